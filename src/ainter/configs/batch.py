@@ -0,0 +1,73 @@
+import copy
+import itertools
+import json
+from dataclasses import dataclass
+from typing import Any, Self, Optional
+
+
+def set_config_value(config: dict[str, Any], path: str, value: Any) -> None:
+    """Sets the value under the dotted path of the JSON config, e.g. `vehicles.time_density_strategy`"""
+    *parents, name = path.split('.')
+    for parent in parents:
+        config = config.setdefault(parent, dict())
+    config[name] = value
+
+
+@dataclass(slots=True, frozen=True)
+class SweepRun:
+    run_id: int
+    seed: int
+    overrides: dict[str, Any]
+    config: dict[str, Any]
+
+
+@dataclass(slots=True, frozen=True)
+class SweepConfig:
+    """Sweep over every combination of the parameter values and seeds, applied on top of the base config"""
+    base: dict[str, Any]
+    parameters: dict[str, list[Any]]
+    seeds: list[int]
+    steps: Optional[int] = None
+
+    @classmethod
+    def from_json(cls, json_data: dict[str, Any]) -> Self:
+        if 'base' not in json_data:
+            raise ValueError("Sweep must provide the base config")
+
+        parameters = {path: list(values) for path, values in json_data.get('parameters', dict()).items()}
+        if any(len(values) == 0 for values in parameters.values()):
+            raise ValueError("Every swept parameter must have at least one value")
+
+        if 'seeds' in json_data:
+            seeds = [int(seed) for seed in json_data['seeds']]
+        else:
+            first_seed = int(json_data.get('seed', 0))
+            seeds = list(range(first_seed, first_seed + int(json_data.get('replications', 1))))
+        if len(seeds) == 0:
+            raise ValueError("Sweep must run at least one seed")
+
+        steps = json_data.get('steps')
+        if steps is not None and steps < 1:
+            raise ValueError(f"{steps=} cannot be zero-like or negative")
+
+        return cls(base=json_data['base'],
+                   parameters=parameters,
+                   seeds=seeds,
+                   steps=None if steps is None else int(steps))
+
+    def get_runs(self) -> list[SweepRun]:
+        runs = list()
+        paths = list(self.parameters)
+        for values in itertools.product(*self.parameters.values()):
+            overrides = dict(zip(paths, values))
+            config = copy.deepcopy(self.base)
+            for path, value in overrides.items():
+                set_config_value(config, path, value)
+
+            runs.extend(SweepRun(run_id=run_id, seed=seed, overrides=overrides, config=config)
+                        for run_id, seed in enumerate(self.seeds, start=len(runs)))
+        return runs
+
+
+def get_sweep_config_from_json(input_file) -> SweepConfig:
+    return SweepConfig.from_json(json.load(input_file))
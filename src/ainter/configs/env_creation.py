@@ -1,23 +1,55 @@
 import json
-from dataclasses import dataclass
-from typing import Any, Self
+import os
+from dataclasses import dataclass, field
+from typing import Any, Self, Optional, Final
 from datetime import time
 
-from ainter.models.nagel_schreckenberg.units import TimeDensity, get_time_density_strategy
+from ainter.models.nagel_schreckenberg.arrivals import ArrivalProcess, BernoulliArrivals, get_arrival_process
+from ainter.models.nagel_schreckenberg.units import TimeDensity, get_time_density_strategy, SPEED_MAX, CELL_SIZE, \
+    DELTA_TIME, Discretization
+
+
+def get_user_cache_dir() -> str:
+    """Cache directory of the user, `XDG_CACHE_HOME` when it is set to an absolute path, `~/.cache` otherwise"""
+    cache_home = os.environ.get('XDG_CACHE_HOME', '')
+    return cache_home if os.path.isabs(cache_home) else os.path.join(os.path.expanduser('~'), '.cache')
+
+
+# Graphs are cached per user, so runs from any working directory share them
+DEFAULT_GRAPH_CACHE_DIR: Final[str] = os.path.join(get_user_cache_dir(), 'ainter', 'graphs')
+DEFAULT_ROUTE_CACHE_SIZE: Final[int] = 4096
+DEFAULT_METRICS_INTERVAL: Final[int] = 60
 
 
 @dataclass(slots=True, frozen=True)
 class PhysicsConfig:
+    """Simulated period with the resolution of the run, the cell size in meters and the time step in seconds"""
     start_time: time
     end_time: time
+    cell_size: float = float(CELL_SIZE)
+    delta_time: float = float(DELTA_TIME)
 
     @classmethod
     def from_json(cls, json_data: dict[str, Any]) -> Self | str:
         if not ('start_time' in json_data and 'end_time' in json_data):
             return json_data
 
+        cell_size = float(json_data.get('cell_size', CELL_SIZE))
+        if cell_size <= 0:
+            raise ValueError(f"{cell_size=} cannot be zero-like or negative")
+
+        delta_time = float(json_data.get('delta_time', DELTA_TIME))
+        if delta_time <= 0:
+            raise ValueError(f"{delta_time=} cannot be zero-like or negative")
+
         return cls(start_time=time.fromisoformat(json_data['start_time']),
-                   end_time=time.fromisoformat(json_data['end_time']))
+                   end_time=time.fromisoformat(json_data['end_time']),
+                   cell_size=cell_size,
+                   delta_time=delta_time)
+
+    @property
+    def discretization(self) -> Discretization:
+        return Discretization(cell_size=self.cell_size, delta_time=self.delta_time)
 
 
 @dataclass(slots=True, frozen=True)
@@ -41,10 +73,49 @@ class MapBoxConfig:
         return self.left, self.bottom, self.right, self.top
 
 
+@dataclass(slots=True, frozen=True)
+class VehicleTypeConfig:
+    """Vehicle type with its length (m), accelerations (m/s^2), maximal speed (km/h) and share of the spawned
+    vehicles, the shares of all types are normalized"""
+    name: str
+    length: float
+    acc_forward: float
+    acc_backward: float
+    max_speed: float = float(SPEED_MAX)
+    share: float = 1.
+
+    @classmethod
+    def from_json(cls, json_data: dict[str, Any]) -> Self:
+        name = str(json_data.get('name', ''))
+        if name == '':
+            raise ValueError("Vehicle type must have a name")
+
+        values = {x: float(json_data.get(x, 0.)) for x in ('length', 'acc_forward', 'acc_backward')}
+        values['max_speed'] = float(json_data.get('max_speed', SPEED_MAX))
+        for value_name, value in values.items():
+            if value <= 0:
+                raise ValueError(f"{value_name}={value} of {name} cannot be zero-like or negative")
+
+        share = float(json_data.get('share', 1.))
+        if share < 0:
+            raise ValueError(f"{share=} of {name} cannot be negative")
+        return cls(name=name, share=share, **values)
+
+
+DEFAULT_VEHICLE_TYPES: Final[tuple[VehicleTypeConfig, ...]] = (
+    VehicleTypeConfig(name='CAR', length=4.5, acc_forward=2., acc_backward=2., share=0.45),
+    VehicleTypeConfig(name='BUS', length=12., acc_forward=2., acc_backward=2., share=0.175),
+    VehicleTypeConfig(name='TRUCK', length=14., acc_forward=2., acc_backward=2., share=0.125),
+    VehicleTypeConfig(name='MOTORCYCLE', length=2.5, acc_forward=2.5, acc_backward=2., share=0.25),
+)
+
+
 @dataclass(slots=True, frozen=True)
 class VehiclesConfig:
     time_density_strategy: TimeDensity
     min_node_path_length: int
+    arrival_process: ArrivalProcess = BernoulliArrivals()
+    types: tuple[VehicleTypeConfig, ...] = DEFAULT_VEHICLE_TYPES
 
     @classmethod
     def from_json(cls, json_data: dict[str, Any]) -> Self | dict[str, Any]:
@@ -56,7 +127,100 @@ class VehiclesConfig:
             raise ValueError(f"{min_node_path_length=} cannot be zero-like or negative")
 
         return cls(time_density_strategy=get_time_density_strategy(json_data['time_density_strategy']),
-                   min_node_path_length=min_node_path_length)
+                   min_node_path_length=min_node_path_length,
+                   arrival_process=get_arrival_process(json_data.get('arrival_process', 'bernoulli'),
+                                                       float(json_data.get('arrival_rate', 1.))),
+                   types=tuple(VehicleTypeConfig.from_json(x) for x in json_data['types'])
+                   if 'types' in json_data else DEFAULT_VEHICLE_TYPES)
+
+
+@dataclass(slots=True, frozen=True)
+class SimulationConfig:
+    """Engine and outputs of the run. By default vehicles pass an intersection in one step, with
+    `reserve_intersections` the agent engine makes them cross on the trajectories granted by the intersection
+    managers, the vectorized engine does not model the crossings"""
+    engine: str = 'agent'
+    sparse_road_min_length: Optional[float] = None
+    graph_cache_dir: Optional[str] = DEFAULT_GRAPH_CACHE_DIR
+    environment_path: Optional[str] = None
+    od_table_path: Optional[str] = None
+    route_cache_size: int = DEFAULT_ROUTE_CACHE_SIZE
+    collect_interval: int = 1
+    results_format: str = 'npz'
+    metrics_interval: Optional[int] = DEFAULT_METRICS_INTERVAL
+    reserve_intersections: bool = False
+
+    @classmethod
+    def from_json(cls, json_data: dict[str, Any]) -> Self:
+        sparse_road_min_length = json_data.get('sparse_road_min_length')
+        if sparse_road_min_length is not None and sparse_road_min_length <= 0:
+            raise ValueError(f"{sparse_road_min_length=} cannot be zero-like or negative")
+
+        route_cache_size = int(json_data.get('route_cache_size', DEFAULT_ROUTE_CACHE_SIZE))
+        if route_cache_size < 1:
+            raise ValueError(f"{route_cache_size=} cannot be zero-like or negative")
+
+        collect_interval = int(json_data.get('collect_interval', 1))
+        if collect_interval < 1:
+            raise ValueError(f"{collect_interval=} cannot be zero-like or negative")
+
+        metrics_interval = json_data.get('metrics_interval', DEFAULT_METRICS_INTERVAL)
+        if metrics_interval is not None and metrics_interval < 1:
+            raise ValueError(f"{metrics_interval=} cannot be zero-like or negative")
+
+        return cls(engine=str(json_data.get('engine', 'agent')),
+                   sparse_road_min_length=None if sparse_road_min_length is None else float(sparse_road_min_length),
+                   graph_cache_dir=json_data.get('graph_cache_dir', DEFAULT_GRAPH_CACHE_DIR),
+                   environment_path=json_data.get('environment_path'),
+                   od_table_path=json_data.get('od_table_path'),
+                   route_cache_size=route_cache_size,
+                   collect_interval=collect_interval,
+                   results_format=str(json_data.get('results_format', 'npz')),
+                   metrics_interval=None if metrics_interval is None else int(metrics_interval),
+                   reserve_intersections=bool(json_data.get('reserve_intersections', False)))
+
+
+@dataclass(slots=True, frozen=True)
+class GreenWaveConfig:
+    """Signals coordinated along the path of intersections for vehicles driving at the speed (km/h). The first
+    intersection starts its cycle `start` seconds after midnight, the optional green duration (seconds) replaces
+    the durations of the path intersections, so their cycles stay aligned"""
+    nodes: tuple[int, ...]
+    speed: float
+    start: float = 0.
+    green_duration: Optional[float] = None
+
+    @classmethod
+    def from_json(cls, json_data: dict[str, Any]) -> Self:
+        nodes = tuple(int(node) for node in json_data.get('nodes', list()))
+        if len(nodes) < 2:
+            raise ValueError("Green wave must pass at least two intersections")
+
+        speed = float(json_data.get('speed', 0.))
+        if speed <= 0:
+            raise ValueError(f"{speed=} cannot be zero-like or negative")
+
+        green_duration = json_data.get('green_duration')
+        if green_duration is not None and green_duration <= 0:
+            raise ValueError(f"{green_duration=} cannot be zero-like or negative")
+
+        return cls(nodes=nodes,
+                   speed=speed,
+                   start=float(json_data.get('start', 0.)),
+                   green_duration=None if green_duration is None else float(green_duration))
+
+
+@dataclass(slots=True, frozen=True)
+class SignalsConfig:
+    """Coordination of the traffic lights: cycle offsets (seconds) of single intersections and green waves,
+    which are applied after the offsets"""
+    offsets: dict[int, float] = field(default_factory=dict)
+    green_waves: tuple[GreenWaveConfig, ...] = tuple()
+
+    @classmethod
+    def from_json(cls, json_data: dict[str, Any]) -> Self:
+        return cls(offsets={int(node): float(offset) for node, offset in json_data.get('offsets', dict()).items()},
+                   green_waves=tuple(GreenWaveConfig.from_json(wave) for wave in json_data.get('green_waves', list())))
 
 
 @dataclass(slots=True, frozen=True)
@@ -64,6 +228,8 @@ class EnvConfig:
     physics: PhysicsConfig
     map_box: MapBoxConfig
     vehicles: VehiclesConfig
+    simulation: SimulationConfig = SimulationConfig()
+    signals: SignalsConfig = SignalsConfig()
 
     @classmethod
     def from_json(cls, json_data: dict[str, Any]) -> Self | dict[str, Any]:
@@ -72,7 +238,9 @@ class EnvConfig:
 
         return cls(physics=PhysicsConfig.from_json(json_data['physics']),
                    map_box=MapBoxConfig.from_json(json_data['map_box']),
-                   vehicles=VehiclesConfig.from_json(json_data['vehicles']))
+                   vehicles=VehiclesConfig.from_json(json_data['vehicles']),
+                   simulation=SimulationConfig.from_json(json_data.get('simulation', dict())),
+                   signals=SignalsConfig.from_json(json_data.get('signals', dict())))
 
 def get_env_config_from_json(input_file) -> EnvConfig:
     data = json.load(input_file, object_hook=EnvConfig.from_json)
@@ -0,0 +1,149 @@
+import json
+import logging
+import os
+import random
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Final, Optional
+
+import numpy as np
+import pandas as pd
+
+from ainter.configs.batch import SweepConfig, SweepRun, set_config_value
+from ainter.configs.env_creation import EnvConfig
+from ainter.models.data.graph_store import get_graph_key
+from ainter.models.data.od_table import ODTable, get_od_table_key
+from ainter.models.data.osmnx import DEFAULT_NETWORK_TYPE
+from ainter.models.data.routing import RouteCache
+from ainter.models.nagel_schreckenberg.environment import Environment
+from ainter.models.nagel_schreckenberg.model import NaSchUrbanModel, get_road_graph
+from ainter.models.nagel_schreckenberg.network import StaticNetwork
+from ainter.models.nagel_schreckenberg.snapshot import save_environment, load_environment
+from ainter.models.nagel_schreckenberg.units import discretize_time
+from ainter.models.vehicles.catalog import VehicleCatalog
+
+SUMMARY_FILE: Final[str] = 'summary.csv'
+ENVIRONMENTS_DIR: Final[str] = 'environments'
+RUNS_DIR: Final[str] = 'runs'
+
+logger = logging.getLogger(__name__)
+
+
+def prepare_environments(runs: list[SweepRun], output_dir: str) -> list[SweepRun]:
+    """Builds the environment and OD table of every distinct map once, runs get the prepared files as their
+    environment and OD table paths, so that the workers memory-map them instead of building their own copies"""
+    os.makedirs(os.path.join(output_dir, ENVIRONMENTS_DIR), exist_ok=True)
+    networks: dict[str, StaticNetwork] = dict()
+    paths: dict[str, str] = dict()
+    prepared = list()
+    for run in runs:
+        env_config = EnvConfig.from_json(run.config)
+        assert isinstance(env_config, EnvConfig), 'Invalid data structure provided'
+        simulation = env_config.simulation
+        key = get_graph_key(env_config.map_box, DEFAULT_NETWORK_TYPE)
+        config = json.loads(json.dumps(run.config))
+
+        environment_path = simulation.environment_path
+        if environment_path is None:
+            environment_path = paths.get(key)
+        if environment_path is None:
+            environment_path = os.path.join(output_dir, ENVIRONMENTS_DIR, f"{key}.env")
+            # Traffic light durations are not stored, so the random state used here does not matter
+            environment = Environment.from_directed_graph(get_road_graph(env_config),
+                                                          discretize_time(env_config.physics.start_time),
+                                                          random.Random())
+            save_environment(environment, environment_path, key=key)
+            logger.info("Prepared environment %s with %d roads", key[:12], len(environment.roads))
+            paths[key] = environment_path
+        set_config_value(config, 'simulation.environment_path', environment_path)
+
+        catalog = VehicleCatalog.from_config(env_config.vehicles.types, env_config.physics.discretization)
+        od_key = get_od_table_key(key, env_config.vehicles.min_node_path_length, catalog)
+        od_table_path = simulation.od_table_path or paths.get(od_key)
+        if od_table_path is None:
+            if environment_path not in networks:
+                networks[environment_path] = load_environment(environment_path, 0, random.Random(), key=key).network
+            od_table_path = os.path.join(output_dir, ENVIRONMENTS_DIR, f"{od_key}.od")
+            routes = RouteCache.from_network(networks[environment_path])
+            ODTable.from_routes(routes, env_config.vehicles.min_node_path_length, catalog=catalog).save(od_table_path,
+                                                                                                      key=od_key)
+            paths[od_key] = od_table_path
+        set_config_value(config, 'simulation.od_table_path', od_table_path)
+
+        prepared.append(SweepRun(run_id=run.run_id, seed=run.seed, overrides=run.overrides, config=config))
+    return prepared
+
+def run_replication(run: SweepRun, output_dir: str, steps: Optional[int] = None) -> dict[str, Any]:
+    """Runs one replication of the sweep and returns its summary row"""
+    start = time.perf_counter()
+    model = NaSchUrbanModel(EnvConfig.from_json(run.config),
+                            seed=run.seed,
+                            results_dir=os.path.join(output_dir, RUNS_DIR, f"{run.run_id:06d}"))
+
+    total_steps = int(model.end_time - model.time + 1)
+    if steps is not None:
+        total_steps = min(total_steps, steps)
+
+    step = 0
+    while model.running and step < total_steps:
+        model.step()
+        step += 1
+    if model.running:
+        model.save_results()
+
+    summary = {
+        'steps': step,
+        'wall_time': time.perf_counter() - start,
+        'vehicles': model.num_agents,
+        'arrived': model.demand.arrived,
+        'released': model.demand.released,
+        'queued': model.demand.queued,
+        'blocked': model.demand.blocked,
+    }
+    if model.metrics is not None and model.metrics.rows > 0:
+        tables = model.metrics.get_tables()
+        with np.errstate(invalid='ignore'):
+            summary |= {
+                'mean_density': float(np.mean(tables['density'])),
+                'mean_flow': float(np.mean(tables['flow'])),
+                'mean_speed': float(np.nanmean(tables['speed'])) if np.any(np.isfinite(tables['speed'])) else np.nan,
+            }
+    return summary
+
+def get_summary_row(run: SweepRun, status: str, summary: dict[str, Any], error: str = '') -> dict[str, Any]:
+    overrides = {path: value if isinstance(value, (str, int, float)) else json.dumps(value)
+                 for path, value in run.overrides.items()}
+    return {'run_id': run.run_id, 'seed': run.seed} | overrides | {'status': status, 'error': error} | summary
+
+def run_sweep(sweep: SweepConfig, output_dir: str, workers: Optional[int] = None) -> pd.DataFrame:
+    """Runs every replication of the sweep over a process pool and writes the summary table.
+
+    Environments and OD tables are prepared in this process before the fan out, workers only memory-map them.
+    A replication that raises, or whose worker dies, gets a `failed` row with the error instead of aborting the
+    sweep.
+    """
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    if workers < 1:
+        raise ValueError(f"{workers=} cannot be zero-like or negative")
+
+    runs = prepare_environments(sweep.get_runs(), output_dir)
+    logger.info("Running %d replications on %d workers", len(runs), workers)
+
+    rows = list()
+    with ProcessPoolExecutor(max_workers=min(workers, len(runs))) as executor:
+        futures = {executor.submit(run_replication, run, output_dir, sweep.steps): run for run in runs}
+        for future in as_completed(futures):
+            run = futures[future]
+            try:
+                rows.append(get_summary_row(run, 'ok', future.result()))
+            except Exception as error:
+                message = ''.join(traceback.format_exception_only(error)).strip()
+                rows.append(get_summary_row(run, 'failed', dict(), message))
+                logger.warning("Run %d failed: %s", run.run_id, error)
+            logger.info("Finished %d/%d runs", len(rows), len(runs))
+
+    table = pd.DataFrame(rows).sort_values('run_id', ignore_index=True)
+    os.makedirs(output_dir, exist_ok=True)
+    table.to_csv(os.path.join(output_dir, SUMMARY_FILE), index=False)
+    return table
@@ -0,0 +1,47 @@
+import logging
+from argparse import ArgumentParser, Namespace, FileType
+
+import osmnx as ox
+
+from ainter.configs.batch import get_sweep_config_from_json
+from ainter.io.batch import run_sweep, SUMMARY_FILE
+from ainter.io.cmd.command import CMDCommand
+
+logger = logging.getLogger(__name__)
+
+
+class BatchCommand(CMDCommand):
+
+    def __init__(self):
+        ox.settings.use_cache = False
+        ox.settings.log_console = False
+
+    def __call__(self, args: Namespace) -> None:
+        sweep = get_sweep_config_from_json(args.input)
+        table = run_sweep(sweep, args.output_dir, workers=args.workers)
+
+        failed = int((table['status'] != 'ok').sum())
+        logger.info("Sweep finished: %d runs, %d failed, summary written to %s/%s",
+                    len(table), failed, args.output_dir, SUMMARY_FILE)
+
+    def configure_parser(self, subparser) -> ArgumentParser:
+        parser: ArgumentParser = subparser.add_parser(name='batch',
+                                                      help='Runs a sweep of model replications in parallel')
+
+        parser.add_argument('-i', '--input',
+                            help='Sweep in .JSON format with the base config, swept parameters and seeds',
+                            type=FileType(mode='r', encoding='UTF-8'),
+                            nargs='?',
+                            dest='input',
+                            required=True)
+        parser.add_argument('-o', '--output-dir',
+                            help='Directory, into which the environments, run results and summary will be written',
+                            type=str,
+                            required=True,
+                            dest='output_dir')
+        parser.add_argument('-w', '--workers',
+                            help='Number of worker processes, by default one per core',
+                            type=int,
+                            default=None,
+                            dest='workers')
+        return parser
@@ -1,5 +1,8 @@
 from argparse import ArgumentParser
 
+from ainter.io.cmd.batch_command import BatchCommand
+from ainter.io.cmd.prepare_command import PrepareCommand
+from ainter.io.cmd.simulate_command import SimulateCommand
 from ainter.io.cmd.visualize_command import VisualizeCommand
 
 
@@ -13,5 +16,17 @@ def create_program_parser() -> ArgumentParser:
     visualize_command = VisualizeCommand()
     visualize_command_parser = visualize_command.configure_parser(subparsers)
     visualize_command_parser.set_defaults(func=visualize_command)
-    
+
+    simulate_command = SimulateCommand()
+    simulate_command_parser = simulate_command.configure_parser(subparsers)
+    simulate_command_parser.set_defaults(func=simulate_command)
+
+    prepare_command = PrepareCommand()
+    prepare_command_parser = prepare_command.configure_parser(subparsers)
+    prepare_command_parser.set_defaults(func=prepare_command)
+
+    batch_command = BatchCommand()
+    batch_command_parser = batch_command.configure_parser(subparsers)
+    batch_command_parser.set_defaults(func=batch_command)
+
     return parser
@@ -0,0 +1,68 @@
+import logging
+import random
+from argparse import ArgumentParser, Namespace, FileType
+
+import osmnx as ox
+
+from ainter.configs.env_creation import get_env_config_from_json
+from ainter.io.cmd.command import CMDCommand
+from ainter.models.data.graph_store import get_graph_key
+from ainter.models.data.od_table import ODTable, get_od_table_key
+from ainter.models.data.osmnx import DEFAULT_NETWORK_TYPE
+from ainter.models.data.routing import RouteCache
+from ainter.models.nagel_schreckenberg.environment import Environment
+from ainter.models.nagel_schreckenberg.model import get_road_graph
+from ainter.models.nagel_schreckenberg.snapshot import save_environment
+from ainter.models.nagel_schreckenberg.units import discretize_time
+from ainter.models.vehicles.catalog import VehicleCatalog
+
+logger = logging.getLogger(__name__)
+
+
+class PrepareCommand(CMDCommand):
+
+    def __init__(self):
+        ox.settings.use_cache = False
+        ox.settings.log_console = False
+
+    def __call__(self, args: Namespace) -> None:
+        env_config = get_env_config_from_json(args.input)
+
+        # Traffic light durations are not stored, so the random state used here does not matter
+        environment = Environment.from_directed_graph(get_road_graph(env_config),
+                                                      discretize_time(env_config.physics.start_time),
+                                                      random.Random())
+        key = get_graph_key(env_config.map_box, DEFAULT_NETWORK_TYPE)
+        save_environment(environment, args.output, key=key)
+        logger.info("Prepared environment with %d roads and %d intersections written to %s",
+                    len(environment.roads), len(environment.intersections), args.output)
+
+        if args.od_table is not None:
+            min_node_path_length = env_config.vehicles.min_node_path_length
+            catalog = VehicleCatalog.from_config(env_config.vehicles.types, env_config.physics.discretization)
+            od_table = ODTable.from_routes(RouteCache.from_network(environment.network), min_node_path_length,
+                                           catalog=catalog)
+            od_table.save(args.od_table, key=get_od_table_key(key, min_node_path_length, catalog))
+            logger.info("Prepared OD table written to %s", args.od_table)
+
+    def configure_parser(self, subparser) -> ArgumentParser:
+        parser: ArgumentParser = subparser.add_parser(name='prepare',
+                                                      help='Builds the environment once and writes it into a file')
+
+        parser.add_argument('-i', '--input',
+                            help='Configuration in .JSON format that describes env settings',
+                            type=FileType(mode='r', encoding='UTF-8'),
+                            nargs='?',
+                            dest='input',
+                            required=True)
+        parser.add_argument('-o', '--output',
+                            help='Path of the prepared environment file, used as simulation.environment_path',
+                            type=str,
+                            required=True,
+                            dest='output')
+        parser.add_argument('--od-table',
+                            help='Path of the prepared OD table file, used as simulation.od_table_path',
+                            type=str,
+                            default=None,
+                            dest='od_table')
+        return parser
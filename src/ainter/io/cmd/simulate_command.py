@@ -0,0 +1,199 @@
+import logging
+from argparse import ArgumentParser, Namespace, FileType
+from typing import Optional
+
+import numpy as np
+import osmnx as ox
+
+from ainter.configs.env_creation import get_env_config_from_json, EnvConfig
+from ainter.io.cmd.command import CMDCommand
+from ainter.io.collector import ColumnarCollector
+from ainter.io.profiler import StepWindowProfiler
+from ainter.io.progress import ProgressReporter
+from ainter.models.nagel_schreckenberg.checkpoint import save_checkpoint, load_checkpoint
+from ainter.models.nagel_schreckenberg.model import NaSchUrbanModel, DEFAULT_RESULTS_DIR, MODEL_COLUMNS
+from ainter.models.nagel_schreckenberg.partitioned import PartitionedSimulation, PARTITION_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+
+class SimulateCommand(CMDCommand):
+
+    def __init__(self):
+        ox.settings.use_cache = False
+        ox.settings.log_console = False
+
+    def __call__(self, args: Namespace) -> None:
+        env_config = get_env_config_from_json(args.input)
+        if args.partitions > 1:
+            if args.checkpoint is not None or args.resume is not None:
+                raise ValueError("Checkpoints are not supported by the partitioned simulation")
+            self.run_partitioned(env_config, args)
+            return
+
+        model = NaSchUrbanModel(env_config, seed=args.seed, results_dir=args.output_dir)
+        if args.resume is not None:
+            load_checkpoint(model, args.resume)
+            logger.info("Resumed from %s", args.resume)
+
+        total_steps = int(model.end_time - model.time + 1)
+        if args.steps is not None:
+            total_steps = min(total_steps, args.steps)
+
+        logger.info("Running %d steps of the %s engine", total_steps, env_config.simulation.engine)
+        reporter = ProgressReporter(total_steps=total_steps, interval=args.progress_interval, logger=logger,
+                                    delta_time=env_config.physics.delta_time)
+
+        profiler = self.create_profiler(args)
+        step = 0
+        while model.running and step < total_steps:
+            if profiler is not None:
+                profiler.before_step(step)
+            model.step()
+            step += 1
+            if profiler is not None:
+                profiler.after_step(step)
+            reporter.update(step, model.time)
+            if args.checkpoint is not None and args.checkpoint_interval is not None and \
+                    step % args.checkpoint_interval == 0:
+                save_checkpoint(model, args.checkpoint)
+
+        reporter.finish(step, model.time)
+        self.finish_profiler(profiler)
+        for line in model.profile.format_summary():
+            logger.info(line)
+        if model.running:
+            model.save_results()
+        if args.checkpoint is not None:
+            save_checkpoint(model, args.checkpoint)
+            logger.info("Checkpoint written to %s", args.checkpoint)
+        logger.info("Route cache: %d hits, %d misses", model.routes.hits, model.routes.misses)
+        logger.info("Demand: %d arrived, %d released, %d still queued, %d blocked vehicle-steps",
+                    model.demand.arrived, model.demand.released, model.demand.queued, model.demand.blocked)
+        logger.info("Results written to %s", args.output_dir)
+
+    def run_partitioned(self, env_config: EnvConfig, args: Namespace) -> None:
+        collector = ColumnarCollector(output_dir=args.output_dir,
+                                      tables={'model': MODEL_COLUMNS, 'partitions': PARTITION_COLUMNS},
+                                      file_format=env_config.simulation.results_format)
+
+        with PartitionedSimulation(env_config, args.partitions, seed=args.seed, work_dir=args.output_dir) as simulation:
+            total_steps = int(simulation.end_time - simulation.time + 1)
+            if args.steps is not None:
+                total_steps = min(total_steps, args.steps)
+
+            logger.info("Running %d steps of the vectorized engine on %d partitions", total_steps, args.partitions)
+            reporter = ProgressReporter(total_steps=total_steps, interval=args.progress_interval, logger=logger,
+                                        delta_time=env_config.physics.delta_time)
+
+            profiler = self.create_profiler(args)
+            step = 0
+            while simulation.running and step < total_steps:
+                if profiler is not None:
+                    profiler.before_step(step)
+                simulation.step()
+                step += 1
+                if profiler is not None:
+                    profiler.after_step(step)
+                reporter.update(step, simulation.time)
+                collector.append('model', time=simulation.time, agent_count=simulation.num_vehicles,
+                                 queued_count=simulation.demand.queued)
+                collector.append('partitions', time=simulation.time, partition=np.arange(simulation.parts),
+                                 vehicle_count=simulation.vehicle_counts, step_time=simulation.step_times[-1])
+
+            reporter.finish(step, simulation.time)
+            self.finish_profiler(profiler)
+            collector.close()
+            report = simulation.get_partition_report()
+
+        for part, (cells, step_time) in enumerate(zip(report['cells'], report['mean_step_time'])):
+            logger.info("Partition %d: %d cells, %.3f ms per step", part, cells, step_time * 1000.)
+        logger.info("%d cut roads, step time imbalance %.2f", report['cut_roads'], report['imbalance'])
+        logger.info("Results written to %s", args.output_dir)
+
+    @staticmethod
+    def create_profiler(args: Namespace) -> Optional[StepWindowProfiler]:
+        if args.profile is None:
+            return None
+        return StepWindowProfiler(args.profile, start=args.profile_start, steps=args.profile_steps)
+
+    @staticmethod
+    def finish_profiler(profiler: Optional[StepWindowProfiler]) -> None:
+        if profiler is None:
+            return
+
+        profiler.close()
+        if profiler.dumped:
+            logger.info("Profile of %d steps written to %s", profiler.profiled_steps, profiler.path)
+        else:
+            logger.warning("Run stopped before step %d, no profile was written", profiler.start)
+
+    def configure_parser(self, subparser) -> ArgumentParser:
+        parser: ArgumentParser = subparser.add_parser(name='simulate',
+                                                      help='Runs the model without the visualization')
+
+        parser.add_argument('-i', '--input',
+                            help='Configuration in .JSON format that describes env settings',
+                            type=FileType(mode='r', encoding='UTF-8'),
+                            nargs='?',
+                            dest='input',
+                            required=True)
+        parser.add_argument('--seed',
+                            help='Seed of the model random number generators',
+                            type=int,
+                            default=None,
+                            dest='seed')
+        parser.add_argument('-o', '--output-dir',
+                            help='Directory, into which the simulation results will be written',
+                            type=str,
+                            default=DEFAULT_RESULTS_DIR,
+                            dest='output_dir')
+        parser.add_argument('--steps',
+                            help='Maximal number of steps to simulate, by default runs until the end time',
+                            type=int,
+                            default=None,
+                            dest='steps')
+        parser.add_argument('--progress-interval',
+                            help='Minimal number of seconds between two progress reports',
+                            type=float,
+                            default=5.,
+                            dest='progress_interval')
+        parser.add_argument('--partitions',
+                            help='Number of road network regions simulated by separate processes with the '
+                                 'vectorized engine, by default the model runs in one process',
+                            type=int,
+                            default=1,
+                            dest='partitions')
+        parser.add_argument('--checkpoint',
+                            help='File, into which the state of the model is written when the run stops, so that '
+                                 'it can be resumed',
+                            type=str,
+                            default=None,
+                            dest='checkpoint')
+        parser.add_argument('--checkpoint-interval',
+                            help='Number of steps between two checkpoints, by default only the final state is written',
+                            type=int,
+                            default=None,
+                            dest='checkpoint_interval')
+        parser.add_argument('--resume',
+                            help='Checkpoint, from which the run continues',
+                            type=str,
+                            default=None,
+                            dest='resume')
+        parser.add_argument('--profile',
+                            help='File, into which the cProfile statistics of the profiled steps are written, '
+                                 'they can be read with pstats',
+                            type=str,
+                            default=None,
+                            dest='profile')
+        parser.add_argument('--profile-start',
+                            help='Number of steps run before the profiling starts',
+                            type=int,
+                            default=0,
+                            dest='profile_start')
+        parser.add_argument('--profile-steps',
+                            help='Number of profiled steps',
+                            type=int,
+                            default=100,
+                            dest='profile_steps')
+        return parser
@@ -0,0 +1,174 @@
+import glob
+import importlib.util
+import os
+import queue
+import threading
+from typing import Final, Optional
+
+import numpy as np
+
+DEFAULT_CHUNK_ROWS: Final[int] = 2 ** 16
+FILE_FORMATS: Final[tuple[str, ...]] = ('npz', 'parquet')
+
+
+class ColumnBuffer:
+    """Preallocated typed columns of one table, filled chunk by chunk"""
+
+    def __init__(self, columns: dict[str, np.dtype], chunk_rows: int) -> None:
+        self.columns = {name: np.dtype(dtype) for name, dtype in columns.items()}
+        self.chunk_rows = chunk_rows
+        self.free: queue.SimpleQueue[dict[str, np.ndarray]] = queue.SimpleQueue()
+        self.data = self.allocate()
+        self.rows = 0
+        self.chunks = 0
+
+    def allocate(self) -> dict[str, np.ndarray]:
+        try:
+            return self.free.get_nowait()
+        except queue.Empty:
+            return {name: np.empty(shape=self.chunk_rows, dtype=dtype) for name, dtype in self.columns.items()}
+
+    def append(self, columns: dict[str, np.ndarray | int | float]) -> list[dict[str, np.ndarray]]:
+        """Copies the rows into the buffer, returns the chunks that got full. Scalars are repeated on every row"""
+        sizes = [np.size(value) for value in columns.values() if np.ndim(value) > 0]
+        size = sizes[0] if len(sizes) > 0 else 1
+        full = list()
+        written = 0
+        while written < size:
+            count = min(size - written, self.chunk_rows - self.rows)
+            for name, value in columns.items():
+                if np.ndim(value) == 0:
+                    self.data[name][self.rows:self.rows + count] = value
+                else:
+                    self.data[name][self.rows:self.rows + count] = value[written:written + count]
+
+            self.rows += count
+            written += count
+            if self.rows == self.chunk_rows:
+                full.append(self.data)
+                self.data = self.allocate()
+                self.rows = 0
+        return full
+
+
+class ColumnarCollector:
+    """Collects tables of typed columns and writes them into chunk files from a background thread.
+
+    Rows are copied into preallocated buffers of `chunk_rows` rows. Full buffers are handed over to the writer
+    thread, which saves every chunk as `<table>-<chunk>.npz` (or `.parquet`) in the output directory and
+    returns the buffer for reuse, so the memory stays flat and the caller never waits for the disk.
+    """
+
+    def __init__(self,
+                 output_dir: str,
+                 tables: dict[str, dict[str, np.dtype]],
+                 chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                 file_format: str = 'npz') -> None:
+        if chunk_rows < 1:
+            raise ValueError(f"{chunk_rows=} cannot be zero-like or negative")
+        if file_format not in FILE_FORMATS:
+            raise ValueError("Unknown file format provided")
+        if file_format == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+            raise ValueError("Parquet output requires the pyarrow package")
+
+        self.output_dir = output_dir
+        self.file_format = file_format
+        self.buffers = {name: ColumnBuffer(columns, chunk_rows) for name, columns in tables.items()}
+
+        self.pending: queue.SimpleQueue[Optional[tuple[str, int, int, dict[str, np.ndarray]]]] = queue.SimpleQueue()
+        self.writer: Optional[threading.Thread] = None
+        self.error: Optional[BaseException] = None
+        self.closed = False
+        self.submitted = 0
+        self.written = 0
+        self.condition = threading.Condition()
+
+    def append(self, table: str, **columns: np.ndarray | int | float) -> None:
+        assert not self.closed, "Cannot collect into a closed collector"
+
+        buffer = self.buffers[table]
+        for data in buffer.append(columns):
+            self.submit(table, buffer, data, buffer.chunk_rows)
+
+    def submit(self, table: str, buffer: ColumnBuffer, data: dict[str, np.ndarray], rows: int) -> None:
+        if self.writer is None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            self.writer = threading.Thread(target=self.write_chunks, name='collector-writer', daemon=True)
+            self.writer.start()
+
+        self.pending.put((table, buffer.chunks, rows, data))
+        buffer.chunks += 1
+        self.submitted += 1
+
+    def write_chunks(self) -> None:
+        while (item := self.pending.get()) is not None:
+            table, chunk, rows, data = item
+            try:
+                self.write_chunk(table, chunk, {name: column[:rows] for name, column in data.items()})
+            except BaseException as error:
+                self.error = error
+            self.buffers[table].free.put(data)
+            with self.condition:
+                self.written += 1
+                self.condition.notify_all()
+
+    def write_chunk(self, table: str, chunk: int, columns: dict[str, np.ndarray]) -> None:
+        path = os.path.join(self.output_dir, f"{table}-{chunk:06d}.{self.file_format}")
+        temporary_path = f"{path}.tmp"
+
+        with open(temporary_path, 'wb') as out_file:
+            if self.file_format == 'npz':
+                np.savez_compressed(out_file, **columns)
+            else:
+                import pandas as pd
+                pd.DataFrame(columns).to_parquet(out_file)
+        os.replace(temporary_path, path)
+
+    def wait(self) -> None:
+        """Waits until the writer thread has written every full chunk, the partially filled ones stay buffered"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.written == self.submitted)
+        if self.error is not None:
+            raise self.error
+
+    def get_buffered(self, table: str) -> dict[str, np.ndarray]:
+        """Rows of the partially filled chunk of the table, not yet handed over to the writer"""
+        buffer = self.buffers[table]
+        return {name: column[:buffer.rows] for name, column in buffer.data.items()}
+
+    def close(self) -> None:
+        """Writes the partially filled chunks and waits for the writer thread"""
+        if self.closed:
+            return
+
+        self.closed = True
+        for table, buffer in self.buffers.items():
+            if buffer.rows > 0:
+                self.submit(table, buffer, buffer.data, buffer.rows)
+                buffer.rows = 0
+
+        if self.writer is not None:
+            self.pending.put(None)
+            self.writer.join()
+        if self.error is not None:
+            raise self.error
+
+
+def load_table(directory: str, table: str) -> dict[str, np.ndarray]:
+    """Concatenates all chunks of the table written by the `ColumnarCollector`"""
+    paths = sorted(glob.glob(os.path.join(glob.escape(directory), f"{table}-*.npz")) +
+                   glob.glob(os.path.join(glob.escape(directory), f"{table}-*.parquet")))
+
+    chunks = list()
+    for path in paths:
+        if path.endswith('.npz'):
+            with np.load(path, allow_pickle=False) as data:
+                chunks.append({name: data[name] for name in data.files})
+        else:
+            import pandas as pd
+            frame = pd.read_parquet(path)
+            chunks.append({name: frame[name].to_numpy() for name in frame.columns})
+
+    if len(chunks) == 0:
+        return dict()
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
@@ -0,0 +1,46 @@
+import cProfile
+from typing import Optional
+
+
+class StepWindowProfiler:
+    """cProfile of a window of `steps` simulation steps starting with the step `start` of the run.
+
+    `before_step` and `after_step` are called around every step with the number of steps done so far, the
+    statistics are dumped into `path` when the window closes or `close` is called inside it, e.g. when the run
+    ends early. The dump is read with `pstats`.
+    """
+
+    def __init__(self, path: str, start: int = 0, steps: int = 100) -> None:
+        if start < 0:
+            raise ValueError(f"{start=} cannot be negative")
+        if steps <= 0:
+            raise ValueError(f"{steps=} cannot be zero-like or negative")
+
+        self.path = path
+        self.start = start
+        self.steps = steps
+        self.profiler: Optional[cProfile.Profile] = None
+        self.profiled_steps = 0
+        self.dumped = False
+
+    def before_step(self, step: int) -> None:
+        if step == self.start and not self.dumped:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def after_step(self, step: int) -> None:
+        if self.profiler is None:
+            return
+
+        self.profiled_steps += 1
+        if step >= self.start + self.steps:
+            self.close()
+
+    def close(self) -> None:
+        if self.profiler is None:
+            return
+
+        self.profiler.disable()
+        self.profiler.dump_stats(self.path)
+        self.profiler = None
+        self.dumped = True
@@ -0,0 +1,59 @@
+import logging
+import time
+from typing import Callable, Optional
+
+from ainter.models.nagel_schreckenberg.units import DiscreteTime, format_time, DELTA_TIME
+
+
+class ProgressReporter:
+    """Rate-limited progress and ETA reporting through the logging module.
+
+    `update` is cheap enough to be called on every step, a message is logged at most once per `interval`
+    seconds of wall time. The simulation time is shown as a clock of time steps lasting `delta_time` seconds.
+    """
+
+    def __init__(self,
+                 total_steps: int,
+                 interval: float = 5.,
+                 logger: Optional[logging.Logger] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 delta_time: float = DELTA_TIME) -> None:
+        if total_steps < 0:
+            raise ValueError(f"{total_steps=} cannot be negative")
+
+        self.total_steps = total_steps
+        self.interval = interval
+        self.logger = logger if logger is not None else logging.getLogger(__name__)
+        self.clock = clock
+        self.delta_time = delta_time
+
+        self.start = self.clock()
+        self.last_report = self.start
+        self.reports = 0
+
+    def update(self, step: int, simulation_time: DiscreteTime) -> bool:
+        """Logs the progress when the interval has passed, returns whether a message was logged"""
+        now = self.clock()
+        if now - self.last_report < self.interval:
+            return False
+
+        self.last_report = now
+        self.report(step, simulation_time, now)
+        return True
+
+    def finish(self, step: int, simulation_time: DiscreteTime) -> None:
+        now = self.clock()
+        elapsed = now - self.start
+        rate = step / elapsed if elapsed > 0 else float('inf')
+        self.logger.info("Finished %d steps at %s in %.1fs (%.1f steps/s)",
+                         step, format_time(simulation_time, self.delta_time), elapsed, rate)
+
+    def report(self, step: int, simulation_time: DiscreteTime, now: float) -> None:
+        elapsed = now - self.start
+        rate = step / elapsed if elapsed > 0 else 0.
+        eta = (self.total_steps - step) / rate if rate > 0 else float('inf')
+        percent = 100. * step / self.total_steps if self.total_steps > 0 else 100.
+
+        self.reports += 1
+        self.logger.info("Step %d/%d (%.1f%%) at %s, %.1f steps/s, ETA %.0fs",
+                         step, self.total_steps, percent, format_time(simulation_time, self.delta_time), rate, eta)
@@ -1,7 +1,10 @@
+import logging
+
 from ainter.io.cmd.parsers import create_program_parser
 
 
 def main() -> None:
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
     parser = create_program_parser()
     args = parser.parse_args()
     args.func(args)
@@ -0,0 +1,389 @@
+from dataclasses import dataclass, field
+from typing import Final, Optional
+
+import numpy as np
+
+from ainter.models.autonomous_intersection.intersection_directions import IntersectionEntranceDirection
+from ainter.models.nagel_schreckenberg.units import DiscreteTime
+from ainter.models.vehicles.vehicle import VehicleId, NULL_VEHICLE_ID
+
+DEFAULT_RESERVATION_HORIZON: Final[int] = 128
+WORD_SIZE: Final[int] = 64
+
+
+def get_segment(start: int, stop: int) -> np.ndarray:
+    """Coordinates from start to stop, both inclusive, in the driving order"""
+    if stop >= start:
+        return np.arange(start, stop + 1, dtype=np.int64)
+    return np.arange(start, stop - 1, -1, dtype=np.int64)
+
+def get_region_middle(shape: tuple[int, int], action_slice: tuple[slice, slice]) -> tuple[int, int]:
+    """Middle cell of the grid region covered by the approach"""
+    return tuple(int(np.mean(range(*index.indices(size)))) for index, size in zip(action_slice, shape))
+
+def get_travel_axis(shape: tuple[int, int], action_slice: tuple[slice, slice]) -> int:
+    """Axis along which the vehicle crosses the border of the grid at the approach"""
+    widths = [len(range(*index.indices(size))) for index, size in zip(action_slice, shape)]
+    return int(np.argmin(widths))
+
+def get_trajectory(shape: tuple[int, int], entry: tuple[slice, slice], exit: tuple[slice, slice]) -> np.ndarray:
+    """Flat indices of the grid cells driven through from the entry to the exit, in the driving order.
+
+    The vehicle keeps going straight from the middle of the entry until it is in line with the middle of the exit
+    and then turns towards it, so crossing trajectories always share a cell.
+    """
+    entry_cell = get_region_middle(shape, entry)
+    exit_cell = get_region_middle(shape, exit)
+    axis = get_travel_axis(shape, entry)
+    other = 1 - axis
+
+    cells = np.empty(shape=(2, 0), dtype=np.int64)
+    legs = ((get_segment(entry_cell[axis], exit_cell[axis]), other, entry_cell[other]),
+            (get_segment(entry_cell[other], exit_cell[other])[1:], axis, exit_cell[axis]))
+    for coordinates, fixed_axis, fixed_value in legs:
+        leg = np.empty(shape=(2, len(coordinates)), dtype=np.int64)
+        leg[fixed_axis] = fixed_value
+        leg[1 - fixed_axis] = coordinates
+        cells = np.concatenate((cells, leg), axis=1)
+
+    return np.ravel_multi_index(cells, shape)
+
+def get_sweep(trajectory_length: int, speed: int, length: int) -> np.ndarray:
+    """Mask of the trajectory cells swept by the vehicle in every time step, one row per step.
+
+    The front of the vehicle is in the first cell in the first step and moves `speed` cells every step. The cells
+    between the rear of the vehicle in the previous step and its front in the current one are swept, so vehicles
+    cannot jump over each other in between the steps. The last row is the one in which the rear leaves the grid.
+    """
+    assert speed > 0, "Vehicle cannot cross the intersection standing still"
+    assert length > 0, "Vehicle must have a length"
+
+    steps = -(-(trajectory_length + length - 1) // speed) + 1
+    front = np.arange(steps, dtype=np.int64) * speed
+    rear = np.maximum(front - speed, 0) - length + 1
+    cells = np.arange(trajectory_length, dtype=np.int64)
+    return (cells >= rear[:, None]) & (cells <= front[:, None])
+
+def get_sweep_bounds(sweep: np.ndarray) -> tuple[tuple[int, int], ...]:
+    """First and stop trajectory cell of every row of the sweep, the cells swept in one step are contiguous"""
+    first = np.argmax(sweep, axis=1)
+    stop = np.where(np.any(sweep, axis=1), first + np.sum(sweep, axis=1), first)
+    return tuple(zip(first.tolist(), stop.tolist()))
+
+def pack_cells(occupied: np.ndarray) -> np.ndarray:
+    """Packs rows of cell flags into the bitsets of 64-bit words, cell `i` is the bit `i % 64` of the word `i // 64`"""
+    words = -(-occupied.shape[1] // WORD_SIZE)
+    padded = np.zeros(shape=(occupied.shape[0], words * WORD_SIZE), dtype=np.bool_)
+    padded[:, :occupied.shape[1]] = occupied
+    return np.packbits(padded, axis=1, bitorder='little').view('<u8').astype(np.uint64)
+
+def unpack_cells(bits: np.ndarray, cells: int) -> np.ndarray:
+    return np.unpackbits(bits.astype('<u8').view(np.uint8), axis=-1, bitorder='little')[..., :cells].astype(np.bool_)
+
+
+@dataclass(slots=True)
+class ReservationTable:
+    """Space-time reservations of the cells of one grid, kept as bitsets.
+
+    Time step `t` is the row `t % horizon` of the ring buffer and every cell is one bit of the row, so a conflict
+    check of a whole trajectory is one AND over a few words per step. The table covers the time steps from `time`
+    on, the rows of the past are cleared when it advances. A `hold` mask is reserved from the end of the masks to
+    the end of the horizon, for the cells kept until their vehicle leaves.
+    """
+    cells: int
+    horizon: int = DEFAULT_RESERVATION_HORIZON
+    time: DiscreteTime = 0
+    bits: np.ndarray = field(init=False)
+
+    def __post_init__(self) -> None:
+        if self.cells < 1:
+            raise ValueError(f"{self.cells=} cannot be zero-like or negative")
+        if self.horizon < 1:
+            raise ValueError(f"{self.horizon=} cannot be zero-like or negative")
+
+        self.bits = np.zeros(shape=(self.horizon, -(-self.cells // WORD_SIZE)), dtype=np.uint64)
+
+    def get_rows(self, start: DiscreteTime, steps: int) -> tuple[slice, slice]:
+        """Two parts of the ring buffer holding the time steps starting at `start`, the second one is often empty"""
+        if int(start) < self.time:
+            raise ValueError(f"Cannot reserve time step {start} before the current one {self.time}")
+        if int(start) + steps > self.time + self.horizon:
+            raise ValueError(f"Reservation of {steps} steps does not fit the horizon of {self.horizon} steps")
+
+        first = int(start) % self.horizon
+        stop = first + steps
+        if stop <= self.horizon:
+            return slice(first, stop), slice(0, 0)
+        return slice(first, self.horizon), slice(0, stop - self.horizon)
+
+    def get_open_rows(self, start: DiscreteTime) -> tuple[slice, slice]:
+        """Parts of the ring buffer holding the time steps from `start` to the end of the horizon"""
+        steps = self.time + self.horizon - int(start)
+        if steps <= 0:
+            return slice(0, 0), slice(0, 0)
+        return self.get_rows(start, steps)
+
+    def resize(self, horizon: int) -> None:
+        """Extends the ring buffer to cover `horizon` time steps, the reservations are kept"""
+        if horizon <= self.horizon:
+            return
+
+        times = np.arange(self.time, self.time + self.horizon)
+        bits = np.zeros(shape=(horizon, self.bits.shape[1]), dtype=np.uint64)
+        bits[times % horizon] = self.bits[times % self.horizon]
+        self.bits = bits
+        self.horizon = horizon
+
+    def advance(self, time: DiscreteTime) -> None:
+        """Forgets the reservations of the time steps before `time`"""
+        if int(time) <= self.time:
+            return
+
+        head, tail = self.get_rows(self.time, min(int(time) - self.time, self.horizon))
+        self.bits[head] = 0
+        self.bits[tail] = 0
+        self.time = int(time)
+
+    def is_free(self, start: DiscreteTime, masks: np.ndarray, hold: Optional[np.ndarray] = None) -> bool:
+        """Checks that none of the cells of `masks[k]` is reserved at time step `start + k`, nor any cell of `hold`
+        after the masks"""
+        head, tail = self.get_rows(start, len(masks))
+        split = head.stop - head.start
+        if np.any(self.bits[head] & masks[:split]) or np.any(self.bits[tail] & masks[split:]):
+            return False
+        if hold is None:
+            return True
+
+        head, tail = self.get_open_rows(int(start) + len(masks))
+        return not (np.any(self.bits[head] & hold) or np.any(self.bits[tail] & hold))
+
+    def reserve(self, start: DiscreteTime, masks: np.ndarray, hold: Optional[np.ndarray] = None) -> None:
+        assert self.is_free(start, masks, hold), "Cannot reserve the cells twice"
+
+        head, tail = self.get_rows(start, len(masks))
+        split = head.stop - head.start
+        self.bits[head] |= masks[:split]
+        self.bits[tail] |= masks[split:]
+        if hold is not None:
+            self.hold(int(start) + len(masks), hold)
+
+    def hold(self, start: DiscreteTime, mask: np.ndarray) -> None:
+        """Reserves the cells of `mask` from the time step `start` to the end of the horizon"""
+        head, tail = self.get_open_rows(max(int(start), self.time))
+        self.bits[head] |= mask
+        self.bits[tail] |= mask
+
+    def release(self, start: DiscreteTime, masks: np.ndarray, hold: Optional[np.ndarray] = None) -> None:
+        """Frees the cells reserved with `reserve(start, masks, hold)`, reservations never overlap, so no other is
+        touched"""
+        passed = max(self.time - int(start), 0)
+        if passed < len(masks):
+            head, tail = self.get_rows(int(start) + passed, len(masks) - passed)
+            split = head.stop - head.start
+            self.bits[head] &= ~masks[passed:passed + split]
+            self.bits[tail] &= ~masks[passed + split:]
+
+        if hold is not None:
+            head, tail = self.get_open_rows(max(int(start) + len(masks), self.time))
+            self.bits[head] &= ~hold
+            self.bits[tail] &= ~hold
+
+    def get_reserved(self, time: DiscreteTime) -> np.ndarray:
+        """Flags of the cells reserved at the time step"""
+        if not self.time <= int(time) < self.time + self.horizon:
+            return np.zeros(shape=self.cells, dtype=np.bool_)
+        return unpack_cells(self.bits[int(time) % self.horizon], self.cells)
+
+
+@dataclass(slots=True, frozen=True)
+class Reservation:
+    """Trajectory granted to a vehicle of `length` cells from the `entry` to the `exit` approach, it drives `speed`
+    cells every step and leaves the grid at `end`. The cells swept in every step are the trajectory slice between
+    the `bounds` of the step, a vehicle that cannot leave at `end` keeps the cells of the last step"""
+    start: DiscreteTime
+    entry: IntersectionEntranceDirection
+    exit: IntersectionEntranceDirection
+    trajectory: np.ndarray
+    bounds: tuple[tuple[int, int], ...]
+    masks: np.ndarray
+    speed: int
+    length: int
+
+    @property
+    def end(self) -> DiscreteTime:
+        return int(self.start) + len(self.masks)
+
+    @property
+    def hold(self) -> np.ndarray:
+        """Bitset of the cells kept from `end` until the vehicle leaves"""
+        return self.masks[-1]
+
+    def is_overdue(self, time: DiscreteTime) -> bool:
+        """Checks that the vehicle should have left the grid before the time step"""
+        return int(time) >= self.end
+
+    def get_remaining(self, time: DiscreteTime) -> int:
+        """Number of trajectory cells in front of the vehicle at the time step"""
+        front = max(int(time) - int(self.start), 0) * self.speed
+        return max(len(self.trajectory) - 1 - front, 0)
+
+
+@dataclass(slots=True)
+class IntersectionManager:
+    """Grants vehicles their trajectories through the intersection grid, first come first served.
+
+    A vehicle asks to drive from one approach to another at its speed, starting at a time step. The request is
+    granted only if the swept cells are free in every step of the crossing, then they stay reserved until the
+    vehicle releases them. The cells of the last step stay reserved after the crossing, so a vehicle waiting for
+    its exit road keeps them until it leaves. Trajectories and their bitsets are cached, a request is a dictionary
+    lookup and a single conflict check in the reservation table, which grows to the longest crossing.
+    """
+    shape: tuple[int, int]
+    entries: dict[IntersectionEntranceDirection, tuple[slice, slice]]
+    exits: dict[IntersectionEntranceDirection, tuple[slice, slice]]
+    horizon: int = DEFAULT_RESERVATION_HORIZON
+    table: ReservationTable = field(init=False)
+    reservations: dict[VehicleId, Reservation] = field(init=False, default_factory=dict)
+    trajectories: dict[tuple[IntersectionEntranceDirection, IntersectionEntranceDirection], np.ndarray] = \
+        field(init=False, default_factory=dict)
+    sweeps: dict[tuple[IntersectionEntranceDirection, IntersectionEntranceDirection, int, int],
+                 tuple[tuple[tuple[int, int], ...], np.ndarray]] = field(init=False, default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self.table = ReservationTable(cells=int(np.prod(self.shape)), horizon=self.horizon)
+
+    def get_trajectory(self, entry: IntersectionEntranceDirection, exit: IntersectionEntranceDirection) -> np.ndarray:
+        if entry not in self.entries:
+            raise ValueError(f"Intersection cannot be entered from {entry.name}")
+        if exit not in self.exits:
+            raise ValueError(f"Intersection cannot be left to {exit.name}")
+
+        key = (entry, exit)
+        if key not in self.trajectories:
+            self.trajectories[key] = get_trajectory(self.shape, self.entries[entry], self.exits[exit])
+        return self.trajectories[key]
+
+    def get_masks(self,
+                  entry: IntersectionEntranceDirection,
+                  exit: IntersectionEntranceDirection,
+                  speed: int,
+                  length: int) -> tuple[tuple[tuple[int, int], ...], np.ndarray]:
+        """Bounds of the swept trajectory cells and their bitsets, one row per time step of the crossing"""
+        key = (entry, exit, speed, length)
+        if key not in self.sweeps:
+            trajectory = self.get_trajectory(entry, exit)
+            sweep = get_sweep(len(trajectory), speed, length)
+            occupied = np.zeros(shape=(len(sweep), self.table.cells), dtype=np.bool_)
+            steps, cells = np.nonzero(sweep)
+            occupied[steps, trajectory[cells]] = True
+            self.sweeps[key] = get_sweep_bounds(sweep), pack_cells(occupied)
+            # The cells held after the crossing must be checked in at least one time step of the horizon
+            self.resize(len(sweep) + 1)
+        return self.sweeps[key]
+
+    def resize(self, horizon: int) -> None:
+        if horizon <= self.table.horizon:
+            return
+
+        end = self.table.time + self.table.horizon
+        self.table.resize(horizon)
+        self.hold(end)
+
+    def advance(self, time: DiscreteTime) -> None:
+        """Forgets the time steps before `time`, the cells held by the vehicles stay reserved in the new ones"""
+        if int(time) <= self.table.time:
+            return
+
+        end = self.table.time + self.table.horizon
+        self.table.advance(time)
+        self.hold(max(end, self.table.time))
+
+    def hold(self, start: DiscreteTime) -> None:
+        """Reserves the held cells of every vehicle in the time steps from `start` to the end of the horizon"""
+        for reservation in self.reservations.values():
+            self.table.hold(max(int(start), reservation.end), reservation.hold)
+
+    def is_free(self,
+                start: DiscreteTime,
+                entry: IntersectionEntranceDirection,
+                exit: IntersectionEntranceDirection,
+                speed: int,
+                length: int) -> bool:
+        """Checks that the crossing starting at the time step would be granted, nothing is reserved. The table
+        forgets the time steps before `start`"""
+        if speed < 1:
+            raise ValueError(f"{speed=} cannot be zero-like or negative")
+        if length < 1:
+            raise ValueError(f"{length=} cannot be zero-like or negative")
+
+        _, masks = self.get_masks(entry, exit, speed, length)
+        self.advance(start)
+        return self.table.is_free(start, masks, hold=masks[-1])
+
+    def request(self,
+                vehicle_id: VehicleId,
+                start: DiscreteTime,
+                entry: IntersectionEntranceDirection,
+                exit: IntersectionEntranceDirection,
+                speed: int,
+                length: int) -> bool:
+        """Reserves the crossing for the vehicle starting at the time step, if none of its cells is taken"""
+        assert vehicle_id not in self.reservations, "Vehicle already holds a reservation"
+        if not self.is_free(start, entry, exit, speed, length):
+            return False
+
+        reservation = self.get_reservation_of(start, entry, exit, speed, length)
+        self.table.reserve(start, reservation.masks, hold=reservation.hold)
+        self.reservations[vehicle_id] = reservation
+        return True
+
+    def restore(self,
+                vehicle_id: VehicleId,
+                start: DiscreteTime,
+                entry: IntersectionEntranceDirection,
+                exit: IntersectionEntranceDirection,
+                speed: int,
+                length: int) -> None:
+        """Puts back a reservation saved in a checkpoint, its cells come with the restored table"""
+        self.reservations[vehicle_id] = self.get_reservation_of(start, entry, exit, speed, length)
+
+    def get_reservation_of(self,
+                           start: DiscreteTime,
+                           entry: IntersectionEntranceDirection,
+                           exit: IntersectionEntranceDirection,
+                           speed: int,
+                           length: int) -> Reservation:
+        bounds, masks = self.get_masks(entry, exit, speed, length)
+        return Reservation(start=start,
+                           entry=entry,
+                           exit=exit,
+                           trajectory=self.get_trajectory(entry, exit),
+                           bounds=bounds,
+                           masks=masks,
+                           speed=speed,
+                           length=length)
+
+    def release(self, vehicle_id: VehicleId) -> None:
+        reservation = self.reservations.pop(vehicle_id, None)
+        if reservation is not None:
+            self.table.release(reservation.start, reservation.masks, hold=reservation.hold)
+
+    def get_reservation(self, vehicle_id: VehicleId) -> Reservation | None:
+        return self.reservations.get(vehicle_id, None)
+
+    def get_occupancy(self, time: DiscreteTime, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Grid of the vehicles holding each cell at the time step, `NULL_VEHICLE_ID` for the free cells, a vehicle
+        still on the grid after its crossing stands in the cells of its last step. With `out`, a contiguous grid of
+        the intersection shape, the occupancy is written into it"""
+        if out is None:
+            occupancy = np.empty(shape=self.table.cells, dtype=np.uint16)
+        else:
+            assert out.shape == self.shape and out.flags.c_contiguous, "Output must be a contiguous grid"
+            occupancy = out.reshape(-1)
+        occupancy[:] = NULL_VEHICLE_ID
+        for vehicle_id, reservation in self.reservations.items():
+            step = int(time) - int(reservation.start)
+            if step >= 0:
+                first, stop = reservation.bounds[min(step, len(reservation.bounds) - 1)]
+                occupancy[reservation.trajectory[first:stop]] = vehicle_id
+        return occupancy.reshape(self.shape)
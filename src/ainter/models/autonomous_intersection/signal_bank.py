@@ -0,0 +1,106 @@
+from dataclasses import dataclass, field
+from typing import Self
+
+import numpy as np
+
+from ainter.models.autonomous_intersection.intersection_directions import IntersectionEntranceDirection
+from ainter.models.nagel_schreckenberg.units import DiscreteTime
+
+
+@dataclass(slots=True)
+class SignalBank:
+    """Fixed-time signal plans of all intersections of the network, kept in arrays.
+
+    Every intersection gives the right of way to its incoming approaches one after another, each for
+    `green_duration` steps, so its cycle lasts `green_duration * phases` steps. The green phase at time `t` is
+    `(t - offset) // green_duration % phases`, so the state of every approach follows from the time in one
+    vectorized expression and the bank is never stepped. The approaches of intersection `i` are the rows
+    `approach_start[i]:approach_start[i + 1]` in their phase order.
+    """
+    green_duration: np.ndarray
+    offset: np.ndarray
+    approach_start: np.ndarray
+    approach_direction: np.ndarray
+    approach_intersection: np.ndarray = field(init=False)
+    approach_phase: np.ndarray = field(init=False)
+    approach_index: np.ndarray = field(init=False)
+
+    def __post_init__(self) -> None:
+        assert len(self.green_duration) == len(self.offset) == len(self.approach_start) - 1, \
+            "Every intersection must have a green duration, an offset and its approaches"
+
+        approaches = np.arange(len(self.approach_direction), dtype=np.int64)
+        self.approach_intersection = np.repeat(np.arange(len(self.green_duration), dtype=np.int64), self.num_phases)
+        self.approach_phase = approaches - self.approach_start[self.approach_intersection]
+        self.approach_index = np.full(shape=(len(self.green_duration), len(IntersectionEntranceDirection)),
+                                      fill_value=-1,
+                                      dtype=np.int64)
+        self.approach_index[self.approach_intersection, self.approach_direction] = approaches
+
+    @classmethod
+    def from_phases(cls,
+                    phases: list[list[IntersectionEntranceDirection]],
+                    green_duration: list[DiscreteTime]) -> Self:
+        """Creates the bank from the phase order and green duration of every intersection, with no offsets"""
+        if len(phases) != len(green_duration):
+            raise ValueError("Every intersection must have its green duration")
+        if any(duration < 1 for duration in green_duration):
+            raise ValueError("Green duration cannot be zero-like or negative")
+        if any(len(set(directions)) != len(directions) for directions in phases):
+            raise ValueError("Cannot add a direction twice")
+
+        phase_count = np.array([len(directions) for directions in phases], dtype=np.int64)
+        return cls(green_duration=np.array(green_duration, dtype=np.int64),
+                   offset=np.zeros(shape=len(phases), dtype=np.int64),
+                   approach_start=np.concatenate(([0], np.cumsum(phase_count))).astype(np.int64),
+                   approach_direction=np.array([direction for directions in phases for direction in directions],
+                                               dtype=np.int8))
+
+    @property
+    def num_phases(self) -> np.ndarray:
+        return np.diff(self.approach_start)
+
+    @property
+    def cycle_length(self) -> np.ndarray:
+        return self.green_duration * self.num_phases
+
+    def get_phases(self, time: DiscreteTime) -> np.ndarray:
+        """Index of the green phase of every intersection at the time"""
+        return (int(time) - self.offset) // self.green_duration % np.maximum(self.num_phases, 1)
+
+    def get_green(self, time: DiscreteTime) -> np.ndarray:
+        """Right of way of every approach at the time"""
+        return self.approach_phase == self.get_phases(time)[self.approach_intersection]
+
+    def get_approach(self, intersection: int, direction: IntersectionEntranceDirection) -> int:
+        approach = int(self.approach_index[intersection, direction])
+        assert approach >= 0, "Cannot ask for unknown direction"
+        return approach
+
+    def get_phase_count(self, intersection: int) -> int:
+        return int(self.approach_start[intersection + 1] - self.approach_start[intersection])
+
+    def has_right_of_way(self, intersection: int, direction: IntersectionEntranceDirection, time: DiscreteTime) -> bool:
+        approach = self.get_approach(intersection, direction)
+        green_duration = int(self.green_duration[intersection])
+        phase = (int(time) - int(self.offset[intersection])) // green_duration % self.get_phase_count(intersection)
+        return phase == int(self.approach_phase[approach])
+
+    def set_green_start(self, intersection: int, direction: IntersectionEntranceDirection, time: DiscreteTime) -> None:
+        """Shifts the offset of the intersection, so the approach from the direction turns green at the time"""
+        approach = self.get_approach(intersection, direction)
+        green_duration = int(self.green_duration[intersection])
+        green_start = int(time) - int(self.approach_phase[approach]) * green_duration
+        self.offset[intersection] = green_start % (green_duration * self.get_phase_count(intersection))
+
+    def set_phases(self, time: DiscreteTime, phases: np.ndarray) -> None:
+        """Shifts the offsets so that every intersection starts the given phase at the time, and holds it for its
+        green duration. Intersections without any approach must be given the phase 0"""
+        phases = np.asarray(phases, dtype=np.int64)
+        if phases.shape != self.green_duration.shape:
+            raise ValueError("Every intersection must be given its phase")
+        if np.any((phases < 0) | (phases >= np.maximum(self.num_phases, 1))):
+            raise ValueError("Phase must be one of the phases of the intersection")
+
+        cycle_length = np.maximum(self.cycle_length, 1)
+        self.offset[:] = (int(time) - phases * self.green_duration) % cycle_length
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+from typing import Any, Final, Optional
+
+import networkx as nx
+import numpy as np
+import shapely
+from shapely import LineString
+
+from ainter.configs.env_creation import MapBoxConfig
+
+GRAPH_STORE_VERSION: Final[int] = 1
+NODE_COLUMNS: Final[tuple[str, ...]] = ('x', 'y')
+EDGE_COLUMNS: Final[tuple[str, ...]] = ('length',)
+
+
+def get_graph_key(config: MapBoxConfig, network_type: str) -> str:
+    """Content address of the graph downloaded for the bounding box and network type"""
+    description = json.dumps({'bbox': [repr(x) for x in config.get_bbox()],
+                              'network_type': network_type,
+                              'version': GRAPH_STORE_VERSION},
+                             sort_keys=True)
+    return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+def encode_numpy_scalar(value: Any) -> Any:
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value)} cannot be stored in the graph store")
+
+def encode_json(data: Any) -> np.ndarray:
+    document = json.dumps(data, separators=(',', ':'), default=encode_numpy_scalar)
+    return np.frombuffer(document.encode('utf-8'), dtype=np.uint8)
+
+def decode_json(data: np.ndarray) -> Any:
+    return json.loads(data.tobytes().decode('utf-8'))
+
+
+class GraphStore:
+    """Local store of OSM graphs, which does not need any network access to load them.
+
+    Every graph is a single `.npz` file named by its key. Node coordinates, edge lengths and edge geometries
+    are kept as typed arrays, the remaining (heterogeneous) OSM attributes are kept as one JSON document.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+
+    def get_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.isfile(self.get_path(key))
+
+    def save(self, key: str, graph: nx.MultiDiGraph) -> str:
+        nodes = list(graph.nodes(data=True))
+        edges = list(graph.edges(keys=True, data=True))
+        node_index = {node_id: i for i, (node_id, _) in enumerate(nodes)}
+
+        geometries = [data.get('geometry') for _, _, _, data in edges]
+        has_geometry = np.array([geometry is not None for geometry in geometries], dtype=bool)
+        stored_geometries = [geometry for geometry in geometries if geometry is not None]
+
+        arrays = {
+            'node_id': np.array([node_id for node_id, _ in nodes], dtype=np.int64),
+            'edge_source': np.array([node_index[u] for u, _, _, _ in edges], dtype=np.int64),
+            'edge_target': np.array([node_index[v] for _, v, _, _ in edges], dtype=np.int64),
+            'edge_key': np.array([k for _, _, k, _ in edges], dtype=np.int64),
+            'edge_has_geometry': has_geometry,
+            'geometry_coords': shapely.get_coordinates(stored_geometries).astype(np.float64),
+            'geometry_sizes': shapely.get_num_coordinates(stored_geometries).astype(np.int64),
+        }
+        for column in NODE_COLUMNS:
+            arrays[f'node_{column}'] = np.array([data[column] for _, data in nodes], dtype=np.float64)
+        for column in EDGE_COLUMNS:
+            arrays[f'edge_{column}'] = np.array([data[column] for _, _, _, data in edges], dtype=np.float64)
+
+        arrays['attributes'] = encode_json({
+            'graph': graph.graph,
+            'nodes': [{name: value for name, value in data.items() if name not in NODE_COLUMNS}
+                      for _, data in nodes],
+            'edges': [{name: value for name, value in data.items() if name not in EDGE_COLUMNS + ('geometry',)}
+                      for _, _, _, data in edges],
+        })
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.get_path(key)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'wb') as out_file:
+            np.savez_compressed(out_file, **arrays)
+        os.replace(temporary_path, path)
+        return path
+
+    def load(self, key: str) -> Optional[nx.MultiDiGraph]:
+        if key not in self:
+            return None
+
+        with np.load(self.get_path(key), allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files}
+        attributes = decode_json(arrays['attributes'])
+
+        graph = nx.MultiDiGraph(**attributes['graph'])
+        node_ids = arrays['node_id'].tolist()
+        node_columns = {column: arrays[f'node_{column}'].tolist() for column in NODE_COLUMNS}
+        graph.add_nodes_from((node_id, data | {column: values[i] for column, values in node_columns.items()})
+                             for i, (node_id, data) in enumerate(zip(node_ids, attributes['nodes'])))
+
+        geometries: list[Optional[LineString]] = [None] * len(arrays['edge_key'])
+        sizes = arrays['geometry_sizes']
+        if len(sizes) > 0:
+            stored = shapely.linestrings(arrays['geometry_coords'], indices=np.repeat(np.arange(len(sizes)), sizes))
+            for i, geometry in zip(np.flatnonzero(arrays['edge_has_geometry']), stored):
+                geometries[i] = geometry
+
+        edge_columns = {column: arrays[f'edge_{column}'].tolist() for column in EDGE_COLUMNS}
+        sources = arrays['edge_source'].tolist()
+        targets = arrays['edge_target'].tolist()
+        for i, (key_id, data) in enumerate(zip(arrays['edge_key'].tolist(), attributes['edges'])):
+            data.update({column: values[i] for column, values in edge_columns.items()})
+            if geometries[i] is not None:
+                data['geometry'] = geometries[i]
+            graph.add_edge(node_ids[sources[i]], node_ids[targets[i]], key=key_id, **data)
+
+        return graph
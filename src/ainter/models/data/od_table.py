@@ -0,0 +1,232 @@
+from typing import Final, Optional
+
+import numpy as np
+from scipy.sparse.csgraph import dijkstra
+
+from ainter.models.data.routing import RouteCache, NO_PREDECESSOR
+from ainter.models.data.table_file import write_table_file, read_table_file
+from ainter.models.vehicles.catalog import VehicleCatalog, VehicleTypeId, DEFAULT_VEHICLE_CATALOG
+
+# Number of predecessor matrix entries processed at once
+OD_CHUNK_SIZE: Final[int] = 2 ** 20
+OD_TABLE_MAGIC: Final[bytes] = b'AINTODT\x00'
+OD_TABLE_VERSION: Final[int] = 2
+
+
+def get_od_table_key(network_key: str,
+                     min_node_path_length: int,
+                     catalog: VehicleCatalog = DEFAULT_VEHICLE_CATALOG) -> str:
+    """Key of the OD table built for the map with the network key, the minimal path length and the vehicle types"""
+    return f"{network_key}-{min_node_path_length}-{catalog.get_content_hash()[:16]}"
+
+
+class AliasTable:
+    """Walker's alias table, draws an index with probability proportional to its weight in constant time"""
+
+    def __init__(self, weights: np.ndarray) -> None:
+        weights = np.asarray(weights, dtype=np.float64)
+        if len(weights) == 0 or np.any(weights < 0) or not np.sum(weights) > 0:
+            raise ValueError("Weights must be non-negative with a positive sum")
+
+        size = len(weights)
+        scaled = weights * size / np.sum(weights)
+        self.probability = np.ones(shape=size, dtype=np.float64)
+        self.alias = np.arange(size, dtype=np.int64)
+
+        # Vose's method in rounds: every small column takes its alias from the large column, whose excess
+        # interval contains the start of the small column's deficit interval
+        small = np.flatnonzero(scaled < 1.)
+        large = np.flatnonzero(scaled >= 1.)
+        while len(small) > 0 and len(large) > 0:
+            deficit = 1. - scaled[small]
+            excess_end = np.cumsum(scaled[large] - 1.)
+            donor = np.searchsorted(excess_end, np.cumsum(deficit) - deficit, side='right')
+            paired = donor < len(large)
+
+            self.probability[small[paired]] = scaled[small[paired]]
+            self.alias[small[paired]] = large[donor[paired]]
+            scaled[large] -= np.bincount(donor[paired], weights=deficit[paired], minlength=len(large))
+
+            small = np.concatenate((small[~paired], large[scaled[large] < 1.]))
+            large = large[scaled[large] >= 1.]
+            if not np.any(paired):
+                break
+
+    @classmethod
+    def from_arrays(cls, probability: np.ndarray, alias: np.ndarray) -> 'AliasTable':
+        table = cls.__new__(cls)
+        table.probability = probability
+        table.alias = alias
+        return table
+
+    def __len__(self) -> int:
+        return len(self.alias)
+
+    def sample(self, random) -> int:
+        index = random.randrange(len(self.alias))
+        if random.random() < self.probability[index]:
+            return index
+        return int(self.alias[index])
+
+    def sample_many(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        index = rng.integers(0, len(self.alias), size=size)
+        return np.where(rng.random(size=size) < self.probability[index], index, self.alias[index])
+
+
+class ODTable:
+    """Valid origin-destination pairs of every vehicle type with their alias tables.
+
+    A pair is valid if its shortest path visits at least `min_node_path_length` nodes and none of its roads is
+    shorter than the vehicle plus a safety margin. By default a pair has the weight `1 / descendants(origin)`,
+    which gives the distribution of drawing a start node, then its descendant, and rejecting invalid paths.
+    The vehicle types are the type ids of `catalog`, the cells follow its discretization.
+    """
+
+    def __init__(self,
+                 nodes: list[int],
+                 pairs: dict[VehicleTypeId, np.ndarray],
+                 tables: dict[VehicleTypeId, AliasTable],
+                 catalog: VehicleCatalog = DEFAULT_VEHICLE_CATALOG):
+        self.nodes = nodes
+        self.pairs = pairs
+        self.tables = tables
+        self.catalog = catalog
+
+    @classmethod
+    def from_routes(cls,
+                    routes: RouteCache,
+                    min_node_path_length: int,
+                    vehicle_types: Optional[list[VehicleTypeId]] = None,
+                    origin_weights: Optional[dict[int, float]] = None,
+                    destination_weights: Optional[dict[int, float]] = None,
+                    catalog: VehicleCatalog = DEFAULT_VEHICLE_CATALOG) -> 'ODTable':
+        vehicle_types = catalog.spawned_type_ids if vehicle_types is None else vehicle_types
+        nodes = routes.nodes
+        size = len(nodes)
+
+        lengths = routes.lengths
+        edge_sources = np.repeat(np.arange(size, dtype=np.int64), np.diff(lengths.indptr))
+        edge_keys = edge_sources * size + lengths.indices
+        edge_order = np.argsort(edge_keys)
+        edge_keys = edge_keys[edge_order]
+        edge_cells = catalog.discretization.discretize_length(lengths.data).astype(np.int64)[edge_order]
+
+        origin_weight = np.ones(shape=size, dtype=np.float64)
+        destination_weight = np.ones(shape=size, dtype=np.float64)
+        for node, weight in (origin_weights or dict()).items():
+            origin_weight[routes.node_index[node]] = weight
+        for node, weight in (destination_weights or dict()).items():
+            destination_weight[routes.node_index[node]] = weight
+
+        margin = int(catalog.discretization.discretize_length(2.))
+        min_cells = {x: int(catalog.length[x]) + margin for x in vehicle_types}
+        found_pairs = {x: list() for x in vehicle_types}
+        found_weights = {x: list() for x in vehicle_types}
+
+        chunk = max(1, OD_CHUNK_SIZE // max(size, 1))
+        for start in range(0, size, chunk):
+            sources = np.arange(start, min(start + chunk, size))
+            _, predecessors = dijkstra(lengths, indices=sources, return_predecessors=True)
+            hops, bottleneck, reachable = get_path_statistics(predecessors, edge_keys, edge_cells)
+
+            descendants = np.maximum(np.sum(reachable, axis=1), 1)
+            weights = (origin_weight[sources] / descendants)[:, np.newaxis] * destination_weight[np.newaxis, :]
+            long_enough = reachable & (hops + 1 >= min_node_path_length) & (weights > 0)
+            for vehicle_type in vehicle_types:
+                row, column = np.nonzero(long_enough & (bottleneck >= min_cells[vehicle_type]))
+                found_pairs[vehicle_type].append(sources[row] * size + column)
+                found_weights[vehicle_type].append(weights[row, column])
+
+        pairs = dict()
+        tables = dict()
+        for vehicle_type in vehicle_types:
+            pairs[vehicle_type] = np.concatenate(found_pairs[vehicle_type])
+            if len(pairs[vehicle_type]) == 0:
+                raise ValueError(f"No valid origin-destination pair exists for {catalog.names[vehicle_type]}")
+            tables[vehicle_type] = AliasTable(np.concatenate(found_weights[vehicle_type]))
+
+        return cls(nodes=nodes, pairs=pairs, tables=tables, catalog=catalog)
+
+    def save(self, path: str, key: Optional[str] = None) -> None:
+        """Writes the pairs and alias tables into a memory-mappable file, see `write_table_file`.
+
+        The vehicle types are stored by their names with their lengths, which the pairs were validated for.
+        """
+        names = self.catalog.names
+        tables = {'nodes': np.array(self.nodes, dtype=np.int64)}
+        for vehicle_type, pairs in self.pairs.items():
+            tables |= {
+                f"{names[vehicle_type]}_pairs": pairs,
+                f"{names[vehicle_type]}_probability": self.tables[vehicle_type].probability,
+                f"{names[vehicle_type]}_alias": self.tables[vehicle_type].alias,
+            }
+        write_table_file(path, OD_TABLE_MAGIC, {
+            'version': OD_TABLE_VERSION,
+            'key': key,
+            'vehicle_types': [names[vehicle_type] for vehicle_type in self.pairs],
+            'vehicle_lengths': [int(self.catalog.length[vehicle_type]) for vehicle_type in self.pairs],
+        }, tables)
+
+    @classmethod
+    def load(cls, path: str, key: Optional[str] = None, catalog: VehicleCatalog = DEFAULT_VEHICLE_CATALOG) -> 'ODTable':
+        """Reads the table saved by `save`, its arrays are read-only views shared by every process mapping the file.
+        The stored vehicle types must be declared in `catalog` with the same lengths.
+        """
+        header, tables = read_table_file(path, OD_TABLE_MAGIC)
+        if header['version'] != OD_TABLE_VERSION:
+            raise ValueError(f"Unsupported OD table version {header['version']}")
+        if key is not None and header['key'] != key:
+            raise ValueError(f"{path} was built for a different map or path length")
+
+        names = header['vehicle_types']
+        vehicle_types = [catalog.get_type_id(name) for name in names]
+        if any(catalog.length[x] != length for x, length in zip(vehicle_types, header['vehicle_lengths'])):
+            raise ValueError(f"{path} was built for different vehicle lengths")
+        return cls(nodes=tables['nodes'].tolist(),
+                   pairs={x: tables[f"{name}_pairs"] for x, name in zip(vehicle_types, names)},
+                   tables={x: AliasTable.from_arrays(tables[f"{name}_probability"], tables[f"{name}_alias"])
+                           for x, name in zip(vehicle_types, names)},
+                   catalog=catalog)
+
+    def sample(self, vehicle_type: VehicleTypeId, random) -> tuple[int, int]:
+        """Draws the (origin, destination) node pair of a new vehicle"""
+        pair = int(self.pairs[vehicle_type][self.tables[vehicle_type].sample(random)])
+        origin, destination = divmod(pair, len(self.nodes))
+        return self.nodes[origin], self.nodes[destination]
+
+    def sample_many(self,
+                    vehicle_type: VehicleTypeId,
+                    rng: np.random.Generator,
+                    size: int) -> tuple[list[int], list[int]]:
+        """Draws `size` (origin, destination) node pairs at once, returned as the origin and destination lists"""
+        pairs = self.pairs[vehicle_type][self.tables[vehicle_type].sample_many(rng, size)]
+        origins, destinations = np.divmod(pairs, len(self.nodes))
+        return [self.nodes[x] for x in origins.tolist()], [self.nodes[x] for x in destinations.tolist()]
+
+
+def get_path_statistics(predecessors: np.ndarray,
+                        edge_keys: np.ndarray,
+                        edge_cells: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Number of edges and the shortest edge (in cells) of every path of the shortest path trees.
+
+    Rows of `predecessors` are shortest path trees, the path statistics are accumulated by pointer jumping,
+    which takes a logarithmic number of vectorized passes in the longest path length.
+    """
+    reachable = predecessors != NO_PREDECESSOR
+    size = predecessors.shape[1]
+    parent = np.where(reachable, predecessors, 0)
+
+    hops = reachable.astype(np.int64)
+    edge = np.searchsorted(edge_keys, parent * size + np.arange(size)[np.newaxis, :])
+    bottleneck = np.where(reachable, np.append(edge_cells, 0)[edge], np.iinfo(np.int64).max)
+    jump = np.where(reachable, predecessors, -1)
+
+    while np.any(jump >= 0):
+        jumping = jump >= 0
+        target = np.where(jumping, jump, 0)
+        hops = np.where(jumping, hops + np.take_along_axis(hops, target, axis=1), hops)
+        bottleneck = np.where(jumping, np.minimum(bottleneck, np.take_along_axis(bottleneck, target, axis=1)),
+                              bottleneck)
+        jump = np.where(jumping, np.take_along_axis(jump, target, axis=1), jump)
+
+    return hops, bottleneck, reachable
@@ -1,13 +1,30 @@
+from typing import Optional, Final
+
 import networkx as nx
 import osmnx as ox
 from networkx.classes import DiGraph
 
 from ainter.configs.env_creation import MapBoxConfig
+from ainter.models.data.graph_store import GraphStore, get_graph_key
+
+DEFAULT_NETWORK_TYPE: Final[str] = 'drive'
+
 
+def get_data_from_bbox(config: MapBoxConfig,
+                       network_type: str = DEFAULT_NETWORK_TYPE,
+                       store: Optional[GraphStore] = None) -> nx.MultiDiGraph:
+    """Downloads the road graph of the bounding box, graphs found in the store are loaded without network access"""
+    if store is None:
+        return ox.graph.graph_from_bbox(bbox=config.get_bbox(),
+                                        network_type=network_type,)
 
-def get_data_from_bbox(config: MapBoxConfig) -> nx.MultiDiGraph:
-    return ox.graph.graph_from_bbox(bbox=config.get_bbox(),
-                                    network_type='drive',)
+    key = get_graph_key(config, network_type)
+    graph = store.load(key)
+    if graph is None:
+        graph = ox.graph.graph_from_bbox(bbox=config.get_bbox(),
+                                         network_type=network_type,)
+        store.save(key, graph)
+    return graph
 
 def bfs_shortest_path(graph: DiGraph, source: int, target: int) -> list[int]:
     return nx.shortest_path(graph, source=source, target=target, weight='length')
@@ -0,0 +1,153 @@
+from collections import OrderedDict
+from typing import Final
+
+import numpy as np
+from networkx.classes import DiGraph
+from scipy.sparse import csr_array
+from scipy.sparse.csgraph import dijkstra, connected_components, breadth_first_order
+
+from ainter.configs.env_creation import DEFAULT_ROUTE_CACHE_SIZE
+from ainter.models.nagel_schreckenberg.network import StaticNetwork
+
+# Explicit zeros are treated as missing edges by scipy.sparse.csgraph
+MIN_EDGE_LENGTH: Final[float] = 1e-6
+NO_PREDECESSOR: Final[int] = -9999
+
+
+def get_length_matrix(graph: DiGraph, nodes: list[int]) -> csr_array:
+    """Sparse adjacency matrix of the graph weighted by the edge length, rows and columns follow `nodes`"""
+    node_index = {node: i for i, node in enumerate(nodes)}
+    edges = list(graph.edges(data='length'))
+    return get_edge_length_matrix(np.array([node_index[u] for u, _, _ in edges], dtype=np.int64),
+                                  np.array([node_index[v] for _, v, _ in edges], dtype=np.int64),
+                                  np.array([length for _, _, length in edges], dtype=np.float64),
+                                  len(nodes))
+
+def get_edge_length_matrix(sources: np.ndarray, targets: np.ndarray, lengths: np.ndarray, size: int) -> csr_array:
+    """Sparse adjacency matrix weighted by the edge length from the edge tables of node indices"""
+    return csr_array((np.maximum(lengths, MIN_EDGE_LENGTH), (sources, targets)), shape=(size, size))
+
+def get_path_from_predecessors(predecessors: np.ndarray, source: int, target: int) -> list[int]:
+    """Indices of the path nodes read backwards from a shortest path tree"""
+    path = [target]
+    while path[-1] != source:
+        previous = int(predecessors[path[-1]])
+        assert previous != NO_PREDECESSOR, "Target is not reachable from the source"
+        path.append(previous)
+    return path[::-1]
+
+
+class RouteCache:
+    """Reachability and shortest path queries of the road graph.
+
+    Reachability is answered from the condensation of the graph into its strongly connected components,
+    the components reachable from a component are computed on the first query and kept. Shortest paths by the
+    edge length are memoized in an LRU cache of at most `max_size` (origin, destination) pairs. They are found
+    with the same Dijkstra implementation as the `ODTable` uses, so that both agree on ties. Everything is
+    computed from the sparse length matrix, so the cache can be built from a `StaticNetwork` without its graph.
+    """
+
+    def __init__(self, nodes: list[int], lengths: csr_array, max_size: int = DEFAULT_ROUTE_CACHE_SIZE) -> None:
+        if max_size < 1:
+            raise ValueError(f"{max_size=} cannot be zero-like or negative")
+
+        self.max_size = max_size
+        self.paths: OrderedDict[tuple[int, int], list[int]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        self.nodes = nodes
+        self.node_index = {node: i for i, node in enumerate(nodes)}
+        self.lengths = lengths
+
+        count, labels = connected_components(lengths, directed=True, connection='strong')
+        self.component = dict(zip(nodes, labels.tolist()))
+        sources = np.repeat(labels, np.diff(lengths.indptr))
+        targets = labels[lengths.indices]
+        between = sources != targets
+        self.condensation = csr_array((np.ones(shape=int(np.sum(between)), dtype=np.int8),
+                                       (sources[between], targets[between])), shape=(count, count))
+
+        order = np.argsort(labels, kind='stable')
+        self.component_nodes = np.array(nodes, dtype=np.int64)[order]
+        self.node_position = {int(node): position for position, node in enumerate(self.component_nodes)}
+        self.component_size = np.bincount(labels, minlength=count).astype(np.int64)
+        self.component_start = np.cumsum(self.component_size) - self.component_size
+        self.reachable_components: dict[int, np.ndarray] = dict()
+
+        has_descendants = (self.component_size > 1) | (np.diff(self.condensation.indptr) > 0)
+        self.starting_nodes = [node for node, label in zip(nodes, labels.tolist()) if has_descendants[label]]
+
+    @classmethod
+    def from_graph(cls, graph: DiGraph, max_size: int = DEFAULT_ROUTE_CACHE_SIZE) -> 'RouteCache':
+        nodes = list(graph.nodes)
+        return cls(nodes, get_length_matrix(graph, nodes), max_size)
+
+    @classmethod
+    def from_network(cls, network: StaticNetwork, max_size: int = DEFAULT_ROUTE_CACHE_SIZE) -> 'RouteCache':
+        return cls(network.node_id.tolist(),
+                   get_edge_length_matrix(network.edge_source, network.edge_target, network.edge_length,
+                                          network.num_nodes),
+                   max_size)
+
+    def get_reachable_components(self, component: int) -> np.ndarray:
+        """Sorted components reachable from the component, including itself"""
+        reachable = self.reachable_components.get(component)
+        if reachable is None:
+            reachable = np.sort(breadth_first_order(self.condensation, component, return_predecessors=False))
+            self.reachable_components[component] = reachable
+        return reachable
+
+    def get_descendants_count(self, node: int) -> int:
+        return int(np.sum(self.component_size[self.get_reachable_components(self.component[node])])) - 1
+
+    def is_reachable(self, source: int, target: int) -> bool:
+        if source == target:
+            return self.component_size[self.component[source]] > 1
+
+        reachable = self.get_reachable_components(self.component[source])
+        target_component = self.component[target]
+        index = np.searchsorted(reachable, target_component)
+        return index < len(reachable) and reachable[index] == target_component
+
+    def sample_descendant(self, node: int, random) -> int:
+        """Draws a node reachable from the node uniformly, the same set as `networkx.descendants` returns"""
+        reachable = self.get_reachable_components(self.component[node])
+        sizes = self.component_size[reachable]
+        count = int(np.sum(sizes)) - 1
+        if count <= 0:
+            raise ValueError(f"Node {node} has no descendants")
+
+        index = random.randrange(count)
+        cumulative = np.cumsum(sizes)
+        own_component = int(np.searchsorted(reachable, self.component[node]))
+        own_index = int(cumulative[own_component] - sizes[own_component]) + \
+            self.node_position[node] - int(self.component_start[self.component[node]])
+        if index >= own_index:
+            index += 1
+
+        chosen = int(np.searchsorted(cumulative, index, side='right'))
+        within = index - int(cumulative[chosen] - sizes[chosen])
+        return int(self.component_nodes[self.component_start[reachable[chosen]] + within])
+
+    def get_shortest_path(self, source: int, target: int) -> list[int]:
+        key = (source, target)
+        path = self.paths.get(key)
+        if path is not None:
+            self.hits += 1
+            self.paths.move_to_end(key)
+            return list(path)
+
+        self.misses += 1
+        source_index = self.node_index[source]
+        _, predecessors = dijkstra(self.lengths, indices=source_index, return_predecessors=True)
+        path = [self.nodes[i] for i in get_path_from_predecessors(predecessors, source_index, self.node_index[target])]
+        self.paths[key] = path
+        if len(self.paths) > self.max_size:
+            self.paths.popitem(last=False)
+        return list(path)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.
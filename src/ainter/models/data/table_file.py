@@ -0,0 +1,59 @@
+import json
+import os
+import struct
+from typing import Any, Final
+
+import numpy as np
+
+from ainter.models.data.graph_store import encode_numpy_scalar
+
+TABLE_FILE_ALIGNMENT: Final[int] = 64
+
+
+def align(offset: int) -> int:
+    return -(-offset // TABLE_FILE_ALIGNMENT) * TABLE_FILE_ALIGNMENT
+
+def write_table_file(path: str, magic: bytes, header: dict[str, Any], tables: dict[str, np.ndarray]) -> None:
+    """Writes the tables as raw arrays aligned to `TABLE_FILE_ALIGNMENT` bytes after the magic number and a JSON
+    header, which describes the layout of every table. The file is replaced atomically."""
+    layout = dict()
+    offset = 0
+    for name, table in tables.items():
+        layout[name] = {'dtype': table.dtype.str, 'shape': list(table.shape), 'offset': offset}
+        offset = align(offset + table.nbytes)
+
+    encoded_header = json.dumps(header | {'tables': layout},
+                                separators=(',', ':'),
+                                default=encode_numpy_scalar).encode('utf-8')
+    data_start = align(len(magic) + 8 + len(encoded_header))
+
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'wb') as out_file:
+        out_file.write(magic)
+        out_file.write(struct.pack('<Q', len(encoded_header)))
+        out_file.write(encoded_header)
+        for name, table in tables.items():
+            out_file.seek(data_start + layout[name]['offset'])
+            out_file.write(np.ascontiguousarray(table).tobytes())
+        out_file.truncate(data_start + offset)
+    os.replace(temporary_path, path)
+
+def read_table_file(path: str, magic: bytes) -> tuple[dict[str, Any], dict[str, np.ndarray]]:
+    """Returns the header and read-only tables, the tables are views of one memory map of the file, so the
+    processes reading the same file share its pages"""
+    data = np.memmap(path, dtype=np.uint8, mode='r')
+    if data[:len(magic)].tobytes() != magic:
+        raise ValueError(f"{path} has an unknown format")
+
+    header_end = len(magic) + 8
+    (header_length,) = struct.unpack('<Q', data[len(magic):header_end].tobytes())
+    header = json.loads(data[header_end:header_end + header_length].tobytes().decode('utf-8'))
+
+    data_start = align(header_end + header_length)
+    tables = dict()
+    for name, description in header['tables'].items():
+        dtype = np.dtype(description['dtype'])
+        start = data_start + description['offset']
+        count = int(np.prod(description['shape']))
+        tables[name] = data[start:start + count * dtype.itemsize].view(dtype).reshape(description['shape'])
+    return header, tables
@@ -0,0 +1,42 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+
+class ArrivalProcess(ABC):
+    """Distribution of the number of vehicles arriving into the network during one time step"""
+
+    @abstractmethod
+    def __call__(self, intensity: float, rng: np.random.Generator) -> int:
+        pass
+
+
+class BernoulliArrivals(ArrivalProcess):
+    """At most one arrival per step, the intensity is its probability, capped at one"""
+
+    def __call__(self, intensity: float, rng: np.random.Generator) -> int:
+        return int(rng.random() < intensity)
+
+
+class PoissonArrivals(ArrivalProcess):
+    """Poisson number of arrivals with the mean of `rate` times the intensity"""
+
+    def __init__(self, rate: float) -> None:
+        if rate < 0.:
+            raise ValueError(f"{rate=} cannot be negative")
+
+        self.rate = rate
+
+    def __call__(self, intensity: float, rng: np.random.Generator) -> int:
+        return int(rng.poisson(self.rate * intensity))
+
+
+def get_arrival_process(code: str, rate: float = 1.) -> ArrivalProcess:
+    match code:
+        case "bernoulli":
+            return BernoulliArrivals()
+
+        case "poisson":
+            return PoissonArrivals(rate)
+
+    raise ValueError("Unknown arrival process code provided")
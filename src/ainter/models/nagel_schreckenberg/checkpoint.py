@@ -0,0 +1,294 @@
+import itertools
+from collections import deque
+from typing import Any, Final
+
+import numpy as np
+
+from ainter.models.autonomous_intersection.intersection_directions import IntersectionEntranceDirection
+from ainter.models.data.table_file import write_table_file, read_table_file
+from ainter.models.nagel_schreckenberg.engine import StepEngine, AgentStepEngine, NO_POSITION
+from ainter.models.nagel_schreckenberg.vectorized import VectorizedStepEngine, VEHICLE_STATE
+from ainter.models.vehicles.vehicle import Vehicle, is_road_position
+
+CHECKPOINT_MAGIC: Final[bytes] = b'AINTCKP\x00'
+CHECKPOINT_VERSION: Final[int] = 5
+METRICS_STATE: Final[tuple[str, ...]] = ('time', 'density', 'flow', 'speed', 'lane_density', 'lane_flow',
+                                         'lane_speed')
+
+
+def flatten_routes(routes: list[list[int]]) -> tuple[np.ndarray, np.ndarray]:
+    """Lengths of the routes and their concatenation"""
+    lengths = np.array([len(route) for route in routes], dtype=np.int64)
+    return lengths, np.fromiter(itertools.chain.from_iterable(routes), dtype=np.int64, count=int(np.sum(lengths)))
+
+def split_routes(lengths: np.ndarray, routes: np.ndarray) -> list[list[int]]:
+    return [route.tolist() for route in np.split(routes, np.cumsum(lengths)[:-1])] if len(lengths) > 0 else list()
+
+def get_engine_code(engine: StepEngine) -> str:
+    if isinstance(engine, VectorizedStepEngine):
+        return 'vectorized'
+    if isinstance(engine, AgentStepEngine):
+        return 'agent'
+    raise ValueError("Checkpoints cannot hold the state of this engine")
+
+def get_vectorized_tables(engine: VectorizedStepEngine) -> dict[str, np.ndarray]:
+    """Road cells, vehicle table and the vehicles spawned but not placed yet"""
+    pending_ids, pending_types, pending_routes = zip(*engine.pending) if len(engine.pending) > 0 else ((), (), ())
+    pending_route_length, pending_route = flatten_routes(list(pending_routes))
+    return {
+        'cells': engine.cells,
+        'occupied': engine.occupied,
+        'routes': engine.routes,
+        'free_slots': engine.free_slots,
+        'pending_id': np.array(pending_ids, dtype=np.int64),
+        'pending_type': np.array(pending_types, dtype=np.int8),
+        'pending_route_length': pending_route_length,
+        'pending_route': pending_route,
+    } | {f"vehicle_{name}": getattr(engine, name) for name in VEHICLE_STATE}
+
+def get_agent_tables(model) -> dict[str, np.ndarray]:
+    """Vehicle agents with their road slots, the reserved crossings and the reservation tables of the
+    intersections"""
+    agents = list(model.agents.sort(lambda x: x.unique_id))
+    roads = model.grid.roads
+    slots = [roads[agent.pos].slots[agent.unique_id] if is_road_position(agent.pos) else None for agent in agents]
+    route_length, route = flatten_routes([agent.path for agent in agents])
+    managers = [(node, intersection.manager) for node, intersection in model.grid.intersections.items()
+                if intersection.manager is not None]
+    reservations = [(node, vehicle_id, reservation) for node, manager in managers
+                    for vehicle_id, reservation in manager.reservations.items()]
+
+    def get_column(values, dtype) -> np.ndarray:
+        return np.array(list(values), dtype=dtype)
+
+    return {
+        'agent_id': get_column((agent.unique_id for agent in agents), np.int64),
+        'agent_type': get_column((agent.type for agent in agents), np.int8),
+        'agent_speed': get_column((agent.speed for agent in agents), np.int8),
+        'agent_from': get_column((agent.pos[0] if slot is not None else agent.pos
+                                  for agent, slot in zip(agents, slots)), np.int64),
+        'agent_to': get_column((agent.pos[1] if slot is not None else NO_POSITION
+                                for agent, slot in zip(agents, slots)), np.int64),
+        'agent_lane': get_column((NO_POSITION if slot is None else slot.lane for slot in slots), np.int64),
+        'agent_start': get_column((NO_POSITION if slot is None else slot.start for slot in slots), np.int64),
+        'agent_color': get_column((agent.color for agent in agents), np.uint8).reshape(-1, 3),
+        'agent_route_length': route_length,
+        'agent_route': route,
+        'reservation_node': get_column((node for node, _, _ in reservations), np.int64),
+        'reservation_vehicle': get_column((vehicle_id for _, vehicle_id, _ in reservations), np.int64),
+        'reservation_start': get_column((x.start for _, _, x in reservations), np.int64),
+        'reservation_entry': get_column((x.entry for _, _, x in reservations), np.int8),
+        'reservation_exit': get_column((x.exit for _, _, x in reservations), np.int8),
+        'reservation_speed': get_column((x.speed for _, _, x in reservations), np.int64),
+        'reservation_length': get_column((x.length for _, _, x in reservations), np.int64),
+        'manager_node': get_column((node for node, _ in managers), np.int64),
+        'manager_time': get_column((manager.table.time for _, manager in managers), np.int64),
+        'manager_horizon': get_column((manager.table.horizon for _, manager in managers), np.int64),
+        'manager_bits': np.concatenate([manager.table.bits.ravel() for _, manager in managers]
+                                       + [np.zeros(shape=0, dtype=np.uint64)]),
+    }
+
+def get_checkpoint_tables(model) -> dict[str, np.ndarray]:
+    """Dynamic state of the model as flat tables, the static network is only referenced by its hash"""
+    environment = model.grid
+    road_ids = {road: i for i, road in enumerate(environment.roads)}
+
+    queued = [(origin, vehicle_type, path) for origin, queue in model.demand.queues.items()
+              for vehicle_type, path in queue]
+    queue_route_length, queue_route = flatten_routes([path for _, _, path in queued])
+
+    tables = {
+        'intersection_grids': np.concatenate([intersection.grid.ravel()
+                                              for intersection in environment.intersections.values()]
+                                             + [np.zeros(shape=0, dtype=np.uint16)]),
+        'palette': environment.palette,
+        'signal_offset': environment.signals.offset,
+        'signal_green_duration': environment.signals.green_duration,
+        'active_road': np.array([road_ids[road] for road in environment.road_vehicles], dtype=np.int64),
+        'active_road_count': np.array(list(environment.road_vehicles.values()), dtype=np.int64),
+        'active_node': np.array(list(environment.intersection_vehicles), dtype=np.int64),
+        'active_node_count': np.array(list(environment.intersection_vehicles.values()), dtype=np.int64),
+        'queue_origin': np.array([origin for origin, _, _ in queued], dtype=np.int64),
+        'queue_type': np.array([vehicle_type for _, vehicle_type, _ in queued], dtype=np.int8),
+        'queue_route_length': queue_route_length,
+        'queue_route': queue_route,
+    }
+    if isinstance(model.engine, VectorizedStepEngine):
+        tables |= get_vectorized_tables(model.engine)
+    else:
+        tables |= get_agent_tables(model)
+    tables |= {f"collector_{table}_{name}": column
+               for table in model.collector.buffers
+               for name, column in model.collector.get_buffered(table).items()}
+    if model.metrics is not None:
+        tables |= {f"metrics_{name}": getattr(model.metrics, name)[:model.metrics.rows] for name in METRICS_STATE}
+    return tables
+
+def save_checkpoint(model, path: str) -> None:
+    """Writes the dynamic state of a `NaSchUrbanModel` into a single file.
+
+    The file holds the road and intersection grids, the vehicles of the engine, the signal plans, the entry queues,
+    the random states, the time and the rows collected but not written yet. The agent engine stores its vehicle
+    agents with their road slots and the reserved intersection crossings, the vectorized one its vehicle table.
+    The static network is referenced by its content hash and the vehicle types by the hash of their parameters, so
+    the checkpoint is restored into a model built from the same map, types and engine. Full result chunks are written before the checkpoint, so the results on
+    disk never run behind it.
+    """
+    engine = model.engine
+    model.collector.wait()
+    demand = model.demand
+    write_table_file(path, CHECKPOINT_MAGIC, {
+        'version': CHECKPOINT_VERSION,
+        'engine': get_engine_code(engine),
+        'reserve_intersections': model.reserve_intersections,
+        'network': model.grid.network.get_content_hash(),
+        'cell_size': float(model.discretization.cell_size),
+        'delta_time': float(model.discretization.delta_time),
+        'catalog': model.vehicle_catalog.get_parameters_hash(),
+        'time': int(model.time),
+        'environment_time': int(model.grid.time),
+        'steps': model.steps,
+        'running': model.running,
+        'next_id': engine.next_id,
+        'streams': model.streams.get_state(),
+        'demand': {'arrived': demand.arrived, 'released': demand.released, 'queued': demand.queued,
+                   'blocked': demand.blocked},
+        'chunks': {table: buffer.chunks for table, buffer in model.collector.buffers.items()},
+        'metrics_rows': None if model.metrics is None else model.metrics.rows,
+    }, get_checkpoint_tables(model))
+
+def read_checkpoint(path: str) -> tuple[dict[str, Any], dict[str, np.ndarray]]:
+    try:
+        header, tables = read_table_file(path, CHECKPOINT_MAGIC)
+    except ValueError:
+        raise ValueError(f"{path} is not a checkpoint")
+
+    if header['version'] != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version {header['version']}")
+    return header, tables
+
+def load_checkpoint(model, path: str, restore_random: bool = True) -> None:
+    """Restores the dynamic state into a fresh model built from the same map and config.
+
+    Without `restore_random` the model keeps its own random streams, e.g. to run many experiments from one
+    warmed-up state with different seeds.
+    """
+    engine = model.engine
+    header, tables = read_checkpoint(path)
+    if header['engine'] != get_engine_code(engine):
+        raise ValueError(f"{path} was saved by the {header['engine']} engine")
+    if header['reserve_intersections'] != model.reserve_intersections:
+        raise ValueError(f"{path} was saved with different intersection reservations")
+    if header['network'] != model.grid.network.get_content_hash():
+        raise ValueError(f"{path} was saved for a different network")
+    if (header['cell_size'], header['delta_time']) != (model.discretization.cell_size,
+                                                       model.discretization.delta_time):
+        raise ValueError(f"{path} was saved with a different discretization")
+    if header['catalog'] != model.vehicle_catalog.get_parameters_hash():
+        raise ValueError(f"{path} was saved with different vehicle types")
+    if isinstance(engine, VectorizedStepEngine) and tables['cells'].shape != engine.cells.shape:
+        raise ValueError(f"{path} does not match the road grids of the model")
+    assert engine.num_vehicles == 0 and all(x.rows == 0 for x in model.collector.buffers.values()), \
+        "Checkpoint must be restored into a fresh model"
+
+    environment = model.grid
+    model.time = np.uint32(header['time'])
+    model.steps = header['steps']
+    model.running = header['running']
+    environment.time = np.uint32(header['environment_time'])
+
+    offset = 0
+    for intersection in environment.intersections.values():
+        intersection.grid[:] = tables['intersection_grids'][offset:offset + intersection.grid.size].reshape(
+            intersection.grid.shape)
+        offset += intersection.grid.size
+    environment.palette[:] = tables['palette']
+    environment.signals.offset[:] = tables['signal_offset']
+    environment.signals.green_duration[:] = tables['signal_green_duration']
+    environment.road_vehicles.clear()
+    road_keys = list(environment.roads)
+    environment.road_vehicles.update((road_keys[road], count)
+                                     for road, count in zip(tables['active_road'].tolist(),
+                                                            tables['active_road_count'].tolist()))
+    environment.intersection_vehicles.clear()
+    environment.intersection_vehicles.update(zip(tables['active_node'].tolist(),
+                                                 tables['active_node_count'].tolist()))
+
+    if isinstance(engine, VectorizedStepEngine):
+        set_vectorized_state(engine, tables)
+    else:
+        set_agent_state(model, tables)
+    engine.next_id = header['next_id']
+
+    demand = model.demand
+    demand.queues = dict()
+    for origin, vehicle_type, path in zip(tables['queue_origin'].tolist(),
+                                          tables['queue_type'].tolist(),
+                                          split_routes(tables['queue_route_length'], tables['queue_route'])):
+        demand.queues.setdefault(origin, deque()).append((vehicle_type, path))
+    for name, value in header['demand'].items():
+        setattr(demand, name, value)
+
+    for table, buffer in model.collector.buffers.items():
+        buffer.chunks = header['chunks'][table]
+        columns = {name: tables[f"collector_{table}_{name}"] for name in buffer.columns}
+        if len(next(iter(columns.values()))) > 0:
+            model.collector.append(table, **columns)
+
+    if model.metrics is not None and header['metrics_rows'] is not None:
+        model.metrics.rows = header['metrics_rows']
+        for name in METRICS_STATE:
+            getattr(model.metrics, name)[:model.metrics.rows] = tables[f"metrics_{name}"]
+
+    if restore_random:
+        model.streams.set_state(header['streams'])
+
+def set_vectorized_state(engine: VectorizedStepEngine, tables: dict[str, np.ndarray]) -> None:
+    engine.cells[:] = tables['cells']
+    for name in VEHICLE_STATE:
+        setattr(engine, name, np.array(tables[f"vehicle_{name}"]))
+    engine.routes = np.array(tables['routes'])
+    engine.occupied = np.array(tables['occupied'])
+    engine.free_slots = np.array(tables['free_slots'])
+    engine.pending = list(zip(tables['pending_id'].tolist(),
+                              tables['pending_type'].tolist(),
+                              split_routes(tables['pending_route_length'], tables['pending_route'])))
+
+def set_agent_state(model, tables: dict[str, np.ndarray]) -> None:
+    """Registers the vehicle agents under their ids, puts them back into their road slots and intersections and
+    restores the reservations of the crossings"""
+    environment = model.grid
+    paths = split_routes(tables['agent_route_length'], tables['agent_route'])
+    for agent_id, vehicle_type, speed, from_node, to_node, lane, start, color, path in zip(
+            tables['agent_id'].tolist(), tables['agent_type'].tolist(), tables['agent_speed'].tolist(),
+            tables['agent_from'].tolist(), tables['agent_to'].tolist(), tables['agent_lane'].tolist(),
+            tables['agent_start'].tolist(), np.array(tables['agent_color']), paths):
+        vehicle = Vehicle.restore(model=model,
+                                  unique_id=agent_id,
+                                  vehicle_type=vehicle_type,
+                                  path=path,
+                                  pos=from_node if to_node == NO_POSITION else (from_node, to_node),
+                                  speed=np.int8(speed),
+                                  color=color,
+                                  characteristic=model.vehicle_catalog.get_characteristic(vehicle_type))
+        if vehicle.is_on_road():
+            environment.roads[vehicle.pos].add_agent(agent_id, lane=lane, length=vehicle.characteristic.length,
+                                                     start=start)
+        else:
+            environment.intersections[vehicle.pos].add_agent(agent_id)
+
+    for node, vehicle_id, start, entry, exit, speed, length in zip(*(tables[f"reservation_{name}"].tolist() for name in
+                                                                     ('node', 'vehicle', 'start', 'entry', 'exit',
+                                                                      'speed', 'length'))):
+        environment.intersections[node].get_manager().restore(vehicle_id, start, IntersectionEntranceDirection(entry),
+                                                              IntersectionEntranceDirection(exit), speed, length)
+
+    offsets = np.cumsum(np.append(0, tables['manager_horizon']))
+    for i, (node, time, horizon) in enumerate(zip(tables['manager_node'].tolist(),
+                                                  tables['manager_time'].tolist(),
+                                                  tables['manager_horizon'].tolist())):
+        table = environment.intersections[node].get_manager().table
+        words = table.bits.shape[1]
+        table.bits = np.array(tables['manager_bits'][offsets[i] * words:offsets[i + 1] * words]).reshape(horizon, words)
+        table.horizon = horizon
+        table.time = time
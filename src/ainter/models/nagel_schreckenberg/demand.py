@@ -0,0 +1,92 @@
+import itertools
+from collections import deque
+
+import numpy as np
+
+from ainter.models.data.od_table import ODTable
+from ainter.models.data.routing import RouteCache
+from ainter.models.nagel_schreckenberg.arrivals import ArrivalProcess
+from ainter.models.nagel_schreckenberg.engine import StepEngine
+from ainter.models.nagel_schreckenberg.units import TimeDensity, DiscreteTime
+from ainter.models.vehicles.catalog import VehicleCatalog, VehicleTypeId, DEFAULT_VEHICLE_CATALOG
+
+
+class DemandGenerator:
+    """Draws the arriving vehicles of every step and keeps them in per-origin entry queues.
+
+    The number of arrivals comes from the arrival process, their vehicle types and (origin, destination) pairs
+    are drawn in bulk from the OD table. A vehicle leaves the queue of its origin when the first cells of its
+    first road are free, the queues are FIFO, so a blocked vehicle holds back the vehicles behind it. The type
+    shares and lengths come from `catalog`, the time step from its discretization: the time density is evaluated
+    at the clock time of the step and its intensity per second is scaled to the step length.
+    """
+
+    def __init__(self,
+                 od_table: ODTable,
+                 routes: RouteCache,
+                 time_density: TimeDensity,
+                 arrival_process: ArrivalProcess,
+                 rng: np.random.Generator,
+                 catalog: VehicleCatalog = DEFAULT_VEHICLE_CATALOG) -> None:
+        self.od_table = od_table
+        self.routes = routes
+        self.time_density = time_density
+        self.arrival_process = arrival_process
+        self.rng = rng
+        self.delta_time = catalog.discretization.delta_time
+
+        self.types = list(od_table.tables)
+        type_pdf = catalog.probability[self.types]
+        self.type_probability = type_pdf / np.sum(type_pdf)
+        self.type_length = catalog.length
+
+        self.queues: dict[int, deque[tuple[VehicleTypeId, list[int]]]] = dict()
+        self.arrived = 0
+        self.released = 0
+        self.queued = 0
+        self.blocked = 0
+
+    def arrive(self, time: DiscreteTime) -> int:
+        """Draws the arrivals of the time step into the entry queues, returns their number"""
+        intensity = self.time_density(float(time) * self.delta_time) * self.delta_time
+        count = self.arrival_process(intensity, self.rng)
+        if count == 0:
+            return 0
+
+        for vehicle_type, type_count in zip(self.types, self.rng.multinomial(count, self.type_probability)):
+            if type_count == 0:
+                continue
+
+            origins, destinations = self.od_table.sample_many(vehicle_type, self.rng, int(type_count))
+            for origin, destination in zip(origins, destinations):
+                path = self.routes.get_shortest_path(origin, destination)
+                self.queues.setdefault(origin, deque()).append((vehicle_type, path))
+
+        self.arrived += count
+        self.queued += count
+        return count
+
+    def release(self, engine: StepEngine) -> list[tuple[VehicleTypeId, list[int]]]:
+        """Pops the queue heads, which fit into the free cells at the beginning of their first road"""
+        if self.queued == 0:
+            return list()
+
+        origins = list(self.queues)
+        heads = [self.queues[origin][0] for origin in origins]
+        free_cells = engine.get_free_entry_cells([(path[0], path[1]) for _, path in heads])
+        lengths = self.type_length[np.array([vehicle_type for vehicle_type, _ in heads], dtype=np.int64)]
+
+        released = list()
+        for origin in itertools.compress(origins, free_cells >= lengths):
+            queue = self.queues[origin]
+            released.append(queue.popleft())
+            if len(queue) == 0:
+                del self.queues[origin]
+
+        self.released += len(released)
+        self.queued -= len(released)
+        self.blocked += self.queued
+        return released
+
+    def get_queue_lengths(self) -> dict[int, int]:
+        return {origin: len(queue) for origin, queue in self.queues.items()}
@@ -0,0 +1,131 @@
+import itertools
+from abc import ABC, abstractmethod
+from typing import Final, Optional
+
+import numpy as np
+from mesa import Agent, Model
+
+from ainter.models.nagel_schreckenberg.profiling import StepProfile
+from ainter.models.vehicles.catalog import VehicleCatalog, VehicleTypeId, DEFAULT_VEHICLE_CATALOG
+from ainter.models.vehicles.vehicle import Vehicle, VehicleId, RoadPosition, is_road_position
+
+NO_POSITION: Final[int] = -1
+
+
+class StepEngine(ABC):
+    """Strategy that advances every vehicle of the model by one time step"""
+
+    @abstractmethod
+    def spawn(self, vehicle_type: VehicleTypeId, path: list[int]) -> Agent | VehicleId:
+        pass
+
+    @abstractmethod
+    def step(self) -> None:
+        pass
+
+    @abstractmethod
+    def get_free_entry_cells(self, roads: list[RoadPosition]) -> np.ndarray:
+        """Number of free cells at the beginning of every road, counted over all of its lanes"""
+        pass
+
+    @abstractmethod
+    def get_vehicle_columns(self) -> dict[str, np.ndarray]:
+        """State of every vehicle as `vehicle_id`, `vehicle_type`, `speed` and `position_from` / `position_to`
+        columns, a vehicle on an intersection has the intersection in `position_from` and `NO_POSITION` in
+        `position_to`"""
+        pass
+
+    @abstractmethod
+    def get_road_vehicle_columns(self) -> dict[str, np.ndarray]:
+        """Vehicles standing on roads as `road` (index in the environment road order), `lane` and `speed` columns"""
+        pass
+
+    @property
+    @abstractmethod
+    def num_vehicles(self) -> int:
+        pass
+
+
+class AgentStepEngine(StepEngine):
+    """Per-agent engine, every vehicle is a Mesa agent stepping through the model API.
+
+    Vehicles follow the parallel NaSch update like the vectorized engine: every agent measures its distance to the
+    obstacle ahead at the beginning of the step, then the agents on the roads move before the agents waiting on the
+    intersections enter their next roads. The braking noise of all vehicles is drawn in one batch per step from
+    `rng`, the colours of the spawned vehicles from `render_rng`, both default to the generator of the model. The
+    vehicles get their parameters from `catalog`, the removal of the finished vehicles is timed in `profile`.
+    """
+
+    def __init__(self,
+                 model: Model,
+                 rng: Optional[np.random.Generator] = None,
+                 render_rng: Optional[np.random.Generator] = None,
+                 catalog: VehicleCatalog = DEFAULT_VEHICLE_CATALOG,
+                 profile: Optional[StepProfile] = None) -> None:
+        self.model = model
+        self.catalog = catalog
+        self.profile = StepProfile() if profile is None else profile
+        self.rng = model.rng if rng is None else rng
+        self.render_rng = self.rng if render_rng is None else render_rng
+        self.road_ids: dict[RoadPosition, int] = {key: i for i, key in enumerate(model.grid.roads)}
+
+    def spawn(self, vehicle_type: VehicleTypeId, path: list[int]) -> Agent:
+        return Vehicle(model=self.model,
+                       vehicle_type=vehicle_type,
+                       path=path,
+                       color=self.render_rng.integers(64, 182, size=3, dtype=np.uint8),
+                       characteristic=self.catalog.get_characteristic(vehicle_type))
+
+    def step(self) -> None:
+        agents = self.model.agents.sort(lambda x: x.unique_id)
+        noises = self.rng.integers(1, 3, size=len(agents)).tolist()
+        moves = [(agent.is_on_road(), agent, noise, agent.get_obstacle_distance())
+                 for agent, noise in zip(agents, noises)]
+        for on_road in (True, False):
+            for _, agent, noise, distance in filter(lambda move: move[0] == on_road, moves):
+                agent.step(noise, distance)
+
+        with self.profile.phase('removal'):
+            finished = self.model.agents.sort(lambda x: x.unique_id).select(lambda x: x.finished())
+            self.profile.count('removed_vehicles', len(finished))
+            finished.do("remove")
+
+    def get_free_entry_cells(self, roads: list[RoadPosition]) -> np.ndarray:
+        return np.array([self.model.grid.roads[road].get_free_entry_cells() for road in roads], dtype=np.int64)
+
+    @property
+    def next_id(self) -> VehicleId:
+        """Id of the next spawned vehicle, Mesa keeps the counter of the ids per model"""
+        next_id = next(Agent._ids[self.model])
+        self.next_id = next_id
+        return next_id
+
+    @next_id.setter
+    def next_id(self, next_id: VehicleId) -> None:
+        Agent._ids[self.model] = itertools.count(next_id)
+
+    def get_vehicle_columns(self) -> dict[str, np.ndarray]:
+        agents = list(self.model.agents)
+        positions = [agent.pos if is_road_position(agent.pos) else (agent.pos, NO_POSITION) for agent in agents]
+        return {
+            'vehicle_id': np.fromiter((agent.unique_id for agent in agents), dtype=np.int64, count=len(agents)),
+            'vehicle_type': np.fromiter((agent.type for agent in agents), dtype=np.int8, count=len(agents)),
+            'speed': np.fromiter((agent.speed for agent in agents), dtype=np.int8, count=len(agents)),
+            'position_from': np.fromiter((x for x, _ in positions), dtype=np.int64, count=len(agents)),
+            'position_to': np.fromiter((x for _, x in positions), dtype=np.int64, count=len(agents)),
+        }
+
+    def get_road_vehicle_columns(self) -> dict[str, np.ndarray]:
+        agents = [agent for agent in self.model.agents if is_road_position(agent.pos)]
+        roads = self.model.grid.roads
+        return {
+            'road': np.fromiter((self.road_ids[agent.pos] for agent in agents), dtype=np.int64, count=len(agents)),
+            'lane': np.fromiter((roads[agent.pos].slots[agent.unique_id].lane for agent in agents),
+                                dtype=np.int64, count=len(agents)),
+            'speed': np.fromiter((agent.speed for agent in agents), dtype=np.int64, count=len(agents)),
+        }
+
+    @property
+    def num_vehicles(self) -> int:
+        return len(self.model.agents)
+
@@ -1,16 +1,25 @@
-from dataclasses import dataclass
-from typing import Self, Any
+import itertools
+from dataclasses import dataclass, field
+from typing import Self, Any, Optional, Final, KeysView
 
 import networkx as nx
+import numpy as np
 from networkx.classes import MultiDiGraph, DiGraph
 from shapely import LineString
 
-from ainter.models.nagel_schreckenberg.intersection import Intersection
+from ainter.models.autonomous_intersection.intersection_directions import IntersectionEntranceDirection
+from ainter.models.autonomous_intersection.signal_bank import SignalBank
+from ainter.models.nagel_schreckenberg.intersection import Intersection, POSSIBLE_GREEN_DURATIONS
+from ainter.models.nagel_schreckenberg.network import StaticNetwork
 from ainter.models.nagel_schreckenberg.road import Road
-from ainter.models.nagel_schreckenberg.units import DEFAULT_ROAD_MAX_SPEED, DiscreteTime
-from ainter.models.vehicles.vehicle import RoadPosition, IntersectionPosition
+from ainter.models.nagel_schreckenberg.units import DEFAULT_ROAD_MAX_SPEED, DiscreteTime, PhysicalLength, ROAD_COLOR, \
+    PhysicalSpeed, Discretization, DEFAULT_DISCRETIZATION
+from ainter.models.vehicles.vehicle import RoadPosition, IntersectionPosition, VehicleId, Position, \
+    is_road_position
 from ainter.models.autonomous_intersection.lane_directions import LaneDirections
 
+PALETTE_SIZE: Final[int] = 2 ** 16
+
 
 def enrich_edge_data(edge_data: dict[str, Any], start_node_data: dict[str, Any], end_node_data: dict[str, Any])-> None:
     if 'geometry' not in edge_data:
@@ -30,7 +39,11 @@ def enrich_with_defaults(graph: nx.DiGraph) -> nx.DiGraph:
 
     return graph
 
-def create_roads_from_graph(graph: MultiDiGraph, graph_di: DiGraph) -> dict[tuple[int, int], Road]:
+def create_roads_from_graph(graph: MultiDiGraph,
+                            graph_di: DiGraph,
+                            sparse_min_length: Optional[PhysicalLength] = None,
+                            cell_size: PhysicalLength = DEFAULT_DISCRETIZATION.cell_size) \
+        -> dict[tuple[int, int], Road]:
     roads = dict()
     for start_id, end_id in graph_di.edges:
         start_data = graph.nodes[start_id]
@@ -38,11 +51,16 @@ def create_roads_from_graph(graph: MultiDiGraph, graph_di: DiGraph) -> dict[tupl
         edge_data = graph_di.edges[start_id, end_id]
         new_road = Road.from_graph_data(start_node_info=start_data,
                                         end_node_info=end_data,
-                                        edge_info=edge_data)
+                                        edge_info=edge_data,
+                                        sparse=(sparse_min_length is not None
+                                                and edge_data['length'] >= sparse_min_length),
+                                        cell_size=cell_size)
         roads.update({(start_id, end_id): new_road})
     return roads
 
-def create_intersections_from_graph(graph_di: DiGraph, global_time: DiscreteTime, rng) -> dict[int, Intersection]:
+def create_intersections_from_graph(graph_di: DiGraph,
+                                    cell_size: PhysicalLength = DEFAULT_DISCRETIZATION.cell_size) \
+        -> dict[int, Intersection]:
     intersections = dict()
     for node_id in graph_di.nodes:
         node_data = graph_di.nodes[node_id]
@@ -52,35 +70,154 @@ def create_intersections_from_graph(graph_di: DiGraph, global_time: DiscreteTime
         new_intersection = Intersection.from_graph_data(osm_id=node_id,
                                                         edges_info=edges_data,
                                                         node_info=node_data,
-                                                        global_time=global_time,
-                                                        rng=rng)
+                                                        cell_size=cell_size)
         intersections.update({node_id: new_intersection})
     return intersections
 
+def create_signal_bank(intersections: dict[IntersectionPosition, Intersection],
+                       rng,
+                       phases: Optional[list[list[IntersectionEntranceDirection]]] = None,
+                       discretization: Discretization = DEFAULT_DISCRETIZATION) -> SignalBank:
+    """Creates the signal bank of the intersections and attaches every intersection to its row. The green
+    durations are drawn in seconds from the random state and converted into time steps of the `discretization`,
+    the phases default to the incoming directions, clockwise"""
+    if phases is None:
+        phases = [intersection.get_phases() for intersection in intersections.values()]
+
+    signals = SignalBank.from_phases(phases, [max(1, discretization.discretize_duration(rng.choice(
+        POSSIBLE_GREEN_DURATIONS))) for _ in intersections])
+    for signal_index, intersection in enumerate(intersections.values()):
+        intersection.signals = signals
+        intersection.signal_index = signal_index
+    return signals
+
+
+def decrease_count(counts: dict[Any, int], key: Any, count: int) -> None:
+    """Decreases the count under the key, the key is removed when it drops to zero"""
+    remaining = counts.get(key, 0) - count
+    assert remaining >= 0, "Cannot remove more vehicles than entered"
+    if remaining == 0:
+        del counts[key]
+    else:
+        counts[key] = remaining
+
 
 @dataclass(slots=True)
 class Environment:
-    road_graph: DiGraph
+    """Road network of one model replica, the shared `StaticNetwork` with the replica's own roads and intersections,
+    which hold the mutable grids and traffic light state.
+
+    The engines report every vehicle entering and leaving a road or an intersection, so the environment keeps the
+    active set: the roads with vehicles and the intersections with vehicles on them or on their incoming roads.
+    Traffic lights follow from the time through the signal bank, so stepping only advances the time and
+    writes the reserved crossings of the active intersections into their grids. The grids and times follow
+    the `discretization` of the run.
+    """
+    network: StaticNetwork
     intersections: dict[IntersectionPosition, Intersection]
     roads: dict[RoadPosition, Road]
+    signals: SignalBank
+    time: DiscreteTime = 0
+    discretization: Discretization = DEFAULT_DISCRETIZATION
+    palette: np.ndarray = field(init=False,
+                                default_factory=lambda: np.full(shape=(PALETTE_SIZE, 3),
+                                                                fill_value=ROAD_COLOR,
+                                                                dtype=np.uint8))
+    road_vehicles: dict[RoadPosition, int] = field(init=False, default_factory=dict)
+    intersection_vehicles: dict[IntersectionPosition, int] = field(init=False, default_factory=dict)
 
     @classmethod
-    def from_directed_graph(cls, graph: MultiDiGraph, global_time: DiscreteTime, rng) -> Self:
+    def from_directed_graph(cls,
+                            graph: MultiDiGraph,
+                            global_time: DiscreteTime,
+                            rng,
+                            sparse_road_min_length: Optional[PhysicalLength] = None,
+                            discretization: Discretization = DEFAULT_DISCRETIZATION) -> Self:
         assert all(map(lambda x: x[2] == 0, graph.edges)), 'The convertion to DiGraph would result in information loss'
 
         graph_di = DiGraph(graph)
         graph_di = enrich_with_defaults(graph_di)
 
-        roads = create_roads_from_graph(graph, graph_di)
-        intersections = create_intersections_from_graph(graph_di, global_time, rng)
+        roads = create_roads_from_graph(graph, graph_di, sparse_road_min_length, discretization.cell_size)
+        intersections = create_intersections_from_graph(graph_di, discretization.cell_size)
 
-        return cls(road_graph=graph_di,
+        return cls(network=StaticNetwork.from_graph(graph_di),
                    roads=roads,
-                   intersections=intersections)
+                   intersections=intersections,
+                   signals=create_signal_bank(intersections, rng, discretization=discretization),
+                   time=global_time,
+                   discretization=discretization)
+
+    @property
+    def road_graph(self) -> DiGraph:
+        return self.network.road_graph
+
+    @property
+    def active_roads(self) -> KeysView[RoadPosition]:
+        return self.road_vehicles.keys()
+
+    @property
+    def active_intersections(self) -> KeysView[IntersectionPosition]:
+        return self.intersection_vehicles.keys()
+
+    def enter(self, position: Position, count: int = 1) -> None:
+        """Registers vehicles entering a road or an intersection, a road also activates its end intersection"""
+        if is_road_position(position):
+            self.road_vehicles[position] = self.road_vehicles.get(position, 0) + count
+            position = position[1]
+
+        self.intersection_vehicles[position] = self.intersection_vehicles.get(position, 0) + count
+
+    def leave(self, position: Position, count: int = 1) -> None:
+        """Registers vehicles leaving a road or an intersection, deactivating it once it holds no vehicles"""
+        if is_road_position(position):
+            decrease_count(self.road_vehicles, position, count)
+            position = position[1]
+        decrease_count(self.intersection_vehicles, position, count)
+
+    def set_color(self, agent_id: VehicleId, color: np.ndarray) -> None:
+        """Registers the render colour of a vehicle in the palette shared by all roads and intersections"""
+        self.palette[agent_id] = color
 
     def step(self) -> None:
-        for inter in self.intersections.values():
-            inter.step()
+        """Advances the time and brings the grids of the active intersections to it, in place"""
+        self.time += 1
+        for position in self.active_intersections:
+            self.intersections[position].update_grid(self.time)
+
+    def get_signal_states(self) -> np.ndarray:
+        """Right of way of every signal approach at the current time, see `SignalBank.get_green`"""
+        return self.signals.get_green(self.time)
+
+    def set_signal_offset(self, position: IntersectionPosition, offset: DiscreteTime) -> None:
+        intersection = self.intersections[position]
+        self.signals.offset[intersection.signal_index] = offset
+
+    def set_green_wave(self,
+                       path: list[IntersectionPosition],
+                       speed: PhysicalSpeed,
+                       start: DiscreteTime = 0,
+                       green_duration: Optional[DiscreteTime] = None) -> None:
+        """Coordinates the signals along the path, so that a vehicle leaving its first intersection at the start
+        time and driving at the speed (m/s) gets the green light at every following intersection. The green
+        duration, if given, is shared by the intersections of the path to keep their cycles aligned."""
+        if len(path) < 2:
+            raise ValueError("Green wave must pass at least two intersections")
+        if speed <= 0:
+            raise ValueError(f"{speed=} cannot be zero-like or negative")
+        if any(edge not in self.roads for edge in itertools.pairwise(path)):
+            raise ValueError("Green wave must follow the roads")
+
+        indices = [self.intersections[position].signal_index for position in path]
+        if green_duration is not None:
+            self.signals.green_duration[indices] = green_duration
+
+        self.signals.offset[indices[0]] = start
+        travel_time = 0.
+        for (previous, position), index in zip(itertools.pairwise(path), indices[1:]):
+            travel_time += self.roads[previous, position].length / speed / self.discretization.delta_time
+            direction = self.intersections[position].in_edge_directions[previous].direction
+            self.signals.set_green_start(index, direction, start + int(np.round(travel_time)))
 
     def get_direction(self, intersection_node: int, next_node: int) -> LaneDirections:
         pass
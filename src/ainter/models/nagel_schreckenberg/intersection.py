@@ -1,20 +1,22 @@
-import random
 from dataclasses import dataclass, field
-from typing import Self, Any
+from typing import Self, Any, Optional
 
 import numpy as np
 
 from ainter.models.autonomous_intersection.intersection_directions import IntersectionEntranceDirection, \
     IntersectionDirection
-from ainter.models.autonomous_intersection.traffic_lights import SimpleTrafficLight, TrafficLight
+from ainter.models.autonomous_intersection.reservation import IntersectionManager
+from ainter.models.autonomous_intersection.signal_bank import SignalBank
 from ainter.models.nagel_schreckenberg.units import DiscreteSpeed, ROAD_COLOR, DiscreteLength, discretize_length, \
-    DiscreteTime, LINE_WIDTH
+    DiscreteTime, LINE_WIDTH, CELL_SIZE, PhysicalLength
 from ainter.models.vehicles.vehicle import VehicleId, NULL_VEHICLE_ID
 from ainter.models.autonomous_intersection.lane_directions import LaneDirections
 
 RED_LIGHT_COLOR = np.array([255, 0, 0], dtype=np.uint8)
 GREEN_LIGHT_COLOR = np.array([0, 255, 0], dtype=np.uint8)
-POSSIBLE_LIGHTS_TIMESTEPS: list[DiscreteTime] = [30, 35, 40]
+POSSIBLE_GREEN_DURATIONS: list[float] = [30., 35., 40.]  # In seconds
+# Free length in front of a vehicle waiting on an intersection without a reserved crossing
+WAITING_OBSTACLE_LENGTH: PhysicalLength = 1.
 
 def create_edge_directions(
         osm_id, inter_x, inter_y, edges_info
@@ -95,36 +97,42 @@ def calculate_slice(direction: IntersectionEntranceDirection, is_in: bool, lanes
 
     raise ValueError("Unknown direction + entrance type provided")
 
+def get_grid_cells(length: DiscreteLength | DiscreteSpeed, cell_size: PhysicalLength = CELL_SIZE) -> int:
+    """Converts road cells into the intersection grid cells, which are one meter wide"""
+    return int(np.round(int(length) * cell_size))
+
 
 @dataclass(slots=True)
 class Intersection:
+    """Intersection of the roads, its traffic lights are the `signal_index` row of the network-wide signal bank.
+
+    Vehicles cross the grid on the trajectories reserved by the intersection manager, so a vehicle enters only when
+    its whole crossing is free and keeps its exit cells until it leaves. Vehicles asking for no crossing pass the
+    intersection in one step, as in the vectorized engine. Intersections with an empty grid are the ends of the
+    roads, without any crossing.
+    `cell_size` is the length of the road cells, which the speeds and lengths of the vehicles are given in.
+    """
     osm_id: int
     grid: np.ndarray
     x: float
     y: float
     in_edge_directions: dict[int, IntersectionDirection]
     out_edge_directions: dict[int, IntersectionDirection]
-    traffic_lights: TrafficLight
-    render_lut: np.ndarray = field(init=False,
-                                   default_factory=lambda: np.full(shape=(2 ** 16, 3),
-                                                                   fill_value=ROAD_COLOR,
-                                                                   dtype=np.uint8))
+    signals: Optional[SignalBank] = None
+    signal_index: int = -1
+    agents: set[VehicleId] = field(default_factory=set)
+    manager: Optional[IntersectionManager] = None
+    cell_size: PhysicalLength = CELL_SIZE
 
     @classmethod
     def from_graph_data(cls, osm_id: int,
                         edges_info: dict[tuple[int, int], Any],
                         node_info: dict[str, Any],
-                        global_time: DiscreteTime,
-                        rng) -> Self:
+                        cell_size: PhysicalLength = CELL_SIZE) -> Self:
         x = node_info['x']
         y = node_info['y']
 
-        edge_directions, used_directions = create_edge_directions(osm_id, x, y, edges_info)
-
-        traffic_lights = SimpleTrafficLight(global_time, rng.choice(POSSIBLE_LIGHTS_TIMESTEPS))
-        for direction, is_in in used_directions:
-            if is_in:
-                traffic_lights.add_direction(direction)
+        edge_directions, _ = create_edge_directions(osm_id, x, y, edges_info)
 
         in_edge_directions: dict[int, IntersectionDirection] = dict()
         out_edge_directions: dict[int, IntersectionDirection] = dict()
@@ -156,44 +164,59 @@ class Intersection:
                    y=y,
                    in_edge_directions=in_edge_directions,
                    out_edge_directions=out_edge_directions,
-                   traffic_lights=traffic_lights)
+                   cell_size=cell_size)
+
+    def get_manager(self) -> IntersectionManager:
+        if self.manager is None:
+            self.manager = IntersectionManager(shape=self.grid.shape,
+                                               entries={x.direction: x.action_slice
+                                                        for x in self.in_edge_directions.values()},
+                                               exits={x.direction: x.action_slice
+                                                      for x in self.out_edge_directions.values()})
+        return self.manager
 
     def add_agent(self, agent_id: VehicleId) -> None:
-        if self.is_end_of_the_road():
-            return
-        self.render_lut[agent_id] = np.array([random.randint(64, 181) for _ in range(3)], dtype=np.uint8)
+        assert agent_id not in self.agents, "Agent is already on this intersection"
+        self.agents.add(agent_id)
 
     def remove_agent(self, agent_id: VehicleId) -> None:
-        if self.is_end_of_the_road():
-            return
-        self.render_lut[agent_id] = ROAD_COLOR
-
-    def move_agent(self, agent_id: VehicleId, speed: DiscreteSpeed) -> None:
-        if self.is_end_of_the_road():
+        self.agents.remove(agent_id)
+        if self.manager is not None:
+            self.manager.release(agent_id)
+            self.grid[self.grid == agent_id] = NULL_VEHICLE_ID
+
+    def update_grid(self, time: DiscreteTime) -> None:
+        """Writes the reserved cells of the time step into the grid, in place, so views of it stay current"""
+        if self.manager is not None and len(self.manager.reservations) > 0:
+            self.manager.get_occupancy(time, out=self.grid)
+
+    def move_agent(self, agent_id: VehicleId, speed: DiscreteSpeed, time: DiscreteTime) -> DiscreteSpeed:
+        """Vehicle with a reservation drives at its reserved speed and stands at the exit once it is over, the others
+        are waiting at the border"""
+        reservation = None if self.manager is None else self.manager.get_reservation(agent_id)
+        if reservation is None:
             return speed
+        if reservation.is_overdue(time):
+            return np.int8(0)
+        return np.int8(max(int(np.round(reservation.speed / self.cell_size)), 1))
 
-        if random.uniform(0., 1.) < 0.1:
-            self.grid[:] = NULL_VEHICLE_ID
-
-            if random.uniform(0., 1.) < 0.5:
-                middle_y = self.grid.shape[0] // 2
-                self.grid[middle_y, 2:4] = agent_id
-            else:
-                middle_x = self.grid.shape[1] // 2
-                self.grid[3:6, middle_x] = agent_id
-
-        return speed
-
-    def is_agent_leaving(self, agent_id: VehicleId, speed: DiscreteSpeed) -> bool:
-        if self.is_end_of_the_road():
+    def is_agent_leaving(self, agent_id: VehicleId, speed: DiscreteSpeed, time: DiscreteTime) -> bool:
+        reservation = None if self.manager is None else self.manager.get_reservation(agent_id)
+        if reservation is None:
             return True
-        return True
+        return int(time) + 1 >= reservation.end
+
+    def get_phases(self) -> list[IntersectionEntranceDirection]:
+        """Directions of the incoming roads in the order of the traffic light phases, clockwise from the north"""
+        return sorted({direction.direction for direction in self.in_edge_directions.values()})
 
-    def step(self) -> None:
-        self.traffic_lights.step()
+    def has_right_of_way(self, direction: IntersectionEntranceDirection, time: DiscreteTime) -> bool:
+        assert self.signals is not None, "Intersection must be attached to a signal bank"
+        return self.signals.has_right_of_way(self.signal_index, direction, time)
 
-    def render(self) -> np.ndarray:
-        base_render = self.render_lut[self.grid]
+    def render(self, palette: np.ndarray, time: DiscreteTime) -> np.ndarray:
+        self.update_grid(time)
+        base_render = palette[self.grid]
 
         padded_render = np.full(
             shape=(base_render.shape[0] + 2,
@@ -206,7 +229,7 @@ class Intersection:
         padded_render[1:-1, 1:-1] = base_render
 
         for incoming_edge in self.in_edge_directions.values():
-            has_right_of_way = self.traffic_lights.has_right_of_way(incoming_edge.direction)
+            has_right_of_way = self.has_right_of_way(incoming_edge.direction, time)
             light_color = GREEN_LIGHT_COLOR if has_right_of_way else RED_LIGHT_COLOR
             data_slice_x, data_slice_y = incoming_edge.action_slice
 
@@ -228,19 +251,63 @@ class Intersection:
         return padded_render.transpose(1, 0, 2)
 
     def contains_agent(self, agent_id: VehicleId) -> bool:
-        if self.is_end_of_the_road():
+        return agent_id in self.agents
+
+    def can_accept_agent(self,
+                         agent_id: VehicleId,
+                         length: DiscreteLength,
+                         time: DiscreteTime,
+                         entry_node: Optional[int] = None,
+                         exit_node: Optional[int] = None,
+                         speed: DiscreteSpeed = 0,
+                         exit_free_cells: Optional[int] = None) -> bool:
+        """Checks that the crossing from the `entry_node` road to the `exit_node` road, starting in the next step,
+        is free, the crossing is taken with `reserve_crossing`. With `exit_free_cells` of the exit road, a vehicle
+        enters only if the road has room for it, so that it does not block the grid.
+
+        Vehicles finishing here or arriving without a known road do not cross the grid and are always accepted.
+        """
+        if self.is_end_of_the_road() or entry_node is None or exit_node is None:
             return True
-        return True
-
-    def can_accept_agent(self, agent_id: VehicleId, length: DiscreteLength) -> bool:
-        if self.is_end_of_the_road():
-            return True
-        return True
+        if exit_free_cells is not None and exit_free_cells < length:
+            return False
+        return self.get_manager().is_free(**self.get_crossing(length, time, entry_node, exit_node, speed))
+
+    def reserve_crossing(self,
+                         agent_id: VehicleId,
+                         length: DiscreteLength,
+                         time: DiscreteTime,
+                         entry_node: Optional[int] = None,
+                         exit_node: Optional[int] = None,
+                         speed: DiscreteSpeed = 0) -> None:
+        """Reserves the crossing accepted by `can_accept_agent` in the same step"""
+        if self.is_end_of_the_road() or entry_node is None or exit_node is None:
+            return
 
-    def get_obstacle_distance(self, agent_id: VehicleId) -> DiscreteLength:
-        if self.is_end_of_the_road():
-            return discretize_length(1.)
-        return discretize_length(1.)
+        granted = self.get_manager().request(vehicle_id=agent_id,
+                                             **self.get_crossing(length, time, entry_node, exit_node, speed))
+        assert granted, "Crossing must be accepted before it is reserved"
+
+    def get_crossing(self,
+                     length: DiscreteLength,
+                     time: DiscreteTime,
+                     entry_node: int,
+                     exit_node: int,
+                     speed: DiscreteSpeed) -> dict[str, Any]:
+        assert entry_node in self.in_edge_directions, "Agent must arrive from an incoming road"
+        assert exit_node in self.out_edge_directions, "Agent must leave to an outgoing road"
+        return {'start': int(time) + 1,
+                'entry': self.in_edge_directions[entry_node].direction,
+                'exit': self.out_edge_directions[exit_node].direction,
+                'speed': max(get_grid_cells(speed, self.cell_size), 1),
+                'length': max(get_grid_cells(length, self.cell_size), 1)}
+
+    def get_obstacle_distance(self, agent_id: VehicleId, time: DiscreteTime) -> DiscreteLength:
+        """Reserved trajectory is free of obstacles, so the distance is what remains of it"""
+        reservation = None if self.manager is None else self.manager.get_reservation(agent_id)
+        if reservation is None:
+            return discretize_length(WAITING_OBSTACLE_LENGTH, self.cell_size)
+        return discretize_length(reservation.get_remaining(time), self.cell_size)
 
     def is_end_of_the_road(self) -> bool:
         return self.grid.shape[0] == 0 or self.grid.shape[1] == 0
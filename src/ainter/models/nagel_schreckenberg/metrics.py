@@ -0,0 +1,91 @@
+import os
+from typing import Final
+
+import numpy as np
+
+from ainter.models.nagel_schreckenberg.environment import Environment
+from ainter.models.nagel_schreckenberg.units import DiscreteTime
+
+ROAD_METRICS_FILE: Final[str] = 'road_metrics.npz'
+METERS_PER_KILOMETER: Final[float] = 1000.
+SECONDS_PER_HOUR: Final[float] = 3600.
+
+
+class RoadMetrics:
+    """Density, flow and space-mean speed of every road and lane, measured once per reporting interval.
+
+    Every measurement is one vectorized pass over the vehicles standing on roads, the counts and speed sums
+    are accumulated per occupied lane with `np.bincount` and summed into roads. Only the occupied lanes and
+    roads are written, the rows start as empty roads, so a measurement costs as much as the vehicles on roads.
+    Density is in vehicles per kilometer of a lane (of all lanes for a road), space-mean speed in meters per
+    second (NaN on an empty road) and flow in vehicles per hour, from the fundamental relation
+    `flow = density * speed`. The results are kept as `(intervals, roads)` and `(intervals, lanes)` matrices.
+    """
+
+    def __init__(self, environment: Environment, intervals: int) -> None:
+        if intervals < 1:
+            raise ValueError(f"{intervals=} cannot be zero-like or negative")
+
+        roads = list(environment.roads.values())
+        self.road_source = np.array([start for start, _ in environment.roads], dtype=np.int64)
+        self.road_target = np.array([end for _, end in environment.roads], dtype=np.int64)
+        road_cells = np.array([road.shape[0] for road in roads], dtype=np.int64)
+        road_lanes = np.array([road.shape[1] for road in roads], dtype=np.int64)
+        self.cell_size = environment.discretization.cell_size
+        self.delta_time = environment.discretization.delta_time
+
+        self.road_lane_base = np.concatenate(([0], np.cumsum(road_lanes)[:-1])).astype(np.int64)
+        self.lane_road = np.repeat(np.arange(len(roads), dtype=np.int64), road_lanes)
+        self.lane_length = np.maximum(np.repeat(road_cells, road_lanes), 1) * self.cell_size / METERS_PER_KILOMETER
+        self.road_length = np.maximum(road_cells * road_lanes, 1) * self.cell_size / METERS_PER_KILOMETER
+
+        self.rows = 0
+        self.time = np.zeros(shape=intervals, dtype=np.uint32)
+        self.density = np.zeros(shape=(intervals, len(roads)), dtype=np.float32)
+        self.flow = np.zeros(shape=(intervals, len(roads)), dtype=np.float32)
+        self.speed = np.full(shape=(intervals, len(roads)), fill_value=np.nan, dtype=np.float32)
+        self.lane_density = np.zeros(shape=(intervals, len(self.lane_road)), dtype=np.float32)
+        self.lane_flow = np.zeros(shape=(intervals, len(self.lane_road)), dtype=np.float32)
+        self.lane_speed = np.full(shape=(intervals, len(self.lane_road)), fill_value=np.nan, dtype=np.float32)
+
+    def measure(self, time: DiscreteTime, road: np.ndarray, lane: np.ndarray, speed: np.ndarray) -> None:
+        """Adds a row from the road index, lane and discrete speed of every vehicle standing on a road"""
+        assert self.rows < len(self.time), "All reporting intervals were already measured"
+
+        global_lane = self.road_lane_base[road] + lane
+        lanes, lane_index, lane_count = np.unique(global_lane, return_inverse=True, return_counts=True)
+        lane_speed_sum = np.bincount(lane_index, weights=speed, minlength=len(lanes)) * self.cell_size / self.delta_time
+        roads, road_index = np.unique(self.lane_road[lanes], return_inverse=True)
+        road_count = np.bincount(road_index, weights=lane_count, minlength=len(roads))
+        road_speed_sum = np.bincount(road_index, weights=lane_speed_sum, minlength=len(roads))
+
+        row = self.rows
+        self.time[row] = time
+        self.lane_density[row, lanes] = lane_count / self.lane_length[lanes]
+        self.lane_speed[row, lanes] = lane_speed_sum / lane_count
+        self.lane_flow[row, lanes] = lane_speed_sum / self.lane_length[lanes] * SECONDS_PER_HOUR / METERS_PER_KILOMETER
+        self.density[row, roads] = road_count / self.road_length[roads]
+        self.speed[row, roads] = road_speed_sum / road_count
+        self.flow[row, roads] = road_speed_sum / self.road_length[roads] * SECONDS_PER_HOUR / METERS_PER_KILOMETER
+        self.rows += 1
+
+    def get_tables(self) -> dict[str, np.ndarray]:
+        return {
+            'time': self.time[:self.rows],
+            'road_source': self.road_source,
+            'road_target': self.road_target,
+            'lane_road': self.lane_road,
+            'density': self.density[:self.rows],
+            'flow': self.flow[:self.rows],
+            'speed': self.speed[:self.rows],
+            'lane_density': self.lane_density[:self.rows],
+            'lane_flow': self.lane_flow[:self.rows],
+            'lane_speed': self.lane_speed[:self.rows],
+        }
+
+    def save(self, output_dir: str) -> str:
+        """Writes the measured rows as `road_metrics.npz` into the directory and returns its path"""
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, ROAD_METRICS_FILE)
+        np.savez_compressed(path, **self.get_tables())
+        return path
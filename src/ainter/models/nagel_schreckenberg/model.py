@@ -1,20 +1,48 @@
-import itertools
+import os
 from abc import abstractmethod, ABC
+from typing import Final
 
+import numpy as np
 from mesa import Model, Agent
-from mesa.datacollection import DataCollector
-from networkx import descendants
-
-from ainter.configs.env_creation import EnvConfig
-from ainter.models.data.osmnx import get_data_from_bbox, bfs_shortest_path
+from networkx import MultiDiGraph
+
+from ainter.configs.env_creation import EnvConfig, SignalsConfig
+from ainter.io.collector import ColumnarCollector
+from ainter.models.data.graph_store import GraphStore, get_graph_key
+from ainter.models.data.osmnx import get_data_from_bbox, DEFAULT_NETWORK_TYPE
+from ainter.models.data.od_table import ODTable, get_od_table_key
+from ainter.models.data.routing import RouteCache
+from ainter.models.nagel_schreckenberg.demand import DemandGenerator
+from ainter.models.nagel_schreckenberg.engine import StepEngine, AgentStepEngine
 from ainter.models.nagel_schreckenberg.environment import Environment
 from ainter.models.nagel_schreckenberg.intersection import Intersection
+from ainter.models.nagel_schreckenberg.metrics import RoadMetrics
+from ainter.models.nagel_schreckenberg.profiling import StepProfile
+from ainter.models.nagel_schreckenberg.random_streams import RandomStreams
 from ainter.models.nagel_schreckenberg.road import Road
-from ainter.models.nagel_schreckenberg.units import discretize_time, TimeDensity, DiscreteLength, DiscreteSpeed, \
-    discretize_length
-from ainter.models.vehicles.vehicle import Vehicle, VehicleType, VehicleId, Position, is_intersection_position, \
+from ainter.models.nagel_schreckenberg.snapshot import load_environment
+from ainter.models.nagel_schreckenberg.units import TimeDensity, DiscreteLength, DiscreteSpeed, DiscreteTime, \
+    convert_km_h_to_m_s
+from ainter.models.nagel_schreckenberg.vectorized import VectorizedStepEngine
+from ainter.models.vehicles.catalog import VehicleCatalog, DEFAULT_VEHICLE_CATALOG
+from ainter.models.vehicles.vehicle import VehicleId, Position, RoadPosition, is_intersection_position, \
     is_road_position
 
+DEFAULT_RESULTS_DIR: Final[str] = os.path.join("src", "ainter", "data")
+MODEL_COLUMNS: Final[dict[str, np.dtype]] = {
+    'time': np.dtype(np.uint32),
+    'agent_count': np.dtype(np.int64),
+    'queued_count': np.dtype(np.int64),
+}
+VEHICLE_COLUMNS: Final[dict[str, np.dtype]] = {
+    'time': np.dtype(np.uint32),
+    'vehicle_id': np.dtype(np.int64),
+    'vehicle_type': np.dtype(np.int8),
+    'speed': np.dtype(np.int8),
+    'position_from': np.dtype(np.int64),
+    'position_to': np.dtype(np.int64),
+}
+
 
 class VehicleModel(ABC):
 
@@ -43,109 +71,196 @@ class VehicleModel(ABC):
         pass
 
 
+def get_step_engine(code: str, model: 'NaSchUrbanModel') -> StepEngine:
+    match code:
+        case "agent":
+            return AgentStepEngine(model, model.streams.driver, model.streams.render, catalog=model.vehicle_catalog,
+                                   profile=model.profile)
+
+        case "vectorized":
+            if model.reserve_intersections:
+                raise ValueError("Intersection reservations need the agent engine")
+            return VectorizedStepEngine(model.grid, model.streams.driver, render_rng=model.streams.render,
+                                        catalog=model.vehicle_catalog, profile=model.profile)
+
+    raise ValueError("Unknown engine code provided")
+
+
+def get_road_graph(env_config: EnvConfig) -> MultiDiGraph:
+    graph_cache_dir = env_config.simulation.graph_cache_dir
+    return get_data_from_bbox(env_config.map_box,
+                              network_type=DEFAULT_NETWORK_TYPE,
+                              store=None if graph_cache_dir is None else GraphStore(graph_cache_dir))
+
+def create_environment(env_config: EnvConfig, global_time: DiscreteTime, rng) -> Environment:
+    """Loads the prepared environment when the config points to one, otherwise builds it from the road graph"""
+    simulation = env_config.simulation
+    if simulation.environment_path is not None:
+        environment = load_environment(simulation.environment_path, global_time, rng,
+                                       sparse_road_min_length=simulation.sparse_road_min_length,
+                                       key=get_graph_key(env_config.map_box, DEFAULT_NETWORK_TYPE),
+                                       discretization=env_config.physics.discretization)
+    else:
+        environment = Environment.from_directed_graph(get_road_graph(env_config), global_time, rng,
+                                                      simulation.sparse_road_min_length,
+                                                      env_config.physics.discretization)
+
+    configure_signals(environment, env_config.signals)
+    return environment
+
+def configure_signals(environment: Environment, signals: SignalsConfig) -> None:
+    """Applies the configured signal offsets and green waves, the times are converted into time steps"""
+    discretization = environment.discretization
+    for node, offset in signals.offsets.items():
+        if node not in environment.intersections:
+            raise ValueError(f"Signal offset of an unknown intersection {node}")
+        environment.set_signal_offset(node, discretization.discretize_duration(offset))
+
+    for wave in signals.green_waves:
+        if any(node not in environment.intersections for node in wave.nodes):
+            raise ValueError("Green wave passes an unknown intersection")
+        environment.set_green_wave(list(wave.nodes),
+                                   speed=convert_km_h_to_m_s(wave.speed),
+                                   start=discretization.discretize_duration(wave.start),
+                                   green_duration=None if wave.green_duration is None else
+                                   max(1, discretization.discretize_duration(wave.green_duration)))
+
+def create_od_table(env_config: EnvConfig,
+                    routes: RouteCache,
+                    catalog: VehicleCatalog = DEFAULT_VEHICLE_CATALOG) -> ODTable:
+    """Loads the shared OD table when the config points to one, otherwise builds it from the routes"""
+    min_node_path_length = env_config.vehicles.min_node_path_length
+    if env_config.simulation.od_table_path is not None:
+        key = get_od_table_key(get_graph_key(env_config.map_box, DEFAULT_NETWORK_TYPE), min_node_path_length, catalog)
+        return ODTable.load(env_config.simulation.od_table_path, key=key, catalog=catalog)
+
+    return ODTable.from_routes(routes, min_node_path_length, catalog=catalog)
+
+
 class NaSchUrbanModel(Model, VehicleModel):
 
-    def __init__(self, env_config: EnvConfig, seed=None) -> None:
+    def __init__(self, env_config: EnvConfig, seed=None, results_dir: str = DEFAULT_RESULTS_DIR) -> None:
         super().__init__(seed=seed)
 
-        self.start_time = discretize_time(env_config.physics.start_time)
-        self.time = discretize_time(env_config.physics.start_time)
-        self.end_time = discretize_time(env_config.physics.end_time)
+        self.results_dir = results_dir
 
-        self.graph = get_data_from_bbox(env_config.map_box)
-        self.grid = Environment.from_directed_graph(self.graph, self.time, self.random)
+        self.discretization = env_config.physics.discretization
+        self.start_time = self.discretization.discretize_time(env_config.physics.start_time)
+        self.time = self.discretization.discretize_time(env_config.physics.start_time)
+        self.end_time = self.discretization.discretize_time(env_config.physics.end_time)
+
+        self.streams = RandomStreams.from_seed(seed)
+        self.grid = create_environment(env_config, self.time, self.streams.signals)
+        self.routes = RouteCache.from_network(self.grid.network, env_config.simulation.route_cache_size)
 
         self.agent_spawn_probability: TimeDensity = env_config.vehicles.time_density_strategy
 
         self.min_node_path_length = env_config.vehicles.min_node_path_length
-
-        self.datacollector = DataCollector(
-            model_reporters={
-            "AgentCount": lambda m: m.num_agents,
-            },
-            agent_reporters={
-            "Speed": lambda a: getattr(a, "speed", None) * 3.6 if getattr(a, "speed", None) is not None else None,
-            "VehicleType": lambda a: {1: "Car", 2: "Bus", 3: "Truck", 4: "Motorcycle"}.get(getattr(a, "type", None), None),
-            "Position": lambda a: getattr(a, "pos", None),
-            }
-        )
-
-        
+        self.vehicle_catalog = VehicleCatalog.from_config(env_config.vehicles.types, self.discretization)
+        self.od_table = create_od_table(env_config, self.routes, self.vehicle_catalog)
+        self.demand = DemandGenerator(od_table=self.od_table,
+                                      routes=self.routes,
+                                      time_density=self.agent_spawn_probability,
+                                      arrival_process=env_config.vehicles.arrival_process,
+                                      rng=self.streams.spawn,
+                                      catalog=self.vehicle_catalog)
+
+        self.reserve_intersections = env_config.simulation.reserve_intersections
+        self.profile = StepProfile()
+        self.engine = get_step_engine(env_config.simulation.engine, self)
+
+        self.collect_interval = env_config.simulation.collect_interval
+        self.collector = ColumnarCollector(output_dir=results_dir,
+                                           tables={'model': MODEL_COLUMNS, 'vehicles': VEHICLE_COLUMNS},
+                                           file_format=env_config.simulation.results_format)
+
+        self.metrics_interval = env_config.simulation.metrics_interval
+        self.metrics = None
+        if self.metrics_interval is not None:
+            steps = int(self.end_time) - int(self.start_time) + 1
+            self.metrics = RoadMetrics(self.grid, intervals=max(1, -(-steps // self.metrics_interval)))
 
         self.running = True
 
     @property
     def num_agents(self):
-        return len(self.agents)
+        return self.engine.num_vehicles
 
     def step(self) -> None:
-        hours = self.time // 3600
-        minutes = (self.time % 3600) // 60
-        seconds = self.time % 60
-        print(f"{hours:02d}:{minutes:02d}:{seconds:02d}")
-        if self.random.random() < self.agent_spawn_probability(self.time):
-            _ = self.spawn_agent()
+        profile = self.profile
+        with profile.phase('spawn'):
+            self.demand.arrive(self.time)
+            for vehicle_type, path in self.demand.release(self.engine):
+                self.engine.spawn(vehicle_type=vehicle_type, path=path)
+
+        with profile.phase('agents'):
+            self.engine.step()
 
-        self.agents.sort(lambda x: x.unique_id).do("step")
-        self.agents.sort(lambda x: x.unique_id).select(lambda x: x.finished()).do("remove")
+        with profile.phase('grid'):
+            self.grid.step()
 
-        self.grid.step()
-        self.datacollector.collect(self)
-        # self.datacollector.collect_agent_vars(self.agents)
+        with profile.phase('collect'):
+            self.collect()
+            self.measure()
 
+        profile.steps += 1
         self.time += 1
         if self.time > self.end_time:
             self.running = False
+            self.save_results()
 
-            df_model = self.datacollector.get_model_vars_dataframe()
-            df_agents = self.datacollector.get_agent_vars_dataframe()
+    def collect(self) -> None:
+        """Appends the model and vehicle state to the collector every `collect_interval` steps"""
+        if (self.time - self.start_time) % self.collect_interval != 0:
+            return
 
-            df_model.to_csv("src/ainter/data/model_results.csv")
-            df_agents.to_csv("src/ainter/data/agent_results.csv")
+        self.collector.append('model', time=self.time, agent_count=self.num_agents, queued_count=self.demand.queued)
+        self.collector.append('vehicles', time=self.time, **self.engine.get_vehicle_columns())
 
+    def measure(self) -> None:
+        """Adds the road density, flow and speed row every `metrics_interval` steps"""
+        if self.metrics is None or (self.time - self.start_time) % self.metrics_interval != 0:
+            return
 
-    def spawn_agent(self) -> Agent:
-        types = list(VehicleType)
-        graph = self.grid.road_graph
-        vehicle_type: VehicleType = self.random.choices(types, weights=[x.get_pdf() for x in types], k=1)[0]
-        vehicle_minimum_road_length = vehicle_type.get_characteristic().length + discretize_length(2.)
-
-        while True:
-            start_node = self.random.choice(list(graph.nodes))
-            end_node_possibilities = list(descendants(graph, start_node))
-            if len(end_node_possibilities) == 0:
-                continue
+        self.metrics.measure(self.time, **self.engine.get_road_vehicle_columns())
 
-            end_node = self.random.choice(end_node_possibilities)
-            path = bfs_shortest_path(graph, start_node, end_node)
-            if len(path) < self.min_node_path_length:
-                continue
+    def save_results(self) -> None:
+        """Writes the remaining collected rows and road metrics into the results directory"""
+        self.collector.close()
+        if self.metrics is not None:
+            self.metrics.save(self.results_dir)
 
-            if any(map(lambda x: discretize_length(self.grid.roads[x].length) < vehicle_minimum_road_length,
-                       itertools.pairwise(path))):
-                continue
+    def spawn_agent(self) -> Agent | VehicleId:
+        probability = self.vehicle_catalog.probability
+        vehicle_type = int(self.streams.spawn.choice(len(probability), p=probability))
 
-            break
+        (start_node,), (end_node,) = self.od_table.sample_many(vehicle_type, self.streams.spawn, 1)
+        path = self.routes.get_shortest_path(start_node, end_node)
 
-
-        return Vehicle(model=self,
-                       vehicle_type=vehicle_type,
-                       path=path)
+        return self.engine.spawn(vehicle_type=vehicle_type, path=path)
 
     def add_agent_to_environment(self, position: Position, agent_id: VehicleId, **kwargs) -> Intersection | Road:
+        color = kwargs.pop('color', None)
+        if color is not None:
+            self.grid.set_color(agent_id, color)
+
         if is_intersection_position(position):
             assert position in self.grid.intersections, "Cannot add agent nonexistent intersection"
 
             intersection = self.grid.intersections[position]
+            self.profile.count('intersection.add_agent')
             intersection.add_agent(agent_id=agent_id)
+            self.grid.enter(position)
             return intersection
 
         if is_road_position(position):
             assert position in self.grid.roads, "Cannot add agent to nonexistent road"
 
             road = self.grid.roads[position]
-            kwargs |= {'lane': self.random.randint(0, road.lanes - 1)}
+            self.profile.count('road.add_agent')
+            kwargs |= {'lane': int(self.streams.driver.integers(road.lanes))}
             road.add_agent(agent_id=agent_id, **kwargs)
+            self.grid.enter(position)
             return road
 
         raise ValueError("Position cannot be decoded")
@@ -154,14 +269,18 @@ class NaSchUrbanModel(Model, VehicleModel):
         if is_intersection_position(position):
             assert position in self.grid.intersections, "Cannot add agent nonexistent intersection"
             intersection = self.grid.intersections[position]
+            self.profile.count('intersection.remove_agent')
             assert intersection.contains_agent(agent_id=agent_id), "Agent is not on this intersection"
             intersection.remove_agent(agent_id=agent_id)
+            self.grid.leave(position)
 
         elif is_road_position(position):
             assert position in self.grid.roads, "Cannot add agent to nonexistent road"
             road = self.grid.roads[position]
+            self.profile.count('road.remove_agent')
             assert road.contains_agent(agent_id=agent_id), "Agent is not on this road"
             road.remove_agent(agent_id=agent_id)
+            self.grid.leave(position)
 
         else:
             raise ValueError("Position cannot be decoded")
@@ -170,12 +289,14 @@ class NaSchUrbanModel(Model, VehicleModel):
         if is_intersection_position(position):
             assert position in self.grid.intersections, "Cannot check if agent is leaving on a nonexistent intersection"
             intersection = self.grid.intersections[position]
+            self.profile.count('intersection.is_agent_leaving')
             assert intersection.contains_agent(agent_id=agent_id), "Agent is not on this intersection"
-            return intersection.is_agent_leaving(agent_id=agent_id, speed=speed)
+            return intersection.is_agent_leaving(agent_id=agent_id, speed=speed, time=self.grid.time)
 
         if is_road_position(position):
             assert position in self.grid.roads, "Cannot check if agent is leaving on a nonexistent road"
             road = self.grid.roads[position]
+            self.profile.count('road.is_agent_leaving')
             assert road.contains_agent(agent_id=agent_id), "Agent is not on this road"
             return road.is_agent_leaving(agent_id=agent_id, speed=speed)
 
@@ -185,15 +306,21 @@ class NaSchUrbanModel(Model, VehicleModel):
         if is_intersection_position(position):
             assert position in self.grid.intersections, "Agent cannot move on a nonexistent intersection"
             intersection = self.grid.intersections[position]
+            self.profile.count('intersection.move_agent')
             assert intersection.contains_agent(agent_id=agent_id), "Agent is not on this intersection"
             return intersection.move_agent(agent_id=agent_id,
-                                           speed=speed)
+                                           speed=speed,
+                                           time=self.grid.time)
 
         elif is_road_position(position):
             assert position in self.grid.roads, "Agent cannot move on a nonexistent road"
             road = self.grid.roads[position]
+            self.profile.count('road.move_agent')
             assert road.contains_agent(agent_id=agent_id), "Agent is not on this road"
-            return road.move_agent(agent_id=agent_id, speed=speed)
+            speed = road.move_agent(agent_id=agent_id, speed=speed)
+            if speed > 0:
+                self.profile.count('moved_vehicles')
+            return speed
 
         raise ValueError("Position cannot be decoded")
 
@@ -201,28 +328,47 @@ class NaSchUrbanModel(Model, VehicleModel):
         if is_intersection_position(position):
             assert position in self.grid.intersections, "Cannot check if agent is leaving on a nonexistent intersection"
             intersection = self.grid.intersections[position]
+            self.profile.count('intersection.get_obstacle_distance')
             assert intersection.contains_agent(agent_id=agent_id), "Agent is not on this intersection"
-            return intersection.get_obstacle_distance(agent_id=agent_id)
+            return intersection.get_obstacle_distance(agent_id=agent_id, time=self.grid.time)
 
         if is_road_position(position):
             assert position in self.grid.roads, "Cannot check if agent is leaving on a nonexistent road"
             road = self.grid.roads[position]
+            self.profile.count('road.get_obstacle_distance')
             assert road.contains_agent(agent_id=agent_id), "Agent is not on this road" # not working at the moment
             return road.get_obstacle_distance(agent_id=agent_id)
 
         raise ValueError("Position cannot be decoded")
 
-    def can_accept_agent(self, position: Position, agent_id: VehicleId, length: DiscreteLength) -> bool:
+    def can_accept_agent(self, position: Position, agent_id: VehicleId, length: DiscreteLength, **kwargs) -> bool:
         if is_intersection_position(position):
             assert position in self.grid.intersections, "Cannot check if agent is leaving on a nonexistent intersection"
             intersection = self.grid.intersections[position]
+            self.profile.count('intersection.can_accept_agent')
             # assert not intersection.contains_agent(agent_id=agent_id), "Agent is on this intersection"
-            return intersection.can_accept_agent(agent_id=agent_id, length=length)
+            if kwargs.get('exit_node') is not None:
+                kwargs['exit_free_cells'] = self.grid.roads[position, kwargs['exit_node']].get_free_entry_cells()
+            return intersection.can_accept_agent(agent_id=agent_id, length=length, time=self.grid.time, **kwargs)
 
         if is_road_position(position):
             assert position in self.grid.roads, "Cannot check if agent is leaving on a nonexistent road"
             road = self.grid.roads[position]
+            self.profile.count('road.can_accept_agent')
             assert not road.contains_agent(agent_id=agent_id), "Agent is on this road"
             return road.can_accept_agent(agent_id=agent_id, length=length)
 
         raise ValueError("Position cannot be decoded")
+
+    def get_road_speed(self, position: RoadPosition) -> DiscreteSpeed:
+        """Speed limit of the road in cells per time step"""
+        assert position in self.grid.roads, "Cannot get the speed of a nonexistent road"
+        return self.discretization.discretize_speed(self.grid.roads[position].max_speed)
+
+    def reserve_crossing(self, position: Position, agent_id: VehicleId, length: DiscreteLength, **kwargs) -> None:
+        """Takes the intersection crossing accepted by `can_accept_agent`, roads are entered without one"""
+        if is_intersection_position(position):
+            assert position in self.grid.intersections, "Cannot reserve a crossing of a nonexistent intersection"
+            intersection = self.grid.intersections[position]
+            self.profile.count('intersection.reserve_crossing')
+            intersection.reserve_crossing(agent_id=agent_id, length=length, time=self.grid.time, **kwargs)
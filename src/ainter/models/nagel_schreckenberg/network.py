@@ -0,0 +1,162 @@
+import hashlib
+import itertools
+from dataclasses import dataclass, field
+from typing import Any, Final, Optional, Self
+
+import numpy as np
+import shapely
+from networkx.classes import DiGraph
+
+from ainter.models.autonomous_intersection.intersection_directions import IntersectionDirection
+
+# Tables identifying the network, with the types they are hashed in
+NETWORK_TABLES: Final[dict[str, np.dtype]] = {
+    'node_id': np.dtype(np.int64),
+    'node_x': np.dtype(np.float64),
+    'node_y': np.dtype(np.float64),
+    'edge_source': np.dtype(np.int64),
+    'edge_target': np.dtype(np.int64),
+    'edge_length': np.dtype(np.float64),
+    'edge_lanes': np.dtype(np.int64),
+    'edge_max_speed': np.dtype(np.float64),
+}
+
+
+# Graph attributes kept in the tables, the other attributes are kept as they are
+NODE_COLUMNS: Final[tuple[str, ...]] = ('x', 'y')
+EDGE_COLUMNS: Final[tuple[str, ...]] = ('length', 'lanes', 'max_speed', 'geometry')
+
+
+def read_only(array: np.ndarray) -> np.ndarray:
+    array = np.asarray(array)
+    array.flags.writeable = False
+    return array
+
+
+@dataclass(slots=True)
+class StaticNetwork:
+    """Immutable part of the environment, the node and edge tables of the road graph.
+
+    Edges follow the road order of the environment and refer to nodes by their index. Networks loaded from a
+    prepared environment hold read-only views of its memory map, together with its `intersection_tables`, and one
+    network is shared by all replicas of the same file in a process. The road geometries are kept as coordinate
+    tables and the other graph attributes as plain dictionaries, the shapely geometries, the networkx graph and
+    the approach directions of the intersections are only built on first use, e.g. for rendering, and then shared.
+    """
+    node_id: np.ndarray
+    node_x: np.ndarray
+    node_y: np.ndarray
+    edge_source: np.ndarray
+    edge_target: np.ndarray
+    edge_length: np.ndarray
+    edge_lanes: np.ndarray
+    edge_max_speed: np.ndarray
+    geometry_coords: Optional[np.ndarray] = None
+    geometry_sizes: Optional[np.ndarray] = None
+    graph_attributes: dict[str, Any] = field(default_factory=dict)
+    node_attributes: tuple[dict[str, Any], ...] = tuple()
+    edge_attributes: tuple[dict[str, Any], ...] = tuple()
+    intersection_tables: Optional[dict[str, np.ndarray]] = None
+    graph: Optional[DiGraph] = field(default=None)
+    geometries: Optional[np.ndarray] = field(default=None)
+    directions: dict[int, tuple[dict[int, IntersectionDirection], dict[int, IntersectionDirection]]] = \
+        field(default_factory=dict)
+
+    @classmethod
+    def from_graph(cls, graph: DiGraph) -> Self:
+        node_index = {node_id: i for i, node_id in enumerate(graph.nodes)}
+        nodes = list(graph.nodes(data=True))
+        edges = list(graph.edges(data=True))
+        geometries = [data['geometry'] for _, _, data in edges]
+        return cls(node_id=read_only(np.fromiter(graph.nodes, dtype=np.int64, count=len(node_index))),
+                   node_x=read_only([data['x'] for _, data in nodes]),
+                   node_y=read_only([data['y'] for _, data in nodes]),
+                   edge_source=read_only(np.array([node_index[u] for u, _, _ in edges], dtype=np.int64)),
+                   edge_target=read_only(np.array([node_index[v] for _, v, _ in edges], dtype=np.int64)),
+                   edge_length=read_only(np.array([data['length'] for _, _, data in edges], dtype=np.float64)),
+                   edge_lanes=read_only(np.array([data['lanes'] for _, _, data in edges], dtype=np.int64)),
+                   edge_max_speed=read_only(np.array([data['max_speed'] for _, _, data in edges], dtype=np.float64)),
+                   geometry_coords=read_only(shapely.get_coordinates(geometries).astype(np.float64)),
+                   geometry_sizes=read_only(shapely.get_num_coordinates(geometries).astype(np.int64)),
+                   graph_attributes=dict(graph.graph),
+                   node_attributes=tuple({name: value for name, value in data.items() if name not in NODE_COLUMNS}
+                                         for _, data in nodes),
+                   edge_attributes=tuple({name: value for name, value in data.items() if name not in EDGE_COLUMNS}
+                                         for _, _, data in edges))
+
+    @classmethod
+    def from_tables(cls, tables: dict[str, np.ndarray], header: dict[str, Any]) -> Self:
+        """Network of a prepared environment, the tables and the `graph`, `nodes` and `edges` attributes of its
+        header, see `save_environment`"""
+        return cls(**{name: tables[name] for name in NETWORK_TABLES},
+                   geometry_coords=tables['geometry_coords'],
+                   geometry_sizes=tables['geometry_sizes'],
+                   graph_attributes=header['graph'],
+                   node_attributes=tuple(header['nodes']),
+                   edge_attributes=tuple(header['edges']),
+                   intersection_tables={name: table for name, table in tables.items()
+                                        if name not in NETWORK_TABLES and not name.startswith('geometry_')})
+
+    @property
+    def road_graph(self) -> DiGraph:
+        """Networkx graph with the attributes of the graph the network was built from"""
+        if self.graph is None:
+            self.graph = self.build_graph()
+        return self.graph
+
+    def build_graph(self) -> DiGraph:
+        node_ids = self.node_id.tolist()
+        graph = DiGraph(**self.graph_attributes)
+        graph.add_nodes_from((node_id, data | {'x': x, 'y': y})
+                             for node_id, data, x, y in zip(node_ids,
+                                                            self.node_attributes or itertools.repeat(dict()),
+                                                            self.node_x.tolist(),
+                                                            self.node_y.tolist()))
+
+        geometries = itertools.repeat(None) if self.geometry_coords is None else self.get_geometries()
+        graph.add_edges_from((node_ids[u], node_ids[v], data | {'length': length, 'lanes': lanes,
+                                                                'max_speed': max_speed} |
+                              ({} if geometry is None else {'geometry': geometry}))
+                             for u, v, data, length, lanes, max_speed, geometry in
+                             zip(self.edge_source.tolist(),
+                                 self.edge_target.tolist(),
+                                 self.edge_attributes or itertools.repeat(dict()),
+                                 self.edge_length.tolist(),
+                                 self.edge_lanes.tolist(),
+                                 self.edge_max_speed.tolist(),
+                                 geometries))
+        return graph
+
+    def get_geometries(self) -> np.ndarray:
+        """Line strings of the edges, built from the coordinate tables on the first call"""
+        if self.geometries is None:
+            assert self.geometry_coords is not None and self.geometry_sizes is not None, "Network has no geometries"
+            indices = np.repeat(np.arange(len(self.geometry_sizes)), self.geometry_sizes)
+            self.geometries = shapely.linestrings(self.geometry_coords, indices=indices)
+        return self.geometries
+
+    def get_edge_names(self) -> list[Optional[str]]:
+        return [data.get('name') for data in self.edge_attributes]
+
+    def get_edge_keys(self) -> list[tuple[int, int]]:
+        """(from node, to node) ids of the edges, the keys of the environment roads"""
+        node_ids = self.node_id.tolist()
+        return [(node_ids[u], node_ids[v]) for u, v in zip(self.edge_source.tolist(), self.edge_target.tolist())]
+
+    def get_content_hash(self) -> str:
+        """SHA-256 of the node and edge tables, the same for a network built from the graph or loaded from a file"""
+        digest = hashlib.sha256()
+        for name, dtype in NETWORK_TABLES.items():
+            table = np.ascontiguousarray(getattr(self, name), dtype=dtype)
+            digest.update(name.encode('utf-8'))
+            digest.update(np.int64(len(table)).tobytes())
+            digest.update(table.tobytes())
+        return digest.hexdigest()
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_id)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.edge_source)
@@ -0,0 +1,133 @@
+from dataclasses import dataclass
+from typing import Final, Self
+
+import numpy as np
+
+from ainter.models.nagel_schreckenberg.environment import Environment
+from ainter.models.nagel_schreckenberg.network import read_only
+from ainter.models.vehicles.vehicle import IntersectionPosition, NULL_VEHICLE_ID
+
+DEFAULT_APPROACH_CELLS: Final[int] = 16
+INTERSECTION_SEGMENT: Final[int] = 0
+APPROACH_SEGMENT: Final[int] = 1
+
+
+@dataclass(slots=True, frozen=True)
+class ObservationLayout:
+    """Placement of the observed grids in the flat observation buffer, one row per segment.
+
+    Every intersection has its grid segment followed by the approach segments of its incoming roads, in the
+    order of its traffic light phases. An approach is the last `approach_cells` cells of the road, `(rows, lanes)`
+    with the stop line in the last row. The buffer holds all intersection grids first and then all road grids
+    in the order of `Environment.roads`, from `roads_offset` on, the approaches are the tails of the road grids.
+    The layout depends only on the network, so every replica of the same map shares it.
+    """
+    kind: np.ndarray
+    node: np.ndarray
+    source: np.ndarray
+    offset: np.ndarray
+    rows: np.ndarray
+    cols: np.ndarray
+    road_offset: np.ndarray
+    roads_offset: int
+    size: int
+
+    @classmethod
+    def from_environment(cls, environment: Environment, approach_cells: int = DEFAULT_APPROACH_CELLS) -> Self:
+        if approach_cells < 1:
+            raise ValueError(f"{approach_cells=} cannot be zero-like or negative")
+
+        grid_sizes = np.array([intersection.grid.size for intersection in environment.intersections.values()],
+                              dtype=np.int64)
+        grid_offsets = np.concatenate(([0], np.cumsum(grid_sizes)[:-1])).astype(np.int64)
+        roads_offset = int(np.sum(grid_sizes))
+        road_sizes = np.array([road.shape[0] * road.shape[1] for road in environment.roads.values()],
+                              dtype=np.int64)
+        road_offset = roads_offset + np.concatenate(([0], np.cumsum(road_sizes)[:-1])).astype(np.int64)
+        road_index = {key: i for i, key in enumerate(environment.roads)}
+
+        segments = list()
+        for intersection, grid_offset in zip(environment.intersections.values(), grid_offsets.tolist()):
+            segments.append((INTERSECTION_SEGMENT, intersection.osm_id, -1, grid_offset, *intersection.grid.shape))
+            sources = sorted(intersection.in_edge_directions,
+                             key=lambda x: intersection.in_edge_directions[x].direction)
+            for source in sources:
+                index = road_index[source, intersection.osm_id]
+                cells, lanes = environment.roads[source, intersection.osm_id].shape
+                rows = min(approach_cells, cells)
+                segments.append((APPROACH_SEGMENT, intersection.osm_id, source,
+                                 int(road_offset[index]) + (cells - rows) * lanes, rows, lanes))
+
+        columns = np.array(segments, dtype=np.int64).reshape(-1, 6).T
+        return cls(kind=read_only(columns[0].astype(np.int8)),
+                   node=read_only(columns[1].copy()),
+                   source=read_only(columns[2].copy()),
+                   offset=read_only(columns[3].copy()),
+                   rows=read_only(columns[4].copy()),
+                   cols=read_only(columns[5].copy()),
+                   road_offset=read_only(road_offset),
+                   roads_offset=roads_offset,
+                   size=roads_offset + int(np.sum(road_sizes)))
+
+    def __len__(self) -> int:
+        return len(self.kind)
+
+    def get_view(self, buffer: np.ndarray, segment: int) -> np.ndarray:
+        """View of the segment in a buffer of this layout, e.g. one attached to shared memory"""
+        start = int(self.offset[segment])
+        rows, cols = int(self.rows[segment]), int(self.cols[segment])
+        return buffer[start:start + rows * cols].reshape(rows, cols)
+
+
+class ObservationBuffer:
+    """Intersection grids and the road approaches of one replica kept in one contiguous buffer.
+
+    The grids of the intersections and the roads are rebound to views of the buffer, so the engines write the
+    state in place and reading it needs no copy. Sparse roads are made dense. The vectorized engine keeps its own
+    cell buffer, it must be given `road_cells` to write into this one. The views handed out are read-only.
+    """
+
+    def __init__(self, environment: Environment, approach_cells: int = DEFAULT_APPROACH_CELLS) -> None:
+        self.layout = ObservationLayout.from_environment(environment, approach_cells)
+        self.data = np.full(shape=self.layout.size, fill_value=NULL_VEHICLE_ID, dtype=np.uint16)
+
+        grids = self.layout.kind == INTERSECTION_SEGMENT
+        for intersection, segment in zip(environment.intersections.values(), np.flatnonzero(grids).tolist()):
+            grid = self.layout.get_view(self.data, segment)
+            grid[:] = intersection.grid
+            intersection.grid = grid
+
+        for road, offset in zip(environment.roads.values(), self.layout.road_offset.tolist()):
+            cells, lanes = road.shape
+            grid = self.data[offset:offset + cells * lanes].reshape(cells, lanes)
+            grid[:] = road.dense_grid()
+            road.set_grid(grid)
+
+        self.views = [read_only(self.layout.get_view(self.data, segment)) for segment in range(len(self.layout))]
+        self.segments: dict[tuple[IntersectionPosition, int], int] = {
+            (node, source): segment
+            for segment, (node, source) in enumerate(zip(self.layout.node.tolist(), self.layout.source.tolist()))}
+
+    @property
+    def buffer(self) -> np.ndarray:
+        return read_only(self.data[:])
+
+    @property
+    def road_cells(self) -> np.ndarray:
+        """Writable road part of the buffer, the cell buffer of the vectorized engine"""
+        return self.data[self.layout.roads_offset:]
+
+    def get_intersection(self, position: IntersectionPosition) -> np.ndarray:
+        return self.views[self.segments[position, -1]]
+
+    def get_approach(self, source: IntersectionPosition, position: IntersectionPosition) -> np.ndarray:
+        """Last cells of the road from `source` into the intersection at `position`"""
+        return self.views[self.segments[position, source]]
+
+    def get_approaches(self, position: IntersectionPosition) -> list[np.ndarray]:
+        """Approaches of the intersection in the order of its traffic light phases"""
+        segment = self.segments[position, -1]
+        end = segment + 1
+        while end < len(self.layout) and self.layout.kind[end] == APPROACH_SEGMENT:
+            end += 1
+        return self.views[segment + 1:end]
@@ -0,0 +1,63 @@
+import numpy as np
+
+from ainter.models.nagel_schreckenberg.network import StaticNetwork
+from ainter.models.nagel_schreckenberg.units import discretize_length, PhysicalLength, CELL_SIZE
+
+
+def get_road_cells(network: StaticNetwork, cell_size: PhysicalLength = CELL_SIZE) -> np.ndarray:
+    return discretize_length(network.edge_length, cell_size).astype(np.int64) * network.edge_lanes
+
+def get_cut_edges(network: StaticNetwork, node_part: np.ndarray) -> np.ndarray:
+    """Mask of the roads, whose ends lie in different partitions"""
+    return node_part[network.edge_source] != node_part[network.edge_target]
+
+def get_balanced_split(cumulative: np.ndarray, target: float) -> int:
+    """Number of leading items, whose total weight is the closest to the target, keeping both sides non-empty"""
+    index = int(np.searchsorted(cumulative, target))
+    candidates = [split for split in (index, index + 1) if 1 <= split <= len(cumulative) - 1]
+    if len(candidates) == 0:
+        return min(max(index, 1), max(len(cumulative) - 1, 1))
+    return min(candidates, key=lambda split: abs(cumulative[split - 1] - target))
+
+def partition_network(network: StaticNetwork, parts: int) -> np.ndarray:
+    """Partition of the nodes into regions with balanced road cells, returned as the region of every node.
+
+    A road belongs to the region of its start node, so a node weighs the cells of its outgoing roads. Regions
+    are found by recursive coordinate bisection: every split is taken at the weighted median along the x or y
+    coordinate, whichever cuts fewer roads between the two halves. Ties keep the node order, so the partition
+    only depends on the network.
+    """
+    if parts < 1:
+        raise ValueError(f"{parts=} cannot be zero-like or negative")
+
+    weights = np.bincount(network.edge_source, weights=get_road_cells(network), minlength=network.num_nodes) + 1.
+    coordinates = (np.asarray(network.node_x), np.asarray(network.node_y))
+    node_part = np.zeros(shape=network.num_nodes, dtype=np.int64)
+
+    pending = [(np.arange(network.num_nodes), parts, 0)]
+    while len(pending) > 0:
+        nodes, node_parts, first_part = pending.pop()
+        if node_parts == 1 or len(nodes) == 0:
+            node_part[nodes] = first_part
+            continue
+
+        left_parts = node_parts // 2
+        target = np.sum(weights[nodes]) * left_parts / node_parts
+        in_nodes = np.zeros(shape=network.num_nodes, dtype=bool)
+        in_nodes[nodes] = True
+        inner = in_nodes[network.edge_source] & in_nodes[network.edge_target]
+
+        best = None
+        for coordinate in coordinates:
+            order = nodes[np.argsort(coordinate[nodes], kind='stable')]
+            split = get_balanced_split(np.cumsum(weights[order]), target)
+            in_left = np.zeros(shape=network.num_nodes, dtype=bool)
+            in_left[order[:split]] = True
+            cut = int(np.sum(inner & (in_left[network.edge_source] != in_left[network.edge_target])))
+            if best is None or cut < best[0]:
+                best = (cut, order[:split], order[split:])
+
+        _, left, right = best
+        pending.append((left, left_parts, first_part))
+        pending.append((right, node_parts - left_parts, first_part + left_parts))
+    return node_part
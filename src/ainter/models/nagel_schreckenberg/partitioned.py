@@ -0,0 +1,250 @@
+import itertools
+import multiprocessing
+import os
+import random
+import time
+import traceback
+from typing import Any, Final, Optional
+
+import numpy as np
+
+from ainter.configs.env_creation import EnvConfig
+from ainter.models.data.graph_store import get_graph_key
+from ainter.models.data.osmnx import DEFAULT_NETWORK_TYPE
+from ainter.models.data.routing import RouteCache
+from ainter.models.nagel_schreckenberg.demand import DemandGenerator
+from ainter.models.nagel_schreckenberg.environment import Environment
+from ainter.models.nagel_schreckenberg.model import create_environment, create_od_table
+from ainter.models.nagel_schreckenberg.partition import partition_network, get_cut_edges, get_road_cells
+from ainter.models.nagel_schreckenberg.snapshot import load_environment, save_environment
+from ainter.models.nagel_schreckenberg.units import DiscreteTime
+from ainter.models.nagel_schreckenberg.vectorized import VectorizedStepEngine, VEHICLE_STATE, get_route_indices
+from ainter.models.vehicles.catalog import VehicleCatalog, VehicleTypeId, DEFAULT_VEHICLE_CATALOG
+from ainter.models.vehicles.vehicle import VehicleId, RoadPosition, NULL_VEHICLE_ID
+
+PARTITIONED_ENVIRONMENT_FILE: Final[str] = 'environment.env'
+PARTITION_COLUMNS: Final[dict[str, np.dtype]] = {
+    'time': np.dtype(np.uint32),
+    'partition': np.dtype(np.int64),
+    'vehicle_count': np.dtype(np.int64),
+    'step_time': np.dtype(np.float64),
+}
+# Vehicle columns sent between the regions, the route start is replaced by the route itself and the receiving
+# region gives the vehicle its own slot
+TRANSFERRED_STATE: Final[tuple[str, ...]] = tuple(name for name in VEHICLE_STATE if name not in ('route_start', 'slot'))
+
+
+class PartitionStepEngine(VectorizedStepEngine):
+    """Vectorized engine of one region, it keeps the vehicles standing on or waiting for the roads of the region.
+
+    A vehicle leaving its road waits at the intersection for its next road, when that road belongs to another
+    region, the vehicle is handed over at the end of the step. As waiting vehicles enter their road in the next
+    step at the earliest, the handover does not delay them compared to the single process engine.
+    """
+
+    def __init__(self, environment: Environment, rng: np.random.Generator, road_part: np.ndarray, part: int,
+                 catalog: VehicleCatalog = DEFAULT_VEHICLE_CATALOG) -> None:
+        super().__init__(environment, rng, catalog=catalog)
+        self.road_part = road_part
+        self.part = part
+        self.owned_roads = np.flatnonzero(road_part == part)
+
+    def spawn_vehicle(self, vehicle_id: VehicleId, vehicle_type: VehicleTypeId, path: list[int]) -> None:
+        """Spawns a vehicle with the id assigned by the coordinator, its first road must belong to the region"""
+        roads = [self.road_ids[edge] for edge in itertools.pairwise(path)]
+        assert self.road_part[roads[0]] == self.part, "Vehicle must start on a road of the region"
+        self.pending.append((vehicle_id, vehicle_type, roads))
+
+    def pop_leaving(self) -> dict[int, dict[str, np.ndarray]]:
+        """Removes the vehicles waiting for a road of another region, returns their state batched by the region"""
+        leaving = ~self.on_road & (self.road_part[self.road] != self.part)
+        if not np.any(leaving):
+            return dict()
+
+        indices = np.flatnonzero(leaving)
+        target_part = self.road_part[self.road[indices]]
+        batches = dict()
+        for part in np.unique(target_part).tolist():
+            selected = indices[target_part == part]
+            batches[part] = {name: getattr(self, name)[selected] for name in TRANSFERRED_STATE}
+            batches[part]['routes'] = self.routes[get_route_indices(self.route_start[selected],
+                                                                    self.route_length[selected])]
+
+        self.update_occupancy(self.road[indices], on_road=False, entering=False)
+        self.remove_vehicles(leaving)
+        return batches
+
+    def add_vehicles(self, batch: dict[str, np.ndarray]) -> None:
+        """Appends the vehicles handed over by another region"""
+        route_length = batch['route_length']
+        self.route_start = np.concatenate((self.route_start,
+                                           len(self.routes) + np.cumsum(route_length) - route_length))
+        self.routes = np.concatenate((self.routes, batch['routes']))
+        for name in TRANSFERRED_STATE:
+            setattr(self, name, np.concatenate((getattr(self, name), batch[name])))
+        count = len(batch['ids'])
+        self.slot = np.concatenate((self.slot, self.acquire_slots(count)))
+        self.environment.palette[self.slot[-count:]] = batch['color']
+        self.update_occupancy(batch['road'][batch['on_road']], on_road=True, entering=True)
+        self.update_occupancy(batch['road'][~batch['on_road']], on_road=False, entering=True)
+
+
+def run_partition(connection, environment_path: str, start_time: DiscreteTime, road_part: np.ndarray, part: int,
+                  seed: np.random.SeedSequence, catalog: VehicleCatalog = DEFAULT_VEHICLE_CATALOG) -> None:
+    """Worker loop of one region: every message holds the spawned and handed over vehicles of one step, the reply
+    holds the leaving vehicles, the free entry cells of the region roads, the vehicle count and the step time"""
+    try:
+        # Traffic light durations are not used by the vectorized engine, so the random state does not matter
+        environment = load_environment(environment_path, start_time, random.Random(0),
+                                       discretization=catalog.discretization)
+        engine = PartitionStepEngine(environment, np.random.default_rng(seed), road_part, part, catalog)
+
+        while (message := connection.recv()) is not None:
+            spawns, incoming = message
+            start = time.perf_counter()
+            for batch in incoming:
+                engine.add_vehicles(batch)
+            for vehicle_id, vehicle_type, path in spawns:
+                engine.spawn_vehicle(vehicle_id, vehicle_type, path)
+
+            engine.step()
+            leaving = engine.pop_leaving()
+            free_cells = engine.get_free_cells()[engine.owned_roads]
+            connection.send((leaving, free_cells, engine.num_vehicles, time.perf_counter() - start))
+    except Exception:
+        connection.send(traceback.format_exc())
+    finally:
+        connection.close()
+
+
+class PartitionedSimulation:
+    """Vectorized model split into road network regions, every region is stepped by its own process.
+
+    The regions come from `partition_network`. This process draws the demand, assigns the vehicle ids and routes
+    the vehicles crossing a cut road between the regions in one batch per region and step. Every region has its
+    own random stream spawned from the seed, the regions and batches are always processed in the same order,
+    so the run is deterministic for a given seed and number of regions.
+    """
+
+    def __init__(self, env_config: EnvConfig, parts: int, seed: Optional[int] = None, work_dir: str = '.') -> None:
+        simulation = env_config.simulation
+        discretization = env_config.physics.discretization
+        self.discretization = discretization
+        self.start_time = discretization.discretize_time(env_config.physics.start_time)
+        self.time = self.start_time
+        self.end_time = discretization.discretize_time(env_config.physics.end_time)
+
+        environment_path = simulation.environment_path
+        key = get_graph_key(env_config.map_box, DEFAULT_NETWORK_TYPE)
+        if environment_path is None:
+            os.makedirs(work_dir, exist_ok=True)
+            environment_path = os.path.join(work_dir, PARTITIONED_ENVIRONMENT_FILE)
+            save_environment(create_environment(env_config, self.time, random.Random(0)), environment_path, key=key)
+        environment = load_environment(environment_path, self.time, random.Random(0), key=key,
+                                       discretization=discretization)
+
+        seeds = np.random.SeedSequence(seed).spawn(parts + 1)
+        self.network = environment.network
+        self.road_ids: dict[RoadPosition, int] = {road: i for i, road in enumerate(environment.roads)}
+        self.node_part = partition_network(self.network, parts)
+        self.road_part = self.node_part[self.network.edge_source]
+        self.part_roads = [np.flatnonzero(self.road_part == part) for part in range(parts)]
+        self.free_cells = np.array([road.shape[0] for road in environment.roads.values()], dtype=np.int64)
+
+        self.vehicle_catalog = VehicleCatalog.from_config(env_config.vehicles.types, discretization)
+        routes = RouteCache.from_network(self.network, simulation.route_cache_size)
+        self.demand = DemandGenerator(od_table=create_od_table(env_config, routes, self.vehicle_catalog),
+                                      routes=routes,
+                                      time_density=env_config.vehicles.time_density_strategy,
+                                      arrival_process=env_config.vehicles.arrival_process,
+                                      rng=np.random.default_rng(seeds[0]),
+                                      catalog=self.vehicle_catalog)
+
+        self.next_id: VehicleId = NULL_VEHICLE_ID + 1
+        self.incoming: list[list[dict[str, np.ndarray]]] = [list() for _ in range(parts)]
+        self.vehicle_counts = np.zeros(shape=parts, dtype=np.int64)
+        self.step_times: list[np.ndarray] = list()
+        self.running = True
+
+        context = multiprocessing.get_context()
+        self.connections = list()
+        self.processes = list()
+        for part in range(parts):
+            connection, worker_connection = context.Pipe()
+            process = context.Process(target=run_partition,
+                                      args=(worker_connection, environment_path, self.time, self.road_part, part,
+                                            seeds[part + 1], self.vehicle_catalog),
+                                      name=f"partition-{part}",
+                                      daemon=True)
+            process.start()
+            worker_connection.close()
+            self.connections.append(connection)
+            self.processes.append(process)
+
+    @property
+    def parts(self) -> int:
+        return len(self.connections)
+
+    @property
+    def num_vehicles(self) -> int:
+        in_transit = sum(len(batch['ids']) for batches in self.incoming for batch in batches)
+        return int(np.sum(self.vehicle_counts)) + in_transit
+
+    def get_free_entry_cells(self, roads: list[RoadPosition]) -> np.ndarray:
+        return self.free_cells[[self.road_ids[road] for road in roads]]
+
+    def step(self) -> None:
+        self.demand.arrive(self.time)
+        spawns = [list() for _ in range(self.parts)]
+        for vehicle_type, path in self.demand.release(self):
+            spawns[self.road_part[self.road_ids[path[0], path[1]]]].append((self.next_id, vehicle_type, path))
+            self.next_id += 1
+
+        for connection, part_spawns, incoming in zip(self.connections, spawns, self.incoming):
+            connection.send((part_spawns, incoming))
+
+        self.incoming = [list() for _ in range(self.parts)]
+        step_times = np.zeros(shape=self.parts, dtype=np.float64)
+        for part, connection in enumerate(self.connections):
+            reply = connection.recv()
+            if isinstance(reply, str):
+                raise RuntimeError(f"Partition {part} failed:\n{reply}")
+
+            leaving, free_cells, self.vehicle_counts[part], step_times[part] = reply
+            self.free_cells[self.part_roads[part]] = free_cells
+            for target_part, batch in leaving.items():
+                self.incoming[target_part].append(batch)
+        self.step_times.append(step_times)
+
+        self.time += 1
+        if self.time > self.end_time:
+            self.running = False
+
+    def close(self) -> None:
+        for connection, process in zip(self.connections, self.processes):
+            if process.is_alive():
+                connection.send(None)
+            process.join()
+            connection.close()
+        self.connections = list()
+        self.processes = list()
+
+    def __enter__(self) -> 'PartitionedSimulation':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def get_partition_report(self) -> dict[str, Any]:
+        """Road cells and step times of every region, with the number of cut roads and the imbalance, the ratio of
+        the slowest region's step time to the mean one"""
+        step_times = np.array(self.step_times, dtype=np.float64).reshape(-1, len(self.part_roads))
+        total_times = np.sum(step_times, axis=0)
+        return {
+            'cells': np.bincount(self.road_part, weights=get_road_cells(self.network, self.discretization.cell_size),
+                                 minlength=len(self.part_roads)).astype(np.int64),
+            'cut_roads': int(np.sum(get_cut_edges(self.network, self.node_part))),
+            'mean_step_time': np.mean(step_times, axis=0) if len(step_times) > 0 else total_times,
+            'total_step_time': total_times,
+            'imbalance': float(np.max(total_times) / np.mean(total_times)) if np.sum(total_times) > 0 else 1.,
+        }
@@ -0,0 +1,77 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Final, Iterator
+
+# Phases of the model step in their order
+STEP_PHASES: Final[tuple[str, ...]] = ('spawn', 'agents', 'removal', 'grid', 'collect')
+
+
+class StepProfile:
+    """Wall time spent in the phases of the model step and counters of the environment calls.
+
+    A phase entered inside another one pauses the outer phase, so the phase times are exclusive and add up to
+    the time of the profiled steps. A phase costs two clock reads and a counter one dictionary update, so the
+    profile is kept for every run. Both engines count the vehicles moving forward on roads as `moved_vehicles`.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        self.clock = clock
+        self.times: dict[str, float] = dict.fromkeys(STEP_PHASES, 0.)
+        self.counters: Counter[str] = Counter()
+        self.steps = 0
+
+        self.stack: list[str] = list()
+        self.started = 0.
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        now = self.clock()
+        if len(self.stack) > 0:
+            self.times[self.stack[-1]] += now - self.started
+        self.stack.append(name)
+        self.started = now
+        try:
+            yield
+        finally:
+            now = self.clock()
+            self.times[name] = self.times.get(name, 0.) + now - self.started
+            self.stack.pop()
+            self.started = now
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] += n
+
+    def reset(self) -> None:
+        assert len(self.stack) == 0, "Cannot reset the profile inside a phase"
+        self.times = dict.fromkeys(STEP_PHASES, 0.)
+        self.counters.clear()
+        self.steps = 0
+
+    @property
+    def total_time(self) -> float:
+        return sum(self.times.values())
+
+    def get_summary(self) -> dict[str, Any]:
+        """Total, per-step and relative time of every phase with the counter totals and per-step means"""
+        total = self.total_time
+        steps = max(self.steps, 1)
+        return {
+            'steps': self.steps,
+            'time': total,
+            'phases': {name: {'time': value, 'step_time': value / steps, 'share': value / total if total > 0 else 0.}
+                       for name, value in self.times.items()},
+            'counters': {name: {'count': value, 'per_step': value / steps}
+                         for name, value in sorted(self.counters.items())},
+        }
+
+    def format_summary(self) -> list[str]:
+        summary = self.get_summary()
+        width = max(len(name) for name in [*summary['phases'], *summary['counters']])
+        lines = [f"Profiled {summary['steps']} steps in {summary['time']:.3f}s"]
+        lines += [f"{name:>{width}}: {phase['time']:9.3f}s {phase['step_time'] * 1000.:9.3f} ms/step "
+                  f"{phase['share'] * 100.:5.1f}%"
+                  for name, phase in summary['phases'].items()]
+        lines += [f"{name:>{width}}: {counter['count']:9d} {counter['per_step']:13.1f} per step"
+                  for name, counter in summary['counters'].items()]
+        return lines
@@ -0,0 +1,38 @@
+from dataclasses import dataclass, fields
+from typing import Any, Optional, Self
+
+import numpy as np
+
+
+@dataclass(slots=True)
+class RandomStreams:
+    """Independent NumPy generators of the model subsystems, all spawned from the model seed.
+
+    `spawn` draws the arriving vehicles and their routes, `driver` the lane choices and the NaSch braking noise,
+    `signals` the traffic light plans and `render` the vehicle colours. Every subsystem has its own stream, so
+    e.g. rendering more vehicles does not change the traffic. Without a seed the entropy of the system is used,
+    it is kept in `entropy` to reproduce the run.
+    """
+    spawn: np.random.Generator
+    driver: np.random.Generator
+    signals: np.random.Generator
+    render: np.random.Generator
+    entropy: int | list[int]
+
+    @classmethod
+    def from_seed(cls, seed: Optional[int | np.random.SeedSequence] = None) -> Self:
+        sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        spawn, driver, signals, render = (np.random.default_rng(x) for x in sequence.spawn(4))
+        return cls(spawn=spawn, driver=driver, signals=signals, render=render, entropy=sequence.entropy)
+
+    @property
+    def generators(self) -> dict[str, np.random.Generator]:
+        return {x.name: getattr(self, x.name) for x in fields(self) if x.name != 'entropy'}
+
+    def get_state(self) -> dict[str, Any]:
+        """States of the bit generators, which can be stored as JSON"""
+        return {name: generator.bit_generator.state for name, generator in self.generators.items()}
+
+    def set_state(self, state: dict[str, Any]) -> None:
+        for name, generator in self.generators.items():
+            generator.bit_generator.state = state[name]
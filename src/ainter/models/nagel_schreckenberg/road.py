@@ -1,3 +1,4 @@
+from bisect import bisect_left
 from dataclasses import dataclass, field
 from typing import Self, Any, Optional
 
@@ -5,142 +6,228 @@ import numpy as np
 from shapely import LineString
 
 from ainter.models.nagel_schreckenberg.units import discretize_length, PhysicalLength, PhysicalSpeed, DiscreteSpeed, \
-    DiscreteLength, ROAD_COLOR, convert_km_h_to_m_s
+    DiscreteLength, convert_km_h_to_m_s, CELL_SIZE
 from ainter.models.vehicles.vehicle import VehicleId, NULL_VEHICLE_ID
 from ainter.models.autonomous_intersection.lane_directions import LaneDirections
 
 
+@dataclass(slots=True)
+class RoadSlot:
+    """Cells taken by a single vehicle, it spans `length` cells of the `lane` from the `start` cell"""
+    start: int
+    lane: int
+    length: int
+
+    @property
+    def end(self) -> int:
+        return self.start + self.length - 1
+
+
 @dataclass(slots=True)
 class Road:
+    """Road with a dense `(cells, lanes)` grid, or a sparse one (`grid` is None) keeping only the lane lists.
+
+    Vehicles of every lane are kept in `lane_starts` / `lane_agents`, ordered by the start cell. As vehicles
+    cannot overtake within a lane, the order only changes when a vehicle enters or leaves the road. The grid has
+    a cell per `cell_size` meters of the road. Roads of a prepared environment have no `geometry`, the shapes of
+    all roads are kept by the static network of the environment.
+    """
     osm_id: int
-    grid: np.ndarray
+    grid: Optional[np.ndarray]
     lanes: int
     max_speed: PhysicalSpeed
     name: Optional[str]
     oneway: bool
     reversed: bool
     length: PhysicalLength
-    geometry: LineString
-    render_lut: np.ndarray = field(init=False,
-                                   default_factory=lambda: np.full(shape=(2 ** 16, 3),
-                                                                   fill_value=ROAD_COLOR,
-                                                                   dtype=np.uint8))
+    geometry: Optional[LineString]
+    cell_size: PhysicalLength = CELL_SIZE
+    slots: dict[VehicleId, RoadSlot] = field(init=False, default_factory=dict)
+    lane_starts: list[list[int]] = field(init=False, default_factory=list)
+    lane_agents: list[list[VehicleId]] = field(init=False, default_factory=list)
+
+    def __post_init__(self) -> None:
+        self.lane_starts = [list() for _ in range(self.shape[1])]
+        self.lane_agents = [list() for _ in range(self.shape[1])]
 
     @classmethod
     def from_graph_data(cls,
                         start_node_info: dict[str, Any],
                         end_node_info: dict[str, Any],
-                        edge_info: dict[str, Any]) -> Self:
+                        edge_info: dict[str, Any],
+                        sparse: bool = False,
+                        cell_size: PhysicalLength = CELL_SIZE) -> Self:
 
         osm_id = edge_info['osmid']
         lanes = edge_info['lanes']
         length = edge_info['length']
-        cells_num = discretize_length(length)
+        cells_num = discretize_length(length, cell_size)
         max_speed = convert_km_h_to_m_s(edge_info['max_speed'])
         name = edge_info['name']
         is_oneway = edge_info['oneway']
         is_reversed = edge_info['reversed']
-        geometry = edge_info['geometry']
+        geometry = edge_info.get('geometry')
 
         return cls(osm_id=osm_id,
-                   grid=np.zeros(shape=(cells_num, lanes), dtype=np.uint16),
+                   grid=None if sparse else np.zeros(shape=(cells_num, lanes), dtype=np.uint16),
                    lanes=lanes,
                    max_speed=max_speed,
                    name=name,
                    oneway=is_oneway,
                    reversed=is_reversed,
                    length=length,
-                   geometry=geometry)
-
-    def add_agent(self, agent_id: VehicleId, color: np.ndarray, lane: int, length: DiscreteLength) -> None:
+                   geometry=geometry,
+                   cell_size=cell_size)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        if self.grid is None:
+            return int(discretize_length(self.length, self.cell_size)), self.lanes
+        return self.grid.shape
+
+    def is_sparse(self) -> bool:
+        return self.grid is None
+
+    def dense_grid(self) -> np.ndarray:
+        """Returns the grid, sparse roads materialize it from the lane lists"""
+        if self.grid is not None:
+            return self.grid
+
+        grid = np.zeros(shape=self.shape, dtype=np.uint16)
+        for agent_id, slot in self.slots.items():
+            grid[slot.start:slot.start + slot.length, slot.lane] = agent_id
+        return grid
+
+    def set_grid(self, grid: np.ndarray) -> None:
+        """Replaces the grid and rebuilds the vehicle slots from its content"""
+        self.grid = grid
+        self.slots = dict()
+
+        for cell, lane in zip(*np.nonzero(grid)):
+            agent_id = int(grid[cell, lane])
+            if agent_id in self.slots:
+                self.slots[agent_id].length += 1
+            else:
+                self.slots[agent_id] = RoadSlot(start=int(cell), lane=int(lane), length=1)
+
+        self.lane_starts = [list() for _ in range(grid.shape[1])]
+        self.lane_agents = [list() for _ in range(grid.shape[1])]
+        for agent_id, slot in sorted(self.slots.items(), key=lambda x: x[1].start):
+            self.lane_starts[slot.lane].append(slot.start)
+            self.lane_agents[slot.lane].append(agent_id)
+
+    def add_agent(self, agent_id: VehicleId, lane: int, length: DiscreteLength, start: int = 0) -> None:
+        """Places the vehicle at the `start` cell of the lane, vehicles enter at the beginning of the road and are
+        placed further only when restored from a checkpoint"""
         if lane < 0 or lane > self.lanes:
             raise ValueError("Incorrect lane number provided")
 
-        if length < 0 or length > discretize_length(self.length):
+        if length < 0 or length > self.shape[0]:
             raise ValueError("Length isd either negative or the agent des not fit into the road")
 
-        if np.any(self.grid == agent_id):
+        if agent_id in self.slots:
             raise ValueError("Cannot add the agent twice to a road")
 
         # TODO: Check if line is occupied
-        self.grid[:length, lane] = agent_id
-        self.render_lut[agent_id] = color
+        slot = RoadSlot(start=int(start), lane=lane, length=int(length))
+        self.slots[agent_id] = slot
+        index = bisect_left(self.lane_starts[lane], slot.start)
+        self.lane_starts[lane].insert(index, slot.start)
+        self.lane_agents[lane].insert(index, agent_id)
+        if self.grid is not None:
+            self.grid[slot.start:slot.start + slot.length, lane] = agent_id
 
     def remove_agent(self, agent_id: VehicleId) -> None:
-        self.render_lut[agent_id] = ROAD_COLOR
-        self.grid = np.where(self.grid == agent_id, NULL_VEHICLE_ID, self.grid)
+        slot = self.slots.pop(agent_id, None)
+        if slot is None:
+            return
+
+        index = self.get_lane_index(agent_id, slot)
+        del self.lane_starts[slot.lane][index]
+        del self.lane_agents[slot.lane][index]
+        if self.grid is not None:
+            self.grid[slot.start:slot.start + slot.length, slot.lane] = NULL_VEHICLE_ID
 
     def move_agent(self, agent_id: VehicleId, speed: DiscreteSpeed) -> DiscreteSpeed:
         assert self.contains_agent(agent_id), "Road must contain this agent"
 
-        if speed < 0 or speed > self.grid.shape[0]:
+        road_length = self.shape[0]
+        if speed < 0 or speed > road_length:
             raise ValueError("Incorrect speed provided")
 
-        agent_start = np.where(self.grid == agent_id)[0][0]
-        agent_lane = np.where(self.grid == agent_id)[1][0]
-        agent_length = np.sum(self.grid == agent_id)
+        slot = self.slots[agent_id]
+        index = self.get_lane_index(agent_id, slot)
+        speed = min(speed, self.get_gap(slot, index))
+        shift = int(speed)
 
-        speed = min(speed, self.get_length_to_obstacle(agent_id))
+        if self.grid is not None:
+            self.grid[slot.start:slot.start + slot.length, slot.lane] = NULL_VEHICLE_ID
 
-        self.grid[agent_start:agent_start + agent_length, agent_lane] = NULL_VEHICLE_ID
-        if agent_start + agent_length + speed > self.grid.shape[0]:
-            assert np.all(self.grid[-agent_length:, agent_lane] != agent_id), 'Cannot put two agent at the same place'
-            self.grid[-agent_length:, agent_lane] = agent_id
+        if slot.start + slot.length + shift > road_length:
+            slot.start = road_length - slot.length
         else:
-            assert np.all( self.grid[agent_start + speed:agent_start + agent_length + speed, agent_lane] != agent_id), 'Cannot put two agent at the same place'
-            self.grid[agent_start + speed:agent_start + agent_length + speed, agent_lane] = agent_id
+            slot.start = slot.start + shift
+        self.lane_starts[slot.lane][index] = slot.start
 
-        assert self.contains_agent(agent_id), "Road must contain this agent"
+        if self.grid is not None:
+            assert np.all(self.grid[slot.start:slot.start + slot.length, slot.lane] == NULL_VEHICLE_ID), \
+                'Cannot put two agent at the same place'
+            self.grid[slot.start:slot.start + slot.length, slot.lane] = agent_id
         return speed
 
-    def get_length_to_obstacle(self, agent_id: VehicleId) -> DiscreteLength:
-        agent_start = np.where(self.grid == agent_id)[0][0]
-        agent_lane = np.where(self.grid == agent_id)[1][0]
-        agent_length = np.sum(self.grid == agent_id)
-        agent_end = agent_start + agent_length - 1
-        road_length = self.grid.shape[0]
+    def get_lane_index(self, agent_id: VehicleId, slot: RoadSlot) -> int:
+        """Position of the agent in its lane list, found by bisecting the start cells"""
+        index = bisect_left(self.lane_starts[slot.lane], slot.start)
+        while self.lane_agents[slot.lane][index] != agent_id:
+            index += 1
+        return index
+
+    def get_gap(self, slot: RoadSlot, index: int) -> DiscreteLength:
+        """Free cells between the vehicle and its leader, or the end of the road when there is no leader"""
+        starts = self.lane_starts[slot.lane]
+        if index + 1 < len(starts):
+            return starts[index + 1] - slot.end - 1
 
-        for i in range(agent_end + 1, road_length):
-            if self.grid[i, agent_lane] != agent_id and self.grid[i, agent_lane] != NULL_VEHICLE_ID:
-                return i - agent_end - 1
+        return self.shape[0] - slot.end - 1
 
-        return road_length - agent_end - 1
+    def get_length_to_obstacle(self, agent_id: VehicleId) -> DiscreteLength:
+        slot = self.slots[agent_id]
+        return self.get_gap(slot, self.get_lane_index(agent_id, slot))
 
     def is_agent_leaving(self, agent_id: VehicleId, speed: DiscreteSpeed) -> bool:
-        return np.any(self.grid[-(speed + 1):, :] == agent_id)
+        """Checks that the vehicle reaches the end of the road, a standing one still rolls over the last cell, so a
+        vehicle refused at the end of the road does not stall in front of it"""
+        slot = self.slots.get(agent_id)
+        if slot is None:
+            return False
 
-    def render(self) -> np.ndarray:
-        return self.render_lut[self.grid.T]
+        return slot.end >= self.shape[0] - (max(int(speed), 1) + 1)
+
+    def render(self, palette: np.ndarray) -> np.ndarray:
+        return palette[self.dense_grid().T]
 
     def contains_agent(self, agent_id: VehicleId) -> bool:
-        return np.any(self.grid == agent_id)
+        return agent_id in self.slots
 
     def can_accept_agent(self, agent_id: VehicleId, length: DiscreteLength) -> bool:
-        return (not self.contains_agent(agent_id)) and np.all(self.grid[:length, :] == NULL_VEHICLE_ID)
+        if self.contains_agent(agent_id):
+            return False
 
-    def get_obstacle_distance(self, agent_id: VehicleId) -> DiscreteLength:
-        agent_indices = np.where(self.grid == agent_id)
-        if len(agent_indices[0]) == 0:
-             raise ValueError("Agent not found on road") # not working at the moment
-
-        agent_start = agent_indices[0][0]
-        agent_lane = agent_indices[1][0]
-        agent_length = np.sum(self.grid[:, agent_lane] == agent_id)
-        agent_end = agent_start + agent_length - 1
-        assert self.grid[agent_end, agent_lane] == agent_id, "Agent must be traced"
-        road_length = self.grid.shape[0]
-
-        if agent_end >= road_length - 1:
-            return discretize_length(0.)
+        return self.get_free_entry_cells() >= length
+
+    def get_free_entry_cells(self) -> DiscreteLength:
+        """Free cells at the beginning of the road, the smallest over all lanes"""
+        return min((starts[0] for starts in self.lane_starts if len(starts) > 0), default=self.shape[0])
 
-        distance_to_obstacle = road_length - agent_end - 1
+    def get_obstacle_distance(self, agent_id: VehicleId) -> DiscreteLength:
+        if agent_id not in self.slots:
+             raise ValueError("Agent not found on road")
 
-        for i in range(agent_end + 1, road_length):
-            if self.grid[i, agent_lane] != NULL_VEHICLE_ID:
-                distance_to_obstacle = i - agent_end - 1
-                break
+        slot = self.slots[agent_id]
+        if slot.end >= self.shape[0] - 1:
+            return discretize_length(0.)
 
-        return distance_to_obstacle
+        return self.get_length_to_obstacle(agent_id)
 
     def get_possible_lanes(self, direction: LaneDirections) -> set[int]:
         assert self.lanes > 0, 'Lanes number cannot bne negative'
@@ -0,0 +1,181 @@
+import functools
+import os
+from typing import Any, Final, Optional
+
+import numpy as np
+
+from ainter.models.autonomous_intersection.intersection_directions import IntersectionEntranceDirection, \
+    IntersectionDirection
+from ainter.models.data.table_file import write_table_file, read_table_file
+from ainter.models.nagel_schreckenberg.environment import Environment, create_signal_bank
+from ainter.models.nagel_schreckenberg.intersection import Intersection, calculate_slice
+from ainter.models.nagel_schreckenberg.network import StaticNetwork, NETWORK_TABLES
+from ainter.models.nagel_schreckenberg.road import Road
+from ainter.models.nagel_schreckenberg.units import DiscreteTime, PhysicalLength, Discretization, \
+    DEFAULT_DISCRETIZATION
+
+SNAPSHOT_MAGIC: Final[bytes] = b'AINTENV\x00'
+SNAPSHOT_VERSION: Final[int] = 1
+# Prepared networks kept per process, so that the replicas of one file share them
+NETWORK_CACHE_SIZE: Final[int] = 8
+
+
+def get_environment_tables(environment: Environment) -> dict[str, np.ndarray]:
+    """Static tables of the environment, every table is a flat array indexed by node, edge or row number"""
+    network = environment.network
+    assert network.get_edge_keys() == list(environment.roads), "Roads must follow the network edge order"
+
+    node_index = {node_id: i for i, node_id in enumerate(network.node_id.tolist())}
+    tables = {name: np.asarray(getattr(network, name)) for name in NETWORK_TABLES} | {
+        'geometry_coords': np.asarray(network.geometry_coords),
+        'geometry_sizes': np.asarray(network.geometry_sizes),
+        'intersection_shape': np.array([intersection.grid.shape for intersection in environment.intersections.values()],
+                                       dtype=np.int64).reshape(-1, 2),
+    }
+
+    direction_rows = list()
+    for node_id, intersection in environment.intersections.items():
+        for is_in, directions in ((True, intersection.in_edge_directions), (False, intersection.out_edge_directions)):
+            direction_rows.extend((node_index[node_id], node_index[neighbour_id], is_in, direction.direction)
+                                  for neighbour_id, direction in directions.items())
+
+    direction_table = np.array(direction_rows, dtype=np.int64).reshape(-1, 4)
+    tables |= {
+        'direction_node': direction_table[:, 0],
+        'direction_neighbour': direction_table[:, 1],
+        'direction_is_in': direction_table[:, 2].astype(bool),
+        'direction_value': direction_table[:, 3].astype(np.int8),
+        'light_node': environment.signals.approach_intersection,
+        'light_direction': environment.signals.approach_direction,
+    }
+    return tables
+
+def save_environment(environment: Environment, path: str, key: Optional[str] = None) -> None:
+    """Serializes the static part of the environment into a single memory-mappable file.
+
+    Vehicles and traffic light durations are not stored, see `write_table_file` for the layout.
+    """
+    network = environment.network
+    write_table_file(path, SNAPSHOT_MAGIC, {
+        'version': SNAPSHOT_VERSION,
+        'key': key,
+        'graph': network.graph_attributes,
+        'nodes': list(network.node_attributes),
+        'edges': list(network.edge_attributes),
+    }, get_environment_tables(environment))
+
+def read_environment_tables(path: str) -> tuple[dict[str, Any], dict[str, np.ndarray]]:
+    """Returns the header and read-only tables, the tables are views of one memory map of the file"""
+    try:
+        header, tables = read_table_file(path, SNAPSHOT_MAGIC)
+    except ValueError:
+        raise ValueError(f"{path} is not a prepared environment")
+
+    if header['version'] != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported prepared environment version {header['version']}")
+    return header, tables
+
+@functools.lru_cache(maxsize=NETWORK_CACHE_SIZE)
+def read_network(path: str, modified: int) -> tuple[Optional[str], StaticNetwork]:
+    header, tables = read_environment_tables(path)
+    return header['key'], StaticNetwork.from_tables(tables, header)
+
+def load_network(path: str) -> tuple[Optional[str], StaticNetwork]:
+    """Key and static network of a prepared environment, the network is read once per version of the file and
+    shared by every caller in the process"""
+    return read_network(os.path.abspath(path), os.stat(path).st_mtime_ns)
+
+def get_intersection_directions(network: StaticNetwork) -> dict[int, tuple[dict[int, IntersectionDirection],
+                                                                          dict[int, IntersectionDirection]]]:
+    """Incoming and outgoing approach directions of every intersection of a prepared network, built on the first
+    call and kept in the network, so all of its replicas share them"""
+    if len(network.directions) > 0 or network.num_nodes == 0:
+        return network.directions
+
+    tables = network.intersection_tables
+    assert tables is not None, "Network was not loaded from a prepared environment"
+    node_ids = network.node_id.tolist()
+    edge_index = {key: i for i, key in enumerate(network.get_edge_keys())}
+    names = network.get_edge_names()
+    lanes = network.edge_lanes.tolist()
+    directions = {node_id: (dict(), dict()) for node_id in node_ids}
+    for node, neighbour, is_in, value in zip(tables['direction_node'].tolist(),
+                                             tables['direction_neighbour'].tolist(),
+                                             tables['direction_is_in'].tolist(),
+                                             tables['direction_value'].tolist()):
+        node_id, neighbour_id = node_ids[node], node_ids[neighbour]
+        edge = edge_index[(neighbour_id, node_id) if is_in else (node_id, neighbour_id)]
+        direction = IntersectionEntranceDirection(value)
+        directions[node_id][0 if is_in else 1][neighbour_id] = \
+            IntersectionDirection(direction=direction,
+                                  name=names[edge],
+                                  action_slice=calculate_slice(direction, is_in, lanes[edge]),
+                                  lanes=lanes[edge])
+
+    network.directions.update(directions)
+    return network.directions
+
+def load_environment(path: str,
+                     global_time: DiscreteTime,
+                     rng,
+                     sparse_road_min_length: Optional[PhysicalLength] = None,
+                     key: Optional[str] = None,
+                     discretization: Discretization = DEFAULT_DISCRETIZATION) -> Environment:
+    """Builds the environment from a prepared file without running the graph enrichment and classification.
+
+    The replica gets the shared static network of the file with its memory-mapped tables and approach directions,
+    only its roads, intersection grids and traffic lights are its own. The road geometries and the networkx graph
+    are not built unless they are asked for, e.g. for rendering.
+
+    Traffic light durations are drawn from `rng` in the same order as `Environment.from_directed_graph` does,
+    so both ways of construction give the same environment for the same random state. The file keeps the road
+    lengths in meters, so one prepared environment serves runs of any discretization.
+    """
+    file_key, network = load_network(path)
+    if key is not None and file_key != key:
+        raise ValueError(f"{path} was prepared for a different map")
+
+    roads = dict()
+    for (u, v), edge_data, length, lanes, max_speed in zip(network.get_edge_keys(),
+                                                           network.edge_attributes,
+                                                           network.edge_length.tolist(),
+                                                           network.edge_lanes.tolist(),
+                                                           network.edge_max_speed.tolist()):
+        roads[u, v] = Road.from_graph_data(start_node_info=dict(),
+                                           end_node_info=dict(),
+                                           edge_info=edge_data | {'length': length,
+                                                                  'lanes': lanes,
+                                                                  'max_speed': max_speed},
+                                           sparse=sparse_road_min_length is not None and
+                                                  length >= sparse_road_min_length,
+                                           cell_size=discretization.cell_size)
+
+    tables = network.intersection_tables
+    node_ids = network.node_id.tolist()
+    light_bounds = np.searchsorted(tables['light_node'], np.arange(len(node_ids) + 1)).tolist()
+    light_direction = tables['light_direction'].tolist()
+    directions = get_intersection_directions(network)
+
+    intersections = dict()
+    phases = list()
+    for i, (node_id, x, y, shape) in enumerate(zip(node_ids,
+                                                   network.node_x.tolist(),
+                                                   network.node_y.tolist(),
+                                                   tables['intersection_shape'].tolist())):
+        phases.append([IntersectionEntranceDirection(direction)
+                       for direction in light_direction[light_bounds[i]:light_bounds[i + 1]]])
+        in_edge_directions, out_edge_directions = directions[node_id]
+        intersections[node_id] = Intersection(osm_id=node_id,
+                                              grid=np.zeros(shape=shape, dtype=np.uint16),
+                                              x=x,
+                                              y=y,
+                                              in_edge_directions=in_edge_directions,
+                                              out_edge_directions=out_edge_directions,
+                                              cell_size=discretization.cell_size)
+
+    return Environment(network=network,
+                       roads=roads,
+                       intersections=intersections,
+                       signals=create_signal_bank(intersections, rng, phases, discretization),
+                       time=global_time,
+                       discretization=discretization)
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
 from datetime import time
 from typing import Final
 
@@ -26,53 +27,106 @@ DEFAULT_ROAD_MAX_SPEED: Final[PhysicalSpeed] = SPEED_MAX
 
 ACCELERATION_MAX: Final[PhysicalAcceleration] = np.float64(2.5)
 ACCELERATION_MIN: Final[PhysicalAcceleration] = np.float64(-1.5)
-BREAKING_DISTANCE_MATRIX = np.array([
-# S= 0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10,
-    [0, 1, 3, 6, 10, 15, 21, 28, 36, 45, 55,], # ACC = 1
-    [0, 1, 2, 4, 6, 9, 12, 16, 20, 25, 30,], # ACC = 2
-], dtype=np.uint16)
 
 ROAD_COLOR: Final[np.uint8] = np.uint8(64)
 
 
-def discretize_time(time_obj: time) -> DiscreteTime:
-    return np.uint32(np.round((time_obj.hour * 3600 + time_obj.minute * 60 + time_obj.second) / DELTA_TIME))
+def discretize_time(time_obj: time, delta_time: float = DELTA_TIME) -> DiscreteTime:
+    return np.uint32(np.round((time_obj.hour * 3600 + time_obj.minute * 60 + time_obj.second) / delta_time))
 
-def discretize_length(length: PhysicalLength) -> DiscreteLength:
+def format_time(time_step: DiscreteTime, delta_time: float = DELTA_TIME) -> str:
+    """Formats the discrete time as an HH:MM:SS clock"""
+    total_seconds = int(np.round(time_step * delta_time))
+    return f"{total_seconds // 3600:02d}:{total_seconds % 3600 // 60:02d}:{total_seconds % 60:02d}"
+
+def discretize_length(length: PhysicalLength, cell_size: PhysicalLength = CELL_SIZE) -> DiscreteLength:
     """Converts the physical length measure into discrete length value"""
-    return np.uint16(np.round(length / CELL_SIZE))
+    return np.uint16(np.round(length / cell_size))
 
-def discretize_speed(speed: PhysicalSpeed) -> DiscreteSpeed:
+def discretize_speed(speed: PhysicalSpeed,
+                     cell_size: PhysicalLength = CELL_SIZE,
+                     delta_time: float = DELTA_TIME) -> DiscreteSpeed:
     """Converts the physical speed measure into discrete speed value"""
-    return np.int8(np.round(speed * DELTA_TIME / CELL_SIZE))
+    return np.int8(np.round(speed * delta_time / cell_size))
 
-def discretize_acceleration(acceleration: PhysicalAcceleration) -> DiscreteAcceleration:
-    """Converts the physical length measure into discrete Length value"""
-    return np.int8(np.round(acceleration * DELTA_TIME * DELTA_TIME / CELL_SIZE))
+def discretize_acceleration(acceleration: PhysicalAcceleration,
+                            cell_size: PhysicalLength = CELL_SIZE,
+                            delta_time: float = DELTA_TIME) -> DiscreteAcceleration:
+    """Converts the physical acceleration measure into discrete acceleration value"""
+    return np.int8(np.round(acceleration * delta_time * delta_time / cell_size))
 
 def convert_km_h_to_m_s(speed_kmh: float) -> PhysicalSpeed:
     """Converts speed from km/h to m/s"""
     return np.float64(speed_kmh * 1000 / 3600)
 
 def get_breaking_distance(speed: DiscreteSpeed, backward_acceleration: DiscreteAcceleration) -> DiscreteLength:
+    """Cells driven until standstill when braking by `backward_acceleration` every step from `speed`"""
     assert speed >= 0., "Speed cannot be negative"
-    assert 0. < backward_acceleration < 3, "Acceleration must be reasonable"
+    assert backward_acceleration > 0., "Acceleration must be positive"
+
+    steps = -(-int(speed) // int(backward_acceleration))
+    return np.uint16(steps * int(speed) - int(backward_acceleration) * steps * (steps - 1) // 2)
+
+def get_breaking_distance_table(max_speed: int, max_backward_acceleration: int) -> np.ndarray:
+    """Braking distances indexed by `[backward_acceleration, speed]` for every speed up to `max_speed`, row zero
+    (no braking) is left empty"""
+    speed = np.arange(max_speed + 1, dtype=np.int64)[np.newaxis, :]
+    acceleration = np.arange(1, max_backward_acceleration + 1, dtype=np.int64)[:, np.newaxis]
+    steps = -(-speed // acceleration)
+    table = np.zeros(shape=(max_backward_acceleration + 1, max_speed + 1), dtype=np.int64)
+    table[1:] = steps * speed - acceleration * steps * (steps - 1) // 2
+    table.flags.writeable = False
+    return table
+
+
+@dataclass(slots=True, frozen=True)
+class Discretization:
+    """Spatial and temporal resolution of a run, a road cell is `cell_size` meters long and a time step lasts
+    `delta_time` seconds. The discrete quantities of the model are converted with the methods of the run's
+    discretization, the module functions use the default one."""
+    cell_size: PhysicalLength = CELL_SIZE
+    delta_time: float = DELTA_TIME
+
+    def __post_init__(self) -> None:
+        if self.cell_size <= 0:
+            raise ValueError(f"cell_size={self.cell_size} cannot be zero-like or negative")
+        if self.delta_time <= 0:
+            raise ValueError(f"delta_time={self.delta_time} cannot be zero-like or negative")
+
+    def discretize_time(self, time_obj: time) -> DiscreteTime:
+        return discretize_time(time_obj, self.delta_time)
+
+    def discretize_duration(self, duration: float) -> DiscreteTime:
+        """Converts a duration in seconds into time steps"""
+        return int(np.round(duration / self.delta_time))
+
+    def format_time(self, time_step: DiscreteTime) -> str:
+        return format_time(time_step, self.delta_time)
+
+    def discretize_length(self, length: PhysicalLength) -> DiscreteLength:
+        return discretize_length(length, self.cell_size)
+
+    def discretize_speed(self, speed: PhysicalSpeed) -> DiscreteSpeed:
+        return discretize_speed(speed, self.cell_size, self.delta_time)
+
+    def discretize_acceleration(self, acceleration: PhysicalAcceleration) -> DiscreteAcceleration:
+        return discretize_acceleration(acceleration, self.cell_size, self.delta_time)
 
-    global BREAKING_DISTANCE_MATRIX
 
-    return BREAKING_DISTANCE_MATRIX[backward_acceleration - 1, speed]
+DEFAULT_DISCRETIZATION: Final[Discretization] = Discretization()
 
 
 class TimeDensity(ABC):
+    """Arrival intensity per second at the clock time of `t` seconds after midnight"""
 
     @abstractmethod
-    def __call__(self, t: DiscreteTime) -> float:
+    def __call__(self, t: float) -> float:
         pass
 
 
 class NormalTimeDensity(TimeDensity):
 
-    def __call__(self, t: DiscreteTime) -> float:
+    def __call__(self, t: float) -> float:
         peak1_mu_seconds: float = 8 * 3600  # 8:00
         peak2_mu_seconds: float = 16 * 3600 # 16:00
 
@@ -97,7 +151,7 @@ class UniformTimeDensity(TimeDensity):
 
         self.p = p
 
-    def __call__(self, t: DiscreteTime) -> float:
+    def __call__(self, t: float) -> float:
         return self.p
 
 
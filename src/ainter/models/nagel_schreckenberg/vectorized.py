@@ -0,0 +1,325 @@
+import itertools
+from typing import Final, Optional
+
+import numpy as np
+
+from ainter.models.nagel_schreckenberg.engine import StepEngine, NO_POSITION
+from ainter.models.nagel_schreckenberg.environment import Environment, PALETTE_SIZE
+from ainter.models.nagel_schreckenberg.intersection import WAITING_OBSTACLE_LENGTH
+from ainter.models.nagel_schreckenberg.profiling import StepProfile
+from ainter.models.vehicles.catalog import VehicleCatalog, VehicleTypeId, DEFAULT_VEHICLE_CATALOG
+from ainter.models.vehicles.vehicle import VehicleId, NULL_VEHICLE_ID, RoadPosition
+
+# Per-vehicle columns of the engine state, the routes are kept apart in one flat array
+VEHICLE_STATE: Final[tuple[str, ...]] = ('ids', 'type', 'length', 'acc_forward', 'acc_backward', 'speed', 'on_road',
+                                         'road', 'lane', 'head', 'leg', 'route_start', 'route_length', 'color',
+                                         'slot')
+
+
+def get_route_indices(route_start: np.ndarray, route_length: np.ndarray) -> np.ndarray:
+    """Indices of the flat route array covering the given routes one after another"""
+    total = int(np.sum(route_length))
+    within = np.arange(total) - np.repeat(np.cumsum(route_length) - route_length, route_length)
+    return np.repeat(route_start, route_length) + within
+
+
+def get_road_approaches(environment: Environment) -> np.ndarray:
+    """Signal approach of every road at its end intersection, `-1` for the roads without one"""
+    signals = environment.signals
+    approaches = np.full(shape=len(environment.roads), fill_value=-1, dtype=np.int64)
+    for i, (start, end) in enumerate(environment.roads):
+        intersection = environment.intersections[end]
+        if start in intersection.in_edge_directions:
+            direction = intersection.in_edge_directions[start].direction
+            approaches[i] = signals.approach_index[intersection.signal_index, direction]
+    return approaches
+
+
+class VectorizedStepEngine(StepEngine):
+    """Whole-network NaSch engine that keeps the vehicle state in NumPy arrays.
+
+    Every step applies accelerate / brake / randomize / move to all vehicles at once, vehicles that reach
+    the end of a road are handed over to their next road in bulk. The rules mirror the per-agent path
+    (`Vehicle.step` with `Road` and `Intersection`), but all vehicles are updated in parallel from the state
+    at the beginning of the step. The road grids are rebound to views of one shared cell buffer, so that
+    rendering keeps working, sparse roads get a dense view as well. Vehicles entering and leaving roads are
+    reported to the environment grouped by the road, a vehicle waiting for its next road stays on the
+    intersection at the road start. With `obey_signals`, vehicles leave a road only on the green light of its
+    approach to the end intersection, otherwise they stop at the end of the road. The cell buffer can be given as
+    `cells`, e.g. the road part of an `ObservationBuffer`, it must hold the roads in the environment order.
+    The cells and the palette hold the slot of a vehicle instead of its id, which does not fit 16 bits in long runs.
+    Slots are recycled once their vehicles are removed, so at most `PALETTE_SIZE - 1` vehicles are on the network.
+    The vehicle colours are drawn from `render_rng`, by default from `rng`, which draws the dynamics. The vehicle
+    parameters are looked up by the type id in the arrays of `catalog`, the braking distances in its table.
+    The placement of the spawned vehicles, the removal of the finished ones and the moved vehicles are recorded
+    in `profile`.
+    """
+
+    def __init__(self,
+                 environment: Environment,
+                 rng: np.random.Generator,
+                 obey_signals: bool = False,
+                 cells: Optional[np.ndarray] = None,
+                 render_rng: Optional[np.random.Generator] = None,
+                 catalog: VehicleCatalog = DEFAULT_VEHICLE_CATALOG,
+                 profile: Optional[StepProfile] = None) -> None:
+        self.environment = environment
+        self.catalog = catalog
+        self.profile = StepProfile() if profile is None else profile
+        self.rng = rng
+        self.render_rng = rng if render_rng is None else render_rng
+        self.obey_signals = obey_signals
+
+        roads = list(environment.roads.values())
+        self.road_ids: dict[tuple[int, int], int] = {key: i for i, key in enumerate(environment.roads)}
+        self.road_keys: list[RoadPosition] = list(environment.roads)
+        self.road_cells = np.array([road.shape[0] for road in roads], dtype=np.int64)
+        self.road_lanes = np.array([road.shape[1] for road in roads], dtype=np.int64)
+        self.road_offset = np.concatenate(([0], np.cumsum(self.road_cells * self.road_lanes)[:-1])).astype(np.int64)
+        self.road_source = np.array([start for start, _ in environment.roads], dtype=np.int64)
+        self.road_target = np.array([end for _, end in environment.roads], dtype=np.int64)
+        self.road_lane_base = np.concatenate(([0], np.cumsum(self.road_lanes)[:-1])).astype(np.int64)
+        self.road_approach = get_road_approaches(environment)
+        self.waiting_distance = int(environment.discretization.discretize_length(WAITING_OBSTACLE_LENGTH))
+
+        size = int(np.sum(self.road_cells * self.road_lanes))
+        if cells is None:
+            cells = np.zeros(shape=size, dtype=np.uint16)
+        elif cells.shape != (size,) or cells.dtype != np.uint16:
+            raise ValueError("Cell buffer must hold every road cell")
+        self.cells = cells
+        self.cells[:] = NULL_VEHICLE_ID
+        for road, offset, cells, lanes in zip(roads, self.road_offset, self.road_cells, self.road_lanes):
+            assert len(road.slots) == 0, "Vectorized engine must start from empty roads"
+            road.grid = self.cells[offset:offset + cells * lanes].reshape(cells, lanes)
+        self.occupied = np.zeros(shape=0, dtype=np.int64)
+        # Stack of the free slots, the lowest ones are taken first
+        self.free_slots = np.arange(PALETTE_SIZE - 1, NULL_VEHICLE_ID, -1, dtype=np.int64)
+
+        self.next_id: VehicleId = NULL_VEHICLE_ID + 1
+        self.pending: list[tuple[VehicleId, VehicleTypeId, list[int]]] = list()
+
+        self.ids = np.zeros(shape=0, dtype=np.int64)
+        self.type = np.zeros(shape=0, dtype=np.int8)
+        self.length = np.zeros(shape=0, dtype=np.int64)
+        self.acc_forward = np.zeros(shape=0, dtype=np.int64)
+        self.acc_backward = np.zeros(shape=0, dtype=np.int64)
+        self.speed = np.zeros(shape=0, dtype=np.int64)
+        self.on_road = np.zeros(shape=0, dtype=bool)
+        self.road = np.zeros(shape=0, dtype=np.int64)
+        self.lane = np.zeros(shape=0, dtype=np.int64)
+        self.head = np.zeros(shape=0, dtype=np.int64)
+        self.leg = np.zeros(shape=0, dtype=np.int64)
+        self.route_start = np.zeros(shape=0, dtype=np.int64)
+        self.route_length = np.zeros(shape=0, dtype=np.int64)
+        self.routes = np.zeros(shape=0, dtype=np.int64)
+        self.color = np.zeros(shape=(0, 3), dtype=np.uint8)
+        self.slot = np.zeros(shape=0, dtype=np.int64)
+
+    @property
+    def num_vehicles(self) -> int:
+        return len(self.ids) + len(self.pending)
+
+    def spawn(self, vehicle_type: VehicleTypeId, path: list[int]) -> VehicleId:
+        assert len(path) > 1, "Cannot construct a valid graph path from one node"
+
+        vehicle_id = self.next_id
+        self.next_id += 1
+        self.pending.append((vehicle_id, vehicle_type, [self.road_ids[edge] for edge in itertools.pairwise(path)]))
+        return vehicle_id
+
+    def step(self) -> None:
+        with self.profile.phase('spawn'):
+            self.flush_spawned()
+        if len(self.ids) == 0:
+            self.sync_cells()
+            return
+
+        waiting = ~self.on_road
+        distance = self.get_obstacle_distances()
+
+        noise = self.rng.integers(1, 3, size=len(self.ids))
+        breaking_distance = self.catalog.breaking_distance[self.acc_backward, self.speed] + noise
+        self.speed = np.where(distance <= breaking_distance,
+                              np.maximum(self.speed - self.acc_backward, 0),
+                              np.minimum(self.speed + self.acc_forward, self.catalog.max_speed[self.type]))
+
+        on_road = self.on_road
+        self.speed[on_road] = np.minimum(self.speed[on_road], distance[on_road])
+        self.head[on_road] += self.speed[on_road]
+        self.profile.count('moved_vehicles', int(np.count_nonzero(self.speed[on_road])))
+
+        leaving = on_road & (self.head >= self.road_cells[self.road] - (np.maximum(self.speed, 1) + 1))
+        if self.obey_signals:
+            leaving &= self.get_road_green()[self.road]
+        self.on_road = on_road & ~leaving
+        self.leg[leaving] += 1
+        finished = leaving & (self.leg >= self.route_length)
+        continuing = leaving & ~finished
+        self.update_occupancy(self.road[leaving], on_road=True, entering=False)
+        self.road[continuing] = self.routes[self.route_start[continuing] + self.leg[continuing]]
+        self.update_occupancy(self.road[continuing], on_road=False, entering=True)
+
+        self.enter_roads(np.flatnonzero(waiting))
+        with self.profile.phase('removal'):
+            self.remove_vehicles(finished)
+        self.sync_cells()
+
+    def get_obstacle_distances(self) -> np.ndarray:
+        """Free cells in front of every vehicle, to the follower's leader or the end of the road"""
+        distance = np.full(shape=len(self.ids), fill_value=self.waiting_distance, dtype=np.int64)
+        on_road = np.flatnonzero(self.on_road)
+        if len(on_road) == 0:
+            return distance
+
+        global_lane = self.road_lane_base[self.road[on_road]] + self.lane[on_road]
+        sorting = np.lexsort((self.head[on_road], global_lane))
+        order = on_road[sorting]
+        sorted_lane = global_lane[sorting]
+        head = self.head[order]
+        tail = head - self.length[order] + 1
+
+        to_road_end = self.road_cells[self.road[order]] - head - 1
+        has_leader = np.zeros(shape=len(order), dtype=bool)
+        has_leader[:-1] = sorted_lane[1:] == sorted_lane[:-1]
+        to_leader = np.zeros(shape=len(order), dtype=np.int64)
+        to_leader[:-1] = tail[1:] - head[:-1] - 1
+
+        distance[order] = np.where(has_leader, to_leader, to_road_end)
+        return distance
+
+    def get_road_green(self) -> np.ndarray:
+        """Right of way at the end of every road, roads without a signal approach always have it"""
+        # The appended flag is the one picked by the `-1` approach of the roads without a signal
+        return np.append(self.environment.get_signal_states(), True)[self.road_approach]
+
+    def enter_roads(self, candidates: np.ndarray) -> None:
+        """Moves the waiting vehicles onto their next road, at most one vehicle per road and step"""
+        if len(candidates) == 0:
+            return
+
+        free_cells = self.get_free_cells()
+        candidates = candidates[self.length[candidates] <= free_cells[self.road[candidates]]]
+        if len(candidates) == 0:
+            return
+
+        candidates = candidates[np.lexsort((self.ids[candidates], self.road[candidates]))]
+        first = np.ones(shape=len(candidates), dtype=bool)
+        first[1:] = self.road[candidates][1:] != self.road[candidates][:-1]
+        entering = candidates[first]
+
+        self.on_road[entering] = True
+        self.head[entering] = self.length[entering] - 1
+        self.lane[entering] = self.rng.integers(0, self.road_lanes[self.road[entering]])
+        self.update_occupancy(self.road[entering], on_road=False, entering=False)
+        self.update_occupancy(self.road[entering], on_road=True, entering=True)
+
+    def update_occupancy(self, roads: np.ndarray, on_road: bool, entering: bool) -> None:
+        """Reports vehicles entering or leaving the roads, or the intersections at their start when the vehicles
+        wait for the roads, to the environment"""
+        if len(roads) == 0:
+            return
+
+        update = self.environment.enter if entering else self.environment.leave
+        unique_roads, counts = np.unique(roads, return_counts=True)
+        for road, count in zip(unique_roads.tolist(), counts.tolist()):
+            update(self.road_keys[road] if on_road else self.road_keys[road][0], count)
+
+    def get_free_cells(self) -> np.ndarray:
+        """Free cells at the beginning of every road, up to the tail of its last vehicle in any lane"""
+        on_road = np.flatnonzero(self.on_road)
+        free_cells = self.road_cells.copy()
+        np.minimum.at(free_cells, self.road[on_road], self.head[on_road] - self.length[on_road] + 1)
+        return free_cells
+
+    def get_free_entry_cells(self, roads: list[RoadPosition]) -> np.ndarray:
+        return self.get_free_cells()[[self.road_ids[road] for road in roads]]
+
+    def get_vehicle_columns(self) -> dict[str, np.ndarray]:
+        return {
+            'vehicle_id': self.ids.copy(),
+            'vehicle_type': self.type.copy(),
+            'speed': self.speed.astype(np.int8),
+            'position_from': self.road_source[self.road],
+            'position_to': np.where(self.on_road, self.road_target[self.road], NO_POSITION),
+        }
+
+    def get_road_vehicle_columns(self) -> dict[str, np.ndarray]:
+        return {
+            'road': self.road[self.on_road],
+            'lane': self.lane[self.on_road],
+            'speed': self.speed[self.on_road],
+        }
+
+    def flush_spawned(self) -> None:
+        if len(self.pending) == 0:
+            return
+
+        ids, types, routes = zip(*self.pending)
+        self.pending.clear()
+        types = np.array(types, dtype=np.int8)
+        route_length = np.array([len(route) for route in routes], dtype=np.int64)
+        count = len(ids)
+
+        self.route_start = np.concatenate((self.route_start,
+                                           len(self.routes) + np.cumsum(route_length) - route_length))
+        self.routes = np.concatenate((self.routes, np.fromiter(itertools.chain.from_iterable(routes),
+                                                               dtype=np.int64,
+                                                               count=int(np.sum(route_length)))))
+        self.route_length = np.concatenate((self.route_length, route_length))
+
+        self.ids = np.concatenate((self.ids, np.array(ids, dtype=np.int64)))
+        self.type = np.concatenate((self.type, types))
+        self.length = np.concatenate((self.length, self.catalog.length[types]))
+        self.acc_forward = np.concatenate((self.acc_forward, self.catalog.acc_forward[types]))
+        self.acc_backward = np.concatenate((self.acc_backward, self.catalog.acc_backward[types]))
+        self.speed = np.concatenate((self.speed, np.zeros(shape=count, dtype=np.int64)))
+        self.on_road = np.concatenate((self.on_road, np.zeros(shape=count, dtype=bool)))
+        self.road = np.concatenate((self.road, self.routes[self.route_start[-count:]]))
+        self.lane = np.concatenate((self.lane, np.zeros(shape=count, dtype=np.int64)))
+        self.head = np.concatenate((self.head, np.zeros(shape=count, dtype=np.int64)))
+        self.leg = np.concatenate((self.leg, np.zeros(shape=count, dtype=np.int64)))
+        self.color = np.concatenate((self.color, self.render_rng.integers(64, 182, size=(count, 3), dtype=np.uint8)))
+        self.slot = np.concatenate((self.slot, self.acquire_slots(count)))
+        self.environment.palette[self.slot[-count:]] = self.color[-count:]
+        self.update_occupancy(self.road[-count:], on_road=False, entering=True)
+
+    def remove_vehicles(self, mask: np.ndarray) -> None:
+        if not np.any(mask):
+            return
+
+        self.profile.count('removed_vehicles', int(np.count_nonzero(mask)))
+        self.free_slots = np.concatenate((self.free_slots, self.slot[mask][::-1]))
+        keep = ~mask
+        for name in VEHICLE_STATE:
+            setattr(self, name, getattr(self, name)[keep])
+
+        if len(self.routes) > 2 * int(np.sum(self.route_length)) + 1024:
+            self.compact_routes()
+
+    def acquire_slots(self, count: int) -> np.ndarray:
+        if count > len(self.free_slots):
+            raise ValueError(f"Cannot hold more than {PALETTE_SIZE - 1} vehicles on the network")
+
+        rest = len(self.free_slots) - count
+        slots = self.free_slots[rest:][::-1]
+        self.free_slots = self.free_slots[:rest]
+        return slots
+
+    def compact_routes(self) -> None:
+        self.routes = self.routes[get_route_indices(self.route_start, self.route_length)]
+        self.route_start = np.cumsum(self.route_length) - self.route_length
+
+    def sync_cells(self) -> None:
+        """Writes the occupancy of every road into the shared cell buffer"""
+        self.cells[self.occupied] = NULL_VEHICLE_ID
+
+        on_road = np.flatnonzero(self.on_road)
+        length = self.length[on_road]
+        road = self.road[on_road]
+        tail = self.head[on_road] - length + 1
+
+        first_cell = self.road_offset[road] + tail * self.road_lanes[road] + self.lane[on_road]
+        within = np.arange(int(np.sum(length))) - np.repeat(np.cumsum(length) - length, length)
+        self.occupied = np.repeat(first_cell, length) + within * np.repeat(self.road_lanes[road], length)
+        self.cells[self.occupied] = np.repeat(self.slot[on_road], length).astype(np.uint16)
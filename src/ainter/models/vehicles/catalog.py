@@ -0,0 +1,150 @@
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from typing import Final, Self
+
+import numpy as np
+
+from ainter.configs.env_creation import VehicleTypeConfig, DEFAULT_VEHICLE_TYPES
+from ainter.models.nagel_schreckenberg.units import DiscreteLength, DiscreteAcceleration, DiscreteSpeed, \
+    Discretization, DEFAULT_DISCRETIZATION, convert_km_h_to_m_s, get_breaking_distance_table
+
+logger = logging.getLogger(__name__)
+
+type VehicleTypeId = int
+
+# Type ids are stored as int8 columns, id zero is the null type
+MAX_VEHICLE_TYPES: Final[int] = np.iinfo(np.int8).max
+
+
+@dataclass(slots=True, frozen=True)
+class VehicleCharacteristic:
+    length: DiscreteLength
+    acc_forward: DiscreteAcceleration
+    acc_backward: DiscreteAcceleration
+    max_speed: DiscreteSpeed
+
+
+def warn_clamped(config: VehicleTypeConfig,
+                 characteristic: VehicleCharacteristic,
+                 discretization: Discretization) -> None:
+    """Reports the physics of a type changed by raising its parameters to one cell"""
+    cell_size, delta_time = discretization.cell_size, discretization.delta_time
+    logger.warning("Vehicle type %s is raised to at least one cell of %.2f m: length %.2f m, acceleration %.2f m/s^2, "
+                   "deceleration %.2f m/s^2 and maximal speed %.1f km/h instead of %.2f m, %.2f m/s^2, %.2f m/s^2 "
+                   "and %.1f km/h",
+                   config.name, cell_size,
+                   int(characteristic.length) * cell_size,
+                   int(characteristic.acc_forward) * cell_size / delta_time ** 2,
+                   int(characteristic.acc_backward) * cell_size / delta_time ** 2,
+                   int(characteristic.max_speed) * cell_size / delta_time * 3.6,
+                   config.length, config.acc_forward, config.acc_backward, config.max_speed)
+
+
+@dataclass(slots=True, frozen=True, eq=False)
+class VehicleCatalog:
+    """Vehicle types of the model compiled once into discrete parameter arrays indexed by the type id.
+
+    The types get the ids from one in their config order, row zero of every array is the null type, so the
+    per-vehicle type column indexes the arrays directly. `probability` holds the normalized spawn shares and
+    `breaking_distance` the braking distances of every deceleration and speed of the types, indexed by
+    `[acc_backward, speed]`. The parameters are discretized with the resolution of the run, a type spans,
+    accelerates, brakes and drives at least one cell, so coarse cells keep every type moving. Catalogs compare
+    by identity, their content is compared through the hashes.
+    """
+    names: tuple[str, ...]
+    length: np.ndarray
+    acc_forward: np.ndarray
+    acc_backward: np.ndarray
+    max_speed: np.ndarray
+    probability: np.ndarray
+    breaking_distance: np.ndarray
+    characteristics: tuple[VehicleCharacteristic, ...]
+    discretization: Discretization = DEFAULT_DISCRETIZATION
+
+    @classmethod
+    def from_config(cls,
+                    types: tuple[VehicleTypeConfig, ...],
+                    discretization: Discretization = DEFAULT_DISCRETIZATION) -> Self:
+        if not 0 < len(types) <= MAX_VEHICLE_TYPES:
+            raise ValueError(f"Between one and {MAX_VEHICLE_TYPES} vehicle types must be declared")
+        names = [x.name for x in types]
+        if len(set(names)) != len(names):
+            raise ValueError("Vehicle type names must be unique")
+
+        share = np.array([0.] + [x.share for x in types], dtype=np.float64)
+        if np.sum(share) <= 0:
+            raise ValueError("At least one vehicle type must be spawned")
+
+        characteristics = [VehicleCharacteristic(length=np.uint16(0),
+                                                 acc_forward=np.int8(0),
+                                                 acc_backward=np.int8(0),
+                                                 max_speed=np.int8(0))]
+        for x in types:
+            if convert_km_h_to_m_s(x.max_speed) * discretization.delta_time / discretization.cell_size > \
+                    np.iinfo(np.int8).max:
+                raise ValueError(f"Maximal speed of {x.name} does not fit into the speed column at this resolution")
+            discrete = (discretization.discretize_length(x.length),
+                        discretization.discretize_acceleration(x.acc_forward),
+                        discretization.discretize_acceleration(x.acc_backward),
+                        discretization.discretize_speed(convert_km_h_to_m_s(x.max_speed)))
+            characteristic = VehicleCharacteristic(length=max(discrete[0], np.uint16(1)),
+                                                   acc_forward=max(discrete[1], np.int8(1)),
+                                                   acc_backward=max(discrete[2], np.int8(1)),
+                                                   max_speed=max(discrete[3], np.int8(1)))
+            if any(value < 1 for value in discrete):
+                warn_clamped(x, characteristic, discretization)
+            characteristics.append(characteristic)
+
+        def compile_column(name: str) -> np.ndarray:
+            column = np.array([int(getattr(x, name)) for x in characteristics], dtype=np.int64)
+            column.flags.writeable = False
+            return column
+
+        probability = share / np.sum(share)
+        probability.flags.writeable = False
+        acc_backward = compile_column('acc_backward')
+        max_speed = compile_column('max_speed')
+        return cls(names=('', *names),
+                   length=compile_column('length'),
+                   acc_forward=compile_column('acc_forward'),
+                   acc_backward=acc_backward,
+                   max_speed=max_speed,
+                   probability=probability,
+                   breaking_distance=get_breaking_distance_table(int(np.max(max_speed)), int(np.max(acc_backward))),
+                   characteristics=tuple(characteristics),
+                   discretization=discretization)
+
+    @property
+    def type_ids(self) -> list[VehicleTypeId]:
+        return list(range(1, len(self.names)))
+
+    @property
+    def spawned_type_ids(self) -> list[VehicleTypeId]:
+        """Types with a positive spawn share"""
+        return [x for x in self.type_ids if self.probability[x] > 0]
+
+    def get_type_id(self, name: str) -> VehicleTypeId:
+        if name not in self.names[1:]:
+            raise ValueError(f"Unknown vehicle type {name} provided")
+        return self.names.index(name)
+
+    def get_characteristic(self, type_id: VehicleTypeId) -> VehicleCharacteristic:
+        return self.characteristics[type_id]
+
+    def get_content_hash(self) -> str:
+        """Digest of the spawned types with their lengths and the cell size, which the OD tables are built for"""
+        description = json.dumps({'cell_size': float(self.discretization.cell_size),
+                                  'types': [[self.names[x], int(self.length[x])] for x in self.spawned_type_ids]})
+        return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+    def get_parameters_hash(self) -> str:
+        """Digest of every type with its discrete parameters, which the type ids of a saved vehicle table refer to"""
+        description = json.dumps({name: [int(getattr(self, name)[x]) for x in self.type_ids]
+                                  for name in ('length', 'acc_forward', 'acc_backward', 'max_speed')}
+                                 | {'names': list(self.names[1:])})
+        return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+
+DEFAULT_VEHICLE_CATALOG: Final[VehicleCatalog] = VehicleCatalog.from_config(DEFAULT_VEHICLE_TYPES)
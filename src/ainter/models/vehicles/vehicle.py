@@ -1,13 +1,13 @@
 import contextlib
-from dataclasses import dataclass
 from enum import auto, IntEnum
-from typing import Final
+from typing import Final, Optional, Self
 
 import numpy as np
 from mesa import Agent, Model
 
-from ainter.models.nagel_schreckenberg.units import discretize_length, discretize_speed, discretize_acceleration, \
-    DiscreteLength, DiscreteAcceleration, DiscreteSpeed, SPEED_MAX, get_breaking_distance, convert_km_h_to_m_s
+from ainter.models.nagel_schreckenberg.units import discretize_speed, DiscreteLength, DiscreteSpeed, \
+    get_breaking_distance
+from ainter.models.vehicles.catalog import VehicleCharacteristic, VehicleTypeId, DEFAULT_VEHICLE_CATALOG
 
 type VehicleId = int
 type IntersectionPosition = int
@@ -23,102 +23,95 @@ def is_road_position(pos: Position) -> bool:
     return isinstance(pos, tuple) and len(pos) == 2 and isinstance(pos[0], int) and isinstance(pos[1], int)
 
 
-@dataclass(slots=True, frozen=True)
-class VehicleCharacteristic:
-    length: DiscreteLength
-    acc_forward: DiscreteAcceleration
-    acc_backward: DiscreteAcceleration
-
-
 class VehicleType(IntEnum):
-    """Vehicle Type with its associated spawn rate"""
+    """Vehicle types of the default catalog, their ids match the ids of `DEFAULT_VEHICLE_CATALOG`"""
     CAR = auto()
     BUS = auto()
     TRUCK = auto()
     MOTORCYCLE = auto()
 
     def get_characteristic(self) -> VehicleCharacteristic:
-        """Method that returns VehicleCharacteristic associated with a VehicleType.
-        :returns: VehicleCharacteristic object associated with a given VehicleType.
-        """
-        # TODO: Fix so that the acc is zero when CELL_SIZE=2m AND DELTA_TIME=1s
-        match self:
-            case VehicleType.CAR:
-                return VehicleCharacteristic(length=discretize_length(4.5),
-                                             acc_forward=discretize_acceleration(2.),
-                                             acc_backward=discretize_acceleration(2))
-
-            case VehicleType.BUS:
-                return VehicleCharacteristic(length=discretize_length(12.),
-                                             acc_forward=discretize_acceleration(2.),
-                                             acc_backward=discretize_acceleration(2.))
-
-            case VehicleType.TRUCK:
-                return VehicleCharacteristic(length=discretize_length(14.),
-                                             acc_forward=discretize_acceleration(2.),
-                                             acc_backward=discretize_acceleration(2.))
-
-            case VehicleType.MOTORCYCLE:
-                return VehicleCharacteristic(length=discretize_length(2.5),
-                                             acc_forward=discretize_acceleration(2.5),
-                                             acc_backward=discretize_acceleration(2))
-
-        raise ValueError("Unknown Vehicle Type provided")
+        return DEFAULT_VEHICLE_CATALOG.get_characteristic(self)
 
     def get_pdf(self) -> float:
         """Get the probability of spawning a particular type of vehicle"""
-        match self:
-            case VehicleType.CAR:
-                return 0.45
-
-            case VehicleType.BUS:
-                return 0.175
-
-            case VehicleType.TRUCK:
-                return 0.125
-
-            case VehicleType.MOTORCYCLE:
-                return 0.25
-
-        raise ValueError("Unknown Vehicle Type provided")
+        return float(DEFAULT_VEHICLE_CATALOG.probability[self])
 
 
 class Vehicle(Agent):
 
     def __init__(self, model: Model,
-                 vehicle_type: VehicleType,
-                 path: list[int]) -> None:
+                 vehicle_type: VehicleTypeId,
+                 path: list[int],
+                 color: Optional[np.ndarray] = None,
+                 characteristic: Optional[VehicleCharacteristic] = None) -> None:
         assert len(path) > 1, "Cannot construct a valid graph path from one node"
 
         super().__init__(model=model)
         self.type = vehicle_type
+        self.characteristic = DEFAULT_VEHICLE_CATALOG.get_characteristic(vehicle_type) \
+            if characteristic is None else characteristic
         self.speed = discretize_speed(0.)
         self.path = path
         self.from_node = self.path[0]
         self.to_node = self.path[-1]
         self.pos = self.from_node
-        self.color = np.array([self.random.randint(64, 181) for _ in range(3)], dtype=np.uint8)
-        _ = self.model.add_agent_to_environment(position=self.pos, agent_id=self.unique_id)
-
-
-    def step(self) -> None:
+        self.color = self.rng.integers(64, 182, size=3, dtype=np.uint8) if color is None else color
+        _ = self.model.add_agent_to_environment(position=self.pos, agent_id=self.unique_id, color=self.color)
+
+    @classmethod
+    def restore(cls,
+                model: Model,
+                unique_id: VehicleId,
+                vehicle_type: VehicleTypeId,
+                path: list[int],
+                pos: Position,
+                speed: DiscreteSpeed,
+                color: np.ndarray,
+                characteristic: VehicleCharacteristic) -> Self:
+        """Vehicle saved in a checkpoint, registered in the model under its own id, the caller puts it back into
+        the environment"""
+        vehicle = cls.__new__(cls)
+        Agent.__init__(vehicle, model=model)
+        vehicle.unique_id = unique_id
+        vehicle.type = vehicle_type
+        vehicle.characteristic = characteristic
+        vehicle.speed = speed
+        vehicle.path = path
+        vehicle.from_node = path[0]
+        vehicle.to_node = path[-1]
+        vehicle.pos = pos
+        vehicle.color = color
+        return vehicle
+
+    def step(self, noise: Optional[int] = None, distance: Optional[DiscreteLength] = None) -> None:
+        """Moves the agent by one time step, `noise` is its random addition to the braking distance, the engines
+        draw it for all agents at once. `distance` to the obstacle ahead is measured now unless the engine
+        measured it for all agents at the beginning of the step"""
         if self.finished():
             raise ValueError("Agent should be removed")
 
-        distance = int(self.model.get_obstacle_distance(self.pos, self.unique_id))
+        distance = self.get_obstacle_distance() if distance is None else distance
         self.speed = self.model.move_agent(position=self.pos,
                                            agent_id=self.unique_id,
-                                           speed=self.decide_speed(distance))
+                                           speed=self.decide_speed(distance, noise))
 
         if self.model.is_agent_leaving(position=self.pos,
                                        agent_id=self.unique_id,
                                        speed=self.speed):
             new_pos = self.calc_new_pos()
 
+            crossing = self.get_crossing() if self.is_on_road() else dict()
             if not self.model.can_accept_agent(position=new_pos,
                                                agent_id=self.unique_id,
-                                               length=self.type.get_characteristic().length):
+                                               length=self.characteristic.length,
+                                               **crossing):
                 return
+            if len(crossing) > 0:
+                self.model.reserve_crossing(position=new_pos,
+                                            agent_id=self.unique_id,
+                                            length=self.characteristic.length,
+                                            **crossing)
 
             self.model.remove_agent_from_environment(position=self.pos,
                                                      agent_id=self.unique_id)
@@ -126,8 +119,7 @@ class Vehicle(Agent):
                 self.pos = new_pos
                 _ = self.model.add_agent_to_environment(position=self.pos,
                                                         agent_id=self.unique_id,
-                                                        color=self.color,
-                                                        length=self.type.get_characteristic().length)
+                                                        length=self.characteristic.length)
 
             elif self.is_on_road():
                 self.pos = new_pos
@@ -137,6 +129,9 @@ class Vehicle(Agent):
             else:
                 raise ValueError("The position of an agent cannot be determined")
 
+    def get_obstacle_distance(self) -> DiscreteLength:
+        return int(self.model.get_obstacle_distance(self.pos, self.unique_id))
+
     def finished(self) -> bool:
         """Check if the agent has reached its destination"""
         return self.pos == self.to_node
@@ -148,18 +143,19 @@ class Vehicle(Agent):
 
             self.model.deregister_agent(self)
 
-    def decide_speed(self, distance: DiscreteLength) -> DiscreteSpeed:
-        nbd = get_breaking_distance(self.speed, self.type.get_characteristic().acc_backward) + self.random.randint(1, 2)
+    def decide_speed(self, distance: DiscreteLength, noise: Optional[int] = None) -> DiscreteSpeed:
+        noise = int(self.rng.integers(1, 3)) if noise is None else noise
+        nbd = get_breaking_distance(self.speed, self.characteristic.acc_backward) + noise
 
         if distance <= nbd:
-            if self.speed < self.type.get_characteristic().acc_backward:
+            if self.speed < self.characteristic.acc_backward:
                 self.speed = 0
             else:
-                self.speed -= self.type.get_characteristic().acc_backward
+                self.speed -= self.characteristic.acc_backward
         else:
-            self.speed += self.type.get_characteristic().acc_forward
-            if self.speed > discretize_speed(convert_km_h_to_m_s(SPEED_MAX)):
-                self.speed = discretize_speed(convert_km_h_to_m_s(SPEED_MAX))
+            self.speed += self.characteristic.acc_forward
+            if self.speed > self.characteristic.max_speed:
+                self.speed = self.characteristic.max_speed
 
         return self.speed
 
@@ -169,6 +165,18 @@ class Vehicle(Agent):
     def is_on_road(self) -> bool:
         return is_road_position(self.pos)
 
+    def get_crossing(self) -> dict[str, int | DiscreteSpeed]:
+        """Roads between which the agent crosses the intersection at the end of its road, none at its destination
+        or when the model does not reserve the crossings. A waiting agent crosses at the speed of its road"""
+        entry_node, node = self.pos
+        if node == self.to_node or not self.model.reserve_intersections:
+            return dict()
+
+        road_speed = min(self.model.get_road_speed(self.pos), self.characteristic.max_speed)
+        return {'entry_node': entry_node,
+                'exit_node': self.path[self.path.index(node) + 1],
+                'speed': max(self.speed, road_speed)}
+
     def calc_new_pos(self) -> Position:
         if self.is_on_intersection():
             current_journey_index = self.path.index(self.pos)
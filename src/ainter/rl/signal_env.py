@@ -0,0 +1,127 @@
+import random
+from typing import Any, Final, Optional
+
+import numpy as np
+
+from ainter.configs.env_creation import EnvConfig
+from ainter.models.data.routing import RouteCache
+from ainter.models.nagel_schreckenberg.demand import DemandGenerator
+from ainter.models.nagel_schreckenberg.model import create_environment, create_od_table
+from ainter.models.nagel_schreckenberg.random_streams import RandomStreams
+from ainter.models.nagel_schreckenberg.vectorized import VectorizedStepEngine
+from ainter.models.vehicles.catalog import VehicleCatalog
+
+DEFAULT_DECISION_INTERVAL: Final[int] = 5
+
+
+class SignalControlEnv:
+    """Reinforcement learning environment controlling the traffic lights of one vectorized model replica.
+
+    The action holds the green phase of every intersection, it starts at the current step and lasts for the
+    green duration of the intersection, so choosing the same phase at every decision keeps it green. After the
+    action, the model runs `decision_interval` steps with the vehicles obeying the lights. The observation is
+    a float vector of the vehicles on every road, the halted vehicles on every road and the current phase of every
+    intersection, in the order of `Environment.roads` and `Environment.intersections`. The reward is the negative
+    number of halted and queued vehicles summed over the steps, so it measures the waiting time. An episode is
+    truncated after `episode_steps` model steps, or at the end time of the config. The episodes reset without a
+    seed follow from `seed`.
+    """
+
+    def __init__(self,
+                 env_config: EnvConfig,
+                 decision_interval: int = DEFAULT_DECISION_INTERVAL,
+                 episode_steps: Optional[int] = None,
+                 seed: Optional[int | np.random.SeedSequence] = None) -> None:
+        if decision_interval < 1:
+            raise ValueError(f"{decision_interval=} cannot be zero-like or negative")
+        if episode_steps is not None and episode_steps < 1:
+            raise ValueError(f"{episode_steps=} cannot be zero-like or negative")
+
+        self.env_config = env_config
+        self.decision_interval = decision_interval
+        discretization = env_config.physics.discretization
+        self.start_time = discretization.discretize_time(env_config.physics.start_time)
+        self.end_time = discretization.discretize_time(env_config.physics.end_time)
+        self.episode_steps = int(self.end_time - self.start_time) if episode_steps is None else episode_steps
+
+        self.environment = create_environment(env_config, self.start_time, random.Random(0))
+        self.offset = self.environment.signals.offset.copy()
+        self.routes = RouteCache.from_network(self.environment.network, env_config.simulation.route_cache_size)
+        self.vehicle_catalog = VehicleCatalog.from_config(env_config.vehicles.types, discretization)
+        self.od_table = create_od_table(env_config, self.routes, self.vehicle_catalog)
+        self.seeds = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+
+        self.engine: Optional[VectorizedStepEngine] = None
+        self.demand: Optional[DemandGenerator] = None
+        self.steps = 0
+
+    @property
+    def num_roads(self) -> int:
+        return len(self.environment.roads)
+
+    @property
+    def num_intersections(self) -> int:
+        return len(self.environment.intersections)
+
+    @property
+    def observation_size(self) -> int:
+        return 2 * self.num_roads + self.num_intersections
+
+    @property
+    def action_sizes(self) -> np.ndarray:
+        """Number of phases to choose from at every intersection"""
+        return np.maximum(self.environment.signals.num_phases, 1)
+
+    def reset(self, seed: Optional[int | np.random.SeedSequence] = None) -> tuple[np.ndarray, dict[str, Any]]:
+        """Starts a new episode from empty roads and the configured signal plans, the network is kept. Without
+        a seed the episode continues the random streams of the previous one"""
+        if seed is not None:
+            self.seeds = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        streams = RandomStreams.from_seed(self.seeds.spawn(1)[0])
+
+        self.environment.time = self.start_time
+        self.environment.road_vehicles.clear()
+        self.environment.intersection_vehicles.clear()
+        self.environment.signals.offset[:] = self.offset
+        self.engine = VectorizedStepEngine(self.environment, streams.driver, obey_signals=True,
+                                           render_rng=streams.render, catalog=self.vehicle_catalog)
+        self.demand = DemandGenerator(od_table=self.od_table,
+                                      routes=self.routes,
+                                      time_density=self.env_config.vehicles.time_density_strategy,
+                                      arrival_process=self.env_config.vehicles.arrival_process,
+                                      rng=streams.spawn,
+                                      catalog=self.vehicle_catalog)
+        self.steps = 0
+        return self.get_observation(), self.get_info()
+
+    def step(self, action: np.ndarray) -> tuple[np.ndarray, float, bool, bool, dict[str, Any]]:
+        """Applies the phases and runs the decision interval, returns the observation, reward, terminated and
+        truncated flags and the info, as the Gym API does"""
+        assert self.engine is not None, "Environment must be reset before stepping"
+
+        self.environment.signals.set_phases(self.environment.time, action)
+        reward = 0.
+        for _ in range(self.decision_interval):
+            self.demand.arrive(self.environment.time)
+            for vehicle_type, path in self.demand.release(self.engine):
+                self.engine.spawn(vehicle_type=vehicle_type, path=path)
+            self.engine.step()
+            self.environment.step()
+            self.steps += 1
+            reward -= np.count_nonzero(self.engine.speed == 0) + self.demand.queued
+
+        truncated = self.steps >= self.episode_steps or self.environment.time > self.end_time
+        return self.get_observation(), reward, False, truncated, self.get_info()
+
+    def get_observation(self) -> np.ndarray:
+        engine = self.engine
+        on_road = engine.on_road
+        halted = on_road & (engine.speed == 0)
+        return np.concatenate((np.bincount(engine.road[on_road], minlength=self.num_roads),
+                               np.bincount(engine.road[halted], minlength=self.num_roads),
+                               self.environment.signals.get_phases(self.environment.time))).astype(np.float32)
+
+    def get_info(self) -> dict[str, Any]:
+        return {'time': int(self.environment.time),
+                'vehicles': self.engine.num_vehicles,
+                'queued': self.demand.queued}
@@ -0,0 +1,181 @@
+import dataclasses
+import multiprocessing
+import os
+import random
+import traceback
+from typing import Any, Final, Optional
+
+import numpy as np
+
+from ainter.configs.env_creation import EnvConfig
+from ainter.models.data.graph_store import get_graph_key
+from ainter.models.data.osmnx import DEFAULT_NETWORK_TYPE
+from ainter.models.nagel_schreckenberg.model import create_environment
+from ainter.models.nagel_schreckenberg.snapshot import save_environment
+from ainter.rl.signal_env import SignalControlEnv, DEFAULT_DECISION_INTERVAL
+
+VECTOR_ENVIRONMENT_FILE: Final[str] = 'environment.env'
+
+
+def run_signal_envs(connection, env_config: EnvConfig, decision_interval: int, episode_steps: Optional[int],
+                    count: int) -> None:
+    """Worker loop of `count` environments stepped one after another. A `('reset', seeds)` message resets them,
+    a `('step', actions)` message steps them, resetting the finished ones, the reply stacks their results"""
+    try:
+        envs = [SignalControlEnv(env_config, decision_interval, episode_steps) for _ in range(count)]
+        connection.send((envs[0].observation_size, envs[0].action_sizes))
+
+        while (message := connection.recv()) is not None:
+            command, data = message
+            match command:
+                case 'reset':
+                    results = [env.reset(seed) for env, seed in zip(envs, data)]
+                    connection.send((np.stack([observation for observation, _ in results]),
+                                     [info for _, info in results]))
+
+                case 'step':
+                    observations = np.empty(shape=(count, envs[0].observation_size), dtype=np.float32)
+                    rewards = np.empty(shape=count, dtype=np.float64)
+                    terminated = np.empty(shape=count, dtype=bool)
+                    truncated = np.empty(shape=count, dtype=bool)
+                    infos = list()
+                    for i, (env, action) in enumerate(zip(envs, data)):
+                        observations[i], rewards[i], terminated[i], truncated[i], info = env.step(action)
+                        if terminated[i] or truncated[i]:
+                            info['final_observation'] = observations[i].copy()
+                            observations[i], info['reset_info'] = env.reset()
+                        infos.append(info)
+                    connection.send((observations, rewards, terminated, truncated, infos))
+
+                case _:
+                    raise ValueError("Unknown worker command provided")
+    except Exception:
+        connection.send(traceback.format_exc())
+    finally:
+        connection.close()
+
+
+class SubprocVectorEnv:
+    """Batch of `SignalControlEnv` replicas stepped by worker processes.
+
+    The replicas are split evenly between the workers, every worker steps its replicas one after another, so
+    the number of workers should not exceed the number of cores. The static network is prepared once and loaded
+    by every replica. `step_async` only sends the actions, the learner can work while the replicas are stepped
+    and collect the results with `step_wait`. Finished episodes are reset in the worker, the final observation
+    is kept in the info, as the Gym vector environments do. Every replica has its own random streams spawned
+    from the reset seed, so the batch is deterministic for a given seed, whatever the number of workers.
+    """
+
+    def __init__(self,
+                 env_config: EnvConfig,
+                 num_envs: int,
+                 num_workers: Optional[int] = None,
+                 decision_interval: int = DEFAULT_DECISION_INTERVAL,
+                 episode_steps: Optional[int] = None,
+                 work_dir: str = '.') -> None:
+        if num_envs < 1:
+            raise ValueError(f"{num_envs=} cannot be zero-like or negative")
+        num_workers = min(num_envs, os.cpu_count() or 1) if num_workers is None else num_workers
+        if not 1 <= num_workers <= num_envs:
+            raise ValueError(f"{num_workers=} must be between one and the number of environments")
+
+        if env_config.simulation.environment_path is None:
+            os.makedirs(work_dir, exist_ok=True)
+            environment_path = os.path.join(work_dir, VECTOR_ENVIRONMENT_FILE)
+            start_time = env_config.physics.discretization.discretize_time(env_config.physics.start_time)
+            save_environment(create_environment(env_config, start_time, random.Random(0)), environment_path,
+                             key=get_graph_key(env_config.map_box, DEFAULT_NETWORK_TYPE))
+            env_config = dataclasses.replace(env_config,
+                                             simulation=dataclasses.replace(env_config.simulation,
+                                                                            environment_path=environment_path))
+
+        self.num_envs = num_envs
+        self.counts = [len(chunk) for chunk in np.array_split(np.arange(num_envs), num_workers)]
+        self.bounds = np.concatenate(([0], np.cumsum(self.counts))).tolist()
+        self.waiting = False
+
+        context = multiprocessing.get_context()
+        self.connections = list()
+        self.processes = list()
+        for worker, count in enumerate(self.counts):
+            connection, worker_connection = context.Pipe()
+            process = context.Process(target=run_signal_envs,
+                                      args=(worker_connection, env_config, decision_interval, episode_steps, count),
+                                      name=f"signal-env-{worker}",
+                                      daemon=True)
+            process.start()
+            worker_connection.close()
+            self.connections.append(connection)
+            self.processes.append(process)
+
+        self.observation_size, self.action_sizes = self.receive()[0]
+
+    @property
+    def num_workers(self) -> int:
+        return len(self.connections)
+
+    def receive(self) -> list[Any]:
+        replies = list()
+        for worker, connection in enumerate(self.connections):
+            reply = connection.recv()
+            if isinstance(reply, str):
+                raise RuntimeError(f"Environment worker {worker} failed:\n{reply}")
+            replies.append(reply)
+        return replies
+
+    def reset(self, seed: Optional[int] = None) -> tuple[np.ndarray, list[dict[str, Any]]]:
+        assert not self.waiting, "Cannot reset while waiting for a step"
+
+        seeds = np.random.SeedSequence(seed).spawn(self.num_envs)
+        for connection, start, stop in zip(self.connections, self.bounds[:-1], self.bounds[1:]):
+            connection.send(('reset', seeds[start:stop]))
+
+        replies = self.receive()
+        return (np.concatenate([observations for observations, _ in replies]),
+                [info for _, infos in replies for info in infos])
+
+    def step_async(self, actions: np.ndarray) -> None:
+        """Sends the actions of every replica, one row per replica, without waiting for the results"""
+        assert not self.waiting, "Cannot step again before waiting for the previous step"
+        actions = np.asarray(actions, dtype=np.int64)
+        if actions.shape != (self.num_envs, len(self.action_sizes)):
+            raise ValueError("Every environment must be given the phase of every intersection")
+
+        for connection, start, stop in zip(self.connections, self.bounds[:-1], self.bounds[1:]):
+            connection.send(('step', actions[start:stop]))
+        self.waiting = True
+
+    def step_wait(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, list[dict[str, Any]]]:
+        """Observations, rewards, terminated and truncated flags and infos of every replica"""
+        assert self.waiting, "Cannot wait without stepping"
+        self.waiting = False
+
+        replies = self.receive()
+        return (np.concatenate([reply[0] for reply in replies]),
+                np.concatenate([reply[1] for reply in replies]),
+                np.concatenate([reply[2] for reply in replies]),
+                np.concatenate([reply[3] for reply in replies]),
+                [info for reply in replies for info in reply[4]])
+
+    def step(self, actions: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray,
+                                                 list[dict[str, Any]]]:
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self) -> None:
+        if self.waiting:
+            self.receive()
+            self.waiting = False
+        for connection, process in zip(self.connections, self.processes):
+            if process.is_alive():
+                connection.send(None)
+            process.join()
+            connection.close()
+        self.connections = list()
+        self.processes = list()
+
+    def __enter__(self) -> 'SubprocVectorEnv':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
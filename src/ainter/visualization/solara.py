@@ -48,9 +48,9 @@ def network_portrayal(model):
                               edge_color='black',
                               node_size=65)
 
-    for edge_data in model.grid.roads.values():
-        text = edge_data.name
-        c = edge_data.geometry.centroid
+    network = model.grid.network
+    for text, geometry in zip(network.get_edge_names(), network.get_geometries()):
+        c = geometry.centroid
         axis.annotate(text, (c.x, c.y), c="blue", ha='center', va='center')
 
     for node_id, node_data in model.grid.intersections.items():
@@ -64,16 +64,18 @@ def network_portrayal(model):
 def intersections_portrayal(model) -> None:
     update_counter.get()
 
-    intersections_dict = model.grid.intersections
+    # Only the active intersections are rendered, the others have no vehicles around them
+    intersections_dict = {position: model.grid.intersections[position] for position in model.grid.active_intersections}
     roads_dict = model.grid.roads
     road_graph = model.grid.road_graph
 
     num_intersections = len(intersections_dict)
     cols = 3
-    rows = math.ceil(num_intersections / cols)
+    rows = max(1, math.ceil(num_intersections / cols))
 
     fig, axes = plt.subplots(rows, cols, figsize=(cols * 4, rows * 4))
     axes = axes.flatten()
+    i = -1
 
     max_x_len = 0
     max_x_id = 0
@@ -121,7 +123,7 @@ def intersections_portrayal(model) -> None:
                 case IntersectionEntranceDirection.WEST:
                     ax.set_ylabel(out_edge.name)
 
-        rendered_image = intersection_data.render()
+        rendered_image = intersection_data.render(model.grid.palette, model.grid.time)
         ax.imshow(rendered_image, origin='upper', cmap="viridis", interpolation='nearest')
         ax.set_title(f"{','.join(map(lambda x: str(roads_dict[intersection_id, x].name), road_graph.adj[intersection_id].keys()))}\n({intersection_id})",
                      fontsize=11)
@@ -152,18 +154,20 @@ def intersections_portrayal(model) -> None:
 @solara.component
 def roads_portrayal(model) -> None:
     update_counter.get()
-    roads_dict = model.grid.roads
+    # Only the active roads are rendered, the others are empty
+    roads_dict = {position: model.grid.roads[position] for position in model.grid.active_roads}
 
     num_roads = len(roads_dict)
     cols = 1
-    rows = math.ceil(num_roads / cols)
+    rows = max(1, math.ceil(num_roads / cols))
     max_x_length = 0
     max_x_len_id = 0
     max_y_length = 0
     max_y_len_id = 0
 
-    fig, axes = plt.subplots(rows, cols, figsize=(cols * 12, rows * 1))
+    fig, axes = plt.subplots(rows, cols, figsize=(cols * 12, rows * 1), squeeze=False)
     axes = axes.flatten()
+    i = -1
 
     for i, ((road_start_id, road_end_id), road_data) in enumerate(roads_dict.items()):
         if i >= len(axes):
@@ -178,7 +182,7 @@ def roads_portrayal(model) -> None:
             max_y_len_id = i
 
         ax = axes[i]
-        ax.imshow(road_data.render(), cmap="viridis", interpolation='nearest')
+        ax.imshow(road_data.render(model.grid.palette), cmap="viridis", interpolation='nearest')
         ax.set_title(f"{road_data.name}, {float(road_data.length):.1f}m ({road_start_id} -> {road_end_id})",
                      fontsize=11)
         ax.axis('off')
@@ -187,7 +191,7 @@ def roads_portrayal(model) -> None:
     for j in range(i + 1, len(axes)):
         fig.delaxes(axes[j])
 
-    for axi in axes:
+    for axi in axes[:i + 1]:
         ax_max_x = axes[max_x_len_id]
         ax_max_y = axes[max_y_len_id]
         axi.set_ylim(ax_max_y.get_ylim())
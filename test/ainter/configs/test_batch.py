@@ -0,0 +1,42 @@
+import pytest
+
+from ainter.configs.batch import SweepConfig, set_config_value
+
+
+@pytest.fixture
+def base():
+    return {'vehicles': {'time_density_strategy': 'uniform_dist', 'min_node_path_length': 3}}
+
+def test_set_config_value():
+    config = {'vehicles': {'min_node_path_length': 3}}
+    set_config_value(config, 'vehicles.time_density_strategy', 'null_dist')
+    set_config_value(config, 'simulation.engine', 'vectorized')
+
+    assert config['vehicles'] == {'min_node_path_length': 3, 'time_density_strategy': 'null_dist'}, \
+        "Value must be added next to the existing ones"
+    assert config['simulation'] == {'engine': 'vectorized'}, "Missing sections must be created"
+
+def test_sweep_runs(base):
+    sweep = SweepConfig.from_json({'base': base,
+                                   'parameters': {'vehicles.time_density_strategy': ['uniform_dist', 'null_dist'],
+                                                  'simulation.engine': ['agent', 'vectorized']},
+                                   'replications': 3,
+                                   'seed': 10})
+    runs = sweep.get_runs()
+
+    assert len(runs) == 12, "Every combination must run every seed"
+    assert [run.run_id for run in runs] == list(range(12)), "Runs must be numbered consecutively"
+    assert sorted({run.seed for run in runs}) == [10, 11, 12], "Seeds must start at the given seed"
+    assert {(run.config['vehicles']['time_density_strategy'], run.config['simulation']['engine']) for run in runs} == \
+        {(x, y) for x in ('uniform_dist', 'null_dist') for y in ('agent', 'vectorized')}, "Overrides must be applied"
+    assert base['vehicles']['time_density_strategy'] == 'uniform_dist', "Base config must not be modified"
+
+@pytest.mark.parametrize("json_data", [
+    {'parameters': {}},
+    {'base': {}, 'parameters': {'simulation.engine': []}},
+    {'base': {}, 'seeds': []},
+    {'base': {}, 'steps': 0},
+])
+def test_invalid_sweep(json_data):
+    with pytest.raises(ValueError):
+        SweepConfig.from_json(json_data)
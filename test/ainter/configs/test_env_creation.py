@@ -0,0 +1,155 @@
+import json
+import os
+
+import pytest
+
+from ainter.configs.env_creation import get_env_config_from_json, SimulationConfig, DEFAULT_GRAPH_CACHE_DIR, \
+    get_user_cache_dir, VehiclesConfig, EnvConfig, SignalsConfig, GreenWaveConfig, VehicleTypeConfig, \
+    DEFAULT_VEHICLE_TYPES, PhysicsConfig
+from ainter.models.nagel_schreckenberg.arrivals import BernoulliArrivals, PoissonArrivals
+from ainter.models.nagel_schreckenberg.units import Discretization, DEFAULT_DISCRETIZATION
+
+
+@pytest.fixture(params=['./test/resources/czarnowiejska.json'])
+def config_json(request):
+    with open(request.param, "r", encoding='utf-8') as in_file:
+        return json.load(in_file)
+
+def test_default_simulation_config(config_json, tmp_path):
+    config_path = tmp_path / 'config.json'
+    config_path.write_text(json.dumps(config_json), encoding='utf-8')
+
+    with open(config_path, "r", encoding='utf-8') as in_file:
+        env_config = get_env_config_from_json(in_file)
+
+    assert env_config.simulation == SimulationConfig(), "Missing simulation section must use defaults"
+    assert env_config.simulation.engine == 'agent', "Per-agent engine must be the default"
+
+@pytest.mark.parametrize("engine", ['agent', 'vectorized'])
+def test_simulation_config_engine(config_json, tmp_path, engine):
+    config_path = tmp_path / 'config.json'
+    config_path.write_text(json.dumps(config_json | {'simulation': {'engine': engine}}), encoding='utf-8')
+
+    with open(config_path, "r", encoding='utf-8') as in_file:
+        env_config = get_env_config_from_json(in_file)
+
+    assert env_config.simulation.engine == engine, "Engine must be read from the config"
+
+@pytest.mark.parametrize("value,expected", [(None, None), (500, 500.0), (1000.5, 1000.5)])
+def test_sparse_road_min_length(value, expected):
+    config = SimulationConfig.from_json({'sparse_road_min_length': value})
+    assert config.sparse_road_min_length == expected, "Sparse road threshold must be read from the config"
+
+@pytest.mark.parametrize("value", [0, -1, -100.0])
+def test_invalid_sparse_road_min_length(value):
+    with pytest.raises(ValueError):
+        SimulationConfig.from_json({'sparse_road_min_length': value})
+
+@pytest.mark.parametrize("value,expected", [({}, DEFAULT_GRAPH_CACHE_DIR),
+                                            ({'graph_cache_dir': '/tmp/graphs'}, '/tmp/graphs'),
+                                            ({'graph_cache_dir': None}, None)])
+def test_graph_cache_dir(value, expected):
+    config = SimulationConfig.from_json(value)
+    assert config.graph_cache_dir == expected, "Graph cache directory must be read from the config"
+
+def test_default_graph_cache_dir_is_absolute():
+    assert os.path.isabs(DEFAULT_GRAPH_CACHE_DIR), "Default cache cannot depend on the working directory"
+
+@pytest.mark.parametrize("value,expected", [('/tmp/cache', '/tmp/cache'),
+                                            ('cache', os.path.join(os.path.expanduser('~'), '.cache')),
+                                            ('', os.path.join(os.path.expanduser('~'), '.cache'))])
+def test_user_cache_dir(monkeypatch, value, expected):
+    monkeypatch.setenv('XDG_CACHE_HOME', value)
+    assert get_user_cache_dir() == expected, "Only an absolute XDG_CACHE_HOME can be used"
+
+@pytest.mark.parametrize("value,expected", [({}, None), ({'environment_path': 'environment.bin'}, 'environment.bin')])
+def test_environment_path(value, expected):
+    config = SimulationConfig.from_json(value)
+    assert config.environment_path == expected, "Prepared environment path must be read from the config"
+
+@pytest.mark.parametrize("value,expected", [({}, None), ({'od_table_path': 'table.od'}, 'table.od')])
+def test_od_table_path(value, expected):
+    config = SimulationConfig.from_json(value)
+    assert config.od_table_path == expected, "Prepared OD table path must be read from the config"
+
+@pytest.mark.parametrize("value", [0, -5])
+def test_invalid_route_cache_size(value):
+    with pytest.raises(ValueError):
+        SimulationConfig.from_json({'route_cache_size': value})
+
+@pytest.mark.parametrize("value,expected", [({}, BernoulliArrivals),
+                                            ({'arrival_process': 'poisson', 'arrival_rate': 4}, PoissonArrivals)])
+def test_arrival_process(value, expected):
+    config = VehiclesConfig.from_json({'time_density_strategy': 'uniform_dist', 'min_node_path_length': 2} | value)
+    assert isinstance(config.arrival_process, expected), "Arrival process must be read from the config"
+
+def test_discretization():
+    json_data = {'start_time': '08:00:00', 'end_time': '09:00:00'}
+    assert PhysicsConfig.from_json(json_data).discretization == DEFAULT_DISCRETIZATION, \
+        "Missing resolution must use the defaults"
+
+    config = PhysicsConfig.from_json(json_data | {'cell_size': 7.5, 'delta_time': 0.5})
+    assert config.discretization == Discretization(cell_size=7.5, delta_time=0.5), \
+        "Resolution must be read from the config"
+    assert config.discretization.discretize_time(config.start_time) == 8 * 3600 * 2, \
+        "Time steps must follow the time resolution"
+
+@pytest.mark.parametrize("value", [{'cell_size': 0}, {'cell_size': -2}, {'delta_time': 0}])
+def test_invalid_discretization(value):
+    with pytest.raises(ValueError):
+        PhysicsConfig.from_json({'start_time': '08:00:00', 'end_time': '09:00:00'} | value)
+
+def test_vehicle_types():
+    json_data = {'time_density_strategy': 'uniform_dist', 'min_node_path_length': 2}
+    assert VehiclesConfig.from_json(json_data).types == DEFAULT_VEHICLE_TYPES, "Missing types must use defaults"
+
+    config = VehiclesConfig.from_json(json_data | {'types': [{'name': 'TRAM', 'length': 30, 'acc_forward': 1,
+                                                              'acc_backward': 2, 'max_speed': 40, 'share': 2}]})
+    assert config.types == (VehicleTypeConfig(name='TRAM', length=30., acc_forward=1., acc_backward=2.,
+                                              max_speed=40., share=2.),), "Vehicle types must be read from the config"
+
+@pytest.mark.parametrize("value", [{'length': 4.5, 'acc_forward': 2, 'acc_backward': 2},
+                                   {'name': 'CAR', 'length': 0, 'acc_forward': 2, 'acc_backward': 2},
+                                   {'name': 'CAR', 'length': 4.5, 'acc_forward': 2},
+                                   {'name': 'CAR', 'length': 4.5, 'acc_forward': 2, 'acc_backward': 2, 'share': -1}])
+def test_invalid_vehicle_type(value):
+    with pytest.raises(ValueError):
+        VehicleTypeConfig.from_json(value)
+
+@pytest.mark.parametrize("value", [0, -1])
+def test_invalid_collect_interval(value):
+    with pytest.raises(ValueError):
+        SimulationConfig.from_json({'collect_interval': value})
+
+@pytest.mark.parametrize("value", [0, -1])
+def test_invalid_metrics_interval(value):
+    with pytest.raises(ValueError):
+        SimulationConfig.from_json({'metrics_interval': value})
+
+def test_disabled_metrics_interval():
+    assert SimulationConfig.from_json({'metrics_interval': None}).metrics_interval is None, \
+        "Null interval must disable the road metrics"
+
+def test_signals_config(config_json, tmp_path):
+    signals = {'offsets': {'12': 15},
+               'green_waves': [{'nodes': [1, 2, 3], 'speed': 40, 'start': 5, 'green_duration': 30}]}
+    config_path = tmp_path / 'config.json'
+    config_path.write_text(json.dumps(config_json | {'signals': signals}), encoding='utf-8')
+
+    with open(config_path, "r", encoding='utf-8') as in_file:
+        env_config = get_env_config_from_json(in_file)
+
+    assert env_config.signals.offsets == {12: 15.}, "Signal offsets must be read from the config"
+    assert env_config.signals.green_waves == (GreenWaveConfig(nodes=(1, 2, 3), speed=40., start=5.,
+                                                              green_duration=30.),), \
+        "Green waves must be read from the config"
+
+def test_default_signals_config(config_json):
+    assert EnvConfig.from_json(config_json).signals == SignalsConfig(), "Missing signals section must use defaults"
+
+@pytest.mark.parametrize("value", [{'nodes': [1], 'speed': 40},
+                                   {'nodes': [1, 2], 'speed': 0},
+                                   {'nodes': [1, 2], 'speed': 40, 'green_duration': 0}])
+def test_invalid_green_wave(value):
+    with pytest.raises(ValueError):
+        GreenWaveConfig.from_json(value)
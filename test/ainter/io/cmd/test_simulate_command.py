@@ -0,0 +1,96 @@
+import json
+import logging
+import pstats
+from argparse import ArgumentParser
+
+import numpy as np
+import pytest
+
+from ainter.io.cmd.simulate_command import SimulateCommand
+from ainter.io.collector import load_table
+from ainter.models.nagel_schreckenberg import model as model_module
+from test.ainter.models.nagel_schreckenberg.test_road import graph
+
+
+@pytest.fixture
+def config_path():
+    return './test/resources/czarnowiejska.json'
+
+def create_program_parser():
+    parser = ArgumentParser()
+    command = SimulateCommand()
+    command.configure_parser(parser.add_subparsers()).set_defaults(func=command)
+    return parser
+
+def test_parse_simulate_arguments(config_path, tmp_path):
+    parser = create_program_parser()
+    args = parser.parse_args(['simulate', '-i', config_path, '--seed', '7', '-o', str(tmp_path), '--steps', '10'])
+
+    assert args.seed == 7, "Seed must be parsed"
+    assert args.output_dir == str(tmp_path), "Output directory must be parsed"
+    assert args.steps == 10, "Step limit must be parsed"
+    args.input.close()
+
+def test_simulate_writes_results(monkeypatch, graph, config_path, tmp_path):
+    monkeypatch.setattr(model_module, "get_data_from_bbox", lambda config, **kwargs: graph)
+    parser = create_program_parser()
+    args = parser.parse_args(['simulate', '-i', config_path, '--seed', '1', '-o', str(tmp_path), '--steps', '30'])
+
+    args.func(args)
+    args.input.close()
+
+    model_table = load_table(str(tmp_path), 'model')
+    vehicle_table = load_table(str(tmp_path), 'vehicles')
+    assert len(model_table['time']) == 30, "Every step must be collected"
+    assert np.all(np.diff(model_table['time']) == 1), "Model rows must follow the simulation time"
+    assert len(vehicle_table['time']) == np.sum(model_table['agent_count']), "Every vehicle must be collected"
+    with np.load(tmp_path / 'road_metrics.npz') as metrics:
+        assert metrics['density'].shape == (1, len(graph.edges)), "Road metrics must have a row per interval"
+
+def test_simulate_partitioned_writes_results(monkeypatch, graph, config_path, tmp_path):
+    monkeypatch.setattr(model_module, "get_data_from_bbox", lambda config, **kwargs: graph)
+    parser = create_program_parser()
+    args = parser.parse_args(['simulate', '-i', config_path, '--seed', '1', '-o', str(tmp_path), '--steps', '20',
+                              '--partitions', '2'])
+
+    args.func(args)
+    args.input.close()
+
+    model_table = load_table(str(tmp_path), 'model')
+    partition_table = load_table(str(tmp_path), 'partitions')
+    assert len(model_table['time']) == 20, "Every step must be collected"
+    assert len(partition_table['time']) == 40, "Every partition must be collected on every step"
+
+@pytest.mark.parametrize('engine', ['agent', 'vectorized'])
+def test_simulate_resumes_from_checkpoint(monkeypatch, graph, config_path, tmp_path, engine):
+    monkeypatch.setattr(model_module, "get_data_from_bbox", lambda config, **kwargs: graph)
+    with open(config_path, 'r', encoding='utf-8') as in_file:
+        config = json.load(in_file)
+    engine_path = tmp_path / f'{engine}.json'
+    engine_path.write_text(json.dumps(config | {'simulation': {'engine': engine}}))
+    checkpoint_path = str(tmp_path / 'model.ckpt')
+    parser = create_program_parser()
+
+    for extra in (['--steps', '20', '--checkpoint', checkpoint_path], ['--steps', '10', '--resume', checkpoint_path]):
+        args = parser.parse_args(['simulate', '-i', str(engine_path), '--seed', '1', '-o', str(tmp_path), *extra])
+        args.func(args)
+        args.input.close()
+
+    model_table = load_table(str(tmp_path), 'model')
+    assert len(model_table['time']) == 30, "Resumed run must continue the collected rows"
+    assert np.all(np.diff(model_table['time']) == 1), "Model rows must follow the simulation time"
+
+def test_simulate_writes_profile(monkeypatch, graph, config_path, tmp_path, caplog):
+    monkeypatch.setattr(model_module, "get_data_from_bbox", lambda config, **kwargs: graph)
+    parser = create_program_parser()
+    args = parser.parse_args(['simulate', '-i', config_path, '--seed', '1', '-o', str(tmp_path), '--steps', '20',
+                              '--profile', str(tmp_path / 'run.prof'), '--profile-start', '5',
+                              '--profile-steps', '10'])
+
+    with caplog.at_level(logging.INFO):
+        args.func(args)
+    args.input.close()
+
+    assert pstats.Stats(str(tmp_path / 'run.prof')).total_calls > 0, "Profile must be written"
+    assert "Profile of 10 steps" in caplog.text, "Profiled window must be reported"
+    assert "Profiled 20 steps" in caplog.text, "Phase summary must be reported"
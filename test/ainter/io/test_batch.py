@@ -0,0 +1,37 @@
+import json
+
+import pytest
+
+from ainter.configs.batch import SweepConfig
+from ainter.io.batch import run_sweep, SUMMARY_FILE, ENVIRONMENTS_DIR
+from ainter.models.nagel_schreckenberg import model as model_module
+from test.ainter.models.nagel_schreckenberg.test_road import graph
+
+
+@pytest.fixture
+def base():
+    with open('./test/resources/czarnowiejska.json') as in_file:
+        return json.load(in_file) | {'simulation': {'graph_cache_dir': None}}
+
+def test_run_sweep(monkeypatch, graph, base, tmp_path):
+    monkeypatch.setattr(model_module, "get_data_from_bbox", lambda config, **kwargs: graph)
+    sweep = SweepConfig.from_json({'base': base,
+                                   'parameters': {'simulation.engine': ['agent', 'vectorized', 'unknown']},
+                                   'seeds': [1, 2],
+                                   'steps': 10})
+    table = run_sweep(sweep, str(tmp_path), workers=2)
+
+    assert len(table) == 6, "Every run must have a summary row"
+    assert table['run_id'].tolist() == list(range(6)), "Rows must follow the run order"
+    assert (table['status'] == 'ok').sum() == 4, "Valid runs must succeed"
+    failed = table[table['simulation.engine'] == 'unknown']
+    assert (failed['status'] == 'failed').all(), "Crashed runs must be reported"
+    assert failed['error'].str.contains("Unknown engine code provided").all(), "Error must be kept"
+    assert (table[table['status'] == 'ok']['steps'] == 10).all(), "Runs must respect the step limit"
+    assert len(list((tmp_path / ENVIRONMENTS_DIR).glob('*.env'))) == 1, "Environment must be built once per map"
+    assert len(list((tmp_path / ENVIRONMENTS_DIR).glob('*.od'))) == 1, "OD table must be built once per map"
+    assert (tmp_path / SUMMARY_FILE).exists(), "Summary must be written"
+
+def test_invalid_workers(base, tmp_path):
+    with pytest.raises(ValueError):
+        run_sweep(SweepConfig.from_json({'base': base}), str(tmp_path), workers=0)
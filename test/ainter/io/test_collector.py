@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from ainter.io.collector import ColumnarCollector, load_table
+
+
+@pytest.fixture
+def tables():
+    return {'samples': {'time': np.uint32, 'value': np.float32}}
+
+@pytest.mark.parametrize("chunk_rows", [1, 7, 64, 1000])
+def test_rows_are_written_in_chunks(tmp_path, tables, chunk_rows):
+    collector = ColumnarCollector(str(tmp_path), tables, chunk_rows=chunk_rows)
+    for time in range(50):
+        collector.append('samples', time=time, value=np.arange(time % 4, dtype=np.float32))
+    collector.close()
+
+    table = load_table(str(tmp_path), 'samples')
+    expected_time = np.repeat(np.arange(50), np.arange(50) % 4)
+    expected_value = np.concatenate([np.arange(time % 4) for time in range(50)])
+
+    assert table['time'].dtype == np.uint32 and table['value'].dtype == np.float32, "Column types must be kept"
+    assert np.array_equal(table['time'], expected_time), "Scalar columns must be repeated on every row"
+    assert np.array_equal(table['value'], expected_value), "Array columns must be kept in order"
+    assert len(list(tmp_path.glob('samples-*.npz'))) == -(-len(expected_time) // chunk_rows), \
+        "Every chunk must be written into its own file"
+
+def test_buffers_are_reused(tmp_path, tables):
+    collector = ColumnarCollector(str(tmp_path), tables, chunk_rows=8)
+    for time in range(200):
+        collector.append('samples', time=time, value=1.)
+    collector.close()
+
+    assert len(load_table(str(tmp_path), 'samples')['time']) == 200, "Every row must be written"
+    assert not collector.buffers['samples'].free.empty(), "Written buffers must be returned for reuse"
+
+def test_wait_keeps_partial_chunk(tmp_path, tables):
+    collector = ColumnarCollector(str(tmp_path), tables, chunk_rows=8)
+    for time in range(20):
+        collector.append('samples', time=time, value=1.)
+    collector.wait()
+
+    assert len(list(tmp_path.glob('samples-*.npz'))) == 2, "Full chunks must be written"
+    assert np.array_equal(collector.get_buffered('samples')['time'], np.arange(16, 20)), \
+        "Partial chunk must stay buffered"
+    collector.close()
+
+def test_empty_collector(tmp_path, tables):
+    collector = ColumnarCollector(str(tmp_path / 'results'), tables)
+    collector.close()
+
+    assert not (tmp_path / 'results').exists(), "Nothing must be written without rows"
+    assert load_table(str(tmp_path / 'results'), 'samples') == dict(), "Empty table must be loaded"
+
+def test_append_after_close(tmp_path, tables):
+    collector = ColumnarCollector(str(tmp_path), tables)
+    collector.close()
+
+    with pytest.raises(AssertionError):
+        collector.append('samples', time=0, value=0.)
+
+@pytest.mark.parametrize("kwargs", [{'chunk_rows': 0}, {'file_format': 'csv'}])
+def test_invalid_collector(tmp_path, tables, kwargs):
+    with pytest.raises(ValueError):
+        ColumnarCollector(str(tmp_path), tables, **kwargs)
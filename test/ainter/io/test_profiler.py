@@ -0,0 +1,35 @@
+import pstats
+
+import pytest
+
+from ainter.io.profiler import StepWindowProfiler
+
+
+def run(profiler, steps):
+    for step in range(steps):
+        profiler.before_step(step)
+        sum(range(1000))
+        profiler.after_step(step + 1)
+    profiler.close()
+
+def test_window_is_dumped(tmp_path):
+    profiler = StepWindowProfiler(str(tmp_path / 'run.prof'), start=2, steps=3)
+    run(profiler, 10)
+
+    assert profiler.dumped and profiler.profiled_steps == 3, "Only the window must be profiled"
+    assert pstats.Stats(str(tmp_path / 'run.prof')).total_calls > 0, "Dump must be readable by pstats"
+
+def test_run_ending_inside_window(tmp_path):
+    profiler = StepWindowProfiler(str(tmp_path / 'run.prof'), start=2, steps=10)
+    run(profiler, 5)
+    assert profiler.dumped and profiler.profiled_steps == 3, "Window must be dumped when the run ends"
+
+def test_run_ending_before_window(tmp_path):
+    profiler = StepWindowProfiler(str(tmp_path / 'run.prof'), start=20)
+    run(profiler, 5)
+    assert not profiler.dumped and not (tmp_path / 'run.prof').exists(), "Nothing must be dumped"
+
+@pytest.mark.parametrize("start, steps", [(-1, 10), (0, 0)])
+def test_invalid_window(tmp_path, start, steps):
+    with pytest.raises(ValueError):
+        StepWindowProfiler(str(tmp_path / 'run.prof'), start=start, steps=steps)
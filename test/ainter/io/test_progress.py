@@ -0,0 +1,44 @@
+import logging
+
+import pytest
+
+from ainter.io.progress import ProgressReporter
+
+
+class FakeClock:
+
+    def __init__(self) -> None:
+        self.now = 0.
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+def test_reports_are_rate_limited(clock):
+    reporter = ProgressReporter(total_steps=100, interval=5., clock=clock)
+
+    for step in range(1, 11):
+        clock.now = step * 1.
+        reporter.update(step, 8 * 3600 + step)
+
+    assert reporter.reports == 2, "Progress must be reported once per interval"
+
+def test_report_contains_eta(clock, caplog):
+    logger = logging.getLogger("test.progress")
+    reporter = ProgressReporter(total_steps=100, interval=1., logger=logger, clock=clock)
+
+    clock.now = 10.
+    with caplog.at_level(logging.INFO, logger="test.progress"):
+        assert reporter.update(50, 8 * 3600), "Report must be logged after the interval"
+
+    assert "Step 50/100 (50.0%)" in caplog.text, "Report must contain the progress"
+    assert "08:00:00" in caplog.text, "Report must contain the simulation clock"
+    assert "ETA 10s" in caplog.text, "Report must contain the remaining time"
+
+def test_negative_total_steps(clock):
+    with pytest.raises(ValueError):
+        ProgressReporter(total_steps=-1, clock=clock)
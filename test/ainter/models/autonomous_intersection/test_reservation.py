@@ -0,0 +1,132 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from ainter.models.autonomous_intersection.intersection_directions import IntersectionEntranceDirection
+from ainter.models.autonomous_intersection.reservation import IntersectionManager, ReservationTable, get_sweep, \
+    get_sweep_bounds, pack_cells, unpack_cells
+from ainter.models.nagel_schreckenberg.intersection import calculate_slice
+from test.ainter.test_fixtures import seed
+
+
+@pytest.fixture
+def manager():
+    return IntersectionManager(shape=(12, 12),
+                               entries={x: calculate_slice(x, True, 1) for x in IntersectionEntranceDirection},
+                               exits={x: calculate_slice(x, False, 1) for x in IntersectionEntranceDirection},
+                               horizon=32)
+
+def test_pack_cells_round_trip(seed):
+    occupied = np.random.default_rng(seed).random(size=(5, 150)) < 0.3
+    bits = pack_cells(occupied)
+
+    assert bits.shape == (5, 3), "Cells must be packed in 64-bit words"
+    assert np.array_equal(unpack_cells(bits, 150), occupied), "Unpacked cells must match"
+
+@pytest.mark.parametrize('speed,length', [(1, 1), (2, 3), (5, 2), (12, 9)])
+def test_sweep_covers_every_cell(speed, length):
+    sweep = get_sweep(12, speed, length)
+
+    assert np.all(np.any(sweep, axis=0)), "Vehicle must drive through every cell"
+    assert sweep[0, 0] and not np.any(sweep[0, 1:]), "Vehicle enters into the first cell"
+    assert sweep[-1, -1], "Vehicle must reach the last cell"
+    assert np.all(np.sum(sweep, axis=1) <= speed + length), "Vehicle cannot sweep more than it drives"
+    for row, (first, stop) in zip(sweep, get_sweep_bounds(sweep)):
+        assert np.array_equal(np.flatnonzero(row), np.arange(first, stop)), "Bounds must hold the swept cells"
+
+def test_trajectories_are_connected(manager):
+    for entry, exit in itertools.product(IntersectionEntranceDirection, repeat=2):
+        rows, columns = np.unravel_index(manager.get_trajectory(entry, exit), manager.shape)
+        assert np.all(np.abs(np.diff(rows)) + np.abs(np.diff(columns)) == 1), "Trajectory cannot skip cells"
+
+def test_crossing_trajectories_conflict(manager):
+    north, east, south, west = IntersectionEntranceDirection
+
+    assert manager.request(1, 10, north, south, speed=1, length=12), "Empty intersection must grant the crossing"
+    assert not manager.request(2, 10, west, east, speed=1, length=12), "Crossing in the same time must be denied"
+    assert manager.request(3, 10, south, north, speed=1, length=12), "Opposite lanes do not conflict"
+    assert manager.request(2, 40, west, east, speed=1, length=12), "Crossing after the others must be granted"
+
+def test_check_does_not_reserve(manager):
+    north, east, south, west = IntersectionEntranceDirection
+    assert manager.is_free(10, north, south, speed=1, length=12), "Empty intersection must be free"
+    assert manager.get_reservation(1) is None, "Check must not reserve the crossing"
+    assert manager.request(1, 10, north, south, speed=1, length=12), "Checked crossing must be granted"
+    assert not manager.is_free(10, west, east, speed=1, length=12), "Reserved cells cannot be free"
+
+def test_release_frees_cells(manager):
+    north, east, south, west = IntersectionEntranceDirection
+    manager.request(1, 10, north, south, speed=1, length=12)
+    manager.release(1)
+
+    assert manager.get_reservation(1) is None, "Released vehicle cannot hold a reservation"
+    assert manager.request(2, 10, west, east, speed=1, length=12), "Released cells must be granted again"
+
+def test_vehicle_keeps_exit_until_it_leaves(manager):
+    north, east, south, west = IntersectionEntranceDirection
+    manager.request(1, 10, north, south, speed=3, length=2)
+    end = manager.get_reservation(1).end
+
+    assert not manager.is_free(end + 100, west, south, speed=3, length=2), \
+        "Exit of a vehicle on the grid cannot be granted"
+    assert manager.is_free(end + 100, west, east, speed=3, length=2), "Other exits stay free"
+    manager.release(1)
+    assert manager.is_free(end + 100, west, south, speed=3, length=2), "Exit must be free once the vehicle leaves"
+
+def test_horizon_grows_with_the_crossing():
+    manager = IntersectionManager(shape=(12, 12),
+                                  entries={x: calculate_slice(x, True, 1) for x in IntersectionEntranceDirection},
+                                  exits={x: calculate_slice(x, False, 1) for x in IntersectionEntranceDirection},
+                                  horizon=4)
+    north, east, south, west = IntersectionEntranceDirection
+    manager.request(1, 0, north, south, speed=1, length=12)
+    reservation = manager.get_reservation(1)
+
+    assert manager.table.horizon > len(reservation.masks), "Horizon must hold the whole crossing"
+    assert manager.request(2, 3, south, north, speed=1, length=12), "Crossing must be granted after the growth"
+    assert not manager.is_free(reservation.end + 50, west, south, speed=1, length=1), \
+        "Held exit must survive the table advancing"
+
+def test_occupancy_follows_reservation(manager):
+    north, _, south, _ = IntersectionEntranceDirection
+    manager.request(7, 10, north, south, speed=3, length=2)
+    reservation = manager.get_reservation(7)
+
+    for time in range(reservation.start, reservation.end):
+        occupancy = manager.get_occupancy(time)
+        assert np.any(occupancy == 7), "Vehicle must hold its cells during the crossing"
+        assert np.array_equal(occupancy.ravel() == 7, manager.table.get_reserved(time)), "Table must match"
+    assert np.array_equal(manager.get_occupancy(reservation.end + 5).ravel() == 7, unpack_cells(reservation.hold, 144)), \
+        "Vehicle must keep its last cells until it leaves"
+    manager.release(7)
+    assert np.all(manager.get_occupancy(reservation.end) == 0), "Vehicle must leave the grid"
+
+def test_ring_buffer_reuses_rows():
+    table = ReservationTable(cells=10, horizon=4)
+    masks = pack_cells(np.ones(shape=(3, 10), dtype=np.bool_))
+    table.reserve(0, masks)
+
+    assert not table.is_free(1, masks[:2]), "Reserved time steps cannot be granted"
+    table.advance(2)
+    assert table.is_free(4, masks[:2]), "Rows wrapped around must not hold the time steps of the past"
+    assert not table.is_free(2, masks[:1]), "Current time step must stay reserved"
+    table.advance(5)
+    assert table.is_free(5, masks), "Rows of the past must be cleared"
+
+def test_invalid_reservation_window():
+    table = ReservationTable(cells=10, horizon=4)
+    masks = pack_cells(np.ones(shape=(5, 10), dtype=np.bool_))
+    table.advance(2)
+
+    with pytest.raises(ValueError):
+        table.is_free(2, masks)
+    with pytest.raises(ValueError):
+        table.is_free(1, masks[:1])
+    with pytest.raises(ValueError):
+        ReservationTable(cells=0)
+
+def test_unknown_approach(manager):
+    manager.entries.pop(IntersectionEntranceDirection.NORTH)
+    with pytest.raises(ValueError):
+        manager.request(1, 0, IntersectionEntranceDirection.NORTH, IntersectionEntranceDirection.SOUTH, 1, 1)
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from ainter.models.autonomous_intersection.intersection_directions import IntersectionEntranceDirection
+from ainter.models.autonomous_intersection.signal_bank import SignalBank
+
+
+@pytest.fixture
+def phases():
+    return [
+        [IntersectionEntranceDirection.NORTH, IntersectionEntranceDirection.EAST,
+         IntersectionEntranceDirection.SOUTH, IntersectionEntranceDirection.WEST],
+        [IntersectionEntranceDirection.EAST, IntersectionEntranceDirection.WEST],
+        [],
+        [IntersectionEntranceDirection.SOUTH],
+    ]
+
+@pytest.fixture
+def signal_bank(phases):
+    return SignalBank.from_phases(phases, [10, 35, 30, 40])
+
+def test_initialization(signal_bank):
+    assert signal_bank.num_phases.tolist() == [4, 2, 0, 1]
+    assert signal_bank.cycle_length.tolist() == [40, 70, 0, 40]
+    assert signal_bank.approach_intersection.tolist() == [0, 0, 0, 0, 1, 1, 3]
+    assert signal_bank.approach_phase.tolist() == [0, 1, 2, 3, 0, 1, 0]
+    assert np.all(signal_bank.offset == 0)
+
+def test_phases_rotate_every_green_duration(phases, signal_bank):
+    for time in range(300):
+        green = signal_bank.get_green(time)
+        for approach, (intersection, direction) in enumerate(zip(signal_bank.approach_intersection.tolist(),
+                                                                 signal_bank.approach_direction.tolist())):
+            directions = phases[intersection]
+            green_duration = int(signal_bank.green_duration[intersection])
+            expected = time // green_duration % len(directions) == directions.index(direction)
+            assert green[approach] == expected
+            assert signal_bank.has_right_of_way(intersection, IntersectionEntranceDirection(direction), time) == \
+                expected
+
+def test_one_green_approach(signal_bank):
+    for time in range(0, 500, 7):
+        green = signal_bank.get_green(time)
+        counts = np.bincount(signal_bank.approach_intersection[green], minlength=4)
+        assert counts.tolist() == [1, 1, 0, 1]
+
+def test_offset_shifts_cycle(signal_bank):
+    signal_bank.offset[1] = 5
+    assert signal_bank.has_right_of_way(1, IntersectionEntranceDirection.WEST, 4) is True
+    assert signal_bank.has_right_of_way(1, IntersectionEntranceDirection.EAST, 5) is True
+    assert signal_bank.has_right_of_way(1, IntersectionEntranceDirection.EAST, 39) is True
+    assert signal_bank.has_right_of_way(1, IntersectionEntranceDirection.WEST, 40) is True
+
+def test_set_green_start(signal_bank):
+    signal_bank.set_green_start(0, IntersectionEntranceDirection.SOUTH, 1234)
+
+    assert signal_bank.has_right_of_way(0, IntersectionEntranceDirection.SOUTH, 1234) is True
+    assert signal_bank.has_right_of_way(0, IntersectionEntranceDirection.SOUTH, 1233) is False
+    assert 0 <= signal_bank.offset[0] < signal_bank.cycle_length[0]
+
+def test_unknown_direction(signal_bank):
+    with pytest.raises(AssertionError, match="Cannot ask for unknown direction"):
+        signal_bank.has_right_of_way(3, IntersectionEntranceDirection.NORTH, 0)
+
+def test_invalid_phases():
+    with pytest.raises(ValueError):
+        SignalBank.from_phases([[IntersectionEntranceDirection.NORTH]], [10, 20])
+    with pytest.raises(ValueError):
+        SignalBank.from_phases([[IntersectionEntranceDirection.NORTH]], [0])
+    with pytest.raises(ValueError, match="Cannot add a direction twice"):
+        SignalBank.from_phases([[IntersectionEntranceDirection.NORTH, IntersectionEntranceDirection.NORTH]], [10])
+
+def test_set_phases(signal_bank):
+    signal_bank.set_phases(1234, np.array([2, 1, 0, 0]))
+
+    assert signal_bank.get_phases(1234).tolist() == [2, 1, 0, 0], "Intersections must start the chosen phases"
+    assert signal_bank.get_phases(1234 + 9).tolist() == [2, 1, 0, 0], "Phases must last their green duration"
+    assert signal_bank.get_phases(1234 + 10)[0] == 3, "Next phase must follow the green duration"
+
+def test_set_invalid_phases(signal_bank):
+    with pytest.raises(ValueError):
+        signal_bank.set_phases(0, np.array([4, 0, 0, 0]))
+    with pytest.raises(ValueError):
+        signal_bank.set_phases(0, np.array([0, 0, 1, 0]))
+    with pytest.raises(ValueError):
+        signal_bank.set_phases(0, np.array([0, 0]))
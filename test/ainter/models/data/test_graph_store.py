@@ -0,0 +1,73 @@
+import networkx as nx
+import osmnx as ox
+import pytest
+
+from ainter.configs.env_creation import MapBoxConfig
+from ainter.models.data.graph_store import GraphStore, get_graph_key
+from ainter.models.data.osmnx import get_data_from_bbox
+from test.ainter.models.nagel_schreckenberg.test_road import graph
+
+
+@pytest.fixture
+def map_box():
+    return MapBoxConfig(left=19.912119, bottom=50.066637, right=19.921871, top=50.069047)
+
+@pytest.fixture
+def store(tmp_path):
+    return GraphStore(str(tmp_path / 'graphs'))
+
+def test_graph_key_is_content_addressed(map_box):
+    same_box = MapBoxConfig(*map_box.get_bbox())
+    other_box = MapBoxConfig(left=map_box.left, bottom=map_box.bottom, right=map_box.right, top=50.07)
+
+    assert get_graph_key(map_box, 'drive') == get_graph_key(same_box, 'drive'), "Key must depend only on the content"
+    assert get_graph_key(map_box, 'drive') != get_graph_key(other_box, 'drive'), "Key must depend on the bbox"
+    assert get_graph_key(map_box, 'drive') != get_graph_key(map_box, 'walk'), "Key must depend on the network type"
+
+def test_load_missing_graph(store):
+    assert store.load('missing') is None, "Missing graph must not be loaded"
+
+def test_graph_round_trip(store, graph):
+    graph = nx.MultiDiGraph(graph)
+    store.save('key', graph)
+    loaded = store.load('key')
+
+    assert 'key' in store, "Saved graph must be found in the store"
+    assert loaded.graph == graph.graph, "Graph attributes must be restored"
+    assert list(loaded.nodes(data=True)) == list(graph.nodes(data=True)), "Nodes must be restored"
+
+    expected_edges = list(graph.edges(keys=True, data=True))
+    loaded_edges = list(loaded.edges(keys=True, data=True))
+    assert len(loaded_edges) == len(expected_edges), "Every edge must be restored"
+    for (u, v, k, data), (expected_u, expected_v, expected_k, expected_data) in zip(loaded_edges, expected_edges):
+        assert (u, v, k) == (expected_u, expected_v, expected_k), "Edge endpoints must be restored"
+        assert data.keys() == expected_data.keys(), "Edge attributes must be restored"
+        assert data['geometry'].equals(expected_data['geometry']), "Edge geometry must be restored"
+        assert {name: value for name, value in data.items() if name != 'geometry'} == \
+               {name: value for name, value in expected_data.items() if name != 'geometry'}, \
+            "Edge attributes must be restored"
+
+def test_edge_without_geometry_round_trip(store):
+    graph = nx.MultiDiGraph(crs='epsg:4326')
+    graph.add_node(1, x=0., y=0.)
+    graph.add_node(2, x=1., y=1.)
+    graph.add_edge(1, 2, key=0, length=10., lanes='2')
+
+    store.save('key', graph)
+    loaded = store.load('key')
+
+    assert 'geometry' not in loaded.edges[1, 2, 0], "Missing geometry must stay missing"
+    assert loaded.edges[1, 2, 0] == {'length': 10., 'lanes': '2'}, "Edge attributes must be restored"
+
+def test_stored_graph_is_loaded_offline(monkeypatch, store, graph, map_box):
+    monkeypatch.setattr(ox.graph, 'graph_from_bbox', lambda **kwargs: nx.MultiDiGraph(graph))
+    downloaded = get_data_from_bbox(map_box, store=store)
+
+    def fail_download(**kwargs):
+        raise AssertionError("Stored graph cannot be downloaded again")
+
+    monkeypatch.setattr(ox.graph, 'graph_from_bbox', fail_download)
+    loaded = get_data_from_bbox(map_box, store=store)
+
+    assert get_graph_key(map_box, 'drive') in store, "Downloaded graph must be stored"
+    assert list(loaded.edges(keys=True)) == list(downloaded.edges(keys=True)), "Stored graph must be loaded"
@@ -0,0 +1,124 @@
+import dataclasses
+import itertools
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from ainter.configs.env_creation import DEFAULT_VEHICLE_TYPES
+from ainter.models.data.od_table import AliasTable, ODTable
+from ainter.models.data.routing import RouteCache
+from ainter.models.nagel_schreckenberg.units import discretize_length
+from ainter.models.vehicles.catalog import VehicleCatalog
+from ainter.models.vehicles.vehicle import VehicleType
+from test.ainter.models.nagel_schreckenberg.test_road import graph
+
+
+@pytest.fixture
+def grid_graph():
+    rng = random.Random(0)
+    graph = nx.DiGraph(nx.grid_2d_graph(4, 4))
+    graph = nx.convert_node_labels_to_integers(graph)
+    for u, v in graph.edges:
+        graph.edges[u, v]['length'] = rng.choice([10., 20., 40.])
+    graph.remove_edges_from([(0, 1), (5, 9), (14, 15)])
+    return graph
+
+def is_valid_path(graph, path, vehicle_type, min_node_path_length):
+    min_cells = vehicle_type.get_characteristic().length + discretize_length(2.)
+    return len(path) >= min_node_path_length and \
+        all(discretize_length(graph.edges[u, v]['length']) >= min_cells for u, v in itertools.pairwise(path))
+
+@pytest.mark.parametrize("weights", [
+    [1., 1., 1., 1.],
+    [1., 2., 3., 4.],
+    [100., 1., 1., 1., 1., 1., 1., 1.],
+    [0., 5., 0., 1.],
+    [0.5, 0.5, 3., 0.1, 0.1, 0.1, 2., 0.7],
+])
+def test_alias_table_distribution(weights):
+    table = AliasTable(np.array(weights))
+    draws = table.sample_many(np.random.default_rng(0), 200_000)
+
+    expected = np.array(weights) / np.sum(weights)
+    observed = np.bincount(draws, minlength=len(weights)) / len(draws)
+    assert np.allclose(observed, expected, atol=0.005), "Draws must follow the weights"
+
+def test_alias_table_single_draw():
+    table = AliasTable(np.array([0., 1., 0.]))
+    assert all(table.sample(random.Random(seed)) == 1 for seed in range(20)), "Only weighted index can be drawn"
+
+@pytest.mark.parametrize("weights", [[], [0., 0.], [1., -1.]])
+def test_alias_table_invalid_weights(weights):
+    with pytest.raises(ValueError):
+        AliasTable(np.array(weights))
+
+@pytest.mark.parametrize("min_node_path_length", [1, 3, 5])
+def test_od_pairs_match_rejection_rule(grid_graph, min_node_path_length):
+    routes = RouteCache.from_graph(grid_graph)
+    table = ODTable.from_routes(routes, min_node_path_length, vehicle_types=[VehicleType.CAR, VehicleType.BUS])
+
+    for vehicle_type in (VehicleType.CAR, VehicleType.BUS):
+        size = len(routes.nodes)
+        pairs = {(routes.nodes[x // size], routes.nodes[x % size]) for x in table.pairs[vehicle_type].tolist()}
+        expected = {(origin, destination)
+                    for origin in grid_graph.nodes
+                    for destination in nx.descendants(grid_graph, origin)
+                    if is_valid_path(grid_graph, routes.get_shortest_path(origin, destination), vehicle_type,
+                                     min_node_path_length)}
+        assert pairs == expected, "Valid pairs must follow the rejection rule of the spawn loop"
+
+def test_sampled_pairs_are_valid(graph):
+    graph = nx.DiGraph(graph)
+    routes = RouteCache.from_graph(graph)
+    table = ODTable.from_routes(routes, 2, vehicle_types=[VehicleType.CAR])
+    rng = random.Random(0)
+
+    for _ in range(100):
+        origin, destination = table.sample(VehicleType.CAR, rng)
+        path = routes.get_shortest_path(origin, destination)
+        assert is_valid_path(graph, path, VehicleType.CAR, 2), "Sampled pair must be valid"
+
+def test_zero_weighted_origin_is_never_drawn(grid_graph):
+    routes = RouteCache.from_graph(grid_graph)
+    table = ODTable.from_routes(routes, 1, vehicle_types=[VehicleType.CAR], origin_weights={3: 0.})
+    rng = random.Random(0)
+
+    assert all(table.sample(VehicleType.CAR, rng)[0] != 3 for _ in range(500)), "Zero weight origin cannot be drawn"
+
+def test_fail_fast_without_valid_pairs():
+    graph = nx.DiGraph()
+    graph.add_edges_from([(1, 2), (2, 3)], length=10.)
+    routes = RouteCache.from_graph(graph)
+
+    with pytest.raises(ValueError, match="TRUCK"):
+        ODTable.from_routes(routes, 1, vehicle_types=[VehicleType.CAR, VehicleType.TRUCK])
+
+def test_saved_table_is_shared(grid_graph, tmp_path):
+    table = ODTable.from_routes(RouteCache.from_graph(grid_graph), 3, vehicle_types=[VehicleType.CAR, VehicleType.BUS])
+    path = str(tmp_path / 'table.od')
+    table.save(path, key='key')
+    loaded = ODTable.load(path, key='key')
+
+    assert loaded.nodes == table.nodes, "Nodes must be restored"
+    for vehicle_type in (VehicleType.CAR, VehicleType.BUS):
+        assert np.array_equal(loaded.pairs[vehicle_type], table.pairs[vehicle_type]), "Pairs must be restored"
+        assert not loaded.pairs[vehicle_type].flags.writeable, "Pairs must be read-only views of the file"
+        assert loaded.sample(vehicle_type, random.Random(3)) == table.sample(vehicle_type, random.Random(3)), \
+            "Loaded table must draw the same pairs"
+
+def test_load_table_with_different_key(grid_graph, tmp_path):
+    path = str(tmp_path / 'table.od')
+    ODTable.from_routes(RouteCache.from_graph(grid_graph), 3, vehicle_types=[VehicleType.CAR]).save(path, key='key')
+    with pytest.raises(ValueError):
+        ODTable.load(path, key='other')
+
+def test_load_table_with_different_vehicle_types(grid_graph, tmp_path):
+    path = str(tmp_path / 'table.od')
+    ODTable.from_routes(RouteCache.from_graph(grid_graph), 3, vehicle_types=[VehicleType.CAR]).save(path)
+    longer_car = VehicleCatalog.from_config((dataclasses.replace(DEFAULT_VEHICLE_TYPES[0], length=8.),))
+    with pytest.raises(ValueError):
+        ODTable.load(path, catalog=longer_car)
+    with pytest.raises(ValueError):
+        ODTable.load(path, catalog=VehicleCatalog.from_config(DEFAULT_VEHICLE_TYPES[1:]))
@@ -0,0 +1,92 @@
+import random
+from collections import Counter
+
+import networkx as nx
+import pytest
+
+from ainter.models.data.osmnx import bfs_shortest_path
+from ainter.models.data.routing import RouteCache
+from ainter.models.nagel_schreckenberg.environment import Environment
+from test.ainter.models.nagel_schreckenberg.test_road import graph
+
+
+@pytest.fixture
+def cyclic_graph():
+    graph = nx.DiGraph()
+    graph.add_edges_from([(1, 2), (2, 3), (3, 1), (3, 4), (4, 5), (6, 4)], length=1.)
+    graph.add_node(7)
+    return graph
+
+def test_descendants_match_networkx(cyclic_graph):
+    routes = RouteCache.from_graph(cyclic_graph)
+
+    for node in cyclic_graph.nodes:
+        assert routes.get_descendants_count(node) == len(nx.descendants(cyclic_graph, node)), \
+            "Descendant count must match networkx"
+        for target in set(cyclic_graph.nodes) - {node}:
+            assert routes.is_reachable(node, target) == (target in nx.descendants(cyclic_graph, node)), \
+                "Reachability must match networkx"
+
+def test_node_reaches_itself_only_through_cycle(cyclic_graph):
+    routes = RouteCache.from_graph(cyclic_graph)
+    assert routes.is_reachable(1, 1), "Node on a cycle must reach itself"
+    assert not routes.is_reachable(4, 4), "Node outside of a cycle cannot reach itself"
+
+def test_starting_nodes(cyclic_graph):
+    routes = RouteCache.from_graph(cyclic_graph)
+    assert set(routes.starting_nodes) == {1, 2, 3, 4, 6}, "Only nodes with descendants can start a route"
+
+@pytest.mark.parametrize("node", [1, 3, 6])
+def test_sample_descendant_is_uniform(cyclic_graph, node):
+    routes = RouteCache.from_graph(cyclic_graph)
+    rng = random.Random(0)
+    expected = nx.descendants(cyclic_graph, node)
+
+    counts = Counter(routes.sample_descendant(node, rng) for _ in range(6000))
+
+    assert set(counts) == expected, "Every descendant and only descendants must be drawn"
+    assert max(counts.values()) - min(counts.values()) < 6000 / len(expected) * 0.2, "Draws must be uniform"
+
+def test_sample_without_descendants(cyclic_graph):
+    with pytest.raises(ValueError):
+        RouteCache.from_graph(cyclic_graph).sample_descendant(5, random.Random(0))
+
+def test_shortest_path_is_memoized(graph):
+    graph = nx.DiGraph(graph)
+    routes = RouteCache.from_graph(graph, max_size=2)
+    source, target = list(nx.topological_sort(graph))[0], list(nx.topological_sort(graph))[-1]
+
+    path = routes.get_shortest_path(source, target)
+    path.append(-1)
+
+    assert routes.get_shortest_path(source, target) == bfs_shortest_path(graph, source, target), \
+        "Cached path cannot be modified through a returned path"
+    assert (routes.hits, routes.misses) == (1, 1), "Second query must hit the cache"
+    assert routes.hit_rate == 0.5, "Hit rate must follow the counters"
+
+def test_cache_is_bounded(cyclic_graph):
+    routes = RouteCache.from_graph(cyclic_graph, max_size=2)
+
+    routes.get_shortest_path(1, 2)
+    routes.get_shortest_path(1, 3)
+    routes.get_shortest_path(1, 2)
+    routes.get_shortest_path(1, 4)
+
+    assert list(routes.paths) == [(1, 2), (1, 4)], "Least recently used path must be evicted"
+    assert (routes.hits, routes.misses) == (1, 3), "Counters must follow the queries"
+
+def test_invalid_cache_size(cyclic_graph):
+    with pytest.raises(ValueError):
+        RouteCache.from_graph(cyclic_graph, max_size=0)
+
+def test_routes_from_network_match_graph(graph):
+    environment = Environment.from_directed_graph(graph, 0, random.Random(0))
+    graph = environment.road_graph
+    from_graph = RouteCache.from_graph(environment.road_graph)
+    from_network = RouteCache.from_network(environment.network)
+
+    assert from_network.nodes == from_graph.nodes, "Nodes must follow the same order"
+    assert from_network.starting_nodes == from_graph.starting_nodes, "Starting nodes must match"
+    source, target = list(nx.topological_sort(graph))[0], list(nx.topological_sort(graph))[-1]
+    assert from_network.get_shortest_path(source, target) == from_graph.get_shortest_path(source, target), \
+        "Shortest paths must match"
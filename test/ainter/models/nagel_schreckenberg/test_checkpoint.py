@@ -0,0 +1,154 @@
+import dataclasses
+import json
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from ainter.configs.env_creation import EnvConfig
+from ainter.io.collector import load_table
+from ainter.models.nagel_schreckenberg import model as model_module
+from ainter.models.nagel_schreckenberg.checkpoint import save_checkpoint, load_checkpoint
+from ainter.models.nagel_schreckenberg.model import NaSchUrbanModel
+from ainter.models.nagel_schreckenberg.vectorized import VEHICLE_STATE
+from test.ainter.models.nagel_schreckenberg.test_road import graph
+
+
+@pytest.fixture
+def vectorized_config():
+    with open('./test/resources/czarnowiejska.json', 'r', encoding='utf-8') as in_file:
+        env_config = EnvConfig.from_json(json.load(in_file))
+    return dataclasses.replace(env_config,
+                               simulation=dataclasses.replace(env_config.simulation, engine='vectorized',
+                                                              metrics_interval=10))
+
+def run(model, steps):
+    for _ in range(steps):
+        model.step()
+
+def test_restored_model_continues_the_run(monkeypatch, graph, vectorized_config, tmp_path):
+    monkeypatch.setattr(model_module, "get_data_from_bbox", lambda config, **kwargs: graph)
+    model = NaSchUrbanModel(vectorized_config, seed=3, results_dir=str(tmp_path / 'original'))
+    run(model, 40)
+    save_checkpoint(model, str(tmp_path / 'model.ckpt'))
+    run(model, 40)
+    model.save_results()
+
+    restored = NaSchUrbanModel(vectorized_config, seed=11, results_dir=str(tmp_path / 'restored'))
+    load_checkpoint(restored, str(tmp_path / 'model.ckpt'))
+    assert restored.engine.num_vehicles > 0, "Checkpoint must hold the vehicles"
+    run(restored, 40)
+    restored.save_results()
+
+    assert restored.time == model.time, "Time must be restored"
+    assert np.array_equal(restored.engine.cells, model.engine.cells), "Road grids must match"
+    for name in VEHICLE_STATE:
+        assert np.array_equal(getattr(restored.engine, name), getattr(model.engine, name)), f"{name} must match"
+    assert restored.demand.get_queue_lengths() == model.demand.get_queue_lengths(), "Queues must match"
+    assert dict(restored.grid.road_vehicles) == dict(model.grid.road_vehicles), "Active set must match"
+
+    original_rows = load_table(str(tmp_path / 'original'), 'model')
+    restored_rows = load_table(str(tmp_path / 'restored'), 'model')
+    assert np.array_equal(original_rows['time'], restored_rows['time']), "Unwritten rows must be restored"
+    assert np.array_equal(original_rows['agent_count'], restored_rows['agent_count']), \
+        "Restored run must collect the same rows"
+    with np.load(tmp_path / 'original' / 'road_metrics.npz') as original, \
+            np.load(tmp_path / 'restored' / 'road_metrics.npz') as metrics:
+        assert np.array_equal(original['density'], metrics['density']), "Road metrics must be restored"
+
+def test_warm_start_with_own_random_streams(monkeypatch, graph, vectorized_config, tmp_path):
+    monkeypatch.setattr(model_module, "get_data_from_bbox", lambda config, **kwargs: graph)
+    model = NaSchUrbanModel(vectorized_config, seed=3, results_dir=str(tmp_path / 'original'))
+    run(model, 20)
+    save_checkpoint(model, str(tmp_path / 'model.ckpt'))
+
+    restored = NaSchUrbanModel(vectorized_config, seed=5, results_dir=str(tmp_path / 'restored'))
+    state = restored.streams.get_state()
+    load_checkpoint(restored, str(tmp_path / 'model.ckpt'), restore_random=False)
+
+    assert restored.streams.get_state() == state, "Model must keep its own random streams"
+    assert restored.time == model.time, "Time must be restored"
+
+def test_checkpoint_of_another_network(monkeypatch, graph, vectorized_config, tmp_path):
+    monkeypatch.setattr(model_module, "get_data_from_bbox", lambda config, **kwargs: graph)
+    model = NaSchUrbanModel(vectorized_config, seed=3, results_dir=str(tmp_path))
+    save_checkpoint(model, str(tmp_path / 'model.ckpt'))
+
+    other = graph.copy()
+    other.remove_node(list(nx.topological_sort(nx.DiGraph(graph)))[-1])
+    monkeypatch.setattr(model_module, "get_data_from_bbox", lambda config, **kwargs: other)
+    with pytest.raises(ValueError):
+        load_checkpoint(NaSchUrbanModel(vectorized_config, seed=3, results_dir=str(tmp_path)),
+                        str(tmp_path / 'model.ckpt'))
+
+@pytest.mark.parametrize('reserve_intersections', [False, True])
+def test_restored_agent_model_continues_the_run(monkeypatch, graph, vectorized_config, tmp_path,
+                                                reserve_intersections):
+    monkeypatch.setattr(model_module, "get_data_from_bbox", lambda config, **kwargs: graph)
+    env_config = dataclasses.replace(vectorized_config,
+                                     simulation=dataclasses.replace(vectorized_config.simulation, engine='agent',
+                                                                    reserve_intersections=reserve_intersections))
+    model = NaSchUrbanModel(env_config, seed=3, results_dir=str(tmp_path / 'original'))
+    run(model, 40)
+    while reserve_intersections and not any(x.manager is not None and len(x.manager.reservations) > 0
+                                            for x in model.grid.intersections.values()):
+        assert model.steps < 200, "Some vehicle must reserve a crossing"
+        model.step()
+    save_checkpoint(model, str(tmp_path / 'model.ckpt'))
+    run(model, 40)
+    model.save_results()
+
+    restored = NaSchUrbanModel(env_config, seed=11, results_dir=str(tmp_path / 'restored'))
+    load_checkpoint(restored, str(tmp_path / 'model.ckpt'))
+    assert restored.engine.num_vehicles > 0, "Checkpoint must hold the vehicles"
+    run(restored, 40)
+    restored.save_results()
+
+    assert restored.time == model.time, "Time must be restored"
+    original_columns = model.engine.get_vehicle_columns()
+    restored_columns = restored.engine.get_vehicle_columns()
+    order, restored_order = np.argsort(original_columns['vehicle_id']), np.argsort(restored_columns['vehicle_id'])
+    for name, column in original_columns.items():
+        assert np.array_equal(column[order], restored_columns[name][restored_order]), f"{name} must match"
+    for key, road in model.grid.roads.items():
+        assert restored.grid.roads[key].slots == road.slots, "Road slots must match"
+    assert dict(restored.grid.road_vehicles) == dict(model.grid.road_vehicles), "Active set must match"
+
+    original_rows = load_table(str(tmp_path / 'original'), 'model')
+    restored_rows = load_table(str(tmp_path / 'restored'), 'model')
+    assert np.array_equal(original_rows['agent_count'], restored_rows['agent_count']), \
+        "Restored run must collect the same rows"
+
+def test_checkpoint_of_another_engine(monkeypatch, graph, vectorized_config, tmp_path):
+    monkeypatch.setattr(model_module, "get_data_from_bbox", lambda config, **kwargs: graph)
+    save_checkpoint(NaSchUrbanModel(vectorized_config, seed=3, results_dir=str(tmp_path)), str(tmp_path / 'model.ckpt'))
+
+    env_config = dataclasses.replace(vectorized_config,
+                                     simulation=dataclasses.replace(vectorized_config.simulation, engine='agent'))
+    with pytest.raises(ValueError, match="engine"):
+        load_checkpoint(NaSchUrbanModel(env_config, seed=3, results_dir=str(tmp_path)), str(tmp_path / 'model.ckpt'))
+
+def test_checkpoint_of_another_discretization(monkeypatch, graph, vectorized_config, tmp_path):
+    monkeypatch.setattr(model_module, "get_data_from_bbox", lambda config, **kwargs: graph)
+    model = NaSchUrbanModel(vectorized_config, seed=3, results_dir=str(tmp_path))
+    save_checkpoint(model, str(tmp_path / 'model.ckpt'))
+
+    coarse_config = dataclasses.replace(vectorized_config,
+                                        physics=dataclasses.replace(vectorized_config.physics, cell_size=7.5))
+    coarse = NaSchUrbanModel(coarse_config, seed=3, results_dir=str(tmp_path))
+    run(coarse, 20)
+    assert coarse.engine.cells.size < model.engine.cells.size, "Coarse cells must shrink the road grids"
+    with pytest.raises(ValueError):
+        load_checkpoint(NaSchUrbanModel(coarse_config, seed=3, results_dir=str(tmp_path)),
+                        str(tmp_path / 'model.ckpt'))
+
+def test_checkpoint_of_other_vehicle_types(monkeypatch, graph, vectorized_config, tmp_path):
+    monkeypatch.setattr(model_module, "get_data_from_bbox", lambda config, **kwargs: graph)
+    model = NaSchUrbanModel(vectorized_config, seed=3, results_dir=str(tmp_path))
+    save_checkpoint(model, str(tmp_path / 'model.ckpt'))
+
+    vehicles = vectorized_config.vehicles
+    other_config = dataclasses.replace(vectorized_config,
+                                       vehicles=dataclasses.replace(vehicles, types=vehicles.types[:2]))
+    with pytest.raises(ValueError, match="vehicle types"):
+        load_checkpoint(NaSchUrbanModel(other_config, seed=3, results_dir=str(tmp_path)), str(tmp_path / 'model.ckpt'))
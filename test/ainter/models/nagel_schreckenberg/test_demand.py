@@ -0,0 +1,104 @@
+from datetime import time
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from ainter.configs.env_creation import DEFAULT_VEHICLE_TYPES
+from ainter.models.data.od_table import ODTable
+from ainter.models.data.routing import RouteCache
+from ainter.models.nagel_schreckenberg.arrivals import BernoulliArrivals, PoissonArrivals, get_arrival_process
+from ainter.models.nagel_schreckenberg.demand import DemandGenerator
+from ainter.models.nagel_schreckenberg.units import UniformTimeDensity, NormalTimeDensity, Discretization
+from ainter.models.vehicles.catalog import VehicleCatalog
+from test.ainter.test_fixtures import seed
+from test.ainter.models.nagel_schreckenberg.test_road import graph
+
+
+class FixedCapacityEngine:
+
+    def __init__(self, free_cells: int) -> None:
+        self.free_cells = free_cells
+
+    def get_free_entry_cells(self, roads):
+        return np.full(shape=len(roads), fill_value=self.free_cells, dtype=np.int64)
+
+
+@pytest.fixture
+def routes(graph):
+    return RouteCache.from_graph(nx.DiGraph(graph))
+
+@pytest.fixture
+def demand(routes, seed):
+    return DemandGenerator(od_table=ODTable.from_routes(routes, 2),
+                           routes=routes,
+                           time_density=UniformTimeDensity(1.),
+                           arrival_process=PoissonArrivals(5.),
+                           rng=np.random.default_rng(seed))
+
+@pytest.mark.parametrize("intensity", [0., 0.3, 1.])
+def test_bernoulli_arrivals(intensity):
+    rng = np.random.default_rng(0)
+    counts = [BernoulliArrivals()(intensity, rng) for _ in range(10_000)]
+
+    assert set(counts) <= {0, 1}, "At most one vehicle can arrive"
+    assert np.mean(counts) == pytest.approx(intensity, abs=0.02), "Arrival probability must follow the intensity"
+
+@pytest.mark.parametrize("rate,intensity", [(10., 0.5), (3., 1.)])
+def test_poisson_arrivals(rate, intensity):
+    rng = np.random.default_rng(0)
+    counts = [PoissonArrivals(rate)(intensity, rng) for _ in range(10_000)]
+
+    assert np.mean(counts) == pytest.approx(rate * intensity, rel=0.05), "Mean must be the rate times the intensity"
+
+def test_get_arrival_process():
+    assert isinstance(get_arrival_process("bernoulli"), BernoulliArrivals), "Code must select the process"
+    assert get_arrival_process("poisson", 7.).rate == 7., "Rate must be passed to the process"
+
+    with pytest.raises(ValueError, match="Unknown arrival process code provided"):
+        get_arrival_process("unknown")
+
+    with pytest.raises(ValueError):
+        PoissonArrivals(-1.)
+
+def test_arrivals_wait_in_origin_queues(demand):
+    arrived = sum(demand.arrive(0) for _ in range(10))
+
+    assert demand.arrived == demand.queued == arrived, "Every arrival must be queued"
+    assert sum(demand.get_queue_lengths().values()) == arrived, "Queues must hold every arrival"
+    for origin, queue in demand.queues.items():
+        assert all(path[0] == origin for _, path in queue), "Vehicle must wait at the origin of its path"
+
+def test_blocked_queues_are_counted(demand):
+    demand.arrive(0)
+    queued = demand.queued
+
+    assert demand.release(FixedCapacityEngine(0)) == [], "Vehicles cannot enter a full road"
+    assert demand.blocked == queued, "Every waiting vehicle must be counted as blocked"
+
+def test_release_queue_heads(demand):
+    for _ in range(10):
+        demand.arrive(0)
+    heads = {origin: queue[0] for origin, queue in demand.queues.items()}
+    queued = demand.queued
+
+    released = demand.release(FixedCapacityEngine(1000))
+
+    assert released == list(heads.values()), "Only the head of every origin queue can enter"
+    assert demand.released == len(released), "Released vehicles must be counted"
+    assert demand.queued == queued - len(released), "Released vehicles must leave the queues"
+
+@pytest.mark.parametrize("delta_time", [0.5, 1., 2.])
+def test_arrivals_follow_the_clock(routes, delta_time):
+    catalog = VehicleCatalog.from_config(DEFAULT_VEHICLE_TYPES, Discretization(delta_time=delta_time))
+    demand = DemandGenerator(od_table=ODTable.from_routes(routes, 2, catalog=catalog),
+                             routes=routes,
+                             time_density=NormalTimeDensity(),
+                             arrival_process=PoissonArrivals(10.),
+                             rng=np.random.default_rng(0),
+                             catalog=catalog)
+    peak = catalog.discretization.discretize_time(time(8))
+    counts = [demand.arrive(peak) for _ in range(2_000)]
+
+    expected = 10. * NormalTimeDensity()(8 * 3600.) * delta_time
+    assert np.mean(counts) == pytest.approx(expected, rel=0.1), "Arrivals must follow the intensity per second"
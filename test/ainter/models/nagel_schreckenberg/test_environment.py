@@ -0,0 +1,144 @@
+import itertools
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from ainter.configs.env_creation import SignalsConfig, GreenWaveConfig
+from ainter.models.nagel_schreckenberg.engine import AgentStepEngine
+from ainter.models.nagel_schreckenberg.environment import Environment
+from ainter.models.nagel_schreckenberg.model import configure_signals
+from ainter.models.nagel_schreckenberg.units import Discretization
+from ainter.models.nagel_schreckenberg.vectorized import VectorizedStepEngine
+from ainter.models.vehicles.vehicle import VehicleType, is_road_position
+from test.ainter.test_fixtures import seed
+from test.ainter.models.nagel_schreckenberg.test_road import graph, env_config, dummy_model
+
+
+@pytest.fixture
+def environment(graph, seed):
+    return Environment.from_directed_graph(graph, 0, random.Random(seed))
+
+def test_new_environment_is_inactive(environment):
+    assert len(environment.active_roads) == 0, "No road can be active without vehicles"
+    assert len(environment.active_intersections) == 0, "No intersection can be active without vehicles"
+
+def test_road_activates_its_end_intersection(environment):
+    start, end = next(iter(environment.roads))
+    environment.enter((start, end), count=2)
+    assert set(environment.active_roads) == {(start, end)}, "Road with vehicles must be active"
+    assert set(environment.active_intersections) == {end}, "Vehicles approach the intersection at the road end"
+
+    environment.leave((start, end))
+    assert set(environment.active_roads) == {(start, end)}, "Road must stay active until its last vehicle leaves"
+    environment.leave((start, end))
+    assert len(environment.active_roads) == 0, "Empty road must be deactivated"
+    assert len(environment.active_intersections) == 0, "Intersection without vehicles must be deactivated"
+
+def test_leave_without_enter(environment):
+    with pytest.raises(AssertionError):
+        environment.leave(next(iter(environment.roads)))
+
+def test_signal_bank_covers_intersections(environment):
+    signals = environment.signals
+    assert len(signals.green_duration) == len(environment.intersections), "Every intersection must have a plan"
+    for intersection in environment.intersections.values():
+        start, end = signals.approach_start[intersection.signal_index:intersection.signal_index + 2]
+        assert signals.approach_direction[start:end].tolist() == intersection.get_phases(), \
+            "Phases must follow the incoming directions"
+
+def test_green_durations_follow_the_time_step(graph, seed):
+    environment = Environment.from_directed_graph(graph, 0, random.Random(seed))
+    halved = Environment.from_directed_graph(graph, 0, random.Random(seed),
+                                             discretization=Discretization(delta_time=.5))
+    assert np.array_equal(halved.signals.green_duration, 2 * environment.signals.green_duration), \
+        "Green durations must last the same time in seconds"
+
+def test_signals_follow_the_time(environment):
+    states = [environment.get_signal_states()]
+    for _ in range(200):
+        environment.step()
+        states.append(environment.get_signal_states())
+
+    intersection = next(x for x in environment.intersections.values() if len(x.in_edge_directions) > 0)
+    direction = next(iter(intersection.in_edge_directions.values())).direction
+    approach = environment.signals.get_approach(intersection.signal_index, direction)
+    assert intersection.has_right_of_way(direction, environment.time) == states[-1][approach], \
+        "Single lookup must agree with the bank"
+    assert all(np.sum(state[environment.signals.approach_intersection == intersection.signal_index]) == 1
+               for state in states), "Exactly one approach must have the green light"
+
+def test_green_wave(environment, graph):
+    path = list(nx.topological_sort(nx.DiGraph(graph)))
+    environment.set_green_wave(path, speed=10., start=100, green_duration=20)
+
+    arrival = 100.
+    for previous, position in itertools.pairwise(path):
+        arrival += environment.roads[previous, position].length / 10.
+        direction = environment.intersections[position].in_edge_directions[previous].direction
+        assert environment.intersections[position].has_right_of_way(direction, int(np.round(arrival))), \
+            "Vehicle driving at the wave speed must get the green light"
+
+@pytest.mark.parametrize('speed', [0., -1.])
+def test_invalid_green_wave_speed(environment, graph, speed):
+    with pytest.raises(ValueError):
+        environment.set_green_wave(list(nx.topological_sort(nx.DiGraph(graph))), speed=speed)
+
+def test_green_wave_must_follow_roads(environment, graph):
+    path = list(nx.topological_sort(nx.DiGraph(graph)))
+    with pytest.raises(ValueError):
+        environment.set_green_wave(path[::-1], speed=10.)
+
+def test_vectorized_engine_keeps_active_set(environment, graph, seed):
+    engine = VectorizedStepEngine(environment, np.random.default_rng(seed))
+    path = list(nx.topological_sort(nx.DiGraph(graph)))
+    for vehicle_type in list(VehicleType) * 3:
+        engine.spawn(vehicle_type, path)
+
+    for _ in range(500):
+        engine.step()
+        roads = {engine.road_keys[road] for road in engine.road[engine.on_road].tolist()}
+        waiting = {engine.road_keys[road][0] for road in engine.road[~engine.on_road].tolist()}
+        assert set(environment.active_roads) == roads, "Active roads must hold the vehicles"
+        assert set(environment.active_intersections) == {end for _, end in roads} | waiting, \
+            "Active intersections must have vehicles on them or approaching them"
+        if engine.num_vehicles == 0:
+            break
+
+    assert engine.num_vehicles == 0, "Vehicles must finish their paths"
+    assert len(environment.active_roads) == 0, "Roads must be deactivated once vehicles leave"
+
+@pytest.mark.parametrize("reserve_intersections", [False, True])
+def test_agent_engine_keeps_active_set(dummy_model, reserve_intersections):
+    dummy_model.reserve_intersections = reserve_intersections
+    engine = AgentStepEngine(dummy_model)
+    path = list(nx.topological_sort(nx.DiGraph(dummy_model.graph)))
+    for vehicle_type in VehicleType:
+        engine.spawn(vehicle_type, path)
+
+    for _ in range(500):
+        engine.step()
+        dummy_model.grid.step()
+        positions = [agent.pos for agent in dummy_model.agents]
+        roads = {position for position in positions if is_road_position(position)}
+        assert set(dummy_model.grid.active_roads) == roads, "Active roads must hold the vehicles"
+        if engine.num_vehicles == 0:
+            break
+
+    assert engine.num_vehicles == 0, "Vehicles must finish their paths"
+    assert len(dummy_model.grid.active_intersections) == 0, "Intersections must be deactivated once vehicles leave"
+
+def test_configure_signals(environment, graph):
+    path = list(nx.topological_sort(nx.DiGraph(graph)))
+    configure_signals(environment, SignalsConfig(offsets={path[0]: 7.},
+                                                 green_waves=(GreenWaveConfig(nodes=tuple(path[1:]), speed=36.),)))
+
+    assert environment.signals.offset[environment.intersections[path[0]].signal_index] == 7, \
+        "Offsets must be converted into time steps"
+    assert environment.signals.offset[environment.intersections[path[1]].signal_index] == 0, \
+        "Green wave must start at its start time"
+
+def test_configure_signals_of_unknown_intersection(environment):
+    with pytest.raises(ValueError):
+        configure_signals(environment, SignalsConfig(offsets={-1: 7.}))
@@ -1,8 +1,9 @@
+import numpy as np
 import pytest
 from shapely import LineString
 
 from ainter.models.autonomous_intersection.intersection_directions import IntersectionEntranceDirection
-from ainter.models.nagel_schreckenberg.intersection import create_edge_directions
+from ainter.models.nagel_schreckenberg.intersection import create_edge_directions, Intersection
 
 
 @pytest.fixture
@@ -13,6 +14,15 @@ def intersection_data():
         'y': 100.0
     }
 
+@pytest.fixture
+def crossroads(intersection_data):
+    edges_info = dict()
+    for neighbour, (x, y) in enumerate([(100., 120.), (120., 100.), (100., 80.), (80., 100.)], start=1):
+        edges_info[(neighbour, 123)] = {'geometry': LineString([[x, y], [100., 100.]]), 'name': 'abc', 'lanes': 1}
+        edges_info[(123, neighbour)] = {'geometry': LineString([[100., 100.], [x, y]]), 'name': 'abc', 'lanes': 1}
+
+    return Intersection.from_graph_data(intersection_data['osm_id'], edges_info, intersection_data)
+
 def test_empty_edges(intersection_data):
     edge_directions, used_directions = create_edge_directions(
         intersection_data['osm_id'],
@@ -223,3 +233,54 @@ def test_all_directions_with_incoming_outgoing(intersection_data):
     assert (IntersectionEntranceDirection.WEST, False) in used_directions
     assert (IntersectionEntranceDirection.SOUTH, True) in used_directions
     assert (IntersectionEntranceDirection.SOUTH, False) in used_directions
+
+def test_vehicle_crosses_on_its_reservation(crossroads):
+    crossing = {'time': 0, 'entry_node': 1, 'exit_node': 3, 'speed': np.int8(2)}
+    assert crossroads.can_accept_agent(1, np.uint16(2), **crossing), "Empty intersection must accept the vehicle"
+    assert crossroads.can_accept_agent(1, np.uint16(2), **crossing), "Check must not take the crossing"
+    crossroads.reserve_crossing(1, np.uint16(2), **crossing)
+    crossroads.add_agent(1)
+    assert crossroads.contains_agent(1), "Accepted vehicle must be on the intersection"
+
+    distances = list()
+    for time in range(1, 100):
+        distances.append(int(crossroads.get_obstacle_distance(1, time=time)))
+        assert crossroads.move_agent(1, np.int8(5), time=time) == 2, "Vehicle must drive at its reserved speed"
+        if crossroads.is_agent_leaving(1, np.int8(2), time=time):
+            break
+
+    assert distances == sorted(distances, reverse=True), "Vehicle must approach the exit"
+    assert time + 1 == crossroads.manager.get_reservation(1).end, "Vehicle must leave with its reservation"
+    crossroads.remove_agent(1)
+    assert not crossroads.contains_agent(1), "Removed vehicle cannot be on the intersection"
+    assert crossroads.manager.get_reservation(1) is None, "Removed vehicle must release its reservation"
+
+def test_conflicting_vehicle_waits(crossroads):
+    assert crossroads.can_accept_agent(1, np.uint16(6), time=0, entry_node=1, exit_node=3, speed=np.int8(1))
+    crossroads.reserve_crossing(1, np.uint16(6), time=0, entry_node=1, exit_node=3, speed=np.int8(1))
+    assert not crossroads.can_accept_agent(2, np.uint16(6), time=0, entry_node=2, exit_node=4, speed=np.int8(1)), \
+        "Vehicle crossing the reserved trajectory must wait"
+    assert crossroads.can_accept_agent(2, np.uint16(6), time=0, entry_node=3, exit_node=1, speed=np.int8(1)), \
+        "Vehicle from the opposite lane can cross"
+    assert crossroads.can_accept_agent(3, np.uint16(6), time=0), "Vehicle finishing its path is always accepted"
+
+def test_vehicle_waits_at_the_exit(crossroads):
+    crossroads.reserve_crossing(1, np.uint16(2), time=0, entry_node=1, exit_node=3, speed=np.int8(2))
+    crossroads.add_agent(1)
+    end = crossroads.manager.get_reservation(1).end
+
+    assert crossroads.move_agent(1, np.int8(2), time=end + 3) == 0, "Vehicle waiting for its road must stand"
+    assert crossroads.is_agent_leaving(1, np.int8(0), time=end + 3), "Waiting vehicle must keep trying to leave"
+    assert np.any(crossroads.manager.get_occupancy(end + 3) == 1), "Waiting vehicle must stay on the grid"
+
+def test_vehicle_does_not_block_the_grid(crossroads):
+    crossing = {'time': 0, 'entry_node': 1, 'exit_node': 3, 'speed': np.int8(2)}
+    assert not crossroads.can_accept_agent(1, np.uint16(2), exit_free_cells=1, **crossing), \
+        "Vehicle cannot enter without room on its exit road"
+    assert crossroads.can_accept_agent(1, np.uint16(2), exit_free_cells=2, **crossing), \
+        "Vehicle enters once its exit road has room"
+    crossroads.reserve_crossing(1, np.uint16(2), **crossing)
+
+    crossing |= {'entry_node': 2}
+    assert not crossroads.can_accept_agent(2, np.uint16(2), exit_free_cells=10, **crossing), \
+        "Exit held by a vehicle on the grid cannot be entered"
@@ -0,0 +1,86 @@
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from ainter.models.nagel_schreckenberg.engine import AgentStepEngine
+from ainter.models.nagel_schreckenberg.environment import Environment
+from ainter.models.nagel_schreckenberg.metrics import RoadMetrics, ROAD_METRICS_FILE
+from ainter.models.nagel_schreckenberg.units import CELL_SIZE, Discretization
+from ainter.models.nagel_schreckenberg.vectorized import VectorizedStepEngine
+from ainter.models.vehicles.vehicle import VehicleType
+from test.ainter.test_fixtures import seed
+from test.ainter.models.nagel_schreckenberg.test_road import graph, env_config, dummy_model
+
+
+@pytest.fixture
+def environment(graph, seed):
+    return Environment.from_directed_graph(graph, 0, random.Random(seed))
+
+def test_empty_network(environment):
+    metrics = RoadMetrics(environment, intervals=2)
+    empty = np.zeros(shape=0, dtype=np.int64)
+    metrics.measure(0, road=empty, lane=empty, speed=empty)
+
+    tables = metrics.get_tables()
+    assert tables['density'].shape == (1, len(environment.roads)), "Rows must follow the measurements"
+    assert np.all(tables['density'] == 0), "Empty roads must have no density"
+    assert np.all(tables['flow'] == 0), "Empty roads must have no flow"
+    assert np.all(np.isnan(tables['speed'])), "Speed of an empty road is not defined"
+
+def test_single_vehicle(environment):
+    metrics = RoadMetrics(environment, intervals=1)
+    road = next(iter(environment.roads.values()))
+    metrics.measure(5, road=np.array([0]), lane=np.array([0]), speed=np.array([2]))
+
+    cells, lanes = road.shape
+    speed = 2 * CELL_SIZE
+    lane_density = 1000. / (cells * CELL_SIZE)
+    assert metrics.time[0] == 5, "Measurement time must be kept"
+    assert metrics.speed[0, 0] == pytest.approx(speed), "Speed must be converted to meters per second"
+    assert metrics.lane_density[0, 0] == pytest.approx(lane_density), "Lane density must be in vehicles per km"
+    assert metrics.density[0, 0] == pytest.approx(lane_density / lanes), "Road density must count all lanes"
+    assert metrics.lane_flow[0, 0] == pytest.approx(lane_density * speed * 3.6), \
+        "Flow must be the product of density and speed"
+    assert np.count_nonzero(metrics.density) == 1, "Other roads must stay empty"
+
+def test_metrics_follow_discretization(graph, seed):
+    environment = Environment.from_directed_graph(graph, 0, random.Random(seed),
+                                                  discretization=Discretization(cell_size=7.5, delta_time=0.5))
+    metrics = RoadMetrics(environment, intervals=1)
+    metrics.measure(0, road=np.array([0]), lane=np.array([0]), speed=np.array([1]))
+
+    cells, _ = environment.roads[next(iter(environment.roads))].shape
+    assert metrics.speed[0, 0] == pytest.approx(15.), "Speed must follow the cell size and time step"
+    assert metrics.lane_density[0, 0] == pytest.approx(1000. / (cells * 7.5)), "Density must follow the cell size"
+
+def test_measure_beyond_intervals(environment):
+    metrics = RoadMetrics(environment, intervals=1)
+    empty = np.zeros(shape=0, dtype=np.int64)
+    metrics.measure(0, road=empty, lane=empty, speed=empty)
+    with pytest.raises(AssertionError):
+        metrics.measure(1, road=empty, lane=empty, speed=empty)
+
+def test_engines_agree_on_road_vehicles(dummy_model, environment, seed):
+    path = list(nx.topological_sort(nx.DiGraph(dummy_model.graph)))
+    engines = [AgentStepEngine(dummy_model), VectorizedStepEngine(environment, np.random.default_rng(seed))]
+    for engine in engines:
+        engine.spawn(VehicleType.CAR, path)
+        engine.step()
+        engine.step()
+
+    for engine in engines:
+        columns = engine.get_road_vehicle_columns()
+        assert columns['road'].tolist() == [0], "Vehicle must stand on the first road"
+        assert set(columns) == {'road', 'lane', 'speed'}, "Columns must be named consistently"
+
+def test_save(environment, tmp_path):
+    metrics = RoadMetrics(environment, intervals=3)
+    metrics.measure(0, road=np.array([1]), lane=np.array([0]), speed=np.array([1]))
+    path = metrics.save(str(tmp_path))
+
+    assert path == str(tmp_path / ROAD_METRICS_FILE), "Metrics must be saved into the directory"
+    with np.load(path) as data:
+        assert data['flow'].shape == (1, len(environment.roads)), "Only measured rows must be saved"
+        assert data['lane_road'].tolist() == metrics.lane_road.tolist(), "Lanes must map to their roads"
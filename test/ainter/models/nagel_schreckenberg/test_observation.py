@@ -0,0 +1,88 @@
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from ainter.models.nagel_schreckenberg.engine import AgentStepEngine
+from ainter.models.nagel_schreckenberg.environment import Environment
+from ainter.models.nagel_schreckenberg.observation import ObservationBuffer, ObservationLayout, APPROACH_SEGMENT
+from ainter.models.nagel_schreckenberg.vectorized import VectorizedStepEngine
+from ainter.models.vehicles.vehicle import VehicleType
+from test.ainter.test_fixtures import seed
+from test.ainter.models.nagel_schreckenberg.test_road import graph, env_config, dummy_model
+
+
+@pytest.fixture
+def environment(graph, seed):
+    return Environment.from_directed_graph(graph, 0, random.Random(seed))
+
+def test_layout_covers_every_grid(environment):
+    layout = ObservationLayout.from_environment(environment, approach_cells=4)
+    approaches = layout.kind == APPROACH_SEGMENT
+
+    assert layout.size == sum(x.grid.size for x in environment.intersections.values()) + \
+           sum(x.shape[0] * x.shape[1] for x in environment.roads.values()), "Buffer must hold every grid"
+    assert np.count_nonzero(approaches) == len(environment.roads), "Every road must approach its end intersection"
+    assert np.all(layout.rows[approaches] <= 4), "Approaches are the last cells of the roads"
+    assert np.all(layout.offset + layout.rows * layout.cols <= layout.size), "Segments must fit in the buffer"
+    assert np.array_equal(layout.offset, ObservationLayout.from_environment(environment, 4).offset), \
+        "Layout must be stable"
+
+def test_views_are_read_only(environment):
+    observation = ObservationBuffer(environment, approach_cells=4)
+    position = next(x for x in environment.intersections.values() if not x.is_end_of_the_road()).osm_id
+
+    for view in [observation.get_intersection(position), *observation.get_approaches(position)]:
+        assert np.shares_memory(view, observation.data), "Views cannot copy the buffer"
+        with pytest.raises(ValueError):
+            view[:] = 1
+
+def test_vectorized_engine_writes_into_buffer(environment, graph, seed):
+    observation = ObservationBuffer(environment, approach_cells=4)
+    engine = VectorizedStepEngine(environment, np.random.default_rng(seed), cells=observation.road_cells)
+    path = list(nx.topological_sort(nx.DiGraph(graph)))
+    for vehicle_type in list(VehicleType) * 3:
+        engine.spawn(vehicle_type, path)
+
+    views = {key: observation.get_approach(*key) for key in environment.roads}
+    seen = 0
+    for _ in range(100):
+        engine.step()
+        for key, view in views.items():
+            assert np.array_equal(view, environment.roads[key].grid[-4:]), "Approach must show the road tail"
+            seen += np.count_nonzero(view)
+    assert seen > 0, "Vehicles must pass the approaches"
+
+def test_vectorized_engine_rejects_other_buffer(environment, seed):
+    with pytest.raises(ValueError):
+        VectorizedStepEngine(environment, np.random.default_rng(seed), cells=np.zeros(shape=3, dtype=np.uint16))
+
+def test_agent_engine_updates_intersection_grids(dummy_model):
+    dummy_model.reserve_intersections = True
+    environment = dummy_model.grid
+    observation = ObservationBuffer(environment)
+    engine = AgentStepEngine(dummy_model)
+    path = list(nx.topological_sort(nx.DiGraph(dummy_model.graph)))
+    for vehicle_type in VehicleType:
+        engine.spawn(vehicle_type, path)
+
+    seen = 0
+    for _ in range(300):
+        engine.step()
+        environment.step()
+        for position, intersection in environment.intersections.items():
+            view = observation.get_intersection(position)
+            if intersection.manager is not None:
+                assert np.array_equal(view, intersection.manager.get_occupancy(environment.time)), \
+                    "Grid must show the reserved crossings"
+            seen += np.count_nonzero(view)
+        if engine.num_vehicles == 0:
+            break
+
+    assert seen > 0, "Vehicles must cross the intersections"
+    assert not np.any(observation.buffer), "Buffer must be empty once the vehicles leave"
+
+def test_invalid_approach_cells(environment):
+    with pytest.raises(ValueError):
+        ObservationBuffer(environment, approach_cells=0)
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from ainter.models.nagel_schreckenberg.network import StaticNetwork
+from ainter.models.nagel_schreckenberg.partition import partition_network, get_cut_edges, get_road_cells
+
+
+@pytest.fixture
+def grid_network():
+    size = 8
+    node_x, node_y = np.meshgrid(np.arange(size, dtype=np.float64), np.arange(size, dtype=np.float64))
+    index = np.arange(size * size).reshape(size, size)
+    horizontal = np.stack((index[:, :-1].ravel(), index[:, 1:].ravel()))
+    vertical = np.stack((index[:-1, :].ravel(), index[1:, :].ravel()))
+    edges = np.concatenate((horizontal, horizontal[::-1], vertical, vertical[::-1]), axis=1)
+    return StaticNetwork(node_id=np.arange(size * size, dtype=np.int64),
+                         node_x=node_x.ravel(),
+                         node_y=node_y.ravel(),
+                         edge_source=edges[0],
+                         edge_target=edges[1],
+                         edge_length=np.full(shape=edges.shape[1], fill_value=100.),
+                         edge_lanes=np.ones(shape=edges.shape[1], dtype=np.int64),
+                         edge_max_speed=np.full(shape=edges.shape[1], fill_value=13.9))
+
+def test_single_partition_holds_every_node(grid_network):
+    assert np.all(partition_network(grid_network, 1) == 0), "Single partition must hold every node"
+
+@pytest.mark.parametrize('parts', [2, 3, 4])
+def test_partitions_are_balanced(grid_network, parts):
+    node_part = partition_network(grid_network, parts)
+    road_part = node_part[grid_network.edge_source]
+    cells = np.bincount(road_part, weights=get_road_cells(grid_network), minlength=parts)
+
+    assert set(node_part.tolist()) == set(range(parts)), "Every partition must hold some nodes"
+    assert np.max(cells) / np.mean(cells) < 1.2, "Partitions must have similar number of cells"
+
+def test_bisection_cuts_grid_in_half(grid_network):
+    node_part = partition_network(grid_network, 2)
+
+    assert np.sum(get_cut_edges(grid_network, node_part)) == 16, "Bisection must cut one row of roads both ways"
+    assert np.array_equal(node_part, partition_network(grid_network, 2)), "Partition must be deterministic"
+
+@pytest.mark.parametrize('parts', [0, -1])
+def test_invalid_number_of_partitions(grid_network, parts):
+    with pytest.raises(ValueError):
+        partition_network(grid_network, parts)
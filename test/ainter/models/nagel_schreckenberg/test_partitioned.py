@@ -0,0 +1,61 @@
+import json
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from ainter.configs.env_creation import EnvConfig
+from ainter.models.nagel_schreckenberg import model as model_module
+from ainter.models.nagel_schreckenberg.environment import Environment
+from ainter.models.nagel_schreckenberg.partitioned import PartitionStepEngine, PartitionedSimulation
+from ainter.models.vehicles.vehicle import VehicleType
+from test.ainter.test_fixtures import seed
+from test.ainter.models.nagel_schreckenberg.test_road import graph
+
+
+@pytest.fixture
+def partition_config():
+    with open('./test/resources/czarnowiejska.json', 'r', encoding='utf-8') as in_file:
+        return EnvConfig.from_json(json.load(in_file))
+
+def test_vehicle_is_handed_over_between_regions(graph, seed):
+    path = list(nx.topological_sort(nx.DiGraph(graph)))
+    road_part = np.array([0, 1, 0], dtype=np.int64)
+    engines = [PartitionStepEngine(Environment.from_directed_graph(graph, 0, random.Random(seed)),
+                                   np.random.default_rng(seed), road_part, part) for part in range(2)]
+    engines[0].spawn_vehicle(7, VehicleType.CAR, path)
+
+    visited_parts = list()
+    for _ in range(1000):
+        for engine in engines:
+            engine.step()
+        for leaving in [engine.pop_leaving() for engine in engines]:
+            for part, batch in leaving.items():
+                assert np.array_equal(batch['ids'], [7]), "Only the spawned vehicle can leave"
+                engines[part].add_vehicles(batch)
+                visited_parts.append(part)
+        if sum(engine.num_vehicles for engine in engines) == 0:
+            break
+
+    assert visited_parts == [1, 0], "Vehicle must cross into every region on its path"
+    assert all(np.all(engine.cells == 0) for engine in engines), "Roads must be empty"
+
+def test_partitioned_simulation_is_deterministic(monkeypatch, graph, partition_config, tmp_path):
+    monkeypatch.setattr(model_module, "get_data_from_bbox", lambda config, **kwargs: graph)
+
+    counts = list()
+    for run in range(2):
+        with PartitionedSimulation(partition_config, 2, seed=3, work_dir=str(tmp_path / str(run))) as simulation:
+            run_counts = list()
+            for _ in range(60):
+                simulation.step()
+                run_counts.append(simulation.num_vehicles)
+            report = simulation.get_partition_report()
+        counts.append(run_counts)
+
+    assert counts[0] == counts[1], "Same seed must give the same run"
+    assert max(counts[0]) > 0, "Vehicles must enter the network"
+    assert np.sum(report['cells']) > 0, "Report must count the road cells"
+    assert len(report['mean_step_time']) == 2, "Report must time every region"
+    assert report['imbalance'] >= 1., "Imbalance cannot be lower than one"
@@ -0,0 +1,72 @@
+import dataclasses
+import json
+
+import pytest
+
+from ainter.configs.env_creation import EnvConfig
+from ainter.models.nagel_schreckenberg import model as model_module
+from ainter.models.nagel_schreckenberg.model import NaSchUrbanModel
+from ainter.models.nagel_schreckenberg.profiling import StepProfile, STEP_PHASES
+from test.ainter.models.nagel_schreckenberg.test_road import graph
+
+
+class FakeClock:
+
+    def __init__(self) -> None:
+        self.now = 0.
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def env_config():
+    with open('./test/resources/czarnowiejska.json', 'r', encoding='utf-8') as in_file:
+        return EnvConfig.from_json(json.load(in_file))
+
+def test_nested_phases_are_exclusive():
+    clock = FakeClock()
+    profile = StepProfile(clock=clock)
+
+    with profile.phase('agents'):
+        clock.now = 1.
+        with profile.phase('removal'):
+            clock.now = 3.
+        clock.now = 4.
+    profile.steps += 1
+
+    assert profile.times['agents'] == 2., "Nested phase must pause the outer phase"
+    assert profile.times['removal'] == 2., "Nested phase must be timed"
+    assert profile.total_time == 4., "Phases must add up to the profiled time"
+    assert profile.get_summary()['phases']['agents']['share'] == .5, "Share must be relative to the total time"
+
+def test_summary_of_counters():
+    profile = StepProfile()
+    profile.steps = 4
+    profile.count('road.move_agent', 10)
+    profile.count('road.move_agent')
+
+    summary = profile.get_summary()
+    assert summary['counters']['road.move_agent'] == {'count': 11, 'per_step': 2.75}, "Counters must be summed"
+    assert any('road.move_agent' in line for line in profile.format_summary()), "Summary must list the counters"
+
+    profile.reset()
+    assert profile.steps == 0 and len(profile.counters) == 0, "Reset must clear the profile"
+
+@pytest.mark.parametrize("engine", ['agent', 'vectorized'])
+def test_model_step_is_profiled(monkeypatch, graph, env_config, tmp_path, engine):
+    monkeypatch.setattr(model_module, "get_data_from_bbox", lambda config, **kwargs: graph)
+    env_config = dataclasses.replace(env_config,
+                                     simulation=dataclasses.replace(env_config.simulation, engine=engine))
+    model = NaSchUrbanModel(env_config, seed=5, results_dir=str(tmp_path))
+    for _ in range(60):
+        model.step()
+
+    profile = model.profile
+    assert profile.steps == 60, "Every step must be profiled"
+    assert all(profile.times[name] > 0 for name in STEP_PHASES), "Every phase must be timed"
+    assert len(profile.stack) == 0, "Every phase must be closed"
+    assert profile.counters['moved_vehicles'] > 0, "Moved vehicles must be counted"
+    if engine == 'agent':
+        assert profile.counters['road.move_agent'] > 0, "Road calls must be counted"
+        assert profile.counters['intersection.can_accept_agent'] > 0, "Intersection calls must be counted"
@@ -0,0 +1,52 @@
+import json
+
+import numpy as np
+import pytest
+
+from ainter.configs.env_creation import EnvConfig
+from ainter.models.nagel_schreckenberg import model as model_module
+from ainter.models.nagel_schreckenberg.model import NaSchUrbanModel
+from ainter.models.nagel_schreckenberg.random_streams import RandomStreams
+from test.ainter.test_fixtures import seed
+from test.ainter.models.nagel_schreckenberg.test_road import graph
+
+
+@pytest.fixture
+def agent_config():
+    with open('./test/resources/czarnowiejska.json', 'r', encoding='utf-8') as in_file:
+        return EnvConfig.from_json(json.load(in_file))
+
+def test_streams_are_independent(seed):
+    streams = RandomStreams.from_seed(seed)
+    draws = {name: generator.integers(0, 2 ** 32, size=8) for name, generator in streams.generators.items()}
+
+    assert len({tuple(x.tolist()) for x in draws.values()}) == len(draws), "Every subsystem must have its own stream"
+    assert np.array_equal(RandomStreams.from_seed(seed).driver.integers(0, 2 ** 32, size=8), draws['driver']), \
+        "Streams must follow from the seed"
+
+def test_state_round_trip(seed):
+    streams = RandomStreams.from_seed(seed)
+    state = streams.get_state()
+    expected = streams.spawn.random(size=4)
+    streams.spawn.random(size=10)
+
+    streams.set_state(json.loads(json.dumps(state)))
+    assert np.array_equal(streams.spawn.random(size=4), expected), "Restored stream must repeat its draws"
+
+def test_unseeded_streams_can_be_reproduced():
+    streams = RandomStreams.from_seed()
+    assert np.array_equal(RandomStreams.from_seed(streams.entropy).render.random(size=4),
+                          streams.render.random(size=4)), "Entropy must reproduce the streams"
+
+def test_agent_model_is_reproducible(monkeypatch, graph, agent_config, tmp_path):
+    monkeypatch.setattr(model_module, "get_data_from_bbox", lambda config, **kwargs: graph)
+    models = [NaSchUrbanModel(agent_config, seed=7, results_dir=str(tmp_path / str(i))) for i in range(2)]
+    for _ in range(60):
+        for model in models:
+            model.step()
+
+    first, second = (model.engine.get_vehicle_columns() for model in models)
+    assert len(first['vehicle_id']) > 0, "Vehicles must be spawned"
+    for name in first:
+        assert np.array_equal(first[name], second[name]), f"{name} must not depend on anything but the seed"
+    assert np.array_equal(models[0].grid.palette, models[1].grid.palette), "Colours must follow the seed"
@@ -12,9 +12,12 @@ from shapely import LineString
 from ainter.configs.env_creation import EnvConfig, PhysicsConfig, VehiclesConfig, MapBoxConfig
 from ainter.models.nagel_schreckenberg.environment import Environment, enrich_edge_data
 from ainter.models.nagel_schreckenberg.model import NaSchUrbanModel
-from ainter.models.nagel_schreckenberg.road import Road
+from ainter.models.nagel_schreckenberg.profiling import StepProfile
+from ainter.models.nagel_schreckenberg.random_streams import RandomStreams
+from ainter.models.nagel_schreckenberg.road import Road, RoadSlot
 from ainter.models.nagel_schreckenberg.units import get_time_density_strategy, discretize_time, TimeDensity, ROAD_COLOR, \
     discretize_length, DEFAULT_ROAD_MAX_SPEED
+from ainter.models.vehicles.catalog import VehicleCatalog
 from ainter.models.vehicles.vehicle import Vehicle, NULL_VEHICLE_ID
 from test.ainter.test_fixtures import seed
 from test.ainter.models.vehicles.test_vehicle import agent_type
@@ -56,11 +59,16 @@ def dummy_model(monkeypatch, graph, env_config, seed):
         self.end_time = discretize_time(env_config.physics.end_time)
 
         self.graph = graph
-        self.grid = Environment.from_directed_graph(self.graph, self.time, self.random)
+        self.streams = RandomStreams.from_seed(seed)
+        self.grid = Environment.from_directed_graph(self.graph, self.time, self.streams.signals)
 
         self.agent_spawn_probability: TimeDensity = env_config.vehicles.time_density_strategy
 
         self.min_node_path_length = env_config.vehicles.min_node_path_length
+        self.vehicle_catalog = VehicleCatalog.from_config(env_config.vehicles.types)
+        self.discretization = env_config.physics.discretization
+        self.reserve_intersections = env_config.simulation.reserve_intersections
+        self.profile = StepProfile()
 
         self.running = True
 
@@ -103,17 +111,11 @@ def test_road(dummy_model, agent_type):
     assert road.contains_agent(agent.unique_id), "Road must contain agent"
 
 
-@pytest.mark.parametrize("color", [
-    np.array([0, 0, 255], dtype=np.uint8),
-    np.array([0, 255, 0], dtype=np.uint8),
-    np.array([255, 0, 0], dtype=np.uint8),
-])
-def test_remove_agent(seed, road_json, color):
+def test_remove_agent(seed, road_json):
     agent_ids = [1, 2, 8, 9, 10, 100, 1000, 765, 4562]
     rng = np.random.RandomState(seed)
     length = 5
 
-    assert np.all(road_json.render_lut == ROAD_COLOR), "Lut should be empty"
     assert np.all(road_json.grid == 0), "Road should be empty"
 
     for possible_lane_assigment in powerset(range(road_json.lanes)):
@@ -124,7 +126,7 @@ def test_remove_agent(seed, road_json, color):
         selected_agents = [agent_ids[i] for i in agent_indices]
 
         for agent_id, lane_num in zip(selected_agents, possible_lane_assigment):
-            road_json.add_agent(agent_id, color, lane_num, length)
+            road_json.add_agent(agent_id, lane_num, length)
             assert road_json.contains_agent(agent_id), f"Agent {agent_id} should be added"
 
         for agent_id in selected_agents:
@@ -133,7 +135,6 @@ def test_remove_agent(seed, road_json, color):
 
         assert np.all(road_json.grid == NULL_VEHICLE_ID), "Road should be empty"
 
-        road_json.render_lut[:] = ROAD_COLOR
         road_json.grid[:] = NULL_VEHICLE_ID
 
 @pytest.mark.parametrize("agent_id", [1111, 1, 2, 987, 1223,])
@@ -143,8 +144,7 @@ def test_move_agent(road_json, agent_type, agent_id, speed):
     assert not road_json.contains_agent(agent_id), "Road must be empty"
 
     for lane in range(road_json.lanes):
-        color = np.zeros((3,), dtype=np.uint8)
-        road_json.add_agent(agent_id, color, lane, length)
+        road_json.add_agent(agent_id, lane, length)
 
         assert road_json.contains_agent(agent_id), "Agent should be added"
 
@@ -153,8 +153,7 @@ def test_move_agent(road_json, agent_type, agent_id, speed):
         initial_end = initial_start + length
 
         if initial_end + speed > road_json.grid.shape[0]:
-            road_json.grid[:] = 0
-            road_json.render_lut[:] = ROAD_COLOR
+            road_json.remove_agent(agent_id)
             continue
 
         road_json.move_agent(agent_id, speed)
@@ -168,15 +167,13 @@ def test_move_agent(road_json, agent_type, agent_id, speed):
         assert moved_end - moved_start == length, "Agent should have the same length"
         assert moved_positions[1][0] == lane, f"Lane should not change"
 
-        road_json.grid[:] = NULL_VEHICLE_ID
-        road_json.render_lut[:] = ROAD_COLOR
+        road_json.remove_agent(agent_id)
 
-@pytest.mark.parametrize("road_grid,lane,agent_id,color,length,speed,expected", [
+@pytest.mark.parametrize("road_grid,lane,agent_id,length,speed,expected", [
     (
         np.array([[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],], dtype=np.uint16).T,
         0,
         7,
-        np.array([0, 255, 0], dtype=np.uint8),
         4,
         0,
         np.array([[7, 7, 7, 7, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],], dtype=np.uint16).T,
@@ -185,7 +182,6 @@ def test_move_agent(road_json, agent_type, agent_id, speed):
         np.array([[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],], dtype=np.uint16).T,
         0,
         7,
-        np.array([0, 255, 0], dtype=np.uint8),
         5,
         6,
         np.array([[0, 0, 0, 0, 0, 0, 7, 7, 7, 7, 7, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],], dtype=np.uint16).T,
@@ -194,7 +190,6 @@ def test_move_agent(road_json, agent_type, agent_id, speed):
         np.array([[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 3, 3, 3, 3, 3, 0, 0, 0, 0, 0],], dtype=np.uint16).T,
         0,
         7,
-        np.array([0, 255, 0], dtype=np.uint8),
         5,
         4,
         np.array([[0, 0, 0, 0, 7, 7, 7, 7, 7, 0, 0, 0, 0, 0, 3, 3, 3, 3, 3, 0, 0, 0, 0, 0],], dtype=np.uint16).T,
@@ -203,18 +198,17 @@ def test_move_agent(road_json, agent_type, agent_id, speed):
         np.array([[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 3, 3, 3, 3, 3, 0, 2, 2, 2, 2],], dtype=np.uint16).T,
         0,
         1,
-        np.array([0, 255, 0], dtype=np.uint8),
         5,
         9,
         np.array([[0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 3, 3, 3, 3, 3, 0, 2, 2, 2, 2],], dtype=np.uint16).T,
     ),
 ])
-def test_movement_from_start(road_json, road_grid, lane, agent_id, color, length, speed, expected):
-    road_json.grid = deepcopy(road_grid)
+def test_movement_from_start(road_json, road_grid, lane, agent_id, length, speed, expected):
+    road_json.set_grid(deepcopy(road_grid))
     road_json.lanes = road_grid.shape[1]
 
     assert not road_json.contains_agent(agent_id), "Road must be empty"
-    road_json.add_agent(agent_id, color, lane, length)
+    road_json.add_agent(agent_id, lane, length)
 
     assert road_json.contains_agent(agent_id), "Road must contain added agent"
     road_json.move_agent(agent_id, speed)
@@ -246,7 +240,7 @@ def test_movement_from_start(road_json, road_grid, lane, agent_id, color, length
 
 ])
 def test_movement_any_start(road_json, road_grid, lane, agent_id, speed, expected):
-    road_json.grid = deepcopy(road_grid)
+    road_json.set_grid(deepcopy(road_grid))
     road_json.lanes = road_grid.shape[1]
 
     assert road_json.contains_agent(agent_id), "Road must contain added agent"
@@ -311,7 +305,7 @@ def test_movement_any_start(road_json, road_grid, lane, agent_id, speed, expecte
     ),
 ])
 def test_get_agent_distance(road_json, road_grid, lane, agent_id, expected):
-    road_json.grid = deepcopy(road_grid)
+    road_json.set_grid(deepcopy(road_grid))
     road_json.lanes = road_grid.shape[1]
 
     assert road_json.contains_agent(agent_id), "Road must contain added agent"
@@ -370,12 +364,126 @@ def test_get_agent_distance(road_json, road_grid, lane, agent_id, expected):
         6,
         True,
     ),
+    (
+        np.array([[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 3, 3, 3, 3, 3, 0, 0, 0, 2, 2, 2, 2, 0],], dtype=np.uint16).T,
+        0,
+        2,
+        0,
+        True,
+    ),
 ])
 def test_agent_leaving_status(road_json, road_grid, lane, agent_id, speed, expected):
-    road_json.grid = deepcopy(road_grid)
+    road_json.set_grid(deepcopy(road_grid))
     road_json.lanes = road_grid.shape[1]
 
     assert road_json.contains_agent(agent_id), "Road must contain added agent"
     result = road_json.is_agent_leaving(agent_id, speed)
 
     assert result == expected, "Status must match"
+
+@pytest.mark.parametrize("road_grid,expected", [
+    (
+        np.array([[0, 0, 0, 3, 3, 3, 0, 2, 2, 0],], dtype=np.uint16).T,
+        {3: RoadSlot(start=3, lane=0, length=3), 2: RoadSlot(start=7, lane=0, length=2)},
+    ),
+    (
+        np.array([[5, 5, 0, 0, 0, 0, 0, 0, 0, 0],
+                  [0, 0, 0, 0, 0, 0, 0, 6, 6, 6],], dtype=np.uint16).T,
+        {5: RoadSlot(start=0, lane=0, length=2), 6: RoadSlot(start=7, lane=1, length=3)},
+    ),
+    (
+        np.zeros(shape=(10, 2), dtype=np.uint16),
+        dict(),
+    ),
+])
+def test_set_grid_rebuilds_slots(road_json, road_grid, expected):
+    road_json.set_grid(deepcopy(road_grid))
+
+    assert road_json.slots == expected, "Slots must match the grid content"
+
+@pytest.mark.parametrize("speeds", [[1, 2, 3], [0, 0, 5], [7, 7, 7, 7]])
+def test_slots_follow_moves(road_json, agent_type, speeds):
+    length = agent_type.get_characteristic().length
+    road_json.add_agent(1, 0, length)
+
+    for speed in speeds:
+        road_json.move_agent(1, speed)
+        cells = np.where(road_json.grid == 1)
+        slot = road_json.slots[1]
+
+        assert slot.start == cells[0][0], "Slot start must follow the grid"
+        assert slot.end == cells[0][-1], "Slot end must follow the grid"
+        assert slot.lane == cells[1][0], "Slot lane must follow the grid"
+
+    road_json.remove_agent(1)
+    assert 1 not in road_json.slots, "Slot must be removed with the agent"
+    assert np.all(road_json.grid == NULL_VEHICLE_ID), "Road should be empty"
+
+@pytest.fixture(params=[
+    './test/resources/roads/road1.json',
+    './test/resources/roads/road4.json',
+    './test/resources/roads/road8.json',
+])
+def dense_and_sparse_road(request):
+    with open(request.param, "r", encoding='utf-8') as in_file:
+        data = json.load(in_file)
+
+    data["geometry"] = LineString(data["geometry"])
+    enrich_edge_data(data, dict(), dict())
+
+    dense = Road.from_graph_data(dict(x=0.0, y=0.0), dict(x=1.0, y=1.0), data)
+    sparse = Road.from_graph_data(dict(x=0.0, y=0.0), dict(x=1.0, y=1.0), data, sparse=True)
+    return dense, sparse
+
+def test_sparse_road_has_no_grid(dense_and_sparse_road):
+    dense, sparse = dense_and_sparse_road
+
+    assert sparse.is_sparse() and not dense.is_sparse(), "Only the sparse road cannot store the grid"
+    assert sparse.grid is None, "Sparse road cannot allocate the grid"
+    assert sparse.shape == dense.shape, "Both representations must describe the same road"
+    assert np.all(sparse.dense_grid() == NULL_VEHICLE_ID), "Materialized grid must be empty"
+
+def test_sparse_road_matches_dense(seed, dense_and_sparse_road):
+    dense, sparse = dense_and_sparse_road
+    rng = np.random.RandomState(seed)
+    next_id = 1
+
+    for _ in range(200):
+        length = int(rng.randint(1, 4))
+        lane = int(rng.randint(0, dense.lanes))
+        if dense.can_accept_agent(next_id, length):
+            assert sparse.can_accept_agent(next_id, length), "Both roads must accept the agent"
+            dense.add_agent(next_id, lane, length)
+            sparse.add_agent(next_id, lane, length)
+            next_id += 1
+
+        for agent_id in sorted(dense.slots, key=lambda x: -dense.slots[x].start):
+            speed = int(rng.randint(0, 6))
+            assert dense.get_obstacle_distance(agent_id) == sparse.get_obstacle_distance(agent_id), "Gaps must match"
+            assert dense.move_agent(agent_id, speed) == sparse.move_agent(agent_id, speed), "Speeds must match"
+            if dense.is_agent_leaving(agent_id, speed):
+                assert sparse.is_agent_leaving(agent_id, speed), "Both agents must leave"
+                dense.remove_agent(agent_id)
+                sparse.remove_agent(agent_id)
+
+        assert np.all(dense.grid == sparse.dense_grid()), "Materialized grid must match the dense one"
+        for starts in sparse.lane_starts:
+            assert starts == sorted(starts), "Lane lists must stay ordered"
+
+def test_render_uses_shared_palette(dummy_model, agent_type):
+    path = list(nx.topological_sort(nx.DiGraph(dummy_model.graph)))
+    agent = Vehicle(model=dummy_model,
+                    vehicle_type=agent_type,
+                    path=path)
+    palette = dummy_model.grid.palette
+
+    assert np.all(palette[agent.unique_id] == agent.color), "Vehicle colour must be registered at spawn"
+    agent.step()
+
+    road = dummy_model.grid.roads[agent.pos]
+    image = road.render(palette)
+    occupied = road.grid.T == agent.unique_id
+
+    assert image.shape == (*road.grid.T.shape, 3), "Render must be an RGB image of the road"
+    assert np.all(image[occupied] == agent.color), "Vehicle cells must use its palette colour"
+    assert np.all(image[~occupied] == ROAD_COLOR), "Empty cells must use the road colour"
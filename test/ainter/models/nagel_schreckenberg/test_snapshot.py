@@ -0,0 +1,107 @@
+import random
+
+import numpy as np
+import pytest
+
+from ainter.models.nagel_schreckenberg.environment import Environment
+from ainter.models.nagel_schreckenberg.snapshot import save_environment, load_environment, read_environment_tables
+from test.ainter.test_fixtures import seed
+from test.ainter.models.nagel_schreckenberg.test_road import graph
+
+
+@pytest.fixture
+def environment(graph, seed):
+    return Environment.from_directed_graph(graph, 0, random.Random(seed))
+
+@pytest.fixture
+def snapshot_path(environment, tmp_path):
+    path = str(tmp_path / 'environment.bin')
+    save_environment(environment, path, key='key')
+    return path
+
+def test_tables_are_memory_mapped(snapshot_path, environment):
+    _, tables = read_environment_tables(snapshot_path)
+
+    assert all(isinstance(table, np.memmap) for table in tables.values()), "Tables must be views of the file"
+    assert not any(table.flags.writeable for table in tables.values()), "Tables must be read-only"
+    assert len(tables['edge_length']) == len(environment.roads), "Every road must be stored"
+
+def test_loaded_environment_matches_built(snapshot_path, environment, seed):
+    loaded = load_environment(snapshot_path, 0, random.Random(seed))
+
+    assert list(loaded.road_graph.nodes(data=True)) == list(environment.road_graph.nodes(data=True)), \
+        "Nodes must be restored"
+    assert list(loaded.roads) == list(environment.roads), "Roads must keep their order"
+    for key, road in environment.roads.items():
+        loaded_road = loaded.roads[key]
+        assert loaded_road.shape == road.shape, "Road grid shape must be restored"
+        assert (loaded_road.osm_id, loaded_road.name, loaded_road.max_speed, loaded_road.length) == \
+               (road.osm_id, road.name, road.max_speed, road.length), "Road attributes must be restored"
+
+    geometries = loaded.network.get_geometries()
+    assert all(geometry.equals(road.geometry) for geometry, road in zip(geometries, environment.roads.values())), \
+        "Road geometries must be restored"
+
+    assert list(loaded.intersections) == list(environment.intersections), "Intersections must keep their order"
+    for key, intersection in environment.intersections.items():
+        loaded_intersection = loaded.intersections[key]
+        assert loaded_intersection.grid.shape == intersection.grid.shape, "Intersection grid shape must be restored"
+        assert loaded_intersection.in_edge_directions == intersection.in_edge_directions, \
+            "Incoming directions must be restored"
+        assert loaded_intersection.out_edge_directions == intersection.out_edge_directions, \
+            "Outgoing directions must be restored"
+        assert loaded_intersection.signal_index == intersection.signal_index, "Signals must keep their order"
+
+    assert np.array_equal(loaded.signals.approach_direction, environment.signals.approach_direction), \
+        "Traffic light phases must be restored"
+    assert np.array_equal(loaded.signals.approach_start, environment.signals.approach_start), \
+        "Traffic light phases must be restored"
+    assert np.array_equal(loaded.signals.green_duration, environment.signals.green_duration), \
+        "Traffic light durations must follow the random state"
+
+def test_loaded_sparse_roads(snapshot_path):
+    loaded = load_environment(snapshot_path, 0, random.Random(0), sparse_road_min_length=1.)
+    assert all(road.is_sparse() for road in loaded.roads.values()), "Sparse threshold must be applied at load"
+
+def test_load_with_different_key(snapshot_path):
+    with pytest.raises(ValueError):
+        load_environment(snapshot_path, 0, random.Random(0), key='other')
+
+def test_load_invalid_file(tmp_path):
+    path = tmp_path / 'invalid.bin'
+    path.write_bytes(b'not an environment')
+
+    with pytest.raises(ValueError):
+        load_environment(str(path), 0, random.Random(0))
+
+def test_loaded_network_is_shared(snapshot_path, environment):
+    loaded = load_environment(snapshot_path, 0, random.Random(0))
+    network = loaded.network
+
+    assert network.graph is None and network.geometries is None, "Graph and geometries must not be built when loading"
+    assert all(isinstance(table, np.memmap) for table in (network.edge_source, network.edge_length, network.node_id)), \
+        "Network tables must be views of the file"
+    assert np.array_equal(network.edge_length, environment.network.edge_length), "Edge tables must match"
+    assert list(loaded.road_graph.edges) == list(environment.road_graph.edges), "Graph must be built on demand"
+    assert network.graph is not None, "Built graph must be kept"
+
+def test_replicas_share_the_network(snapshot_path):
+    first = load_environment(snapshot_path, 0, random.Random(0))
+    second = load_environment(snapshot_path, 0, random.Random(1))
+
+    assert first.network is second.network, "Replicas of one file must share the network"
+    assert all(first.roads[key] is not second.roads[key] for key in first.roads), "Roads must be per replica"
+    for key, intersection in first.intersections.items():
+        assert intersection.grid is not second.intersections[key].grid, "Intersection grids must be per replica"
+        assert intersection.in_edge_directions is second.intersections[key].in_edge_directions, \
+            "Approach directions must be shared"
+
+def test_loaded_network_has_the_same_hash(snapshot_path, environment):
+    loaded = load_environment(snapshot_path, 0, random.Random(0))
+    assert loaded.network.get_content_hash() == environment.network.get_content_hash(), \
+        "Hash must not depend on how the network was loaded"
+
+def test_built_network_is_read_only(environment):
+    assert not environment.network.edge_length.flags.writeable, "Static network cannot be modified"
+    assert environment.network.num_edges == len(environment.roads), "Every road must be an edge"
+    assert environment.network.graph is None, "Network must not keep the graph it was built from"
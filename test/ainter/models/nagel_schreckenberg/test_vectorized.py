@@ -0,0 +1,231 @@
+import dataclasses
+import itertools
+import json
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from ainter.models.nagel_schreckenberg import model as model_module
+from ainter.models.nagel_schreckenberg.arrivals import BernoulliArrivals, PoissonArrivals
+from ainter.models.nagel_schreckenberg.engine import AgentStepEngine, NO_POSITION
+from ainter.models.nagel_schreckenberg.environment import Environment, PALETTE_SIZE
+from ainter.models.nagel_schreckenberg.model import get_step_engine, NaSchUrbanModel
+from ainter.configs.env_creation import VehicleTypeConfig, DEFAULT_VEHICLE_TYPES, EnvConfig
+from ainter.models.nagel_schreckenberg.units import Discretization, UniformTimeDensity
+from ainter.models.nagel_schreckenberg.vectorized import VectorizedStepEngine
+from ainter.models.vehicles.catalog import VehicleCatalog, DEFAULT_VEHICLE_CATALOG
+from ainter.models.vehicles.vehicle import VehicleType, NULL_VEHICLE_ID
+from test.ainter.test_fixtures import seed
+from test.ainter.models.nagel_schreckenberg.test_road import graph, env_config, dummy_model
+from test.ainter.models.vehicles.test_vehicle import agent_type
+
+
+@pytest.fixture
+def engine(graph, seed):
+    environment = Environment.from_directed_graph(graph, 0, random.Random(seed))
+    return VectorizedStepEngine(environment, np.random.default_rng(seed))
+
+@pytest.fixture
+def path(graph):
+    return list(nx.topological_sort(nx.DiGraph(graph)))
+
+def assert_consistent_cells(engine):
+    for slot, length, on_road in zip(engine.slot, engine.length, engine.on_road):
+        expected = length if on_road else 0
+        assert np.sum(engine.cells == slot) == expected, "Vehicle must occupy exactly its length"
+
+def test_vehicle_travels_whole_path(engine, path, agent_type):
+    engine.spawn(agent_type, path)
+    assert engine.num_vehicles == 1, "Vehicle must be registered"
+
+    visited_roads = list()
+    for _ in range(1000):
+        engine.step()
+        assert_consistent_cells(engine)
+        if engine.num_vehicles == 0:
+            break
+        if engine.on_road[0] and (not visited_roads or visited_roads[-1] != engine.road[0]):
+            visited_roads.append(int(engine.road[0]))
+
+    assert engine.num_vehicles == 0, "Vehicle must finish its path"
+    assert visited_roads == list(range(len(path) - 1)), "Vehicle must follow its path"
+    assert np.all(engine.cells == 0), "Roads must be empty"
+
+def test_vehicles_do_not_overlap(engine, path):
+    for vehicle_type in list(VehicleType) * 5:
+        engine.spawn(vehicle_type, path)
+
+    for _ in range(300):
+        engine.step()
+        assert_consistent_cells(engine)
+        assert np.all(engine.speed >= 0), "Speed cannot be negative"
+        assert np.all(engine.speed <= engine.catalog.max_speed[engine.type]), "Speed cannot exceed the maximum"
+
+def test_vehicle_ids_beyond_cell_range(engine, path):
+    engine.next_id = PALETTE_SIZE - 2
+    for vehicle_type in list(VehicleType) * 2:
+        engine.spawn(vehicle_type, path)
+
+    seen = set()
+    for _ in range(1000):
+        engine.step()
+        assert_consistent_cells(engine)
+        assert np.all(engine.environment.palette[engine.slot] == engine.color), "Palette must hold the colours"
+        seen.update(engine.ids[engine.on_road].tolist())
+        if engine.num_vehicles == 0:
+            break
+
+    assert PALETTE_SIZE in seen, "Vehicle with the id wrapping 16 bits must drive on the roads"
+    assert engine.num_vehicles == 0, "Vehicles must finish their paths"
+    assert len(engine.free_slots) == PALETTE_SIZE - 1, "Slots of the removed vehicles must be recycled"
+
+def test_one_vehicle_enters_road_per_step(engine, path):
+    for _ in range(3):
+        engine.spawn(VehicleType.CAR, path)
+
+    engine.step()
+    assert np.sum(engine.on_road) == 1, "Only one vehicle can enter an empty road"
+    assert engine.on_road[0], "Vehicle spawned first must enter first"
+
+def test_vehicle_types_from_catalog(graph, path, seed):
+    catalog = VehicleCatalog.from_config((VehicleTypeConfig(name='SLOW', length=6., acc_forward=2., acc_backward=2.,
+                                                            max_speed=15.),
+                                          VehicleTypeConfig(name='FAST', length=2., acc_forward=4., acc_backward=4.)))
+    engine = VectorizedStepEngine(Environment.from_directed_graph(graph, 0, random.Random(seed)),
+                                  np.random.default_rng(seed), catalog=catalog)
+    for _ in range(3):
+        engine.spawn(catalog.get_type_id('SLOW'), path)
+        engine.spawn(catalog.get_type_id('FAST'), path)
+
+    engine.step()
+    assert engine.length.tolist() == catalog.length[engine.type].tolist(), "Length must be looked up by the type"
+    assert engine.acc_forward.tolist() == catalog.acc_forward[engine.type].tolist(), \
+        "Acceleration must be looked up by the type"
+    for _ in range(100):
+        engine.step()
+        assert_consistent_cells(engine)
+        assert np.all(engine.speed <= catalog.max_speed[engine.type]), "Speed cannot exceed the type maximum"
+
+@pytest.mark.parametrize("cell_size", [0.5, 7.5])
+def test_run_at_another_resolution(graph, path, seed, cell_size):
+    discretization = Discretization(cell_size=cell_size)
+    environment = Environment.from_directed_graph(graph, 0, random.Random(seed), discretization=discretization)
+    catalog = VehicleCatalog.from_config(DEFAULT_VEHICLE_TYPES, discretization)
+    engine = VectorizedStepEngine(environment, np.random.default_rng(seed), catalog=catalog)
+    default_cells = Environment.from_directed_graph(graph, 0, random.Random(seed)).roads[path[0], path[1]].shape[0]
+    assert environment.roads[path[0], path[1]].shape[0] == pytest.approx(default_cells * 2. / cell_size, abs=1), \
+        "Road cells must follow the cell size"
+    intersection = next(iter(environment.intersections.values()))
+    assert engine.waiting_distance == intersection.get_obstacle_distance(NULL_VEHICLE_ID, time=0), \
+        "Engines must stop at intersections alike"
+
+    for vehicle_type in catalog.type_ids * 2:
+        engine.spawn(vehicle_type, path)
+    for _ in range(2000):
+        engine.step()
+        assert_consistent_cells(engine)
+        assert np.all(engine.speed <= catalog.max_speed[engine.type]), "Speed cannot exceed the type maximum"
+        if engine.num_vehicles == 0:
+            break
+    assert engine.num_vehicles == 0, "Vehicles must finish their path at any resolution"
+    assert catalog.max_speed[1] != DEFAULT_VEHICLE_CATALOG.max_speed[1], "Speeds must be given in the new cells"
+
+@pytest.mark.parametrize("code,expected", [
+    ("agent", AgentStepEngine),
+    ("vectorized", VectorizedStepEngine),
+])
+def test_get_step_engine(dummy_model, code, expected):
+    assert isinstance(get_step_engine(code, dummy_model), expected), "Engine must match the code"
+
+def test_vectorized_engine_cannot_reserve_intersections(dummy_model):
+    dummy_model.reserve_intersections = True
+    with pytest.raises(ValueError, match="agent engine"):
+        get_step_engine("vectorized", dummy_model)
+
+def test_get_unknown_step_engine(dummy_model):
+    with pytest.raises(ValueError, match="Unknown engine code provided"):
+        get_step_engine("unknown", dummy_model)
+
+def test_free_entry_cells(engine, path, agent_type):
+    first_road = (path[0], path[1])
+    assert engine.get_free_entry_cells([first_road])[0] == engine.environment.roads[first_road].shape[0], \
+        "Empty road must be free"
+
+    engine.spawn(agent_type, path)
+    engine.step()
+    assert engine.get_free_entry_cells([first_road])[0] == 0, "Entered vehicle must occupy the first cells"
+
+def test_vehicle_columns(engine, path, agent_type):
+    engine.spawn(agent_type, path)
+    engine.spawn(agent_type, path)
+    engine.step()
+
+    columns = engine.get_vehicle_columns()
+    assert list(columns['vehicle_id']) == [1, 2], "Every vehicle must be reported"
+    assert list(columns['position_from']) == [path[0], path[0]], "Vehicles must start at the first node"
+    assert list(columns['position_to']) == [path[1], NO_POSITION], "Only the entered vehicle can be on the road"
+
+def test_vehicles_stop_on_red_light(monkeypatch, graph, seed, path):
+    environment = Environment.from_directed_graph(graph, 0, random.Random(seed))
+    engine = VectorizedStepEngine(environment, np.random.default_rng(seed), obey_signals=True)
+    monkeypatch.setattr(Environment, "get_signal_states",
+                        lambda self: np.zeros(shape=len(self.signals.approach_direction), dtype=bool))
+    signalled = engine.road_approach >= 0
+    engine.spawn(VehicleType.CAR, path)
+
+    for _ in range(300):
+        engine.step()
+        if engine.on_road[0] and signalled[engine.road[0]]:
+            break
+
+    road = engine.road[0]
+    for _ in range(100):
+        engine.step()
+    assert engine.on_road[0] and engine.road[0] == road, "Vehicle cannot leave its road on the red light"
+    assert engine.road_cells[road] - engine.head[0] <= 3, "Vehicle must wait at the end of the road"
+    assert engine.speed[0] == 0, "Waiting vehicle must stand still"
+
+@pytest.fixture
+def street_grid():
+    """Grid of 6x6 intersections joined by one-lane two-way streets of 100 meters"""
+    size = 6
+    graph = nx.MultiDiGraph()
+    for row, column in itertools.product(range(size), repeat=2):
+        graph.add_node(row * size + column, x=column * 100., y=row * 100.)
+    for row, column in itertools.product(range(size), repeat=2):
+        for neighbour in (row * size + column + 1 if column + 1 < size else None,
+                          (row + 1) * size + column if row + 1 < size else None):
+            if neighbour is None:
+                continue
+            node = row * size + column
+            for start, end in ((node, neighbour), (neighbour, node)):
+                graph.add_edge(start, end, key=0, osmid=start * size ** 2 + end, length=100., lanes=1,
+                               oneway=False, reversed=False)
+    return graph
+
+@pytest.mark.parametrize("p, arrivals", [(0.05, BernoulliArrivals()), (1., PoissonArrivals(4.))],
+                         ids=['free_flow', 'congested'])
+def test_engines_agree_on_street_grid(monkeypatch, street_grid, tmp_path, p, arrivals):
+    monkeypatch.setattr(model_module, "get_data_from_bbox", lambda config, **kwargs: street_grid)
+    with open('./test/resources/czarnowiejska.json', 'r', encoding='utf-8') as in_file:
+        env_config = EnvConfig.from_json(json.load(in_file))
+    vehicles = dataclasses.replace(env_config.vehicles, time_density_strategy=UniformTimeDensity(p),
+                                   arrival_process=arrivals)
+
+    aggregates = dict()
+    for code in ('agent', 'vectorized'):
+        simulation = dataclasses.replace(env_config.simulation, engine=code, graph_cache_dir=None)
+        model = NaSchUrbanModel(dataclasses.replace(env_config, simulation=simulation, vehicles=vehicles),
+                                seed=3, results_dir=str(tmp_path / code))
+        counts = list()
+        for _ in range(1000):
+            model.step()
+            counts.append(model.num_agents)
+        aggregates[code] = np.mean(counts[200:]), model.demand.released - model.num_agents
+
+    (agent_count, agent_throughput), (vectorized_count, vectorized_throughput) = aggregates.values()
+    assert agent_throughput > 0, "Vehicles must finish their paths"
+    assert vectorized_count == pytest.approx(agent_count, rel=.05), "Engines must hold as many vehicles"
+    assert vectorized_throughput == pytest.approx(agent_throughput, rel=.05), "Engines must finish as many vehicles"
@@ -0,0 +1,77 @@
+import logging
+
+import numpy as np
+import pytest
+
+from ainter.configs.env_creation import VehicleTypeConfig, DEFAULT_VEHICLE_TYPES
+from ainter.models.nagel_schreckenberg.units import discretize_length, get_breaking_distance, Discretization
+from ainter.models.vehicles.catalog import VehicleCatalog, DEFAULT_VEHICLE_CATALOG
+from ainter.models.vehicles.vehicle import VehicleType
+from test.ainter.models.vehicles.test_vehicle import agent_type
+
+
+def test_default_catalog_matches_vehicle_types(agent_type):
+    assert DEFAULT_VEHICLE_CATALOG.names[agent_type] == agent_type.name, "Type ids must match the enum"
+    assert DEFAULT_VEHICLE_CATALOG.length[agent_type] == agent_type.get_characteristic().length, \
+        "Arrays must hold the characteristic of the type"
+
+def test_catalog_arrays():
+    catalog = VehicleCatalog.from_config((VehicleTypeConfig(name='TRAM', length=30., acc_forward=2., acc_backward=2.,
+                                                            max_speed=30., share=3.),
+                                          VehicleTypeConfig(name='BIKE', length=2., acc_forward=2., acc_backward=2.,
+                                                            max_speed=20., share=0.)))
+
+    assert catalog.get_type_id('BIKE') == 2, "Types must be numbered from one in the config order"
+    assert catalog.length.tolist() == [0, int(discretize_length(30.)), int(discretize_length(2.))], \
+        "Lengths must be indexed by the type id"
+    assert catalog.max_speed[1] > catalog.max_speed[2], "Maximal speed must be discretized per type"
+    assert np.allclose(catalog.probability, [0., 1., 0.]), "Shares must be normalized"
+    assert catalog.spawned_type_ids == [1], "Types without a share are not spawned"
+    assert not catalog.length.flags.writeable, "Arrays must be read-only"
+
+def test_coarse_cells_keep_types_moving(caplog):
+    with caplog.at_level(logging.WARNING):
+        catalog = VehicleCatalog.from_config(DEFAULT_VEHICLE_TYPES, Discretization(cell_size=7.5))
+    assert "Vehicle type CAR" in caplog.text and "acceleration 7.50 m/s^2" in caplog.text, \
+        "Raised parameters must be reported with their physical values"
+    assert np.all(catalog.length[1:] >= 1) and np.all(catalog.acc_forward[1:] >= 1), \
+        "Every type must span and accelerate by at least one cell"
+    assert np.all(catalog.max_speed[1:] == 2), "Maximal speed must be discretized with the cell size"
+    assert catalog.get_content_hash() != DEFAULT_VEHICLE_CATALOG.get_content_hash(), "Hash must follow the cells"
+
+def test_breaking_distance_covers_types():
+    catalog = VehicleCatalog.from_config(DEFAULT_VEHICLE_TYPES, Discretization(cell_size=0.5))
+    assert catalog.breaking_distance.shape == (np.max(catalog.acc_backward) + 1, np.max(catalog.max_speed) + 1), \
+        "Table must cover every deceleration and speed of the types"
+    for acc_backward in range(1, catalog.breaking_distance.shape[0]):
+        for speed in range(catalog.breaking_distance.shape[1]):
+            assert catalog.breaking_distance[acc_backward, speed] == get_breaking_distance(speed, acc_backward), \
+                "Table must match the braking distance"
+    assert catalog.breaking_distance[2, :8].tolist() == [0, 1, 2, 4, 6, 9, 12, 16], \
+        "Braking by two cells must stop in the same distance as the NaSch rules"
+
+def test_content_hash_follows_spawned_types():
+    other = VehicleCatalog.from_config(DEFAULT_VEHICLE_TYPES[:2])
+    assert other.get_content_hash() != DEFAULT_VEHICLE_CATALOG.get_content_hash(), "Hash must depend on the types"
+    assert VehicleCatalog.from_config(DEFAULT_VEHICLE_TYPES).get_content_hash() == \
+        DEFAULT_VEHICLE_CATALOG.get_content_hash(), "Hash must follow from the config"
+
+def test_catalog_compares_by_identity():
+    other = VehicleCatalog.from_config(DEFAULT_VEHICLE_TYPES)
+    assert DEFAULT_VEHICLE_CATALOG == DEFAULT_VEHICLE_CATALOG and DEFAULT_VEHICLE_CATALOG != other, \
+        "Catalogs must compare without the arrays"
+    assert len({DEFAULT_VEHICLE_CATALOG, other}) == 2, "Catalogs must be hashable"
+
+@pytest.mark.parametrize("types", [
+    (),
+    (VehicleTypeConfig(name='CAR', length=4.5, acc_forward=2., acc_backward=2.),) * 2,
+    (VehicleTypeConfig(name='CAR', length=4.5, acc_forward=2., acc_backward=2., share=0.),),
+    (VehicleTypeConfig(name='CAR', length=4.5, acc_forward=2., acc_backward=2., max_speed=1000.),),
+])
+def test_invalid_catalog(types):
+    with pytest.raises(ValueError):
+        VehicleCatalog.from_config(types)
+
+def test_unknown_type_name():
+    with pytest.raises(ValueError, match="Unknown vehicle type"):
+        DEFAULT_VEHICLE_CATALOG.get_type_id(VehicleType.CAR.name.lower())
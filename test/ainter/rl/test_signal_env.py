@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from ainter.models.nagel_schreckenberg import model as model_module
+from ainter.rl.signal_env import SignalControlEnv
+from test.ainter.models.nagel_schreckenberg.test_partitioned import partition_config
+from test.ainter.models.nagel_schreckenberg.test_road import graph
+
+
+@pytest.fixture
+def signal_env(monkeypatch, graph, partition_config):
+    monkeypatch.setattr(model_module, "get_data_from_bbox", lambda config, **kwargs: graph)
+    return SignalControlEnv(partition_config, decision_interval=5, episode_steps=50)
+
+def run_episode(signal_env, seed):
+    observation, _ = signal_env.reset(seed=seed)
+    observations = [observation]
+    rewards = list()
+    truncated = False
+    while not truncated:
+        observation, reward, terminated, truncated, info = signal_env.step(np.zeros_like(signal_env.action_sizes))
+        assert not terminated, "Traffic never terminates"
+        observations.append(observation)
+        rewards.append(reward)
+    return np.array(observations), np.array(rewards), info
+
+def test_observation_layout(signal_env):
+    observation, info = signal_env.reset(seed=1)
+
+    assert observation.shape == (signal_env.observation_size,), "Observation must have its declared size"
+    assert observation.dtype == np.float32, "Observation must be a float vector"
+    assert np.all(signal_env.action_sizes >= 1), "Every intersection must have a phase to choose"
+    assert info['vehicles'] == 0, "Episode must start from empty roads"
+
+def test_episode_is_truncated(signal_env):
+    observations, rewards, info = run_episode(signal_env, 1)
+
+    assert len(rewards) == 10, "Episode must last its number of steps"
+    assert np.all(rewards <= 0), "Reward cannot be positive"
+    assert info['vehicles'] > 0, "Vehicles must enter the network"
+    vehicles = observations[:, :signal_env.num_roads]
+    halted = observations[:, signal_env.num_roads:2 * signal_env.num_roads]
+    assert np.all(halted <= vehicles), "Halted vehicles are the vehicles on the road"
+
+def test_same_seed_gives_same_episode(signal_env):
+    first = run_episode(signal_env, 7)
+    second = run_episode(signal_env, 7)
+
+    assert np.array_equal(first[0], second[0]), "Same seed must give the same observations"
+    assert np.array_equal(first[1], second[1]), "Same seed must give the same rewards"
+
+def test_constructor_seed_gives_same_episodes(monkeypatch, graph, partition_config):
+    monkeypatch.setattr(model_module, "get_data_from_bbox", lambda config, **kwargs: graph)
+    first, second = (SignalControlEnv(partition_config, decision_interval=5, episode_steps=50, seed=3)
+                     for _ in range(2))
+
+    for _ in range(2):
+        assert np.array_equal(run_episode(first, None)[1], run_episode(second, None)[1]), \
+            "Episodes of the same seed must repeat"
+
+def test_invalid_action(signal_env):
+    signal_env.reset(seed=1)
+    with pytest.raises(ValueError):
+        signal_env.step(signal_env.action_sizes)
+
+@pytest.mark.parametrize('decision_interval,episode_steps', [(0, None), (1, 0)])
+def test_invalid_parameters(monkeypatch, graph, partition_config, decision_interval, episode_steps):
+    monkeypatch.setattr(model_module, "get_data_from_bbox", lambda config, **kwargs: graph)
+    with pytest.raises(ValueError):
+        SignalControlEnv(partition_config, decision_interval=decision_interval, episode_steps=episode_steps)
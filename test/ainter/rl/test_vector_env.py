@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from ainter.models.nagel_schreckenberg import model as model_module
+from ainter.rl.vector_env import SubprocVectorEnv
+from test.ainter.models.nagel_schreckenberg.test_partitioned import partition_config
+from test.ainter.models.nagel_schreckenberg.test_road import graph
+
+
+def run_steps(vector_env, steps, seed):
+    observations, _ = vector_env.reset(seed=seed)
+    actions = np.zeros(shape=(vector_env.num_envs, len(vector_env.action_sizes)), dtype=np.int64)
+    rewards = list()
+    for _ in range(steps):
+        vector_env.step_async(actions)
+        observations, reward, terminated, truncated, infos = vector_env.step_wait()
+        rewards.append(reward)
+    return observations, np.array(rewards), truncated, infos
+
+def test_batch_does_not_depend_on_workers(monkeypatch, graph, partition_config, tmp_path):
+    monkeypatch.setattr(model_module, "get_data_from_bbox", lambda config, **kwargs: graph)
+
+    results = list()
+    for workers in (1, 2):
+        with SubprocVectorEnv(partition_config, num_envs=3, num_workers=workers, episode_steps=20,
+                              work_dir=str(tmp_path / str(workers))) as vector_env:
+            results.append(run_steps(vector_env, 4, seed=5))
+
+    (observations, rewards, truncated, infos), (other_observations, other_rewards, _, _) = results
+    assert observations.shape == (3, len(observations[0])), "Every replica must have its observation"
+    assert np.array_equal(observations, other_observations), "Batch must not depend on the number of workers"
+    assert np.array_equal(rewards, other_rewards), "Rewards must not depend on the number of workers"
+    assert not np.array_equal(rewards[:, 0], rewards[:, 1]), "Replicas must have their own random streams"
+    assert np.all(truncated), "Episodes must be truncated after their steps"
+    assert all('final_observation' in info for info in infos), "Final observation must be kept in the info"
+    assert all(info['reset_info']['vehicles'] == 0 for info in infos), "Finished replicas must be reset"
+
+def test_invalid_actions(monkeypatch, graph, partition_config, tmp_path):
+    monkeypatch.setattr(model_module, "get_data_from_bbox", lambda config, **kwargs: graph)
+
+    with SubprocVectorEnv(partition_config, num_envs=2, num_workers=1, work_dir=str(tmp_path)) as vector_env:
+        vector_env.reset(seed=1)
+        with pytest.raises(ValueError):
+            vector_env.step(np.zeros(shape=(1, len(vector_env.action_sizes)), dtype=np.int64))
+
+@pytest.mark.parametrize('num_envs,num_workers', [(0, None), (2, 3), (2, 0)])
+def test_invalid_number_of_workers(partition_config, num_envs, num_workers):
+    with pytest.raises(ValueError):
+        SubprocVectorEnv(partition_config, num_envs=num_envs, num_workers=num_workers)